@@ -1,8 +1,14 @@
-from flask import Flask
-from .routes import bp
-
-def create_app():
-    """Crée et configure l'application Flask."""
-    app = Flask(__name__)
-    app.register_blueprint(bp)
-    return app
+def create_app():
+    """Crée et configure l'application Flask."""
+    from flask import Flask
+    from jinja2 import FileSystemBytecodeCache
+    from .config import TEMPLATE_CACHE_DIR, TRANSCRIPTION_MAX_UPLOAD_MB
+    from .routes import bp, UploadRequest
+
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+    app.config['MAX_CONTENT_LENGTH'] = TRANSCRIPTION_MAX_UPLOAD_MB * 1024 * 1024
+    TEMPLATE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    app.jinja_options = {**app.jinja_options, 'bytecode_cache': FileSystemBytecodeCache(str(TEMPLATE_CACHE_DIR))}
+    app.register_blueprint(bp)
+    return app
@@ -0,0 +1,487 @@
+"""
+ASGI entry point for serving concurrent /process streams.
+
+POST /process is handled natively with astream_response, so hundreds of
+generations share one event loop instead of each holding a worker
+thread. Live correction is served over the /ws/live WebSocket. Every
+other request is delegated to the Flask application in a worker thread,
+its response streamed back chunk by chunk, so the blueprint stays the
+single place where routes live.
+"""
+import asyncio
+import contextvars
+import importlib.util
+import io
+import itertools
+import json
+import logging
+import sys
+import tempfile
+import uuid
+from typing import BinaryIO, Iterator, Optional
+
+from werkzeug.wrappers import Request
+
+from .cancellation import StreamAbort, abortable, stream_registry
+from .config import UPLOAD_SPOOL_MAX_MB
+from .metrics import StreamTimer
+from .models import astream_response
+from .prewarm import connection_warmer
+from .routes import live_check, parse_live_request, parse_process_request, stream_for_request
+from .speculation import speculator
+from .streaming import create_stream_encoder, SSE_END
+
+logger = logging.getLogger(__name__)
+
+
+class AsgiApp:
+    """
+    ASGI application running next to the Flask blueprint.
+    """
+
+    def __init__(self, flask_app) -> None:
+        """
+        Initialize the ASGI application.
+
+        Args:
+            flask_app: Flask application handling every route but /process
+        """
+        self.flask_app = flask_app
+
+    async def __call__(self, scope: dict, receive, send) -> None:
+        """
+        Dispatches an ASGI connection.
+
+        Args:
+            scope: ASGI connection scope
+            receive: ASGI receive callable
+            send: ASGI send callable
+        """
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] == 'websocket':
+            if scope['path'] == '/ws/live':
+                await self._live(receive, send)
+            else:
+                await send({'type': 'websocket.close', 'code': 1008})
+            return
+        if scope['type'] != 'http':
+            return
+
+        # Bodies over MAX_CONTENT_LENGTH are refused from their Content-Length
+        # before being read, or as soon as they grow past it
+        max_length = getattr(self.flask_app, 'config', {}).get('MAX_CONTENT_LENGTH')
+        body = None
+        if max_length is None or _declared_length(scope) <= max_length:
+            body = await _read_body(receive, max_length)
+        if body is None:
+            await _send_response(send, 413, [('Content-Type', 'application/json')], json.dumps({
+                'success': False,
+                'error': f"Le fichier est trop volumineux. Taille maximale: {max_length // (1024 * 1024)}MB",
+            }).encode('utf-8'))
+            return
+        with body:
+            environ = _build_environ(scope, body)
+            if scope['path'] == '/process' and scope['method'] == 'POST':
+                await self._process(environ, receive, send)
+            else:
+                await self._wsgi(environ, receive, send)
+
+    async def _lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                connection_warmer.attach_loop(asyncio.get_running_loop())
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                connection_warmer.attach_loop(None)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _process(self, environ: dict, receive, send) -> None:
+        """
+        Streams a /process response from the async engine.
+
+        Mirrors routes.process, including its streaming protocols,
+        cancellation, speculation and metrics. Long-text and edit-list requests
+        run the threaded pipelines, and speculations are followed, from a worker thread. A client disconnect cancels
+        the stream task, which closes the provider stream; so does /process/cancel, even before the first token.
+        """
+        timer = StreamTimer()
+        form = Request(environ).form
+        params, error = await asyncio.to_thread(parse_process_request, form)
+        if error:
+            await _send_response(send, 400, [('Content-Type', 'application/json')],
+                                 json.dumps({'error': error}).encode('utf-8'))
+            return
+        encoder = create_stream_encoder(params.pop('protocol'))
+        request_id = params.pop('request_id')
+        metadata = {}
+        # Reaches the threaded streams too, through the context copied by _iterate_in_thread
+        abort = StreamAbort()
+        abortable(abort)
+        # Claiming waits for the pending speculation to be prepared
+        speculation = await asyncio.to_thread(speculator.claim, params)
+        if speculation:
+            stream = _iterate_in_thread(speculation.follow(metadata))
+        elif params['long_text'] or params['edit_list']:
+            stream = _iterate_in_thread(stream_for_request(params, metadata))
+        else:
+            params.pop('long_text')
+            params.pop('edit_list')
+            stream = astream_response(**params, metadata=metadata)
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [(b'content-type', b'text/event-stream; charset=utf-8'), (b'cache-control', b'no-cache'),
+                        (b'x-request-id', request_id.encode('latin-1')),
+                        (b'server-timing', f"setup;dur={timer.elapsed_ms()}".encode('latin-1'))],
+        })
+
+        async def send_frame(frame: str) -> None:
+            if frame:
+                await send({'type': 'http.response.body', 'body': frame.encode('utf-8'), 'more_body': True})
+
+        cancelled = stream_registry.register(request_id, abort)
+        output = []
+        outcome = 'disconnected'
+
+        async def relay() -> None:
+            nonlocal outcome
+            try:
+                async for chunk in stream:
+                    if cancelled.is_set():
+                        outcome = 'cancelled'
+                        await send_frame(encoder.error("Erreur: Génération interrompue"))
+                        return
+                    if chunk:
+                        output.append(chunk)
+                        timer.chunk(chunk)
+                        await send_frame(encoder.delta(chunk.replace('\r', '')))
+                outcome = 'completed'
+                metadata['timing'] = timer.timing()
+                await send_frame(encoder.done(metadata))
+            except Exception as e:
+                outcome = 'completed'
+                metadata.update({'error': f"Erreur: {str(e)}", 'error_class': type(e).__name__})
+                await send_frame(encoder.error(metadata['error']))
+            finally:
+                await stream.aclose()
+
+        def cancel_relay() -> None:
+            if outcome == 'disconnected':
+                relay_task.cancel()
+
+        loop = asyncio.get_running_loop()
+        relay_task = asyncio.create_task(relay())
+        abort.add(lambda: loop.call_soon_threadsafe(cancel_relay))
+        disconnect_task = asyncio.create_task(_wait_disconnect(receive))
+        try:
+            await asyncio.wait({relay_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+            if not relay_task.done():
+                relay_task.cancel()
+                await asyncio.gather(relay_task, return_exceptions=True)
+                return
+            if relay_task.cancelled():
+                outcome = 'cancelled'
+                await send_frame(encoder.error("Erreur: Génération interrompue"))
+            await send({'type': 'http.response.body', 'body': SSE_END.encode('utf-8')})
+        finally:
+            disconnect_task.cancel()
+            stream_registry.release(request_id, outcome, params['input_text'], ''.join(output))
+            timer.finish(outcome, params['mode_name'], metadata)
+
+    async def _live(self, receive, send) -> None:
+        """
+        Serves live correction over a WebSocket.
+
+        Every text frame is a live message as accepted by /api/live, the
+        session defaulting to the connection. Paragraph messages and the
+        summary are sent back as JSON text frames. A check superseded by a
+        newer revision stops at its next paragraph; closing the connection
+        stops every check.
+        """
+        if (await receive())['type'] != 'websocket.connect':
+            return
+        await send({'type': 'websocket.accept'})
+        connection_id = uuid.uuid4().hex
+        checks = set()
+
+        async def send_json(message: dict) -> None:
+            await send({'type': 'websocket.send', 'text': json.dumps(message, ensure_ascii=False)})
+
+        async def run_check(params: dict) -> None:
+            stream = _iterate_in_thread(live_check(params))
+            try:
+                async for message in stream:
+                    await send_json(message)
+            except Exception as e:
+                await send_json({'type': 'error', 'revision': params['revision'], 'error': f"Erreur: {str(e)}"})
+            finally:
+                await stream.aclose()
+
+        try:
+            while True:
+                message = await receive()
+                if message['type'] == 'websocket.disconnect':
+                    return
+                if message['type'] != 'websocket.receive':
+                    continue
+                try:
+                    data = json.loads(message.get('text') or message.get('bytes') or '')
+                except ValueError:
+                    data = None
+                if not isinstance(data, dict):
+                    await send_json({'type': 'error', 'revision': None, 'error': "Message JSON invalide."})
+                    continue
+                data.setdefault('session_id', connection_id)
+                params, error = await asyncio.to_thread(parse_live_request, data)
+                if error:
+                    await send_json({'type': 'error', 'revision': data.get('revision'), 'error': error})
+                    continue
+                task = asyncio.create_task(run_check(params))
+                checks.add(task)
+                task.add_done_callback(checks.discard)
+        finally:
+            running = list(checks)
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+    async def _wsgi(self, environ: dict, receive, send) -> None:
+        """
+        Runs the Flask application in a worker thread and streams its response.
+
+        Every chunk of the response body is sent as soon as Flask yields it,
+        so that the NDJSON routes stream under this server as they do under
+        waitress. A client disconnect closes the response.
+        """
+        response = _iterate_in_thread(_run_wsgi(self.flask_app, environ))
+
+        async def relay() -> None:
+            status, headers = await anext(response)
+            await send({
+                'type': 'http.response.start',
+                'status': status,
+                'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+            })
+            async for data in response:
+                await send({'type': 'http.response.body', 'body': data, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+
+        relay_task = asyncio.create_task(relay())
+        disconnect_task = asyncio.create_task(_wait_disconnect(receive))
+        try:
+            await asyncio.wait({relay_task, disconnect_task}, return_when=asyncio.FIRST_COMPLETED)
+            if not relay_task.done():
+                relay_task.cancel()
+                await asyncio.gather(relay_task, return_exceptions=True)
+            else:
+                relay_task.result()
+        finally:
+            disconnect_task.cancel()
+            await response.aclose()
+
+
+async def _wait_disconnect(receive) -> None:
+    """
+    Waits until the client closes the connection.
+
+    Args:
+        receive: ASGI receive callable whose request body was already read
+    """
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def _iterate_in_thread(iterator):
+    """
+    Iterates a blocking generator without blocking the event loop.
+
+    When iteration is cancelled while a worker thread is still waiting for
+    the next item, the generator is closed as soon as that item arrives.
+
+    Args:
+        iterator: Blocking generator
+
+    Yields:
+        Items of the generator
+    """
+    loop = asyncio.get_running_loop()
+    # Every step runs in the same context, so that context variables set by
+    # the generator, such as Flask's request context, survive between threads
+    context = contextvars.copy_context()
+    end = object()
+    pending = None
+    try:
+        while True:
+            pending = loop.run_in_executor(None, context.run, next, iterator, end)
+            item = await asyncio.shield(pending)
+            if item is end:
+                return
+            yield item
+    finally:
+        if pending is not None and not pending.done():
+            pending.add_done_callback(lambda _: context.run(iterator.close))
+        else:
+            context.run(iterator.close)
+
+
+def _run_wsgi(wsgi_app, environ: dict) -> Iterator:
+    """
+    Calls a WSGI application and iterates its response.
+
+    Args:
+        wsgi_app: WSGI application
+        environ: WSGI environment
+
+    Yields:
+        The status code and headers, as a tuple, then every non-empty chunk of the body
+    """
+    response = {}
+    written = []
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+        return written.append
+
+    result = wsgi_app(environ, start_response)
+    try:
+        chunks = iter(result)
+        # start_response may be deferred until the first chunk
+        first = [] if 'status' in response else [next(chunks, b'')]
+        yield response['status'], response['headers']
+        for data in itertools.chain(first, chunks):
+            while written:
+                yield written.pop(0)
+            if data:
+                yield data
+        while written:
+            yield written.pop(0)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+
+
+async def _send_response(send, status: int, headers: list[tuple[str, str]], body: bytes) -> None:
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def _declared_length(scope: dict) -> int:
+    """
+    Returns the Content-Length of a request, 0 when it has none.
+    """
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'content-length':
+            try:
+                return int(value)
+            except ValueError:
+                return 0
+    return 0
+
+
+async def _read_body(receive, max_length: Optional[int] = None) -> Optional[BinaryIO]:
+    """
+    Reads the request body into a spooled file.
+
+    Bodies of up to UPLOAD_SPOOL_MAX_MB are kept in memory, larger ones are
+    written to a temporary file, as UploadRequest does for uploads.
+
+    Args:
+        receive: ASGI receive callable
+        max_length: Largest accepted body in bytes, unbounded if None
+
+    Returns:
+        BinaryIO | None: Request body, rewound, or None once it grew past max_length
+    """
+    body = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MB * 1024 * 1024)
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            break
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if max_length is not None and size > max_length:
+            body.close()
+            return None
+        body.write(chunk)
+        if not message.get('more_body'):
+            break
+    body.seek(0)
+    return body
+
+
+def _build_environ(scope: dict, body: BinaryIO) -> dict:
+    """
+    Builds a WSGI environment from an ASGI HTTP scope.
+
+    Args:
+        scope: ASGI connection scope
+        body: Full request body, rewound
+
+    Returns:
+        dict: WSGI environment
+    """
+    length = body.seek(0, io.SEEK_END)
+    body.seek(0)
+    server = scope.get('server') or ('127.0.0.1', 80)
+    client = scope.get('client') or ('127.0.0.1', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'REMOTE_ADDR': str(client[0]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'CONTENT_LENGTH': str(length),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope.get('headers', []):
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def asgi_available() -> bool:
+    """
+    Checks whether an ASGI server is installed.
+
+    Returns:
+        bool: True if uvicorn can be imported
+    """
+    return importlib.util.find_spec('uvicorn') is not None
+
+
+def run_asgi(flask_app, port: int) -> None:
+    """
+    Serves the application through uvicorn on localhost.
+
+    Args:
+        flask_app: Flask application created by create_app
+        port: Port number to listen on
+    """
+    import uvicorn
+
+    uvicorn.run(AsgiApp(flask_app), host='127.0.0.1', port=port, log_level='warning')
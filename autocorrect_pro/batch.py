@@ -0,0 +1,113 @@
+"""
+Batch processing of many texts.
+
+Items are processed through stream_response on a bounded worker pool.
+Each provider also has a process-wide concurrency limit, shared by all
+running batches, so a large batch cannot exceed the provider rate limits.
+Results are yielded as soon as each item completes, tagged with its index.
+"""
+import threading
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Generator, Mapping, Optional
+
+from .config import AVAILABLE_MODELS
+from .models import stream_response
+
+_provider_limits: dict[tuple[str, int], threading.BoundedSemaphore] = {}
+_provider_limits_lock = threading.Lock()
+
+
+def _provider_slot(provider: str, limit: int) -> threading.BoundedSemaphore:
+    """
+    Returns the semaphore bounding concurrent batch calls to a provider.
+
+    Args:
+        provider: Provider name
+        limit: Maximum number of concurrent calls
+
+    Returns:
+        threading.BoundedSemaphore: Semaphore shared by every batch with the same limit
+    """
+    with _provider_limits_lock:
+        key = (provider, max(1, limit))
+        if key not in _provider_limits:
+            _provider_limits[key] = threading.BoundedSemaphore(key[1])
+        return _provider_limits[key]
+
+
+def _process_item(index: int, item: Mapping, model: str, api_key: Optional[str], all_modes: dict,
+                  slot: threading.BoundedSemaphore) -> dict:
+    """
+    Processes one batch item.
+
+    Args:
+        index: Position of the item in the batch
+        item: Item with 'text', 'mode' and optional 'user_response'
+        model: AI model to use
+        api_key: API key for authentication
+        all_modes: Dictionary containing all available modes
+        slot: Provider concurrency semaphore
+
+    Returns:
+        dict: Result line with the index, the status and the text or error
+    """
+    metadata = {}
+    try:
+        with slot:
+            text = ''.join(stream_response(item.get('mode'), item.get('text'), item.get('user_response'),
+                                           model, api_key, all_modes=all_modes, metadata=metadata))
+    except Exception as e:
+        metadata['error'] = f"Erreur: {str(e)}"
+
+    if metadata.get('error'):
+        return {'type': 'result', 'index': index, 'status': 'error', 'error': metadata['error']}
+    return {
+        'type': 'result',
+        'index': index,
+        'status': 'ok',
+        'text': text,
+        'model': metadata.get('model'),
+        'cache': metadata.get('cache'),
+    }
+
+
+def run_batch(items: list, model: str, api_key: Optional[str], all_modes: dict, max_workers: int = 4,
+              provider_concurrency: Optional[Mapping[str, int]] = None) -> Generator[dict, None, None]:
+    """
+    Processes batch items concurrently and yields their results as they complete.
+
+    A failing item produces an error result and does not stop the others.
+    Closing the generator skips the items that have not started yet.
+
+    Args:
+        items: Items with 'text', 'mode' and optional 'user_response'
+        model: AI model to use
+        api_key: API key for authentication
+        all_modes: Dictionary containing all available modes
+        max_workers: Maximum number of items processed at the same time
+        provider_concurrency: Maximum concurrent calls per provider
+
+    Yields:
+        dict: One result per item in completion order, then a summary
+    """
+    provider = AVAILABLE_MODELS.get(model, {}).get('provider', 'unknown')
+    limit = (provider_concurrency or {}).get(provider, max_workers)
+    slot = _provider_slot(provider, limit)
+
+    errors = 0
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='batch')
+    try:
+        pending = {
+            executor.submit(_process_item, index, item, model, api_key, all_modes, slot)
+            for index, item in enumerate(items)
+        }
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                errors += result['status'] == 'error'
+                yield result
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    yield {'type': 'summary', 'total': len(items), 'errors': errors}
@@ -0,0 +1,195 @@
+"""
+Disk-backed cache of AI responses and transcriptions.
+
+Every provider is called with temperature=0, so the same prompt, input
+and model produce the same answer. Transcriptions are keyed by a hash of
+the audio content, so a re-uploaded recording is not sent to Whisper
+again. Entries live in SQLite files under CONFIG_DIR and are evicted by
+TTL, then least recently used first once the entry count or total size
+exceeds its bounds.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+from .config import RESPONSE_CACHE_FILE, RESPONSE_CACHE_MAX_ENTRIES, RESPONSE_CACHE_MAX_BYTES, \
+    RESPONSE_CACHE_TTL_SECONDS, TRANSCRIPTION_CACHE_FILE, TRANSCRIPTION_CACHE_MAX_ENTRIES, \
+    TRANSCRIPTION_CACHE_MAX_BYTES, TRANSCRIPTION_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache with TTL persisted in SQLite.
+
+    A single connection is shared between threads and guarded by a lock;
+    it is opened lazily so that importing the module touches no file.
+    """
+
+    def __init__(self, path: Path, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES,
+                 max_bytes: int = RESPONSE_CACHE_MAX_BYTES, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS) -> None:
+        """
+        Initialize the cache.
+
+        Args:
+            path: SQLite database file
+            max_entries: Maximum number of stored entries
+            max_bytes: Maximum total size of stored values in bytes
+            ttl_seconds: Lifetime of an entry after it was stored
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts: Optional[str]) -> str:
+        """
+        Builds a cache key from the parts identifying a request.
+
+        Args:
+            *parts: Strings identifying the request (model, prompt, input, ...)
+
+        Returns:
+            str: Hex SHA-256 digest of the parts
+        """
+        return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Returns a cached value and marks it as recently used.
+
+        Args:
+            key: Cache key from make_key
+
+        Returns:
+            str | None: Cached value, None on miss or expiry
+        """
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                row = conn.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is None or now - row[1] > self.ttl_seconds:
+                    if row is not None:
+                        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                        conn.commit()
+                    self.misses += 1
+                    return None
+                conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                conn.commit()
+                self.hits += 1
+                return row[0]
+        except sqlite3.Error as e:
+            logger.error(f"Erreur lors de la lecture du cache: {e}")
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: str) -> None:
+        """
+        Stores a value, evicting old entries beyond the bounds.
+
+        Args:
+            key: Cache key from make_key
+            value: Value to store
+        """
+        size = len(value.encode('utf-8'))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, value, size, now, now)
+                )
+                self._evict(conn, now)
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.error(f"Erreur lors de l'écriture du cache: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+        count, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY accessed").fetchall():
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+
+    def clear(self) -> None:
+        """
+        Removes every entry and resets the counters.
+        """
+        with self._lock:
+            try:
+                conn = self._connection()
+                conn.execute("DELETE FROM responses")
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Erreur lors du vidage du cache: {e}")
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict[str, any]:
+        """
+        Returns hit/miss counters and storage usage.
+
+        Returns:
+            dict[str, any]: hits, misses, hit_rate, entries and size_bytes
+        """
+        with self._lock:
+            try:
+                count, total = self._connection().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+            except sqlite3.Error:
+                count, total = 0, 0
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': count,
+                'size_bytes': total,
+            }
+
+    def close(self) -> None:
+        """
+        Closes the underlying database connection.
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_FILE)
+transcription_cache = ResponseCache(TRANSCRIPTION_CACHE_FILE, TRANSCRIPTION_CACHE_MAX_ENTRIES,
+                                    TRANSCRIPTION_CACHE_MAX_BYTES, TRANSCRIPTION_CACHE_TTL_SECONDS)
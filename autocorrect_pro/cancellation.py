@@ -0,0 +1,186 @@
+"""
+Cancellation of in-flight /process streams.
+
+Every streamed request registers a cancellation event under an identifier
+chosen by the client. The stop endpoint sets that event, and the serving
+loops check it between chunks, together with client disconnection.
+Stopping a stream closes the generator chain down to the provider SDK
+stream, which releases the upstream connection.
+
+A generator cannot be closed from another thread while it is blocked in a
+network read. A StreamAbort set for the streaming thread lets the provider
+functions register the close method of their SDK stream and the rate
+limiter its in-flight slot, so that another thread can release both at once.
+A stream registered with its StreamAbort is aborted by the stop endpoint,
+even while it is still waiting for its first token.
+"""
+import contextvars
+import logging
+import threading
+from typing import Callable, Optional
+
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+class StreamRegistry:
+    """
+    Thread-safe registry of the streams being served and of cancellation statistics.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._active: dict[str, threading.Event] = {}
+        self._aborts: dict[str, StreamAbort] = {}
+        self._counters = {'completed': 0, 'cancelled': 0, 'disconnected': 0,
+                          'tokens_streamed': 0, 'tokens_saved': 0}
+
+    def register(self, request_id: str, abort: Optional['StreamAbort'] = None) -> threading.Event:
+        """
+        Registers a stream.
+
+        Args:
+            request_id: Identifier sent by the client
+            abort: Close hooks of the stream, aborted when it is cancelled
+
+        Returns:
+            threading.Event: Event set when the stream must stop
+        """
+        event = threading.Event()
+        with self._lock:
+            self._active[request_id] = event
+            if abort is not None:
+                self._aborts[request_id] = abort
+        return event
+
+    def cancel(self, request_id: str) -> bool:
+        """
+        Requests a stream to stop.
+
+        Args:
+            request_id: Identifier of the stream
+
+        Returns:
+            bool: True if the stream was still running
+        """
+        with self._lock:
+            event = self._active.get(request_id)
+            abort = self._aborts.get(request_id)
+        if event is None:
+            return False
+        event.set()
+        if abort is not None:
+            abort.abort()
+        return True
+
+    def release(self, request_id: str, outcome: str, input_text: Optional[str], output_text: str) -> None:
+        """
+        Unregisters a finished stream and records how it ended.
+
+        The tokens saved by a stopped stream are estimated from the input
+        length, since rewriting modes produce about as much text as they read.
+
+        Args:
+            request_id: Identifier of the stream
+            outcome: 'completed', 'cancelled' or 'disconnected'
+            input_text: Text sent to the model
+            output_text: Text streamed before the stream ended
+        """
+        streamed = estimate_tokens(output_text)
+        with self._lock:
+            self._active.pop(request_id, None)
+            self._aborts.pop(request_id, None)
+            self._counters[outcome] += 1
+            if outcome != 'completed':
+                self._counters['tokens_streamed'] += streamed
+                self._counters['tokens_saved'] += max(0, estimate_tokens(input_text or '') - streamed)
+
+    def stats(self) -> dict:
+        """
+        Returns cancellation statistics.
+
+        Returns:
+            dict: Active streams, outcome counters, and tokens streamed by and
+                saved on stopped streams
+        """
+        with self._lock:
+            return {'active': len(self._active), **self._counters}
+
+
+stream_registry = StreamRegistry()
+
+
+class StreamAbort:
+    """
+    Close hooks of the provider stream running in one thread.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._hooks: list[Callable[[], None]] = []
+        self.aborted = False
+
+    def add(self, hook: Callable[[], None]) -> None:
+        """
+        Registers a close hook, called at once if the stream was already aborted.
+
+        Args:
+            hook: Callable releasing a resource of the stream; it may be called twice
+        """
+        with self._lock:
+            if not self.aborted:
+                self._hooks.append(hook)
+                return
+        hook()
+
+    def abort(self) -> None:
+        """
+        Calls every close hook. The blocked read fails in the streaming thread.
+        """
+        with self._lock:
+            self.aborted = True
+            hooks, self._hooks = self._hooks, []
+        for hook in hooks:
+            try:
+                hook()
+            except Exception as e:
+                logger.debug(f"Fermeture du flux impossible: {type(e).__name__}: {e}")
+
+
+_stream_abort: contextvars.ContextVar[Optional[StreamAbort]] = contextvars.ContextVar('stream_abort', default=None)
+
+
+def abortable(abort: Optional[StreamAbort]) -> None:
+    """
+    Makes the streams started from now on in the current thread abortable.
+
+    Args:
+        abort: Receives the close hooks of those streams; None makes them not abortable again
+    """
+    _stream_abort.set(abort)
+
+
+def aborted() -> bool:
+    """
+    Tells whether the streams of the current thread were aborted.
+
+    A stream failing after its abort must not be retried or reported as an error.
+
+    Returns:
+        bool: True once the StreamAbort of the current thread was aborted
+    """
+    abort = _stream_abort.get()
+    return abort is not None and abort.aborted
+
+
+def on_abort(hook: Callable[[], None]) -> None:
+    """
+    Registers a close hook of the current stream, if it can be aborted.
+
+    Args:
+        hook: Callable releasing a resource of the stream; it may be called twice
+    """
+    abort = _stream_abort.get()
+    if abort is not None:
+        abort.add(hook)
@@ -0,0 +1,149 @@
+"""
+Command-line entry point.
+
+`ai-autocorrect` without arguments starts the desktop application.
+`ai-autocorrect process` corrects, translates... text from files or stdin
+and streams the result to stdout, without Qt or the web server:
+
+    ai-autocorrect process --mode corriger notes.txt mail.txt
+    echo "Bonjour, sa va ?" | ai-autocorrect process --mode corriger
+    ai-autocorrect modes
+
+This module must not import PyQt6 or Flask, so that scripted use starts
+quickly.
+"""
+import argparse
+import sys
+from typing import Callable, Iterable, Iterator, Optional
+
+from .config import AVAILABLE_MODELS
+from .models import stream_response
+from .pipeline import stream_in_order
+from .utils import load_config, load_modes
+
+COMMANDS = ('process', 'modes')
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    Builds the command-line parser.
+
+    Returns:
+        argparse.ArgumentParser: Parser for the CLI commands
+    """
+    parser = argparse.ArgumentParser(prog='ai-autocorrect', description="AI AutoCorrect en ligne de commande.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    process = commands.add_parser('process', help="traite des fichiers ou l'entrée standard")
+    process.add_argument('files', nargs='*', help="fichiers à traiter ('-' ou aucun pour l'entrée standard)")
+    process.add_argument('--mode', '-m', default='corriger', help="mode de traitement (défaut: corriger)")
+    process.add_argument('--model', choices=sorted(AVAILABLE_MODELS), help="modèle à utiliser (défaut: configuration)")
+    process.add_argument('--user-response', help="réponse à formuler, pour le mode 'repondre'")
+    process.add_argument('--jobs', '-j', type=int, default=4, help="fichiers traités en parallèle (défaut: 4)")
+
+    commands.add_parser('modes', help="liste les modes disponibles")
+    return parser
+
+
+def _read_input(path: str) -> str:
+    """
+    Reads a file, or standard input for '-'.
+
+    Args:
+        path: File path or '-'
+
+    Returns:
+        str: Text to process
+    """
+    if path == '-':
+        return sys.stdin.read()
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+def process_command(args: argparse.Namespace) -> int:
+    """
+    Streams the processed text of every input to stdout.
+
+    Inputs are processed in parallel; their outputs are printed in the
+    order of the command line, each under a header when there are several.
+
+    Args:
+        args: Parsed arguments of the process command
+
+    Returns:
+        int: Exit status, 1 if any input failed
+    """
+    config = load_config()
+    modes_config = load_modes()
+    all_modes = {**modes_config['system'], **modes_config.get('custom', {})}
+    model = args.model or config.get('model')
+    paths = args.files or ['-']
+    errors = []
+
+    def make_task(path: str) -> Callable[[], Iterable[str]]:
+        def task() -> Iterator[str]:
+            if len(paths) > 1:
+                yield f"==> {path} <==\n"
+            try:
+                text = _read_input(path)
+            except OSError as e:
+                errors.append(f"{path}: {e.strerror}")
+                return
+            metadata = {}
+            for chunk in stream_response(args.mode, text, args.user_response, model, config.get('api_key'),
+                                         all_modes=all_modes, metadata=metadata):
+                if metadata.get('error'):
+                    errors.append(f"{path}: {metadata['error']}")
+                    return
+                yield chunk
+            yield "\n"
+        return task
+
+    for chunk in stream_in_order([make_task(path) for path in paths], args.jobs):
+        sys.stdout.write(chunk)
+        sys.stdout.flush()
+
+    for error in errors:
+        print(error, file=sys.stderr)
+    return 1 if errors else 0
+
+
+def modes_command(args: argparse.Namespace) -> int:
+    """
+    Prints the available modes.
+
+    Args:
+        args: Parsed arguments of the modes command
+
+    Returns:
+        int: Exit status
+    """
+    modes_config = load_modes()
+    all_modes = {**modes_config['system'], **modes_config.get('custom', {})}
+    for mode_id in modes_config.get('order', list(all_modes)):
+        if mode_id in all_modes:
+            print(f"{mode_id:<16}{all_modes[mode_id].get('title', '')}")
+    return 0
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    """
+    Runs a CLI command, or the desktop application when none is given.
+
+    Args:
+        argv: Command-line arguments, sys.argv[1:] by default
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in COMMANDS and argv[0] not in ('-h', '--help'):
+        from .main import main as gui_main
+        gui_main()
+        return
+
+    args = build_parser().parse_args(argv)
+    handlers = {'process': process_command, 'modes': modes_command}
+    sys.exit(handlers[args.command](args))
+
+
+if __name__ == '__main__':
+    main()
@@ -16,26 +16,152 @@ else:
 
 CONFIG_DIR.mkdir(parents=True, exist_ok=True)
 CONFIG_FILE = CONFIG_DIR / "gemini.json"
+RESPONSE_CACHE_FILE = CONFIG_DIR / "response_cache.sqlite3"
+TRANSCRIPTION_CACHE_FILE = CONFIG_DIR / "transcription_cache.sqlite3"
+TEMPLATE_CACHE_DIR = CONFIG_DIR / "template_cache"
+CONFIG_RELOAD_CHECK_SECONDS = 1.0
+CONFIG_WRITE_DELAY_SECONDS = 0.25
 ICON_PATH = Path(__file__).resolve().parent / "static" / "favicon.ico"
 
 CURRENT_VERSION = 25
 DEFAULT_SHORTCUT = "Ctrl+Space"
 
+# Maximum number of provider SDK clients kept alive for connection reuse
+CLIENT_POOL_SIZE = 8
+# Idle keep-alive connections of the pooled clients are closed after this many seconds
+CLIENT_KEEPALIVE_SECONDS = 120
+
+# Connection pre-warming when the window is shown: keep-alive refresh interval while
+# it stays open, longest refreshed session, and shortest delay between two warm-ups
+PREWARM_KEEPALIVE_SECONDS = 60
+PREWARM_SESSION_SECONDS = 600
+PREWARM_MIN_INTERVAL_SECONDS = 10
+
+# Mode used to process captured clipboard text ahead of time until a mode has been used
+SPECULATION_DEFAULT_MODE = "corriger"
+
+# Streaming protocol of /process: 2 sends text deltas, 1 re-sends the whole buffer
+STREAM_PROTOCOL_VERSION = 2
+SUPPORTED_STREAM_PROTOCOLS = (1, 2)
+
+# Response cache limits (answers are deterministic with temperature=0)
+RESPONSE_CACHE_MAX_ENTRIES = 1000
+RESPONSE_CACHE_MAX_BYTES = 20 * 1024 * 1024
+RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+RESPONSE_CACHE_REPLAY_CHUNK_SIZE = 64
+
+# Delay before a hedged request is sent to the secondary model
+HEDGE_DEFAULT_DELAY_MS = 1500
+
+# Retries of provider errors raised before the first token (full-jitter exponential backoff)
+RETRY_DEFAULT_ATTEMPTS = 2
+RETRY_BACKOFF_MS = 500
+RETRY_MAX_BACKOFF_MS = 4000
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 425, 429, 500, 502, 503, 504, 529})
+
+# Per-provider circuit breakers: consecutive transient failures before opening, seconds before a trial
+BREAKER_FAILURE_THRESHOLD = 5
+BREAKER_COOLDOWN_SECONDS = 30
+
+# Client-side rate limiting per provider key: longest wait for a slot, polling interval of a full key
+RATE_LIMIT_MAX_WAIT_SECONDS = 30
+RATE_LIMIT_POLL_SECONDS = 0.05
+
+# Whisper upload limit; longer recordings are split into overlapping segments cut at silences
+WHISPER_MAX_SIZE_MB = 25
+TRANSCRIPTION_MAX_UPLOAD_MB = 500
+TRANSCRIPTION_SEGMENT_SECONDS = 300
+TRANSCRIPTION_OVERLAP_SECONDS = 2
+TRANSCRIPTION_SILENCE_SEARCH_SECONDS = 15
+TRANSCRIPTION_SILENCE_FRAME_MS = 50
+# Uploads and decoded audio are kept in memory up to this size, and spooled to disk beyond it
+UPLOAD_SPOOL_MAX_MB = 25
+# Transcription cache limits; entries are keyed by the audio content, so they stay valid longer
+TRANSCRIPTION_CACHE_MAX_ENTRIES = 500
+TRANSCRIPTION_CACHE_MAX_BYTES = 20 * 1024 * 1024
+TRANSCRIPTION_CACHE_TTL_SECONDS = 30 * 24 * 3600
+
+# Maximum number of texts accepted by a single /api/batch request
+BATCH_MAX_ITEMS = 1000
+
+# Modes whose segments can be processed independently in long-text mode
+SEGMENTABLE_MODES = ("corriger", "traduire", "reformuler")
+
+# Request metrics: latency histogram buckets in seconds, and number of
+# recent requests used for the percentiles shown in the settings
+METRICS_LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+METRICS_RECENT_WINDOW = 200
+
+# Live correction: sessions kept at once, idle time before a session is
+# dropped, and paragraph results remembered per session
+LIVE_MAX_SESSIONS = 64
+LIVE_SESSION_IDLE_SECONDS = 1800
+LIVE_SESSION_MAX_PARAGRAPHS = 500
+
+# Modes that can answer with a list of edits instead of the whole text
+EDIT_LIST_MODES = ("corriger",)
+
+# Characters per token of French prose by provider, when no local tokenizer is available
+TOKEN_CHARS_PER_TOKEN = {"google": 4.0, "openai": 3.8, "anthropic": 3.4, "custom": 3.5}
+
+# Expected output length relative to the input, by mode (unknown and custom modes use the default)
+MODE_OUTPUT_RATIOS = {
+    "traduire": 1.3,
+    "analyser": 1.5,
+    "corriger": 1.1,
+    "professionaliser": 1.3,
+    "etendre": 3.0,
+    "reformuler": 1.2,
+    "repondre": 1.5,
+    "resumer": 0.4,
+}
+DEFAULT_OUTPUT_RATIO = 1.5
+
+# Output budget: expected output times the margin, never below the floor
+OUTPUT_TOKENS_MARGIN = 1.5
+OUTPUT_TOKENS_FLOOR = 1024
+
+# Limits assumed for custom endpoints that do not set theirs in custom_endpoint;
+# going over them logs a warning instead of refusing the request
+CUSTOM_CONTEXT_WINDOW = 32768
+CUSTOM_MAX_OUTPUT_TOKENS = 4096
+
+# Anthropic requires max_tokens; used when a request was not sized
+ANTHROPIC_DEFAULT_MAX_TOKENS = 4096
+
+# Models flagged "reasoning" spend part of their output budget thinking, so
+# it is not capped for them. Prices are in USD per million tokens.
 AVAILABLE_MODELS = {
     "gemini-1.5-flash": {
         "name": "Gemini 2.5 Flash",
         "provider": "google",
         "model_name": "gemini-2.5-flash",
+        "context_window": 1048576,
+        "max_output_tokens": 65536,
+        "reasoning": True,
+        "price_per_million": {"input": 0.30, "output": 2.50},
+        "output_tokens_per_second": 200,
     },
     "gpt-4o-mini": {
         "name": "OpenAI GPT-5 Mini",
         "provider": "openai",
         "model_name": "gpt-5-mini-2025-08-07",
+        "context_window": 400000,
+        "max_output_tokens": 128000,
+        "reasoning": True,
+        "price_per_million": {"input": 0.25, "output": 2.00},
+        "output_tokens_per_second": 80,
     },
     "claude-3-5-haiku-latest": {
         "name": "Anthropic Claude 4.5 Haiku",
         "provider": "anthropic",
         "model_name": "claude-haiku-4-5",
+        "context_window": 200000,
+        "max_output_tokens": 64000,
+        "reasoning": False,
+        "price_per_million": {"input": 1.00, "output": 5.00},
+        "output_tokens_per_second": 150,
     },
     "custom": {"name": "Autre modèle", "provider": "custom", "configurable": True},
 }
@@ -184,6 +310,20 @@ Texte à résumer :""",
 }
 
 
+EDIT_LIST_PROMPT = """Rôle : Correcteur linguistique
+Tâche : Corriger les erreurs orthographiques et grammaticales
+Contraintes :
+- Conserver la langue d'origine
+- Ne corriger que les erreurs, sans reformuler
+Format de sortie : Uniquement un tableau JSON des corrections, dans l'ordre du texte, sans commentaire :
+[{"contexte": "...", "original": "...", "correction": "..."}]
+- "contexte" : les quelques mots qui précèdent immédiatement l'erreur, recopiés à l'identique ("" en début de texte)
+- "original" : le passage erroné, recopié à l'identique
+- "correction" : le passage corrigé
+Si le texte ne contient aucune erreur, renvoyer []
+Message à corriger :"""
+
+
 DEFAULT_CONFIG = {
     "api_key": None,
     "model": "gemini-1.5-flash",
@@ -191,6 +331,27 @@ DEFAULT_CONFIG = {
     "last_version": 1,
     "shortcut": DEFAULT_SHORTCUT,
     "custom_endpoint": {"url": "", "model_name": "", "style": "openai"},
+    "response_cache": {"enabled": True, "replay_as_stream": True},
+    "server": "wsgi",
+    "long_text": {"enabled": False, "segment_tokens": 800, "max_workers": 4},
+    "edit_list": {"enabled": False, "min_chars": 2000},
+    "live": {"max_workers": 4},
+    "transcription": {"max_workers": 4, "segment_seconds": TRANSCRIPTION_SEGMENT_SECONDS,
+                      "overlap_seconds": TRANSCRIPTION_OVERLAP_SECONDS, "cache": True},
+    "prewarm": {"enabled": True, "keepalive_seconds": PREWARM_KEEPALIVE_SECONDS,
+                "session_seconds": PREWARM_SESSION_SECONDS, "load_custom_model": False},
+    "speculation": {"enabled": False, "mode": ""},
+    "hedging": {"enabled": False, "delay_ms": HEDGE_DEFAULT_DELAY_MS, "model": "", "api_key": ""},
+    "resilience": {
+        "retries": RETRY_DEFAULT_ATTEMPTS,
+        "backoff_ms": RETRY_BACKOFF_MS,
+        "max_backoff_ms": RETRY_MAX_BACKOFF_MS,
+        "breaker_threshold": BREAKER_FAILURE_THRESHOLD,
+        "breaker_cooldown_seconds": BREAKER_COOLDOWN_SECONDS,
+        "fallback_models": [],
+    },
+    "rate_limits": {"enabled": True, "max_wait_seconds": RATE_LIMIT_MAX_WAIT_SECONDS, "providers": {}},
+    "batch": {"max_workers": 4, "provider_concurrency": {"google": 4, "openai": 4, "anthropic": 2, "custom": 2}},
 }
 
 AVAILABLE_THEMES = ["light", "dark", "glass-light", "glass-dark", "pastel"]
@@ -0,0 +1,130 @@
+"""
+Edit-list corrections.
+
+Correcting a long text with few mistakes makes the model re-emit the
+whole document. In edit-list mode the model only returns the corrections,
+each anchored by the words preceding it, and the corrected text is
+rebuilt locally. When the reply cannot be parsed or an anchor does not
+match the text, the request falls back to the regular full-text answer.
+"""
+import json
+import logging
+import re
+from typing import Generator, Optional
+
+from .config import EDIT_LIST_PROMPT
+from .models import stream_response
+
+logger = logging.getLogger(__name__)
+
+_CODE_FENCE = re.compile(r'^\s*```(?:json)?\s*(.*?)\s*```\s*$', re.DOTALL)
+
+
+def parse_edits(reply: str) -> list[dict]:
+    """
+    Parses the edit list returned by the model.
+
+    Args:
+        reply: Model answer, a JSON array optionally wrapped in a code fence
+
+    Returns:
+        list[dict]: Edits with 'contexte', 'original' and 'correction'
+
+    Raises:
+        ValueError: If the answer is not a valid edit list
+    """
+    fenced = _CODE_FENCE.match(reply)
+    try:
+        edits = json.loads(fenced.group(1) if fenced else reply)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Liste de corrections illisible: {e.msg}") from e
+    if not isinstance(edits, list):
+        raise ValueError("La réponse n'est pas une liste de corrections")
+    for edit in edits:
+        if not isinstance(edit, dict) or not all(
+                isinstance(edit.get(key, ''), str) for key in ('contexte', 'original', 'correction')):
+            raise ValueError(f"Correction invalide: {edit!r}")
+    return edits
+
+
+def apply_edits(text: str, edits: list[dict]) -> str:
+    """
+    Applies an edit list to a text.
+
+    Edits must come in text order. Each one is located by its context
+    followed by its original passage, at the first match after the
+    previous edit; the context may overlap the previous edit.
+
+    Args:
+        text: Original text
+        edits: Edits from parse_edits
+
+    Returns:
+        str: Corrected text
+
+    Raises:
+        ValueError: If an edit cannot be located in the text
+    """
+    parts = []
+    cursor = 0
+    for edit in edits:
+        context, original = edit.get('contexte', ''), edit.get('original', '')
+        if not context and not original:
+            raise ValueError("Correction sans contexte ni passage original")
+        anchor = context + original
+        index = text.find(anchor, max(0, cursor - len(context)))
+        if index < 0:
+            raise ValueError(f"Passage introuvable: {anchor!r}")
+        start = index + len(context)
+        parts.append(text[cursor:start])
+        parts.append(edit.get('correction', ''))
+        cursor = start + len(original)
+    parts.append(text[cursor:])
+    return ''.join(parts)
+
+
+def stream_with_edits(mode_name: str, input_text: str, user_response: Optional[str] = None,
+                      model: str = "gemini-1.5-flash", api_key: Optional[str] = None,
+                      all_modes: dict = None, metadata: Optional[dict] = None) -> Generator[str, None, None]:
+    """
+    Corrects a text through an edit list, falling back to the full-text answer.
+
+    The edit list is requested like any other answer, so it benefits from
+    the response cache and hedging. The corrected text is yielded at once
+    once the edits are applied.
+
+    Args:
+        mode_name: Name of the processing mode
+        input_text: Text to process
+        user_response: User response for reply mode
+        model: AI model to use
+        api_key: API key for authentication
+        all_modes: Dictionary containing all available modes
+        metadata: Optional dictionary filled like stream_response's, plus the
+            number of applied edits under 'edits' (None after a fall back)
+
+    Yields:
+        str: Corrected text
+    """
+    if metadata is None:
+        metadata = {}
+    reply = ''.join(stream_response(mode_name, input_text, user_response, model, api_key,
+                                    all_modes={mode_name: {'prompt': EDIT_LIST_PROMPT}}, metadata=metadata))
+    if metadata.get('error'):
+        yield metadata['error']
+        return
+
+    try:
+        edits = parse_edits(reply)
+        corrected = apply_edits(input_text, edits)
+    except ValueError as e:
+        logger.info(f"Corrections non applicables, demande du texte complet: {str(e)}")
+    else:
+        metadata['edits'] = len(edits)
+        yield corrected
+        return
+
+    metadata.clear()
+    metadata['edits'] = None
+    yield from stream_response(mode_name, input_text, user_response, model, api_key,
+                               all_modes=all_modes, metadata=metadata)
@@ -11,12 +11,11 @@ from PyQt6.QtCore import QUrl, pyqtSignal, QTimer, Qt, QObject
 from PyQt6.QtGui import QKeySequence, QShortcut, QIcon
 from PyQt6.QtWebChannel import QWebChannel
 from pynput import keyboard
-from rich.console import Console
 from .config import ICON_PATH, DEFAULT_SHORTCUT
-from .utils import load_config, save_config
+from .prewarm import connection_warmer
+from .utils import load_config, save_config, get_console
 import pyperclip
 
-console = Console()
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -67,7 +66,7 @@ class MainWindow(QMainWindow):
             self.setup_keyboard_listener()
         except ValueError:
             logger.warning("Raccourcis invalide, remise à zero")
-            console.print("[red]Raccourcis invalide, remise à zero")
+            get_console().print("[red]Raccourcis invalide, remise à zero")
             config = load_config()
             save_config(api_key=config['api_key'], model=config['model'],
                         theme=config['theme'], last_version=config['last_version'],
@@ -219,12 +218,16 @@ class MainWindow(QMainWindow):
         Implement visibility toggling logic.
 
         Handles the actual showing/hiding of the window and
-        clipboard integration for text input.
+        clipboard integration for text input. Showing the window opens the
+        connection to the provider in the background while the user picks
+        a mode; hiding it ends the keep-alive session.
         """
         if self.is_visible:
             self.hide()
             self.is_visible = False
+            connection_warmer.stop()
         else:
+            connection_warmer.warm()
             clipboard_content = pyperclip.paste()
             if isinstance(clipboard_content, str) and len(clipboard_content) > 0 and clipboard_content != self.clipboard_last_content and len(clipboard_content) < 2000:
                 self.clipboard_last_content = clipboard_content
@@ -247,6 +250,7 @@ class MainWindow(QMainWindow):
         """
         event.ignore()
         self.hide()
+        connection_warmer.stop()
 
     def quit_application(self) -> None:
         """
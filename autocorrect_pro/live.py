@@ -0,0 +1,211 @@
+"""
+Live correction while the user types.
+
+The client sends the whole text again after each pause in typing. Every
+session remembers the suggestion of each paragraph it has checked, keyed
+by a hash of the paragraph, so only new or edited paragraphs are sent to
+the model: after a one-word edit a long document costs one paragraph.
+Suggestions are pushed back paragraph by paragraph, and a check stops as
+soon as a newer revision of the text arrives.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Generator, Mapping, Optional
+
+from .batch import run_batch
+from .config import LIVE_MAX_SESSIONS, LIVE_SESSION_IDLE_SECONDS, LIVE_SESSION_MAX_PARAGRAPHS
+from .pipeline import split_paragraphs
+
+
+def paragraph_hash(mode_name: str, model: Optional[str], paragraph: str) -> str:
+    """
+    Returns the key of a paragraph result.
+
+    Args:
+        mode_name: Name of the processing mode
+        model: AI model used
+        paragraph: Paragraph text
+
+    Returns:
+        str: Hexadecimal digest
+    """
+    return hashlib.sha256('\0'.join((mode_name, model or '', paragraph)).encode('utf-8')).hexdigest()[:32]
+
+
+class LiveSession:
+    """
+    Paragraph results and current revision of one live editing session.
+    """
+
+    def __init__(self, max_paragraphs: int = LIVE_SESSION_MAX_PARAGRAPHS) -> None:
+        self.max_paragraphs = max_paragraphs
+        self.revision = -1
+        self.last_used = time.monotonic()
+        self._results: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str) -> Optional[str]:
+        with self._lock:
+            suggestion = self._results.get(key)
+            if suggestion is not None:
+                self._results.move_to_end(key)
+            return suggestion
+
+    def _store(self, key: str, suggestion: str) -> None:
+        with self._lock:
+            self._results[key] = suggestion
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_paragraphs:
+                self._results.popitem(last=False)
+
+    def _start(self, revision: int) -> bool:
+        with self._lock:
+            self.last_used = time.monotonic()
+            if revision < self.revision:
+                return False
+            self.revision = revision
+            return True
+
+    def check(self, text: str, revision: int, mode_name: str, model: str, api_key: Optional[str],
+              all_modes: dict, max_workers: int = 4,
+              provider_concurrency: Optional[Mapping[str, int]] = None) -> Generator[dict, None, None]:
+        """
+        Checks a revision of the text, paragraph by paragraph.
+
+        Paragraphs already checked are answered from the session; the
+        others are processed concurrently like batch items. Identical
+        paragraphs are sent once.
+
+        Args:
+            text: Full text being edited
+            revision: Revision number of the text, increasing with each edit
+            mode_name: Name of the processing mode
+            model: AI model to use
+            api_key: API key for authentication
+            all_modes: Dictionary containing all available modes
+            max_workers: Maximum number of paragraphs processed at the same time
+            provider_concurrency: Maximum concurrent calls per provider
+
+        Yields:
+            dict: One 'paragraph' message per non-blank paragraph, reused
+                ones first, then a 'done' summary telling whether the check
+                was superseded by a newer revision
+        """
+        summary = {'type': 'done', 'revision': revision, 'paragraphs': 0, 'checked': 0, 'reused': 0,
+                   'errors': 0, 'superseded': False}
+        if not self._start(revision):
+            summary['superseded'] = True
+            yield summary
+            return
+
+        paragraphs = split_paragraphs(text)
+        pending: dict[str, list[int]] = {}
+        for index, (paragraph, _) in enumerate(paragraphs):
+            if not paragraph.strip():
+                continue
+            summary['paragraphs'] += 1
+            key = paragraph_hash(mode_name, model, paragraph)
+            suggestion = self._lookup(key)
+            if suggestion is None:
+                pending.setdefault(key, []).append(index)
+                continue
+            summary['reused'] += 1
+            yield _paragraph_message(revision, index, key, paragraph, suggestion, reused=True)
+
+        keys = list(pending)
+        items = [{'text': paragraphs[pending[key][0]][0], 'mode': mode_name} for key in keys]
+        results = run_batch(items, model, api_key, all_modes, max_workers, provider_concurrency)
+        try:
+            for result in results:
+                if result['type'] != 'result':
+                    continue
+                key = keys[result['index']]
+                if result['status'] == 'ok':
+                    self._store(key, result['text'].strip())
+                if self.revision != revision:
+                    summary['superseded'] = True
+                    break
+                for index in pending[key]:
+                    paragraph = paragraphs[index][0]
+                    summary['checked'] += 1
+                    if result['status'] == 'ok':
+                        yield _paragraph_message(revision, index, key, paragraph, result['text'].strip())
+                    else:
+                        summary['errors'] += 1
+                        yield {'type': 'paragraph', 'revision': revision, 'index': index, 'hash': key,
+                               'original': paragraph, 'error': result['error']}
+        finally:
+            results.close()
+        yield summary
+
+
+def _paragraph_message(revision: int, index: int, key: str, paragraph: str, suggestion: str,
+                       reused: bool = False) -> dict:
+    return {
+        'type': 'paragraph',
+        'revision': revision,
+        'index': index,
+        'hash': key,
+        'original': paragraph,
+        'suggestion': suggestion,
+        'changed': suggestion != paragraph.strip(),
+        'reused': reused,
+    }
+
+
+class LiveSessions:
+    """
+    Thread-safe registry of live sessions, bounded in number and idle time.
+    """
+
+    def __init__(self, max_sessions: int = LIVE_MAX_SESSIONS,
+                 idle_seconds: float = LIVE_SESSION_IDLE_SECONDS) -> None:
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: OrderedDict[str, LiveSession] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> LiveSession:
+        """
+        Returns a session, creating it if needed.
+
+        Idle sessions are dropped, then the least recently used ones while
+        there are too many.
+
+        Args:
+            session_id: Identifier chosen by the client
+
+        Returns:
+            LiveSession: Session of the identifier
+        """
+        now = time.monotonic()
+        with self._lock:
+            for expired in [key for key, session in self._sessions.items()
+                            if now - session.last_used > self.idle_seconds]:
+                del self._sessions[expired]
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = LiveSession()
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def discard(self, session_id: str) -> None:
+        """
+        Forgets a session.
+
+        Args:
+            session_id: Identifier of the session
+        """
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+
+live_sessions = LiveSessions()
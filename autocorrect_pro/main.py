@@ -4,13 +4,16 @@ Entry point for pip installation.
 This module provides the main entry point when the package is installed
 via pip and contains the primary application initialization logic.
 """
+import logging
 import sys
 import threading
 from PyQt6.QtWidgets import QApplication
-from .utils import find_free_port
+from .utils import find_free_port, load_config
 from .gui import MainWindow
 from . import create_app
 
+logger = logging.getLogger(__name__)
+
 def main() -> None:
     """
 Main entry point for the application.
@@ -29,7 +32,16 @@ Initializes and starts the AI AutoCorrect application by:
 
     port = find_free_port()
     app = create_app()
-    flask_thread = threading.Thread(target=lambda: app.run(port=port, debug=False))
+    run_server = lambda: app.run(port=port, debug=False)
+    if load_config().get('server') == 'asgi':
+        # Only the ASGI server needs this module and its imports
+        from .asgi import asgi_available, run_asgi
+        if asgi_available():
+            run_server = lambda: run_asgi(app, port)
+        else:
+            logger.warning("uvicorn n'est pas installé, utilisation du serveur Flask")
+
+    flask_thread = threading.Thread(target=run_server)
     flask_thread.daemon = True
     flask_thread.start()
 
@@ -0,0 +1,250 @@
+"""
+Request metrics.
+
+Every /process stream and /transcribe call is timed and counted by
+outcome and error class. The figures are exposed at /api/metrics in the
+Prometheus text format. Histograms keep cumulative buckets for Prometheus
+and a window of recent values for the percentiles shown in the settings.
+"""
+import math
+import threading
+import time
+from collections import Counter, deque
+from typing import Mapping, Optional
+
+from .config import METRICS_LATENCY_BUCKETS, METRICS_RECENT_WINDOW
+
+
+class Histogram:
+    """
+    Latency histogram with Prometheus buckets and a window of recent values.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = METRICS_LATENCY_BUCKETS,
+                 window: int = METRICS_RECENT_WINDOW) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.recent: deque[float] = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        """
+        Records a value.
+
+        Args:
+            value: Observed duration in seconds
+        """
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        """
+        Returns a percentile of the recent values.
+
+        Args:
+            fraction: Percentile between 0 and 1
+
+        Returns:
+            Optional[float]: Value in seconds, None without observations
+        """
+        return _percentile(self.recent, fraction)
+
+
+def _percentile(values, fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for value in values)
+    return '{' + ','.join(f'{name}="{value}"' for name, value in zip(names, escaped)) + '}'
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters and histograms of the served requests.
+    """
+
+    REQUEST_LABELS = ('kind', 'mode', 'model', 'provider', 'outcome', 'error_class')
+    LATENCY_LABELS = ('kind', 'model', 'provider')
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Clears every metric.
+        """
+        with self._lock:
+            self._requests: Counter = Counter()
+            self._chunks: Counter = Counter()
+            self._output_bytes: Counter = Counter()
+            self._ttft: dict[tuple, Histogram] = {}
+            self._duration: dict[tuple, Histogram] = {}
+
+    def observe(self, kind: str, mode: Optional[str], model: Optional[str], provider: Optional[str],
+                outcome: str, duration: float, ttft: Optional[float] = None, chunks: int = 0,
+                output_bytes: int = 0, error_class: Optional[str] = None) -> None:
+        """
+        Records one served request.
+
+        Args:
+            kind: 'process' or 'transcribe'
+            mode: Processing mode, if any
+            model: Model that answered
+            provider: Provider of the model
+            outcome: 'completed', 'error', 'cancelled' or 'disconnected'
+            duration: Seconds from the request to its last byte
+            ttft: Seconds from the request to the first chunk, None if nothing was streamed
+            chunks: Number of streamed chunks
+            output_bytes: UTF-8 size of the output
+            error_class: Exception class name of a failed request
+        """
+        latency_key = (kind, model or '', provider or '')
+        with self._lock:
+            self._requests[(kind, mode or '', model or '', provider or '', outcome, error_class or '')] += 1
+            self._chunks[latency_key] += chunks
+            self._output_bytes[latency_key] += output_bytes
+            self._duration.setdefault(latency_key, Histogram()).observe(duration)
+            if ttft is not None:
+                self._ttft.setdefault(latency_key, Histogram()).observe(ttft)
+
+    def render(self) -> str:
+        """
+        Renders every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: Metrics text
+        """
+        lines = []
+        with self._lock:
+            lines += ["# HELP autocorrect_requests_total Served requests by outcome.",
+                      "# TYPE autocorrect_requests_total counter"]
+            lines += [f"autocorrect_requests_total{_labels(self.REQUEST_LABELS, key)} {value}"
+                      for key, value in sorted(self._requests.items())]
+            for name, help_text, counter in (
+                    ('autocorrect_stream_chunks_total', "Streamed chunks.", self._chunks),
+                    ('autocorrect_output_bytes_total', "Bytes of generated text.", self._output_bytes)):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+                lines += [f"{name}{_labels(self.LATENCY_LABELS, key)} {value}" for key, value in sorted(counter.items())]
+            for name, help_text, histograms in (
+                    ('autocorrect_ttft_seconds', "Time to the first streamed chunk.", self._ttft),
+                    ('autocorrect_request_duration_seconds', "Time to the end of the response.", self._duration)):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for key, histogram in sorted(histograms.items()):
+                    labels = _labels(self.LATENCY_LABELS, key)[:-1]
+                    cumulative = 0
+                    for bound, count in zip((*histogram.buckets, '+Inf'), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{labels}}} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{labels}}} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def summary(self) -> dict:
+        """
+        Summarizes the recent requests of each kind.
+
+        Returns:
+            dict: For each kind, the request and error counts and the recent
+                p50/p95 of TTFT and duration in milliseconds
+        """
+        def recent(histograms: dict[tuple, Histogram], kind: str) -> list[float]:
+            return [value for key, histogram in histograms.items() if key[0] == kind for value in histogram.recent]
+
+        def ms(value: Optional[float]) -> Optional[float]:
+            return None if value is None else round(value * 1000, 1)
+
+        with self._lock:
+            kinds = sorted({key[0] for key in self._requests})
+            result = {}
+            for kind in kinds:
+                ttft, duration = recent(self._ttft, kind), recent(self._duration, kind)
+                result[kind] = {
+                    'requests': sum(v for k, v in self._requests.items() if k[0] == kind),
+                    'errors': sum(v for k, v in self._requests.items() if k[0] == kind and k[4] == 'error'),
+                    'ttft_p50_ms': ms(_percentile(ttft, 0.5)),
+                    'ttft_p95_ms': ms(_percentile(ttft, 0.95)),
+                    'duration_p50_ms': ms(_percentile(duration, 0.5)),
+                    'duration_p95_ms': ms(_percentile(duration, 0.95)),
+                }
+            return result
+
+
+metrics = MetricsRegistry()
+
+
+class StreamTimer:
+    """
+    Times one streamed response and records it in the metrics.
+    """
+
+    def __init__(self, kind: str = 'process') -> None:
+        self.kind = kind
+        self.start = time.perf_counter()
+        self.first_chunk: Optional[float] = None
+        self.chunks = 0
+        self.output_bytes = 0
+
+    def elapsed_ms(self) -> float:
+        """
+        Returns the time since the request started.
+
+        Returns:
+            float: Milliseconds
+        """
+        return round((time.perf_counter() - self.start) * 1000, 1)
+
+    def chunk(self, text: str) -> None:
+        """
+        Counts a streamed chunk.
+
+        Args:
+            text: Chunk sent to the client
+        """
+        if self.first_chunk is None:
+            self.first_chunk = time.perf_counter()
+        self.chunks += 1
+        self.output_bytes += len(text.encode('utf-8'))
+
+    def timing(self) -> dict:
+        """
+        Returns the timing of the response so far.
+
+        Returns:
+            dict: 'ttft_ms' (None before the first chunk) and 'total_ms'
+        """
+        ttft = None if self.first_chunk is None else round((self.first_chunk - self.start) * 1000, 1)
+        return {'ttft_ms': ttft, 'total_ms': self.elapsed_ms()}
+
+    def finish(self, outcome: str, mode: Optional[str], metadata: Mapping) -> None:
+        """
+        Records the response in the metrics.
+
+        A response whose metadata carries an error counts as an error
+        whatever the serving outcome, and its error message is not
+        counted as a first token.
+
+        Args:
+            outcome: Serving outcome, 'completed', 'cancelled' or 'disconnected'
+            mode: Processing mode
+            metadata: Response metadata filled by stream_response
+        """
+        ttft = None if self.first_chunk is None else self.first_chunk - self.start
+        if metadata.get('error'):
+            outcome, ttft = 'error', None
+        metrics.observe(
+            self.kind, mode, metadata.get('model'), metadata.get('provider'), outcome,
+            duration=time.perf_counter() - self.start,
+            ttft=ttft,
+            chunks=self.chunks,
+            output_bytes=self.output_bytes,
+            error_class=metadata.get('error_class'),
+        )
@@ -1,17 +1,588 @@
-from typing import Generator, Optional
-import google.generativeai as genai
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
-import anthropic
-from openai import OpenAI
-from .config import AVAILABLE_MODELS
-from .utils import load_config
+import asyncio
+import functools
+import hashlib
+import importlib
+import logging
+import queue
+import string
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Callable, Generator, Iterator, Mapping, Optional
+from .cache import response_cache
+from .config import AVAILABLE_MODELS, CLIENT_POOL_SIZE, RESPONSE_CACHE_REPLAY_CHUNK_SIZE, HEDGE_DEFAULT_DELAY_MS, \
+    ANTHROPIC_DEFAULT_MAX_TOKENS, CLIENT_KEEPALIVE_SECONDS
+from .cancellation import StreamAbort, abortable, aborted, on_abort
+from .ratelimit import athrottled_stream, rate_limiter, throttled_stream
+from .resilience import astream_with_fallback, resilience_settings, stream_with_fallback
+from .tokens import plan_request
+from .utils import config_snapshot
+
+logger = logging.getLogger(__name__)
+
+_STREAM_DONE = object()
+
+# Provider SDKs take seconds to import and a user only needs one of them:
+# they are imported on first use, see _sdk.
+_LAZY_IMPORTS = {
+    'genai': ('google.generativeai', None),
+    'genai_client': ('google.generativeai.client', None),
+    'HarmCategory': ('google.generativeai.types', 'HarmCategory'),
+    'HarmBlockThreshold': ('google.generativeai.types', 'HarmBlockThreshold'),
+    'anthropic': ('anthropic', None),
+    'openai': ('openai', None),
+    'OpenAI': ('openai', 'OpenAI'),
+    'AsyncOpenAI': ('openai', 'AsyncOpenAI'),
+}
+
+
+def _sdk(name: str) -> Any:
+    """
+    Returns a provider SDK module or class, importing it on first use.
+
+    The imported object is stored as a module global, so it can be patched
+    like a regular import.
+
+    Args:
+        name: Name listed in _LAZY_IMPORTS
+
+    Returns:
+        Any: SDK module or class
+    """
+    value = globals().get(name)
+    if value is None:
+        module_name, attribute = _LAZY_IMPORTS[name]
+        module = importlib.import_module(module_name)
+        value = getattr(module, attribute) if attribute else module
+        globals()[name] = value
+    return value
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY_IMPORTS:
+        return _sdk(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class ClientPool:
+    """
+    Bounded LRU pool of provider SDK clients.
+
+    Clients are keyed by (provider, api_key, base_url) so that the HTTP
+    keep-alive connections held by each SDK client are reused across
+    requests instead of paying a new TCP+TLS handshake per correction.
+    Async clients are also keyed by the running event loop: their
+    connections belong to the loop they were opened on, and the prewarm
+    loop, a CLI asyncio.run and a test each run their own.
+    """
+
+    def __init__(self, max_size: int = CLIENT_POOL_SIZE) -> None:
+        """
+        Initialize an empty pool.
+
+        Args:
+            max_size: Maximum number of clients kept before evicting the least recently used
+        """
+        self.max_size = max_size
+        self._clients: OrderedDict[tuple, Any] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, api_key: str, base_url: Optional[str] = None) -> Any:
+        """
+        Returns a pooled client, creating it on first use.
+
+        Args:
+            provider: Provider name, see _create_client
+            api_key: API key for authentication
+            base_url: Custom API endpoint URL, if any
+
+        Returns:
+            Any: SDK client for the provider
+        """
+        loop = _running_loop() if provider.endswith('_async') else None
+        key = (provider, api_key, base_url or None, loop)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._clients.move_to_end(key)
+                return client
+
+            client = _create_client(provider, api_key, base_url)
+            self._clients[key] = client
+            # The clients of a closed loop can no longer be used
+            for stale in [k for k in self._clients if k[3] is not None and k[3].is_closed()]:
+                del self._clients[stale]
+            # Evicted clients are dropped rather than closed: a stream may still be using them
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+            return client
+
+    def invalidate(self, provider: Optional[str] = None) -> None:
+        """
+        Drops pooled clients, e.g. after the API key or custom endpoint changed.
+
+        Args:
+            provider: Only drop clients of this provider; all clients if None
+        """
+        with self._lock:
+            for key in [k for k in self._clients if provider is None or k[0] == provider]:
+                del self._clients[key]
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+
+def _running_loop() -> Optional[asyncio.AbstractEventLoop]:
+    """
+    Returns the event loop running in this thread, if any.
+
+    Returns:
+        asyncio.AbstractEventLoop | None: Running loop, or None outside a coroutine
+    """
+    try:
+        return asyncio.get_running_loop()
+    except RuntimeError:
+        return None
+
+
+def _create_client(provider: str, api_key: str, base_url: Optional[str] = None) -> Any:
+    """
+    Builds a new SDK client for a provider.
+
+    The built-in retries of the OpenAI and Anthropic SDKs are disabled,
+    see the resilience module, and their idle connections are kept for
+    CLIENT_KEEPALIVE_SECONDS instead of 5 seconds, so that a connection
+    pre-warmed by the prewarm module is still open when the user sends.
+    genai.configure would set the key for the whole process, so the pooled
+    Gemini entry is a GenerativeModel bound to a service client configured
+    for its own key.
+
+    Args:
+        provider: Provider name ('google', 'openai', 'anthropic', 'google_async', 'openai_async'
+            or 'anthropic_async')
+        api_key: API key for authentication
+        base_url: Custom API endpoint URL, if any
+
+    Returns:
+        Any: SDK client for the provider
+    """
+    if provider in ("google", "google_async"):
+        manager = _sdk('genai_client')._ClientManager()
+        manager.configure(api_key=api_key)
+        model = _sdk('genai').GenerativeModel('gemini-2.5-flash')
+        # GenerativeModel falls back to the process-wide client when these are unset. _ClientManager and
+        # these attributes are private to the SDK: test_gemini_sdk_internals_still_used guards them
+        if provider == "google":
+            model._client = _AbortableGeminiClient(manager.make_client('generative'))
+        else:
+            model._async_client = _AbortableGeminiAsyncClient(manager.make_client('generative_async'))
+        return model
+    # Retries are handled by the resilience layer, which also feeds the circuit breakers
+    options = {'api_key': api_key, 'max_retries': 0}
+    if base_url:
+        options['base_url'] = base_url
+    if provider == "openai":
+        return _sdk('OpenAI')(**options, http_client=_http_client(_sdk('openai')))
+    if provider == "anthropic":
+        return _sdk('anthropic').Anthropic(**options, http_client=_http_client(_sdk('anthropic')))
+    if provider == "openai_async":
+        return _sdk('AsyncOpenAI')(**options, http_client=_http_client(_sdk('openai'), asynchronous=True))
+    if provider == "anthropic_async":
+        return _sdk('anthropic').AsyncAnthropic(**options,
+                                                http_client=_http_client(_sdk('anthropic'), asynchronous=True))
+    raise ValueError(f"Fournisseur non supporté: {provider}")
+
+
+class _AbortableGeminiClient:
+    """
+    Gemini service client whose streamed calls can be aborted.
+
+    GenerativeModel reads the first chunk before handing the response over,
+    so the gRPC call is registered with on_abort as soon as it is sent.
+    """
+
+    def __init__(self, client: Any) -> None:
+        self._client = client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def stream_generate_content(self, *args: Any, **kwargs: Any) -> Any:
+        call = self._client.stream_generate_content(*args, **kwargs)
+        on_abort(call.cancel)
+        return call
+
+
+class _AbortableGeminiAsyncClient(_AbortableGeminiClient):
+    """
+    Async counterpart of _AbortableGeminiClient.
+
+    The call belongs to its event loop, so an abort from another thread cancels it through the loop.
+    """
+
+    async def stream_generate_content(self, *args: Any, **kwargs: Any) -> Any:
+        call = await self._client.stream_generate_content(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        on_abort(lambda: loop.call_soon_threadsafe(call.cancel))
+        return call
+
+
+def _http_client(sdk: Any, asynchronous: bool = False) -> Any:
+    """
+    Builds the HTTP client of an OpenAI or Anthropic SDK client.
+
+    The SDK defaults are kept, except for the keep-alive expiry.
+
+    Args:
+        sdk: openai or anthropic module
+        asynchronous: Build the client of an async SDK client
+
+    Returns:
+        Any: HTTP client for the http_client argument of the SDK client
+    """
+    defaults = sdk.DEFAULT_CONNECTION_LIMITS
+    limits = type(defaults)(max_connections=defaults.max_connections,
+                            max_keepalive_connections=defaults.max_keepalive_connections,
+                            keepalive_expiry=CLIENT_KEEPALIVE_SECONDS)
+    factory = sdk.DefaultAsyncHttpxClient if asynchronous else sdk.DefaultHttpxClient
+    return factory(limits=limits)
+
+
+client_pool = ClientPool()
+
+
+def _resolve_request(mode_name: str, input_text: str, user_response: Optional[str], model: str,
+                     all_modes: dict, config: Mapping) -> tuple[Optional[dict], Optional[str]]:
+    """
+    Validates the mode and model of a request, builds its messages and sizes it.
+
+    Args:
+        mode_name: Name of the processing mode
+        input_text: Text to process
+        user_response: User response for reply mode
+        model: AI model to use
+        all_modes: Dictionary containing all available modes
+        config: Application configuration
+
+    Returns:
+        tuple[dict | None, str | None]: (resolved request, error_message), exactly one of them is set
+    """
+    mode_config = (all_modes or {}).get(mode_name)
+    if not mode_config:
+        return None, f"Erreur: Mode '{mode_name}' non reconnu."
+
+    prompt_text = mode_config.get('prompt')
+    if not prompt_text:
+        return None, f"Erreur: Prompt non défini pour le mode '{mode_name}'."
+
+    if mode_name == "repondre":
+        if user_response is None:
+            return None, "Erreur: Réponse utilisateur manquante pour le mode 'répondre'."
+        system, prompt = _split_template(prompt_text, original_message=input_text, user_response=user_response)
+    else:
+        system, prompt = prompt_text, input_text
+
+    model_config = AVAILABLE_MODELS.get(model)
+    if not model_config:
+        return None, f"Erreur: Modèle '{model}' non reconnu."
+
+    provider = model_config["provider"]
+    if provider not in ("google", "openai", "anthropic", "custom"):
+        return None, f"Erreur: Fournisseur non supporté pour le modèle {model}"
+
+    custom_endpoint = config.get('custom_endpoint', {})
+    if provider == "custom" and (not custom_endpoint.get('url') or not custom_endpoint.get('model_name')):
+        return None, "Erreur: Configuration de l'endpoint personnalisé incomplète"
+
+    return {
+        'model_config': model_config,
+        'prompt_text': prompt_text,
+        'system': system,
+        'prompt': prompt,
+        'custom_endpoint': custom_endpoint,
+        'plan': plan_request(model_config, mode_name, prompt, system, custom_endpoint),
+    }, None
+
+
+def estimate_request(mode_name: str, input_text: str, user_response: Optional[str] = None,
+                     model: str = "gemini-1.5-flash", all_modes: dict = None) -> tuple[Optional[dict], Optional[str]]:
+    """
+    Estimates the size, cost and duration of a request without sending it.
+
+    Args:
+        mode_name: Name of the processing mode
+        input_text: Text to process
+        user_response: User response for reply mode
+        model: AI model to use
+        all_modes: Dictionary containing all available modes
+
+    Returns:
+        tuple[dict | None, str | None]: (plan from tokens.plan_request, error_message)
+    """
+    resolved, error = _resolve_request(mode_name, input_text, user_response, model, all_modes, config_snapshot())
+    if error:
+        return None, error
+    return resolved['plan'], None
+
+
+def _prepare_request(mode_name: str, input_text: str, user_response: Optional[str], model: str,
+                     api_key: Optional[str], all_modes: dict) -> tuple[Optional[dict], Optional[str]]:
+    """
+    Validates a processing request and builds everything needed to send it.
+
+    Shared by the synchronous and asynchronous streaming engines. Inputs
+    too long for the model are rejected here, before any network call.
+
+    Args:
+        mode_name: Name of the processing mode
+        input_text: Text to process
+        user_response: User response for reply mode
+        model: AI model to use
+        api_key: API key for authentication
+        all_modes: Dictionary containing all available modes
+
+    Returns:
+        tuple[dict | None, str | None]: (request, error_message), exactly one of them is set
+    """
+    if not api_key:
+        return None, "Erreur: Clé API non configurée"
+
+    config = config_snapshot()
+    resolved, error = _resolve_request(mode_name, input_text, user_response, model, all_modes, config)
+    if error:
+        return None, error
+
+    plan = resolved['plan']
+    if not plan['fits']:
+        return None, (f"Erreur: Texte trop long pour ce modèle (environ {plan['input_tokens']} jetons, "
+                      f"limite {plan['context_window']}).")
+
+    model_config = resolved['model_config']
+    custom_endpoint = resolved['custom_endpoint']
+    cache_settings = config.get('response_cache', {})
+    cache_key = None
+    if cache_settings.get('enabled', True):
+        cache_key = response_cache.make_key(
+            model,
+            _model_target(model_config, custom_endpoint),
+            hashlib.sha256(resolved['prompt_text'].encode('utf-8')).hexdigest(),
+            input_text,
+            user_response,
+        )
+
+    hedge = _hedge_settings(config, model, api_key, custom_endpoint)
+    if hedge:
+        hedge_plan = plan_request(hedge['model_config'], mode_name, resolved['prompt'],
+                                  resolved['system'], custom_endpoint)
+        hedge.update({'max_tokens': hedge_plan['max_tokens'], 'tokens': _planned_tokens(hedge_plan)})
+
+    fallbacks = []
+    for fallback in _fallback_settings(config, model, api_key, custom_endpoint):
+        fallback_plan = plan_request(fallback['model_config'], mode_name, resolved['prompt'],
+                                     resolved['system'], custom_endpoint)
+        if fallback_plan['fits']:
+            fallbacks.append({**fallback, 'max_tokens': fallback_plan['max_tokens'],
+                              'tokens': _planned_tokens(fallback_plan)})
+
+    return {
+        'model': model,
+        'model_config': model_config,
+        'system': resolved['system'],
+        'prompt': resolved['prompt'],
+        'max_tokens': plan['max_tokens'],
+        'tokens': _planned_tokens(plan),
+        'api_key': api_key,
+        'custom_endpoint': custom_endpoint,
+        'cache_key': cache_key,
+        'replay_as_stream': cache_settings.get('replay_as_stream', True),
+        'hedge': hedge,
+        'fallbacks': fallbacks,
+        'resilience': resilience_settings(config),
+        'rate_limits': config.get('rate_limits', {}),
+    }, None
+
+
+def _planned_tokens(plan: dict) -> int:
+    """
+    Estimates the tokens a request counts against the provider rate limit.
+
+    Args:
+        plan: Result of plan_request
+
+    Returns:
+        int: Input tokens plus expected output tokens
+    """
+    return plan['input_tokens'] + plan['output_tokens']
+
+
+def _split_template(prompt_text: str, **fields: Optional[str]) -> tuple[Optional[str], str]:
+    """
+    Splits a prompt template into its fixed instructions and the per-request message.
+
+    The instructions are the lines before the line holding the first
+    placeholder; they are identical on every request and can be cached by
+    the provider.
+
+    Args:
+        prompt_text: Prompt template with placeholders
+        **fields: Placeholder values
+
+    Returns:
+        tuple[str | None, str]: (instructions, message), instructions are None
+            when the template starts with a placeholder
+    """
+    full_prompt = prompt_text.format(**fields)
+    prefix = ''
+    for literal, field_name, _, _ in string.Formatter().parse(prompt_text):
+        prefix += literal
+        if field_name is not None:
+            break
+    cut = prefix.rfind('\n')
+    if cut <= 0:
+        return None, full_prompt
+    return prefix[:cut], full_prompt[cut + 1:]
+
+
+def _hedge_settings(config: Mapping, model: str, api_key: str, custom_endpoint: dict) -> Optional[dict]:
+    """
+    Resolves the secondary model used for hedged requests.
+
+    Args:
+        config: Application configuration
+        model: Primary model identifier
+        api_key: API key of the primary model
+        custom_endpoint: Custom endpoint configuration
+
+    Returns:
+        dict | None: Secondary model, its API key and the hedge delay, None when hedging is off
+    """
+    hedging = config.get('hedging', {})
+    secondary = hedging.get('model')
+    if not hedging.get('enabled') or not secondary or secondary == model:
+        return None
+    secondary_config = AVAILABLE_MODELS.get(secondary)
+    if not secondary_config:
+        logger.warning(f"Modèle de couverture inconnu: {secondary}")
+        return None
+    if secondary_config["provider"] == "custom" and not (custom_endpoint.get('url') and custom_endpoint.get('model_name')):
+        return None
+    return {
+        'model': secondary,
+        'model_config': secondary_config,
+        'api_key': hedging.get('api_key') or api_key,
+        'delay': hedging.get('delay_ms', HEDGE_DEFAULT_DELAY_MS) / 1000,
+    }
+
+
+def _fallback_settings(config: Mapping, model: str, api_key: str, custom_endpoint: dict) -> list[dict]:
+    """
+    Resolves the models tried, in order, when the requested one cannot answer.
+
+    Entries of resilience.fallback_models are model identifiers, or dicts
+    with 'model' and 'api_key' for a model of another provider.
+
+    Args:
+        config: Application configuration
+        model: Requested model identifier
+        api_key: API key of the requested model
+        custom_endpoint: Custom endpoint configuration
+
+    Returns:
+        list[dict]: Fallback models with their configuration and API key
+    """
+    fallbacks = []
+    for entry in config.get('resilience', {}).get('fallback_models') or []:
+        if isinstance(entry, str):
+            name, key = entry, None
+        else:
+            name, key = entry.get('model'), entry.get('api_key')
+        if not name or name == model or any(fallback['model'] == name for fallback in fallbacks):
+            continue
+        fallback_config = AVAILABLE_MODELS.get(name)
+        if not fallback_config:
+            logger.warning(f"Modèle de secours inconnu: {name}")
+            continue
+        if fallback_config["provider"] == "custom" and not (custom_endpoint.get('url') and custom_endpoint.get('model_name')):
+            continue
+        fallbacks.append({'model': name, 'model_config': fallback_config, 'api_key': key or api_key})
+    return fallbacks
+
+
+def _endpoint_key(provider: str, base_url: Optional[str] = None) -> str:
+    """
+    Names the endpoint serving a provider, for its circuit breaker and rate limiter.
+
+    Args:
+        provider: Provider name
+        base_url: Custom endpoint URL, if any
+
+    Returns:
+        str: Provider name, or 'custom:' followed by the endpoint URL
+    """
+    return f"custom:{base_url}" if base_url else provider
+
+
+def _model_endpoint(model_config: dict, custom_endpoint: dict) -> str:
+    """
+    Names the endpoint serving a model.
+
+    Args:
+        model_config: Entry of AVAILABLE_MODELS
+        custom_endpoint: Custom endpoint configuration
+
+    Returns:
+        str: Endpoint key, see _endpoint_key
+    """
+    if model_config["provider"] == "custom":
+        return _endpoint_key("custom", custom_endpoint['url'])
+    return _endpoint_key(model_config["provider"])
+
+
+def _candidates(request: dict, models: list[dict], usage: dict, stream_provider: Callable,
+                throttle: Callable) -> list[dict]:
+    """
+    Builds the fallback chain of a request for stream_with_fallback.
+
+    Each attempt waits for a slot of the rate limiter of its provider key.
+
+    Args:
+        request: Prepared request
+        models: Dicts with 'model', 'model_config', 'api_key', 'max_tokens' and 'tokens', in order
+        usage: Dictionary filled with the token usage of the model that answers
+        stream_provider: _stream_provider or _astream_provider
+        throttle: throttled_stream or athrottled_stream, matching stream_provider
+
+    Returns:
+        list[dict]: Candidates with their endpoint key and stream factory
+    """
+    candidates = []
+    for entry in models:
+        endpoint = _model_endpoint(entry['model_config'], request['custom_endpoint'])
+        start = functools.partial(stream_provider, entry['model_config'], request['prompt'], entry['api_key'],
+                                  request['custom_endpoint'], request['system'], usage, entry['max_tokens'])
+        candidates.append({
+            'model': entry['model'],
+            'breaker': endpoint,
+            'start': functools.partial(throttle, endpoint, entry['api_key'], entry['tokens'],
+                                       request['rate_limits'], start),
+        })
+    return candidates
+
 
 def stream_response(mode_name: str, input_text: str, user_response: Optional[str] = None,
                     model: str = "gemini-1.5-flash", api_key: Optional[str] = None,
-                    all_modes: dict = None) -> Generator[str, None, None]:
+                    all_modes: dict = None, metadata: Optional[dict] = None,
+                    cache_writes: Optional[list] = None) -> Generator[str, None, None]:
     """
     Generate streaming response based on configured model.
 
+    Identical requests are answered from the response cache when it is
+    enabled in the configuration. Transient provider errors are retried and
+    the fallback models are tried in turn, see the resilience module. With
+    hedging enabled, a secondary model is queried when the first token is
+    late and the faster stream wins.
+
     Args:
         mode_name: Name of the processing mode
         input_text: Text to process
@@ -19,134 +590,639 @@ def stream_response(mode_name: str, input_text: str, user_response: Optional[str
         model: AI model to use
         api_key: API key for authentication
         all_modes: Dictionary containing all available modes
+        metadata: Optional dictionary filled with the model and provider that answered,
+            cache usage, provider token usage, hedging and fallback details, and the error
+            message and its class if the request failed
+        cache_writes: Optional list receiving the (cache key, answer) pair to store instead
+            of storing it, for callers that only cache once a larger answer succeeded
 
     Yields:
         str: Streamed response text
     """
-
-    if not api_key:
-        yield "Erreur: Clé API non configurée"
+    if metadata is None:
+        metadata = {}
+    request, error = _prepare_request(mode_name, input_text, user_response, model, api_key, all_modes)
+    if error:
+        metadata.update({'error': error, 'error_class': 'InvalidRequest'})
+        yield error
         return
 
-    config = load_config()
+    try:
+        metadata.update({'model': model, 'provider': request['model_config']['provider'], 'cache': None})
+        cache_key = request['cache_key']
+        if cache_key:
+            cached = response_cache.get(cache_key)
+            metadata['cache'] = 'miss' if cached is None else 'hit'
+            if cached is not None:
+                yield from _replay_cached(cached, request['replay_as_stream'])
+                return
 
-    mode_config = all_modes.get(mode_name)
-    if not mode_config:
-        yield f"Erreur: Mode '{mode_name}' non reconnu."
-        return
+        usage = {'primary': {}, 'secondary': {}}
+        hedge = request['hedge']
+        # Hedged streams run concurrently: each reports its fallback in its own dict, only the winner's is kept
+        outcomes = {'primary': {} if hedge else metadata, 'secondary': {}}
+        settings = request['resilience']
+        chain = _candidates(request, [request, *request['fallbacks']], usage['primary'], _stream_provider,
+                            throttled_stream)
+        primary = lambda: stream_with_fallback(chain, settings, outcomes['primary'])
+        if hedge:
+            secondary_chain = _candidates(request, [hedge], usage['secondary'], _stream_provider, throttled_stream)
+            secondary = lambda: stream_with_fallback(secondary_chain, settings, outcomes['secondary'])
+            stream = _stream_hedged(primary, secondary, hedge['delay'], metadata)
+        else:
+            stream = primary()
 
-    prompt_text = mode_config.get('prompt')
-    if not prompt_text:
-        yield f"Erreur: Prompt non défini pour le mode '{mode_name}'."
-        return
+        chunks = []
+        for chunk in stream:
+            chunks.append(chunk)
+            yield chunk
 
-    if mode_name == "repondre":
-        if user_response is None:
-            yield "Erreur: Réponse utilisateur manquante pour le mode 'répondre'."
+        winner = 'secondary' if hedge and metadata['hedge']['winner'] == 'secondary' else 'primary'
+        if hedge:
+            metadata.update(outcomes[winner])
+        if winner == 'secondary':
+            metadata.update({'model': hedge['model'], 'provider': hedge['model_config']['provider']})
+        elif 'fallback' in metadata:
+            _answered_by_fallback(metadata)
+        elif cache_key and chunks and cache_writes is not None:
+            cache_writes.append((cache_key, ''.join(chunks)))
+        elif cache_key and chunks:
+            response_cache.set(cache_key, ''.join(chunks))
+        _report_usage(metadata, usage[winner])
+
+    except Exception as e:
+        if aborted():
+            # Stopped through /process/cancel: the closed stream is not a failure
+            logger.debug(f"Requête {model} interrompue: {type(e).__name__}")
             return
-        full_prompt = prompt_text.format(original_message=input_text, user_response=user_response)
-    else:
-        full_prompt = f"{prompt_text}\n\n{input_text}"
+        logger.warning(f"Échec de la requête {model}: {type(e).__name__}: {str(e)}")
+        metadata.update({'error': f"Erreur AI: {str(e)}", 'error_class': type(e).__name__})
+        yield metadata['error']
+
+
+def _answered_by_fallback(metadata: dict) -> None:
+    """
+    Reports the fallback model that answered as the model of the response.
+
+    The answer is not cached: it would be replayed for the requested model.
+
+    Args:
+        metadata: Request metadata holding 'fallback'
+    """
+    fallback = metadata['fallback']['model']
+    metadata.update({'model': fallback, 'provider': AVAILABLE_MODELS[fallback]['provider']})
+
+
+def _stream_hedged(primary: Callable[[], Iterator[str]], secondary: Callable[[], Iterator[str]],
+                   delay: float, metadata: dict) -> Generator[str, None, None]:
+    """
+    Streams from whichever of two providers produces its first token first.
+
+    The primary stream starts immediately; the secondary one starts when no
+    token arrived within the hedge delay, or as soon as the primary fails
+    before its first token. The first stream to produce a token is kept and
+    the other one is aborted: its SDK stream is closed and its rate limiter
+    slot released right away, even while it is still waiting for the provider.
+    Aborting the request aborts both streams.
+
+    Args:
+        primary: Callable starting the primary stream
+        secondary: Callable starting the secondary stream
+        delay: Seconds to wait for a primary token before hedging
+        metadata: Dictionary receiving the hedging details under 'hedge'
+
+    Yields:
+        str: Streamed response text chunks of the winning stream
+    """
+    events = queue.Queue()
+    cancelled = {'primary': threading.Event(), 'secondary': threading.Event()}
+    aborts = {'primary': StreamAbort(), 'secondary': StreamAbort()}
+    factories = {'primary': primary, 'secondary': secondary}
+
+    def run(name: str) -> None:
+        abortable(aborts[name])
+        chunks = None
+        try:
+            if aborts[name].aborted:
+                # The request was aborted before the hedge delay ran out
+                raise RuntimeError("Flux interrompu")
+            chunks = iter(factories[name]())
+            for chunk in chunks:
+                if cancelled[name].is_set():
+                    break
+                events.put((name, chunk))
+        except Exception as e:
+            events.put((name, e))
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            events.put((name, _STREAM_DONE))
+
+    def start(name: str) -> None:
+        running.add(name)
+        threading.Thread(target=run, args=(name,), daemon=True, name=f"hedge-{name}").start()
+
+    def abort_all() -> None:
+        for abort in aborts.values():
+            abort.abort()
+
+    # The streams run in their own threads, out of reach of the request's StreamAbort
+    on_abort(abort_all)
 
+    started_at = time.monotonic()
+    running: set[str] = set()
+    errors: dict[str, Exception] = {}
+    metadata['hedge'] = {'delay_ms': round(delay * 1000), 'hedged': False, 'winner': None}
+    start('primary')
     try:
-        model_config = AVAILABLE_MODELS.get(model)
-        if not model_config:
-            yield f"Erreur: Modèle '{model}' non reconnu."
+        winner, first = None, None
+        while winner is None:
+            timeout = None if 'secondary' in running else max(0.0, delay - (time.monotonic() - started_at))
+            try:
+                name, item = events.get(timeout=timeout)
+            except queue.Empty:
+                metadata['hedge']['hedged'] = True
+                start('secondary')
+                continue
+
+            if isinstance(item, Exception):
+                errors[name] = item
+            elif item is _STREAM_DONE:
+                running.discard(name)
+                if name not in errors:
+                    winner = name
+            else:
+                winner, first = name, item
+
+            if winner is None and 'secondary' not in running and 'secondary' not in errors:
+                metadata['hedge']['hedged'] = True
+                start('secondary')
+            elif winner is None and not running:
+                raise errors.get('primary') or errors['secondary']
+
+        loser = 'secondary' if winner == 'primary' else 'primary'
+        cancelled[loser].set()
+        aborts[loser].abort()
+        metadata['hedge'].update({'winner': winner, 'ttft_ms': round((time.monotonic() - started_at) * 1000)})
+        if first is None:
             return
+        yield first
 
-        if model_config["provider"] == "google":
-            yield from _stream_gemini(full_prompt, api_key)
-        elif model_config["provider"] == "openai":
-            yield from _stream_openai(full_prompt, api_key, model_config["model_name"])
-        elif model_config["provider"] == "anthropic":
-            yield from _stream_anthropic(full_prompt, api_key, model_config["model_name"])
-        elif model_config["provider"] == "custom":
-            custom_endpoint = config.get('custom_endpoint', {})
-            if not custom_endpoint.get('url') or not custom_endpoint.get('model_name'):
-                yield "Erreur: Configuration de l'endpoint personnalisé incomplète"
+        while True:
+            name, item = events.get()
+            if name != winner:
+                continue
+            if item is _STREAM_DONE:
                 return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        for name, event in cancelled.items():
+            event.set()
+            aborts[name].abort()
 
-            endpoint_style = custom_endpoint.get('style', 'openai')
-            if endpoint_style == 'anthropic':
-                yield from _stream_custom_anthropic(
-                    full_prompt,
-                    api_key,
-                    custom_endpoint['model_name'],
-                    custom_endpoint['url']
-                )
-            else:
-                yield from _stream_custom_openai(
-                    full_prompt,
-                    api_key,
-                    custom_endpoint['model_name'],
-                    custom_endpoint['url']
-                )
-        else:
-            yield f"Erreur: Fournisseur non supporté pour le modèle {model}"
+
+async def astream_response(mode_name: str, input_text: str, user_response: Optional[str] = None,
+                           model: str = "gemini-1.5-flash", api_key: Optional[str] = None,
+                           all_modes: dict = None, metadata: Optional[dict] = None) -> AsyncGenerator[str, None]:
+    """
+    Asynchronous counterpart of stream_response.
+
+    Uses the async SDK clients so that many concurrent generations can
+    share a single event loop instead of one thread each. Requests are
+    retried and fall back like on the synchronous path, but are not hedged.
+
+    Args:
+        mode_name: Name of the processing mode
+        input_text: Text to process
+        user_response: User response for reply mode
+        model: AI model to use
+        api_key: API key for authentication
+        all_modes: Dictionary containing all available modes
+        metadata: Optional dictionary filled with the model, provider, cache usage, token usage,
+            fallback details, and the error and its class
+
+    Yields:
+        str: Streamed response text
+    """
+    if metadata is None:
+        metadata = {}
+    request, error = await asyncio.to_thread(
+        _prepare_request, mode_name, input_text, user_response, model, api_key, all_modes
+    )
+    if error:
+        metadata.update({'error': error, 'error_class': 'InvalidRequest'})
+        yield error
+        return
+
+    try:
+        metadata.update({'model': model, 'provider': request['model_config']['provider'], 'cache': None})
+        cache_key = request['cache_key']
+        if cache_key:
+            cached = await asyncio.to_thread(response_cache.get, cache_key)
+            metadata['cache'] = 'miss' if cached is None else 'hit'
+            if cached is not None:
+                for chunk in _replay_cached(cached, request['replay_as_stream']):
+                    yield chunk
+                return
+
+        chunks = []
+        usage = {}
+        chain = _candidates(request, [request, *request['fallbacks']], usage, _astream_provider, athrottled_stream)
+        async for chunk in astream_with_fallback(chain, request['resilience'], metadata):
+            chunks.append(chunk)
+            yield chunk
+
+        if 'fallback' in metadata:
+            _answered_by_fallback(metadata)
+        elif cache_key and chunks:
+            await asyncio.to_thread(response_cache.set, cache_key, ''.join(chunks))
+        _report_usage(metadata, usage)
 
     except Exception as e:
-        yield f"Erreur AI: {str(e)}"
+        logger.warning(f"Échec de la requête {model}: {type(e).__name__}: {str(e)}")
+        metadata.update({'error': f"Erreur AI: {str(e)}", 'error_class': type(e).__name__})
+        yield metadata['error']
+
 
-def _stream_gemini(prompt: str, api_key: str) -> Generator[str, None, None]:
+def _report_usage(metadata: dict, usage: dict) -> None:
     """
-    Handles streaming responses from Gemini AI models.
+    Copies the token counts reported by the provider into the request metadata.
 
-    Configures the Gemini API client with appropriate safety settings
-    and streams the response text chunk by chunk.
+    Args:
+        metadata: Request metadata
+        usage: Input and cached token counts, empty if the provider reported none
+    """
+    if not usage:
+        return
+    metadata['usage'] = usage
+    logger.debug(f"{metadata['model']}: {usage['cached_tokens']}/{usage['input_tokens']} jetons d'entrée en cache")
+
+
+def _model_target(model_config: dict, custom_endpoint: dict) -> str:
+    """
+    Identifies the model that will actually answer a request.
 
     Args:
-        prompt: Text prompt to send to the model
+        model_config: Entry of AVAILABLE_MODELS
+        custom_endpoint: Custom endpoint configuration
+
+    Returns:
+        str: Provider model name, or style, URL and model name for custom endpoints
+    """
+    if model_config["provider"] == "custom":
+        return f"{custom_endpoint.get('style', 'openai')}:{custom_endpoint['url']}:{custom_endpoint['model_name']}"
+    return model_config["model_name"]
+
+
+def _replay_cached(text: str, as_stream: bool = True) -> Generator[str, None, None]:
+    """
+    Replays a cached response.
+
+    Args:
+        text: Cached response text
+        as_stream: Split the text into small chunks so it flows through the SSE path like a live answer
+
+    Yields:
+        str: Cached response chunks
+    """
+    if not as_stream:
+        yield text
+        return
+    for start in range(0, len(text), RESPONSE_CACHE_REPLAY_CHUNK_SIZE):
+        yield text[start:start + RESPONSE_CACHE_REPLAY_CHUNK_SIZE]
+
+
+def _stream_provider(model_config: dict, prompt: str, api_key: str, custom_endpoint: dict,
+                     system: Optional[str] = None, usage: Optional[dict] = None,
+                     max_tokens: Optional[int] = None) -> Generator[str, None, None]:
+    """
+    Dispatches a prompt to the streaming function of the model's provider.
+
+    Args:
+        model_config: Entry of AVAILABLE_MODELS
+        prompt: User message to send
         api_key: API key for authentication
+        custom_endpoint: Custom endpoint configuration, used by the 'custom' provider
+        system: Fixed mode instructions, sent ahead of the user message so providers can cache them
+        usage: Optional dictionary filled with the input and cached token counts
+        max_tokens: Output token budget, no cap if None
 
     Yields:
         str: Streamed response text chunks
     """
-    genai.configure(api_key=api_key)
-    model = genai.GenerativeModel('gemini-2.5-flash')
-    safety_settings = {
+    provider = model_config["provider"]
+    if provider == "google":
+        yield from _stream_gemini(prompt, api_key, system, usage, max_tokens)
+    elif provider == "openai":
+        yield from _stream_openai(prompt, api_key, model_config["model_name"], system, usage, max_tokens)
+    elif provider == "anthropic":
+        yield from _stream_anthropic(prompt, api_key, model_config["model_name"], system, usage, max_tokens)
+    elif custom_endpoint.get('style', 'openai') == 'anthropic':
+        yield from _stream_custom_anthropic(prompt, api_key, custom_endpoint['model_name'], custom_endpoint['url'],
+                                            system, usage, max_tokens)
+    else:
+        yield from _stream_custom_openai(prompt, api_key, custom_endpoint['model_name'], custom_endpoint['url'],
+                                         system, usage, max_tokens)
+
+async def _astream_provider(model_config: dict, prompt: str, api_key: str, custom_endpoint: dict,
+                            system: Optional[str] = None, usage: Optional[dict] = None,
+                            max_tokens: Optional[int] = None) -> AsyncGenerator[str, None]:
+    """
+    Asynchronous counterpart of _stream_provider.
+
+    Args:
+        model_config: Entry of AVAILABLE_MODELS
+        prompt: User message to send
+        api_key: API key for authentication
+        custom_endpoint: Custom endpoint configuration, used by the 'custom' provider
+        system: Fixed mode instructions, sent ahead of the user message so providers can cache them
+        usage: Optional dictionary filled with the input and cached token counts
+        max_tokens: Output token budget, no cap if None
+
+    Yields:
+        str: Streamed response text chunks
+    """
+    provider = model_config["provider"]
+    if provider == "google":
+        stream = _astream_gemini(prompt, api_key, system, usage, max_tokens)
+    elif provider == "openai":
+        stream = _astream_openai(prompt, api_key, model_config["model_name"], None, system, usage, max_tokens)
+    elif provider == "anthropic":
+        stream = _astream_anthropic(prompt, api_key, model_config["model_name"], None, system, usage, max_tokens)
+    elif custom_endpoint.get('style', 'openai') == 'anthropic':
+        stream = _astream_anthropic(prompt, api_key, custom_endpoint['model_name'], custom_endpoint['url'],
+                                    system, usage, max_tokens)
+    else:
+        stream = _astream_openai(prompt, api_key, custom_endpoint['model_name'], custom_endpoint['url'],
+                                 system, usage, max_tokens)
+
+    async for text in stream:
+        yield text
+
+
+def _observe_rate_limits(endpoint: str, api_key: str, response: Any) -> None:
+    """
+    Feeds the rate-limit headers of a provider response to the limiter of its key.
+
+    Args:
+        endpoint: Endpoint key, see _endpoint_key
+        api_key: API key of the call
+        response: SDK stream exposing the HTTP response as .response
+    """
+    rate_limiter.observe(endpoint, api_key, getattr(getattr(response, 'response', None), 'headers', None))
+
+
+def _record_usage(usage: Optional[dict], input_tokens: Any, cached_tokens: Any, cache_write_tokens: Any = None) -> None:
+    """
+    Stores the token counts reported by a provider.
+
+    Args:
+        usage: Dictionary to fill, nothing is recorded if None
+        input_tokens: Total input tokens, cached ones included
+        cached_tokens: Input tokens read from the provider prompt cache
+        cache_write_tokens: Input tokens written to the prompt cache, reported by Anthropic only
+    """
+    if usage is None:
+        return
+    usage['input_tokens'] = int(input_tokens or 0)
+    usage['cached_tokens'] = int(cached_tokens or 0)
+    if cache_write_tokens is not None:
+        usage['cache_write_tokens'] = int(cache_write_tokens or 0)
+
+
+def _chat_messages(prompt: str, system: Optional[str]) -> list[dict]:
+    """
+    Builds chat completion messages, the mode instructions first.
+
+    OpenAI caches the longest previously seen prefix of a request
+    automatically, so the fixed instructions must precede the user text.
+
+    Args:
+        prompt: User message
+        system: Fixed mode instructions, if any
+
+    Returns:
+        list[dict]: Chat messages
+    """
+    messages = [{"role": "system", "content": system}] if system else []
+    messages.append({"role": "user", "content": prompt})
+    return messages
+
+
+def _openai_options(usage: Optional[dict], base_url: Optional[str], max_tokens: Optional[int]) -> dict:
+    """
+    Extra chat completion arguments: output budget and token usage in the final chunk.
+
+    Custom endpoints are not asked for usage, since not every
+    OpenAI-compatible server accepts stream_options, and take the older
+    max_tokens parameter.
+
+    Args:
+        usage: Dictionary that will receive the usage, None if not wanted
+        base_url: Custom API endpoint URL, if any
+        max_tokens: Output token budget, no cap if None
+
+    Returns:
+        dict: Keyword arguments for chat.completions.create
+    """
+    options = {}
+    if max_tokens:
+        options["max_tokens" if base_url else "max_completion_tokens"] = max_tokens
+    if usage is not None and not base_url:
+        options["stream_options"] = {"include_usage": True}
+    return options
+
+
+def _record_openai_usage(usage: Optional[dict], chunk: Any) -> None:
+    """
+    Records the usage carried by a chat completion chunk, if any.
+
+    Args:
+        usage: Dictionary to fill
+        chunk: Streamed chat completion chunk
+    """
+    chunk_usage = getattr(chunk, 'usage', None)
+    if usage is None or chunk_usage is None:
+        return
+    details = getattr(chunk_usage, 'prompt_tokens_details', None)
+    _record_usage(usage, chunk_usage.prompt_tokens, getattr(details, 'cached_tokens', 0))
+
+
+def _anthropic_system(system: Optional[str], cache: bool) -> dict:
+    """
+    Extra message arguments carrying the mode instructions.
+
+    Args:
+        system: Fixed mode instructions, if any
+        cache: Mark the instructions as a prompt cache breakpoint; custom
+            endpoints get plain text since they may not support cache_control
+
+    Returns:
+        dict: Keyword arguments for messages.stream
+    """
+    if not system:
+        return {}
+    if not cache:
+        return {"system": system}
+    return {"system": [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]}
+
+
+def _record_anthropic_usage(usage: Optional[dict], message: Any) -> None:
+    """
+    Records the usage of a complete Anthropic message.
+
+    Anthropic reports cached and freshly cached tokens apart from the
+    other input tokens; they are summed into the total.
+
+    Args:
+        usage: Dictionary to fill
+        message: Final message of the stream
+    """
+    if usage is None:
+        return
+    reported = message.usage
+    cache_read = getattr(reported, 'cache_read_input_tokens', 0) or 0
+    cache_write = getattr(reported, 'cache_creation_input_tokens', 0) or 0
+    _record_usage(usage, (reported.input_tokens or 0) + cache_read + cache_write, cache_read, cache_write)
+
+
+def _gemini_model(api_key: str, system: Optional[str], asynchronous: bool = False) -> Any:
+    """
+    Returns the Gemini model to query, bound to the mode instructions.
+
+    Gemini caches repeated request prefixes implicitly; the instructions go
+    in system_instruction so they form that prefix.
+
+    Args:
+        api_key: API key for authentication
+        system: Fixed mode instructions, if any
+        asynchronous: Return a model for the async calls of the running loop
+
+    Returns:
+        Any: GenerativeModel
+    """
+    model = client_pool.get("google_async" if asynchronous else "google", api_key)
+    if not system:
+        return model
+    bound = _sdk('genai').GenerativeModel(model.model_name, system_instruction=system)
+    bound._client, bound._async_client = model._client, model._async_client
+    return bound
+
+
+def _record_gemini_usage(usage: Optional[dict], chunk: Any) -> None:
+    """
+    Records the usage metadata carried by a Gemini chunk, if any.
+
+    Args:
+        usage: Dictionary to fill
+        chunk: Streamed response chunk
+    """
+    metadata = getattr(chunk, 'usage_metadata', None)
+    if usage is None or not metadata or not getattr(metadata, 'prompt_token_count', 0):
+        return
+    _record_usage(usage, metadata.prompt_token_count, getattr(metadata, 'cached_content_token_count', 0))
+
+
+def _gemini_options(max_tokens: Optional[int]) -> dict:
+    """
+    Extra generate_content arguments carrying the output budget.
+
+    Args:
+        max_tokens: Output token budget, no cap if None
+
+    Returns:
+        dict: Keyword arguments for generate_content
+    """
+    return {"generation_config": {"max_output_tokens": max_tokens}} if max_tokens else {}
+
+
+def _gemini_safety_settings() -> dict:
+    """
+    Returns the Gemini safety settings, which disable content blocking.
+
+    Returns:
+        dict: Safety settings by harm category
+    """
+    HarmCategory, HarmBlockThreshold = _sdk('HarmCategory'), _sdk('HarmBlockThreshold')
+    return {
         HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_NONE,
         HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_NONE,
         HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_NONE,
         HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_NONE,
     }
 
-    response = model.generate_content(prompt, safety_settings=safety_settings, stream=True)
+
+def _stream_gemini(prompt: str, api_key: str, system: Optional[str] = None, usage: Optional[dict] = None,
+                   max_tokens: Optional[int] = None) -> Generator[str, None, None]:
+    """
+    Handles streaming responses from Gemini AI models.
+
+    Uses the pooled Gemini model with appropriate safety settings
+    and streams the response text chunk by chunk.
+
+    Args:
+        prompt: Text prompt to send to the model
+        api_key: API key for authentication
+        system: Fixed mode instructions, if any
+        usage: Optional dictionary filled with the input and cached token counts
+        max_tokens: Output token budget, no cap if None
+    Yields:
+        str: Streamed response text chunks
+    """
+    model = _gemini_model(api_key, system)
+    response = model.generate_content(prompt, safety_settings=_gemini_safety_settings(), stream=True,
+                                      **_gemini_options(max_tokens))
     for chunk in response:
+        _record_gemini_usage(usage, chunk)
         if chunk.text:
             yield chunk.text
 
 
-def _stream_openai(prompt: str, api_key: str, model_name: str) -> Generator[str, None, None]:
+def _stream_openai(prompt: str, api_key: str, model_name: str, system: Optional[str] = None,
+                   usage: Optional[dict] = None, max_tokens: Optional[int] = None) -> Generator[str, None, None]:
     """
     Handles streaming responses from OpenAI models.
 
-    Creates an OpenAI client and streams the response using their
-    chat completions API with streaming enabled.
+    Reuses a pooled OpenAI client and streams the response using their
+    chat completions API with streaming enabled. The HTTP stream is closed
+    when the generator is, even before the response is complete.
 
     Args:
         prompt: Text prompt to send to the model
         api_key: API key for authentication
         model_name: Specific model name to use
-
+        system: Fixed mode instructions, if any
+        usage: Optional dictionary filled with the input and cached token counts
+        max_tokens: Output token budget, no cap if None
     Yields:
         str: Streamed response text chunks
     """
-    client = OpenAI(api_key=api_key)
+    client = client_pool.get("openai", api_key)
     response = client.chat.completions.create(
         model=model_name,
         temperature=0,
-        messages=[{"role": "user", "content": prompt}],
-        stream=True
+        messages=_chat_messages(prompt, system),
+        stream=True,
+        **_openai_options(usage, None, max_tokens)
     )
-    for chunk in response:
-        if chunk.choices[0].delta.content:
-            yield chunk.choices[0].delta.content
+    _observe_rate_limits(_endpoint_key("openai"), api_key, response)
+    on_abort(response.close)
+    try:
+        for chunk in response:
+            _record_openai_usage(usage, chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        response.close()
 
-def _stream_custom_openai(prompt: str, api_key: str, model_name: str, base_url: str) -> Generator[str, None, None]:
+def _stream_custom_openai(prompt: str, api_key: str, model_name: str, base_url: str, system: Optional[str] = None,
+                          usage: Optional[dict] = None, max_tokens: Optional[int] = None) -> Generator[str, None, None]:
     """
     Handles streaming responses from custom OpenAI-compatible models.
 
-    Creates an OpenAI client with a custom base URL for models that
+    Reuses a pooled OpenAI client with a custom base URL for models that
     follow the OpenAI API format but are hosted elsewhere.
 
     Args:
@@ -154,26 +1230,37 @@ def _stream_custom_openai(prompt: str, api_key: str, model_name: str, base_url:
         api_key: API key for authentication
         model_name: Specific model name to use
         base_url: Custom API endpoint URL
-
+        system: Fixed mode instructions, if any
+        usage: Optional dictionary filled with the token counts, if the server reports them
+        max_tokens: Output token budget, no cap if None
     Yields:
         str: Streamed response text chunks
     """
-    client = OpenAI(api_key=api_key, base_url=base_url)
+    client = client_pool.get("openai", api_key, base_url)
     response = client.chat.completions.create(
         model=model_name,
         temperature=0,
-        messages=[{"role": "user", "content": prompt}],
-        stream=True
+        messages=_chat_messages(prompt, system),
+        stream=True,
+        **_openai_options(usage, base_url, max_tokens)
     )
-    for chunk in response:
-        if chunk.choices[0].delta.content:
-            yield chunk.choices[0].delta.content
+    _observe_rate_limits(_endpoint_key("custom", base_url), api_key, response)
+    on_abort(response.close)
+    try:
+        for chunk in response:
+            _record_openai_usage(usage, chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        response.close()
 
-def _stream_custom_anthropic(prompt: str, api_key: str, model_name: str, base_url: str) -> Generator[str, None, None]:
+def _stream_custom_anthropic(prompt: str, api_key: str, model_name: str, base_url: str,
+                             system: Optional[str] = None, usage: Optional[dict] = None,
+                             max_tokens: Optional[int] = None) -> Generator[str, None, None]:
     """
     Handles streaming responses from custom Anthropic-compatible models.
 
-    Creates an Anthropic client with a custom base URL for models that
+    Reuses a pooled Anthropic client with a custom base URL for models that
     follow the Anthropic API format but are hosted elsewhere.
 
     Args:
@@ -181,44 +1268,144 @@ def _stream_custom_anthropic(prompt: str, api_key: str, model_name: str, base_ur
         api_key: API key for authentication
         model_name: Specific model name to use
         base_url: Custom API endpoint URL
-
+        system: Fixed mode instructions, if any
+        usage: Optional dictionary filled with the input and cached token counts
+        max_tokens: Output token budget, ANTHROPIC_DEFAULT_MAX_TOKENS if None
     Yields:
         str: Streamed response text chunks
     """
-    try:
-        client = anthropic.Anthropic(api_key=api_key, base_url=base_url)
-        with client.messages.stream(
-            max_tokens=4096,
+    client = client_pool.get("anthropic", api_key, base_url)
+    with client.messages.stream(
+            max_tokens=max_tokens or ANTHROPIC_DEFAULT_MAX_TOKENS,
             temperature=0,
             messages=[{"role": "user", "content": prompt}],
             model=model_name,
-        ) as stream:
-            for text in stream.text_stream:
-                yield text
-    except Exception as e:
-        yield str(e)
+            **_anthropic_system(system, cache=False)
+    ) as stream:
+        _observe_rate_limits(_endpoint_key("custom", base_url), api_key, stream)
+        on_abort(stream.close)
+        for text in stream.text_stream:
+            yield text
+        _record_anthropic_usage(usage, stream.get_final_message())
 
-def _stream_anthropic(prompt: str, api_key: str, model_name: str) -> Generator[str, None, None]:
+def _stream_anthropic(prompt: str, api_key: str, model_name: str, system: Optional[str] = None,
+                      usage: Optional[dict] = None, max_tokens: Optional[int] = None) -> Generator[str, None, None]:
     """
     Handles streaming responses from Anthropic models.
 
-    Creates an Anthropic client and uses their streaming API to get
-    real-time response chunks from Claude models.
+    Reuses a pooled Anthropic client and uses their streaming API to get
+    real-time response chunks from Claude models. The mode instructions
+    are marked for prompt caching.
 
     Args:
         prompt: Text prompt to send to the model
         api_key: API key for authentication
         model_name: Specific model name to use
-
+        system: Fixed mode instructions, if any
+        usage: Optional dictionary filled with the input and cached token counts
+        max_tokens: Output token budget, ANTHROPIC_DEFAULT_MAX_TOKENS if None
     Yields:
         str: Streamed response text chunks
     """
-    client = anthropic.Anthropic(api_key=api_key)
+    client = client_pool.get("anthropic", api_key)
     with client.messages.stream(
-            max_tokens=4096,
+            max_tokens=max_tokens or ANTHROPIC_DEFAULT_MAX_TOKENS,
             temperature=0,
             messages=[{"role": "user", "content": prompt}],
             model=model_name,
+            **_anthropic_system(system, cache=True)
     ) as stream:
+        _observe_rate_limits(_endpoint_key("anthropic"), api_key, stream)
+        on_abort(stream.close)
         for text in stream.text_stream:
             yield text
+        _record_anthropic_usage(usage, stream.get_final_message())
+
+
+async def _astream_gemini(prompt: str, api_key: str, system: Optional[str] = None, usage: Optional[dict] = None,
+                          max_tokens: Optional[int] = None) -> AsyncGenerator[str, None]:
+    """
+    Handles asynchronous streaming responses from Gemini AI models.
+
+    Args:
+        prompt: Text prompt to send to the model
+        api_key: API key for authentication
+        system: Fixed mode instructions, if any
+        usage: Optional dictionary filled with the input and cached token counts
+        max_tokens: Output token budget, no cap if None
+    Yields:
+        str: Streamed response text chunks
+    """
+    model = _gemini_model(api_key, system, asynchronous=True)
+    response = await model.generate_content_async(prompt, safety_settings=_gemini_safety_settings(), stream=True,
+                                                  **_gemini_options(max_tokens))
+    async for chunk in response:
+        _record_gemini_usage(usage, chunk)
+        if chunk.text:
+            yield chunk.text
+
+
+async def _astream_openai(prompt: str, api_key: str, model_name: str, base_url: Optional[str] = None,
+                          system: Optional[str] = None, usage: Optional[dict] = None,
+                          max_tokens: Optional[int] = None) -> AsyncGenerator[str, None]:
+    """
+    Handles asynchronous streaming responses from OpenAI and OpenAI-compatible models.
+
+    Args:
+        prompt: Text prompt to send to the model
+        api_key: API key for authentication
+        model_name: Specific model name to use
+        base_url: Custom API endpoint URL, if any
+        system: Fixed mode instructions, if any
+        usage: Optional dictionary filled with the input and cached token counts
+        max_tokens: Output token budget, no cap if None
+    Yields:
+        str: Streamed response text chunks
+    """
+    client = client_pool.get("openai_async", api_key, base_url)
+    response = await client.chat.completions.create(
+        model=model_name,
+        temperature=0,
+        messages=_chat_messages(prompt, system),
+        stream=True,
+        **_openai_options(usage, base_url, max_tokens)
+    )
+    _observe_rate_limits(_endpoint_key("openai", base_url), api_key, response)
+    try:
+        async for chunk in response:
+            _record_openai_usage(usage, chunk)
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        await response.close()
+
+
+async def _astream_anthropic(prompt: str, api_key: str, model_name: str, base_url: Optional[str] = None,
+                             system: Optional[str] = None, usage: Optional[dict] = None,
+                             max_tokens: Optional[int] = None) -> AsyncGenerator[str, None]:
+    """
+    Handles asynchronous streaming responses from Anthropic and Anthropic-compatible models.
+
+    Args:
+        prompt: Text prompt to send to the model
+        api_key: API key for authentication
+        model_name: Specific model name to use
+        base_url: Custom API endpoint URL, if any
+        system: Fixed mode instructions, if any
+        usage: Optional dictionary filled with the input and cached token counts
+        max_tokens: Output token budget, ANTHROPIC_DEFAULT_MAX_TOKENS if None
+    Yields:
+        str: Streamed response text chunks
+    """
+    client = client_pool.get("anthropic_async", api_key, base_url)
+    async with client.messages.stream(
+            max_tokens=max_tokens or ANTHROPIC_DEFAULT_MAX_TOKENS,
+            temperature=0,
+            messages=[{"role": "user", "content": prompt}],
+            model=model_name,
+            **_anthropic_system(system, cache=base_url is None)
+    ) as stream:
+        _observe_rate_limits(_endpoint_key("anthropic", base_url), api_key, stream)
+        async for text in stream.text_stream:
+            yield text
+        _record_anthropic_usage(usage, await stream.get_final_message())
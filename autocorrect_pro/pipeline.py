@@ -0,0 +1,239 @@
+"""
+Parallel processing of long texts.
+
+Long inputs are split at paragraph, then sentence boundaries into
+token-bounded segments that are processed concurrently on a bounded
+worker pool. Results are streamed back in input order: the first segment
+flows to the client as soon as it is produced while the next ones are
+buffered in the background. The metadata of the segments is summarized
+into the metadata of the whole response.
+"""
+import contextvars
+import queue
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Generator, Iterable, Iterator, Optional
+
+from .cache import response_cache
+from .config import SEGMENTABLE_MODES
+from .models import stream_response
+from .tokens import estimate_tokens
+
+_PARAGRAPH_BREAK = re.compile(r'(\n\s*\n)')
+_SENTENCE_END = re.compile(r'(?<=[.!?…])(\s+)')
+_DONE = object()
+
+
+def split_paragraphs(text: str) -> list[tuple[str, str]]:
+    """
+    Splits a text at blank lines.
+
+    Args:
+        text: Text to split
+
+    Returns:
+        list[tuple[str, str]]: (paragraph, separator following it) pairs
+    """
+    parts = _PARAGRAPH_BREAK.split(text)
+    return [(parts[index], parts[index + 1] if index + 1 < len(parts) else '') for index in range(0, len(parts), 2)]
+
+
+def split_segments(text: str, max_tokens: int) -> list[tuple[str, str]]:
+    """
+    Splits a text into segments of at most max_tokens each.
+
+    Paragraphs are grouped together while they fit; a paragraph that is
+    too long on its own is split between sentences. The whitespace between
+    two segments is kept aside so the output can be reassembled with the
+    original layout.
+
+    Args:
+        text: Text to split
+        max_tokens: Token budget per segment
+
+    Returns:
+        list[tuple[str, str]]: (segment, separator following it) pairs
+    """
+    pieces = []
+    for paragraph, separator in split_paragraphs(text):
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append((paragraph, separator))
+            continue
+        sentences = _SENTENCE_END.split(paragraph)
+        for sentence_index in range(0, len(sentences), 2):
+            sentence_separator = sentences[sentence_index + 1] if sentence_index + 1 < len(sentences) else separator
+            pieces.append((sentences[sentence_index], sentence_separator))
+
+    segments = []
+    current, current_separator = '', ''
+    for piece, separator in pieces:
+        if current and estimate_tokens(current + current_separator + piece) > max_tokens:
+            segments.append((current, current_separator))
+            current, current_separator = '', ''
+        current = f"{current}{current_separator}{piece}" if current else piece
+        current_separator = separator
+    if current or not segments:
+        segments.append((current, current_separator))
+    return segments
+
+
+def stream_in_order(tasks: list[Callable[[], Iterable[str]]], max_workers: int) -> Generator[str, None, None]:
+    """
+    Runs streaming tasks concurrently and yields their output in task order.
+
+    Chunks of the first unfinished task are yielded as soon as they are
+    produced; later tasks keep running and their chunks are buffered until
+    their turn. Closing the generator stops every task at its next chunk, and
+    aborting the caller's StreamAbort closes their provider streams at once.
+
+    Args:
+        tasks: Callables returning an iterable of text chunks
+        max_workers: Maximum number of tasks running at the same time
+
+    Yields:
+        str: Chunks of every task, in task order
+    """
+    stop = threading.Event()
+    queues = [queue.Queue() for _ in tasks]
+
+    def run(task: Callable[[], Iterable[str]], output: queue.Queue) -> None:
+        chunks = None
+        try:
+            if stop.is_set():
+                return
+            chunks = iter(task())
+            for chunk in chunks:
+                if stop.is_set():
+                    break
+                output.put(chunk)
+        except Exception as e:
+            output.put(f"Erreur: {str(e)}")
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            output.put(_DONE)
+
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='segment')
+    try:
+        for task, output in zip(tasks, queues):
+            # Each task sees the caller's context variables, such as its StreamAbort
+            executor.submit(contextvars.copy_context().run, run, task, output)
+        for output in queues:
+            while (chunk := output.get()) is not _DONE:
+                yield chunk
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _strip_trailing_whitespace(chunks: Iterable[str]) -> Iterator[str]:
+    """
+    Drops the whitespace a model may append at the end of a segment.
+
+    Args:
+        chunks: Streamed text chunks
+
+    Yields:
+        str: The same text without trailing whitespace
+    """
+    pending = ''
+    for chunk in chunks:
+        text = pending + chunk
+        stripped = text.rstrip()
+        pending = text[len(stripped):]
+        if stripped:
+            yield stripped
+
+
+def _merge_metadata(metadata: dict, parts: list[dict]) -> None:
+    """
+    Summarizes the metadata of the segments into the metadata of the response.
+
+    The first segment that failed gives the error and the first one answered
+    by a fallback model gives the fallback. Token counts are summed, and the
+    cache counts as a hit only when every segment was replayed from it.
+
+    Args:
+        metadata: Dictionary receiving the response metadata
+        parts: Metadata of each segment, empty for blank segments
+    """
+    answered = [part for part in parts if part]
+    metadata['segments'] = len(parts)
+    for key in ('model', 'provider'):
+        metadata[key] = next((part[key] for part in answered if part.get(key)), None)
+    caches = [part.get('cache') for part in answered]
+    metadata['cache'] = None if None in caches or not caches else 'hit' if set(caches) == {'hit'} else 'miss'
+    usage = {}
+    for part in answered:
+        for key, count in part.get('usage', {}).items():
+            usage[key] = usage.get(key, 0) + count
+    if usage:
+        metadata['usage'] = usage
+    fallback = next((part['fallback'] for part in answered if 'fallback' in part), None)
+    if fallback:
+        metadata['fallback'] = fallback
+    failed = next((part for part in answered if part.get('error')), None)
+    if failed:
+        metadata.update({'error': failed['error'], 'error_class': failed.get('error_class')})
+
+
+def stream_segmented(mode_name: str, input_text: str, user_response: Optional[str] = None,
+                     model: str = "gemini-1.5-flash", api_key: Optional[str] = None,
+                     all_modes: dict = None, segment_tokens: int = 800,
+                     max_workers: int = 4, metadata: Optional[dict] = None) -> Generator[str, None, None]:
+    """
+    Streams the response for a long text processed segment by segment.
+
+    Only modes whose segments are independent (see SEGMENTABLE_MODES) are
+    split; other modes and short texts go through stream_response as is.
+    The segment answers are cached only when every segment succeeded.
+
+    Args:
+        mode_name: Name of the processing mode
+        input_text: Text to process
+        user_response: User response for reply mode
+        model: AI model to use
+        api_key: API key for authentication
+        all_modes: Dictionary containing all available modes
+        segment_tokens: Token budget per segment
+        max_workers: Maximum number of segments processed at the same time
+        metadata: Optional dictionary filled like the metadata of stream_response, with
+            the number of segments; the error is the one of the first failed segment
+
+    Yields:
+        str: Streamed response text
+    """
+    if metadata is None:
+        metadata = {}
+    segments = split_segments(input_text or '', segment_tokens)
+    if mode_name not in SEGMENTABLE_MODES or len(segments) == 1:
+        yield from stream_response(mode_name, input_text, user_response, model, api_key, all_modes=all_modes,
+                                   metadata=metadata)
+        return
+
+    parts = [{} for _ in segments]
+    cache_writes = []
+
+    def make_task(segment: str, separator: str, part: dict) -> Callable[[], Iterable[str]]:
+        def task() -> Iterator[str]:
+            try:
+                if segment.strip():
+                    yield from _strip_trailing_whitespace(
+                        stream_response(mode_name, segment, user_response, model, api_key, all_modes=all_modes,
+                                        metadata=part, cache_writes=cache_writes)
+                    )
+            except Exception as e:
+                part.update({'error': f"Erreur: {str(e)}", 'error_class': type(e).__name__})
+                raise
+            if separator:
+                yield separator
+        return task
+
+    tasks = [make_task(segment, separator, part) for (segment, separator), part in zip(segments, parts)]
+    yield from stream_in_order(tasks, max_workers)
+    # Every task has finished once its output was consumed
+    _merge_metadata(metadata, parts)
+    if not metadata.get('error'):
+        for key, answer in cache_writes:
+            response_cache.set(key, answer)
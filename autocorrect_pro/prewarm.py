@@ -0,0 +1,280 @@
+"""
+Pre-warming of provider connections.
+
+After the application sat idle in the tray, the first correction pays
+DNS, TCP and TLS setup to the provider before any token arrives. When the
+window is shown, the pooled client of the configured model sends a free
+metadata request in the background (the model list, or a token count for
+Gemini), so that its keep-alive connection is open by the time the user
+has picked a mode. While the window stays open, the connection is
+refreshed at a slow interval, within the keep-alive expiry of the pooled
+clients. No prompt is sent, unless loading the model of a custom endpoint
+is explicitly enabled.
+
+Under the ASGI server, /process streams through the async clients of the
+event loop, so the warm-up runs on that loop once it is attached.
+"""
+import asyncio
+import logging
+import threading
+import time
+from typing import Any, Mapping, Optional
+
+from .config import AVAILABLE_MODELS, PREWARM_KEEPALIVE_SECONDS, PREWARM_SESSION_SECONDS, \
+    PREWARM_MIN_INTERVAL_SECONDS
+from .models import client_pool
+from .utils import config_snapshot
+
+logger = logging.getLogger(__name__)
+
+_WARM_TIMEOUT_SECONDS = 10
+
+
+def prewarm_settings(config: Mapping) -> dict:
+    """
+    Reads the pre-warming settings, filling in the defaults.
+
+    Args:
+        config: Application configuration
+
+    Returns:
+        dict: enabled, keepalive_seconds, session_seconds and load_custom_model
+    """
+    settings = config.get('prewarm') or {}
+    return {
+        'enabled': bool(settings.get('enabled', True)),
+        'keepalive_seconds': max(1.0, float(settings.get('keepalive_seconds', PREWARM_KEEPALIVE_SECONDS))),
+        'session_seconds': max(0.0, float(settings.get('session_seconds', PREWARM_SESSION_SECONDS))),
+        'load_custom_model': bool(settings.get('load_custom_model', False)),
+    }
+
+
+def warm_target(config: Mapping) -> Optional[dict]:
+    """
+    Finds the endpoint serving the configured model.
+
+    Args:
+        config: Application configuration
+
+    Returns:
+        dict | None: provider ('google', 'openai' or 'anthropic', the SDK
+            used), api_key, base_url, model_name and custom, or None when no
+            request could be sent
+    """
+    model_config = AVAILABLE_MODELS.get(config.get('model', ''))
+    api_key = config.get('api_key')
+    if not model_config or not api_key:
+        return None
+    if model_config['provider'] != 'custom':
+        return {'provider': model_config['provider'], 'api_key': api_key, 'base_url': None,
+                'model_name': model_config.get('model_name'), 'custom': False}
+
+    endpoint = config.get('custom_endpoint') or {}
+    if not endpoint.get('url'):
+        return None
+    return {'provider': 'anthropic' if endpoint.get('style', 'openai') == 'anthropic' else 'openai',
+            'api_key': api_key, 'base_url': endpoint['url'], 'model_name': endpoint.get('model_name'),
+            'custom': True}
+
+
+def _ping(target: dict, load_model: bool) -> None:
+    """
+    Sends a free request through the pooled blocking client of an endpoint.
+
+    Args:
+        target: Endpoint from warm_target
+        load_model: Also ask a custom endpoint for a one-token completion, loading its model
+    """
+    provider, api_key, base_url = target['provider'], target['api_key'], target['base_url']
+    if provider == 'google':
+        client_pool.get('google', api_key).count_tokens("ping")
+    elif provider == 'anthropic':
+        client = client_pool.get('anthropic', api_key, base_url)
+        if load_model:
+            client.messages.create(model=target['model_name'], max_tokens=1,
+                                   messages=[{'role': 'user', 'content': "ping"}])
+        else:
+            client.models.list(limit=1)
+    else:
+        client = client_pool.get('openai', api_key, base_url)
+        if load_model:
+            client.chat.completions.create(model=target['model_name'], max_tokens=1,
+                                           messages=[{'role': 'user', 'content': "ping"}])
+        else:
+            client.models.list()
+
+
+async def _aping(target: dict, load_model: bool) -> None:
+    """
+    Asynchronous counterpart of _ping, warming the async pooled clients.
+
+    Args:
+        target: Endpoint from warm_target
+        load_model: Also ask a custom endpoint for a one-token completion, loading its model
+    """
+    provider, api_key, base_url = target['provider'], target['api_key'], target['base_url']
+    if provider == 'google':
+        await client_pool.get('google_async', api_key).count_tokens_async("ping")
+    elif provider == 'anthropic':
+        client = client_pool.get('anthropic_async', api_key, base_url)
+        if load_model:
+            await client.messages.create(model=target['model_name'], max_tokens=1,
+                                         messages=[{'role': 'user', 'content': "ping"}])
+        else:
+            await client.models.list(limit=1)
+    else:
+        client = client_pool.get('openai_async', api_key, base_url)
+        if load_model:
+            await client.chat.completions.create(model=target['model_name'], max_tokens=1,
+                                                 messages=[{'role': 'user', 'content': "ping"}])
+        else:
+            await client.models.list()
+
+
+class ConnectionWarmer:
+    """
+    Opens and keeps open the connection to the configured provider.
+
+    warm() is called when the window is shown and returns at once: the
+    request runs on a background thread. A keep-alive timer then refreshes
+    the connection until stop() is called or the session length is reached.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize an idle warmer.
+        """
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._timer: Optional[threading.Timer] = None
+        self._last_warm: Optional[float] = None
+        self._session_end = 0.0
+        self.warms = 0
+        self.failures = 0
+
+    def attach_loop(self, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        """
+        Warms the async clients on an event loop instead of the blocking ones.
+
+        Args:
+            loop: Event loop of the ASGI server, or None when it stops
+        """
+        with self._lock:
+            self._loop = loop
+
+    def warm(self) -> bool:
+        """
+        Starts warming the connection of the configured model, and a keep-alive session.
+
+        Returns:
+            bool: True if a request was started, False if pre-warming is
+                disabled, nothing is configured, or a warm-up is recent
+        """
+        return self._start(new_session=True)
+
+    def _start(self, new_session: bool) -> bool:
+        config = config_snapshot()
+        settings = prewarm_settings(config)
+        target = warm_target(config)
+        if not settings['enabled'] or target is None:
+            return False
+
+        now = time.monotonic()
+        with self._lock:
+            if new_session:
+                self._session_end = now + settings['session_seconds']
+            elif now >= self._session_end:
+                return False
+            busy = self._thread is not None and self._thread.is_alive()
+            recent = self._last_warm is not None and now - self._last_warm < PREWARM_MIN_INTERVAL_SECONDS
+            if busy or (new_session and recent):
+                self._schedule(settings['keepalive_seconds'])
+                return False
+            self._last_warm = now
+            self._thread = threading.Thread(target=self._run, args=(target, settings), name='prewarm', daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        """
+        Ends the keep-alive session, e.g. when the window is hidden.
+        """
+        with self._lock:
+            self._session_end = 0.0
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """
+        Waits for the current warm-up to finish.
+
+        Args:
+            timeout: Longest wait in seconds, unbounded if None
+        """
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self, target: dict, settings: dict) -> None:
+        load_model = target['custom'] and settings['load_custom_model']
+        try:
+            loop = self._loop
+            if loop is not None and loop.is_running():
+                asyncio.run_coroutine_threadsafe(_aping(target, load_model), loop).result(_WARM_TIMEOUT_SECONDS)
+            else:
+                _ping(target, load_model)
+            with self._lock:
+                self.warms += 1
+        except Exception as e:
+            # The real request reports errors; a failed warm-up only costs its own round trip
+            logger.debug(f"Préchauffage de la connexion impossible: {type(e).__name__}: {e}")
+            with self._lock:
+                self.failures += 1
+        with self._lock:
+            self._schedule(settings['keepalive_seconds'])
+
+    def _schedule(self, interval: float) -> None:
+        if self._timer is not None or time.monotonic() + interval > self._session_end:
+            return
+        self._timer = threading.Timer(interval, self._keep_alive)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _keep_alive(self) -> None:
+        with self._lock:
+            self._timer = None
+        self._start(new_session=False)
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Returns the warm-up counters.
+
+        Returns:
+            dict[str, Any]: warms, failures, seconds since the last warm-up and whether a session is active
+        """
+        with self._lock:
+            now = time.monotonic()
+            return {
+                'warms': self.warms,
+                'failures': self.failures,
+                'last_warm_ago': None if self._last_warm is None else round(now - self._last_warm, 1),
+                'session_active': now < self._session_end,
+            }
+
+    def reset(self) -> None:
+        """
+        Stops the session and clears the counters and the attached loop.
+        """
+        self.stop()
+        self.wait()
+        with self._lock:
+            self._loop = None
+            self._thread = None
+            self._last_warm = None
+            self.warms = 0
+            self.failures = 0
+
+
+connection_warmer = ConnectionWarmer()
@@ -0,0 +1,450 @@
+"""
+Client-side rate limiting per provider key.
+
+Every call to a provider takes a slot from the limiter of its endpoint and
+API key: a token bucket of requests per minute, a token bucket of
+estimated tokens per minute and a maximum number of calls in flight, all
+shared by the users, batches and live sessions of the process. A call
+over the limit waits for a slot, up to a bounded time, instead of being
+sent and throttled by the provider.
+
+The limits set in the configuration are tightened by the rate-limit
+headers of the responses (OpenAI x-ratelimit-*, Anthropic
+anthropic-ratelimit-*, retry-after), so calls are paced at the rate the
+key actually allows.
+"""
+import asyncio
+import hashlib
+import logging
+import re
+import threading
+import time
+from datetime import datetime, timezone
+from typing import AsyncGenerator, AsyncIterator, Callable, Generator, Iterator, Mapping, Optional
+
+from .cancellation import on_abort
+from .config import RATE_LIMIT_MAX_WAIT_SECONDS, RATE_LIMIT_POLL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+_DURATION = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+class ThrottleTimeout(Exception):
+    """
+    Raised when no rate-limit slot frees up within the maximum wait.
+    """
+
+    def __init__(self, endpoint: str, waited: float) -> None:
+        super().__init__(f"Limite de débit atteinte pour {endpoint} après {waited:.0f} s d'attente")
+        self.endpoint = endpoint
+
+
+def rate_limit_settings(rate_limits: Mapping, endpoint: str) -> dict:
+    """
+    Resolves the limits of an endpoint from the rate_limits configuration.
+
+    Args:
+        rate_limits: rate_limits section of the configuration
+        endpoint: Provider name, or 'custom:' followed by the endpoint URL
+
+    Returns:
+        dict: enabled, max_wait_seconds, requests_per_minute, tokens_per_minute and
+            max_in_flight, 0 meaning no configured limit
+    """
+    provider = endpoint.split(':', 1)[0]
+    limits = (rate_limits.get('providers') or {}).get(provider) or {}
+    return {
+        'enabled': rate_limits.get('enabled', True),
+        'max_wait_seconds': rate_limits.get('max_wait_seconds', RATE_LIMIT_MAX_WAIT_SECONDS),
+        'requests_per_minute': limits.get('requests_per_minute') or 0,
+        'tokens_per_minute': limits.get('tokens_per_minute') or 0,
+        'max_in_flight': limits.get('max_in_flight') or 0,
+    }
+
+
+def _header(headers: Mapping, *names: str) -> Optional[str]:
+    for name in names:
+        value = headers.get(name)
+        if isinstance(value, str) and value:
+            return value
+    return None
+
+
+def _number(value: Optional[str]) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _reset_seconds(value: Optional[str], now: float) -> Optional[float]:
+    """
+    Parses a reset header: a duration like '6m0s' or '20ms' (OpenAI), a
+    number of seconds, or an RFC 3339 timestamp (Anthropic).
+    """
+    if value is None:
+        return None
+    seconds = _number(value)
+    if seconds is not None:
+        return seconds
+    parts = _DURATION.findall(value)
+    if parts and ''.join(f"{amount}{unit}" for amount, unit in parts) == value:
+        return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+    try:
+        reset_at = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return max(0.0, reset_at.timestamp() - datetime.now(timezone.utc).timestamp())
+
+
+class TokenBucket:
+    """
+    Bucket holding up to one minute of allowance, refilled continuously.
+    """
+
+    def __init__(self, per_minute: float) -> None:
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """
+        Returns how long to wait before `amount` can be taken.
+
+        A request larger than the whole bucket waits for a full bucket.
+
+        Args:
+            amount: Requests or tokens needed
+            now: Current monotonic time
+
+        Returns:
+            float: Seconds, 0 if available now
+        """
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.capacity)
+
+    def take(self, amount: float) -> None:
+        self.level -= min(amount, self.capacity)
+
+    def resize(self, per_minute: float) -> None:
+        self._refill(time.monotonic())
+        self.capacity = per_minute
+        self.level = min(self.level, per_minute)
+
+    def clamp(self, remaining: float) -> None:
+        self._refill(time.monotonic())
+        self.level = min(self.level, remaining)
+
+
+class KeyLimiter:
+    """
+    Request and token buckets and in-flight calls of one provider key.
+    """
+
+    def __init__(self, endpoint: str) -> None:
+        self.endpoint = endpoint
+        self.configured = {'requests': 0, 'tokens': 0}
+        self.learned = {'requests': 0, 'tokens': 0}
+        self.buckets: dict[str, TokenBucket] = {}
+        self.max_in_flight = 0
+        self.in_flight = 0
+        self.waiting = 0
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _apply_limits(self) -> None:
+        for kind in ('requests', 'tokens'):
+            limits = [limit for limit in (self.configured[kind], self.learned[kind]) if limit]
+            if not limits:
+                self.buckets.pop(kind, None)
+            elif kind not in self.buckets:
+                self.buckets[kind] = TokenBucket(min(limits))
+            elif self.buckets[kind].capacity != min(limits):
+                self.buckets[kind].resize(min(limits))
+
+    def configure(self, settings: Mapping) -> None:
+        """
+        Applies the configured limits.
+
+        Args:
+            settings: Limits from rate_limit_settings
+        """
+        with self._lock:
+            self.configured = {'requests': settings['requests_per_minute'], 'tokens': settings['tokens_per_minute']}
+            self.max_in_flight = settings['max_in_flight']
+            self._apply_limits()
+
+    def try_acquire(self, tokens: int) -> float:
+        """
+        Takes a slot if one is free.
+
+        Args:
+            tokens: Estimated tokens of the call
+
+        Returns:
+            float: 0 when the slot was taken, otherwise seconds to wait before trying again
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                return self.blocked_until - now
+            if self.max_in_flight and self.in_flight >= self.max_in_flight:
+                return RATE_LIMIT_POLL_SECONDS
+            amounts = {'requests': 1, 'tokens': tokens}
+            wait = max((bucket.wait_time(amounts[kind], now) for kind, bucket in self.buckets.items()), default=0.0)
+            if wait > 0:
+                return wait
+            for kind, bucket in self.buckets.items():
+                bucket.take(amounts[kind])
+            self.in_flight += 1
+            return 0.0
+
+    def release(self) -> None:
+        """
+        Frees the in-flight slot of a finished call.
+        """
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+
+    def observe(self, headers: Optional[Mapping]) -> None:
+        """
+        Adjusts the limits to the rate-limit headers of a provider response.
+
+        Args:
+            headers: Response headers, ignored if None
+        """
+        if headers is None or not hasattr(headers, 'get'):
+            return
+        with self._lock:
+            now = time.monotonic()
+            for kind in ('requests', 'tokens'):
+                limit = _number(_header(headers, f'x-ratelimit-limit-{kind}', f'anthropic-ratelimit-{kind}-limit'))
+                remaining = _number(_header(headers, f'x-ratelimit-remaining-{kind}',
+                                            f'anthropic-ratelimit-{kind}-remaining'))
+                reset = _reset_seconds(_header(headers, f'x-ratelimit-reset-{kind}',
+                                               f'anthropic-ratelimit-{kind}-reset'), now)
+                if limit:
+                    self.learned[kind] = limit
+                    self._apply_limits()
+                if remaining is not None and kind in self.buckets:
+                    self.buckets[kind].clamp(remaining)
+                if remaining == 0 and reset:
+                    self.blocked_until = max(self.blocked_until, now + reset)
+            retry_after = _number(_header(headers, 'retry-after'))
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def snapshot(self) -> dict:
+        """
+        Returns the limits and load of the key.
+
+        Returns:
+            dict: Effective limits per minute (None if unlimited), calls in flight and
+                waiting, and seconds before calls resume when blocked
+        """
+        with self._lock:
+            return {
+                'endpoint': self.endpoint,
+                'requests_per_minute': self.buckets['requests'].capacity if 'requests' in self.buckets else None,
+                'tokens_per_minute': self.buckets['tokens'].capacity if 'tokens' in self.buckets else None,
+                'max_in_flight': self.max_in_flight or None,
+                'in_flight': self.in_flight,
+                'waiting': self.waiting,
+                'blocked_for': round(max(0.0, self.blocked_until - time.monotonic()), 1),
+            }
+
+
+class RateLimiter:
+    """
+    Thread-safe registry of the limiters of every (endpoint, API key).
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forgets every limiter.
+        """
+        with self._lock:
+            self._limiters: dict[tuple[str, str], KeyLimiter] = {}
+
+    @staticmethod
+    def _key(endpoint: str, api_key: Optional[str]) -> tuple[str, str]:
+        return endpoint, hashlib.sha256((api_key or '').encode('utf-8')).hexdigest()[:12]
+
+    def limiter(self, endpoint: str, api_key: Optional[str], settings: Optional[Mapping] = None) -> KeyLimiter:
+        """
+        Returns the limiter of a provider key, created on first use.
+
+        Args:
+            endpoint: Provider name, or 'custom:' followed by the endpoint URL
+            api_key: API key of the calls
+            settings: Limits from rate_limit_settings, applied when given
+
+        Returns:
+            KeyLimiter: Limiter shared by every call with this key
+        """
+        with self._lock:
+            key = self._key(endpoint, api_key)
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = KeyLimiter(endpoint)
+        if settings is not None:
+            limiter.configure(settings)
+        return limiter
+
+    def observe(self, endpoint: str, api_key: Optional[str], headers: Optional[Mapping]) -> None:
+        """
+        Adjusts the limiter of a key to the headers of a provider response.
+
+        Args:
+            endpoint: Provider name, or 'custom:' followed by the endpoint URL
+            api_key: API key of the call
+            headers: Response headers
+        """
+        if headers is not None:
+            self.limiter(endpoint, api_key).observe(headers)
+
+    def snapshot(self) -> list[dict]:
+        """
+        Returns the state of every limiter, without the API keys.
+
+        Returns:
+            list[dict]: KeyLimiter snapshots with a short hash identifying the key
+        """
+        with self._lock:
+            limiters = sorted(self._limiters.items())
+        return [{**limiter.snapshot(), 'key': key[1][:8]} for key, limiter in limiters]
+
+
+rate_limiter = RateLimiter()
+
+
+def _deadline_exceeded(limiter: KeyLimiter, started: float, wait: float, max_wait: float) -> bool:
+    if time.monotonic() + wait - started <= max_wait:
+        return False
+    logger.warning(f"Limite de débit {limiter.endpoint}: attente de plus de {max_wait} s, requête abandonnée")
+    return True
+
+
+def acquire(limiter: KeyLimiter, tokens: int, max_wait: float) -> None:
+    """
+    Waits for a slot of the limiter.
+
+    Args:
+        limiter: Limiter of the provider key
+        tokens: Estimated tokens of the call
+        max_wait: Longest wait in seconds
+
+    Raises:
+        ThrottleTimeout: When no slot frees up in time
+    """
+    started = time.monotonic()
+    with limiter._lock:
+        limiter.waiting += 1
+    try:
+        while wait := limiter.try_acquire(tokens):
+            if _deadline_exceeded(limiter, started, wait, max_wait):
+                raise ThrottleTimeout(limiter.endpoint, time.monotonic() - started)
+            time.sleep(wait)
+    finally:
+        with limiter._lock:
+            limiter.waiting -= 1
+
+
+async def aacquire(limiter: KeyLimiter, tokens: int, max_wait: float) -> None:
+    """
+    Asynchronous counterpart of acquire.
+    """
+    started = time.monotonic()
+    with limiter._lock:
+        limiter.waiting += 1
+    try:
+        while wait := limiter.try_acquire(tokens):
+            if _deadline_exceeded(limiter, started, wait, max_wait):
+                raise ThrottleTimeout(limiter.endpoint, time.monotonic() - started)
+            await asyncio.sleep(wait)
+    finally:
+        with limiter._lock:
+            limiter.waiting -= 1
+
+
+def _error_headers(error: Exception) -> Optional[Mapping]:
+    return getattr(getattr(error, 'response', None), 'headers', None)
+
+
+def throttled_stream(endpoint: str, api_key: Optional[str], tokens: int, rate_limits: Mapping,
+                     start: Callable[[], Iterator[str]]) -> Generator[str, None, None]:
+    """
+    Starts a provider stream once the limiter of its key has a free slot.
+
+    The in-flight slot is held until the stream ends or is aborted, see
+    cancellation.StreamAbort. The headers of a
+    provider error, e.g. retry-after on a 429, are fed back to the limiter.
+
+    Args:
+        endpoint: Provider name, or 'custom:' followed by the endpoint URL
+        api_key: API key of the call
+        tokens: Estimated input and output tokens of the call
+        rate_limits: rate_limits section of the configuration
+        start: Callable starting the provider stream
+
+    Yields:
+        str: Streamed response text chunks
+    """
+    settings = rate_limit_settings(rate_limits, endpoint)
+    if not settings['enabled']:
+        yield from start()
+        return
+    limiter = rate_limiter.limiter(endpoint, api_key, settings)
+    acquire(limiter, tokens, settings['max_wait_seconds'])
+    slot = threading.Lock()
+
+    def release() -> None:
+        # Either when the stream ends or when it is aborted from another thread
+        if slot.acquire(blocking=False):
+            limiter.release()
+
+    on_abort(release)
+    try:
+        yield from start()
+    except Exception as e:
+        limiter.observe(_error_headers(e))
+        raise
+    finally:
+        release()
+
+
+async def athrottled_stream(endpoint: str, api_key: Optional[str], tokens: int, rate_limits: Mapping,
+                            start: Callable[[], AsyncIterator[str]]) -> AsyncGenerator[str, None]:
+    """
+    Asynchronous counterpart of throttled_stream.
+    """
+    settings = rate_limit_settings(rate_limits, endpoint)
+    limiter = None
+    if settings['enabled']:
+        limiter = rate_limiter.limiter(endpoint, api_key, settings)
+        await aacquire(limiter, tokens, settings['max_wait_seconds'])
+    stream = None
+    try:
+        stream = start()
+        async for chunk in stream:
+            yield chunk
+    except Exception as e:
+        if limiter:
+            limiter.observe(_error_headers(e))
+        raise
+    finally:
+        if hasattr(stream, 'aclose'):
+            await stream.aclose()
+        if limiter:
+            limiter.release()
@@ -0,0 +1,469 @@
+"""
+Retries, circuit breakers and model fallback around provider streams.
+
+A transient provider error (rate limit, server error, timeout, lost
+connection) raised before the first token is retried after a random
+exponential backoff. Each provider, or custom endpoint, has a circuit
+breaker: after repeated transient failures it opens and requests to it
+fail at once instead of waiting for a timeout, until a single trial
+request is let through after the cooldown. When a model still cannot
+answer, the next model of the fallback list is tried.
+
+Errors raised after the first token are never retried: part of the text
+has already reached the client.
+"""
+import asyncio
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from typing import AsyncGenerator, AsyncIterator, Callable, Generator, Iterator, Mapping, Optional, TypeVar
+
+from .config import RETRYABLE_STATUS_CODES, RETRY_DEFAULT_ATTEMPTS, RETRY_BACKOFF_MS, RETRY_MAX_BACKOFF_MS, \
+    BREAKER_FAILURE_THRESHOLD, BREAKER_COOLDOWN_SECONDS
+from .cancellation import aborted
+from .ratelimit import ThrottleTimeout
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+_TRANSIENT_NAMES = ('Timeout', 'Connection', 'RateLimit', 'Overloaded', 'ServiceUnavailable',
+                    'InternalServer', 'ResourceExhausted', 'DeadlineExceeded')
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of calling a provider whose circuit breaker is open.
+    """
+
+    def __init__(self, key: str, retry_in: float) -> None:
+        super().__init__(f"Fournisseur indisponible ({key}), nouvel essai dans {retry_in:.0f} s")
+        self.key = key
+        self.retry_in = retry_in
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    Tells whether a provider error is worth retrying.
+
+    The HTTP status is read from the SDK exception when it has one
+    (status_code for OpenAI and Anthropic, code for Google); otherwise
+    the exception class name is used.
+
+    Args:
+        error: Exception raised by a provider SDK
+
+    Returns:
+        bool: True for rate limits, server errors, timeouts and connection failures
+    """
+    if isinstance(error, (CircuitOpenError, ThrottleTimeout)):
+        return False
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(error, 'status_code', None)
+    if not isinstance(status, int):
+        status = getattr(error, 'code', None)
+    if isinstance(status, int) and not isinstance(status, bool):
+        return status in RETRYABLE_STATUS_CODES
+    name = type(error).__name__
+    return any(marker in name for marker in _TRANSIENT_NAMES)
+
+
+def resilience_settings(config: Mapping) -> dict:
+    """
+    Reads the retry and circuit breaker settings of the configuration.
+
+    Args:
+        config: Application configuration
+
+    Returns:
+        dict: retries, backoff_ms, max_backoff_ms, breaker_threshold and breaker_cooldown_seconds
+    """
+    resilience = config.get('resilience', {})
+    return {
+        'retries': max(0, int(resilience.get('retries', RETRY_DEFAULT_ATTEMPTS))),
+        'backoff_ms': resilience.get('backoff_ms', RETRY_BACKOFF_MS),
+        'max_backoff_ms': resilience.get('max_backoff_ms', RETRY_MAX_BACKOFF_MS),
+        'breaker_threshold': max(1, int(resilience.get('breaker_threshold', BREAKER_FAILURE_THRESHOLD))),
+        'breaker_cooldown_seconds': resilience.get('breaker_cooldown_seconds', BREAKER_COOLDOWN_SECONDS),
+    }
+
+
+def backoff_delay(attempt: int, settings: Mapping) -> float:
+    """
+    Returns the wait before a retry, with full jitter.
+
+    Args:
+        attempt: Number of the failed attempt, starting at 0
+        settings: Resilience settings
+
+    Returns:
+        float: Seconds, drawn uniformly up to the exponential backoff
+    """
+    ceiling = min(settings['max_backoff_ms'], settings['backoff_ms'] * 2 ** attempt)
+    return random.uniform(0, ceiling) / 1000
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one provider endpoint.
+
+    Closed, calls go through. After `threshold` consecutive transient
+    failures it opens and calls are refused for `cooldown` seconds. Then
+    it is half open: one trial call goes through, closing the breaker if
+    it succeeds and opening it again if it fails. A trial that never
+    reports back, e.g. cancelled by the client, expires after the cooldown.
+    """
+
+    def __init__(self, key: str, threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 cooldown: float = BREAKER_COOLDOWN_SECONDS) -> None:
+        self.key = key
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Lets a call through or refuses it.
+
+        Raises:
+            CircuitOpenError: When the breaker is open, or half open with a trial in flight
+        """
+        with self._lock:
+            if self.state == 'closed':
+                return
+            now = time.monotonic()
+            if self.state == 'open':
+                remaining = self.cooldown - (now - self.opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(self.key, remaining)
+                self.state = 'half_open'
+            elif self.trial_at is not None and now - self.trial_at < self.cooldown:
+                raise CircuitOpenError(self.key, self.cooldown - (now - self.trial_at))
+            self.trial_at = now
+
+    def record_success(self) -> None:
+        """
+        Records a call the provider answered, closing the breaker.
+        """
+        with self._lock:
+            if self.state != 'closed':
+                logger.info(f"Fournisseur {self.key} de nouveau disponible")
+            self.state, self.failures, self.opened_at, self.trial_at = 'closed', 0, None, None
+
+    def record_failure(self) -> None:
+        """
+        Records a transient failure, opening the breaker past the threshold.
+        """
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half_open' or self.failures >= self.threshold:
+                if self.state != 'open':
+                    logger.warning(f"Fournisseur {self.key} indisponible après {self.failures} échecs")
+                self.state, self.opened_at, self.trial_at = 'open', time.monotonic(), None
+
+    def snapshot(self) -> dict:
+        """
+        Returns the state of the breaker.
+
+        Returns:
+            dict: state ('closed', 'open' or 'half_open'), consecutive failures,
+                and seconds before the next trial while open
+        """
+        with self._lock:
+            retry_in = None
+            if self.state == 'open':
+                retry_in = round(max(0.0, self.cooldown - (time.monotonic() - self.opened_at)), 1)
+            return {'state': self.state, 'failures': self.failures, 'retry_in': retry_in}
+
+
+class ProviderHealth:
+    """
+    Thread-safe registry of the circuit breakers and of the fallbacks used.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Forgets every breaker and fallback count.
+        """
+        with self._lock:
+            self._breakers: dict[str, CircuitBreaker] = {}
+            self._fallbacks: Counter = Counter()
+
+    def breaker(self, key: str, settings: Mapping) -> CircuitBreaker:
+        """
+        Returns the breaker of an endpoint, created on first use.
+
+        The threshold and cooldown follow the current settings.
+
+        Args:
+            key: Provider name, or 'custom:' followed by the endpoint URL
+            settings: Resilience settings
+
+        Returns:
+            CircuitBreaker: Breaker of the endpoint
+        """
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(key)
+            breaker.threshold = settings['breaker_threshold']
+            breaker.cooldown = settings['breaker_cooldown_seconds']
+            return breaker
+
+    def record_fallback(self, requested: str, answered: str) -> None:
+        """
+        Counts a request answered by a fallback model.
+
+        Args:
+            requested: Model the request was sent to
+            answered: Fallback model that answered
+        """
+        with self._lock:
+            self._fallbacks[(requested, answered)] += 1
+
+    def snapshot(self) -> dict:
+        """
+        Returns the state of every breaker and the fallback counts.
+
+        Returns:
+            dict: 'breakers' by endpoint key, and 'fallbacks' as a list of
+                {'model', 'fallback', 'count'}
+        """
+        with self._lock:
+            breakers = dict(self._breakers)
+            fallbacks = [{'model': requested, 'fallback': answered, 'count': count}
+                         for (requested, answered), count in sorted(self._fallbacks.items())]
+        return {'breakers': {key: breaker.snapshot() for key, breaker in sorted(breakers.items())},
+                'fallbacks': fallbacks}
+
+
+provider_health = ProviderHealth()
+
+
+def _failed(error: Exception, breaker: CircuitBreaker) -> bool:
+    """
+    Reports a failed attempt to the breaker.
+
+    Returns:
+        bool: True if the error is transient
+    """
+    if is_transient(error):
+        breaker.record_failure()
+        return True
+    if not isinstance(error, (CircuitOpenError, ThrottleTimeout)):
+        # The provider answered, the request itself was refused
+        breaker.record_success()
+    return False
+
+
+def stream_with_retries(start: Callable[[], Iterator[str]], breaker: CircuitBreaker,
+                        settings: Mapping) -> Generator[str, None, None]:
+    """
+    Streams from a provider through its breaker, retrying transient errors.
+
+    Args:
+        start: Callable starting the provider stream
+        breaker: Circuit breaker of the provider
+        settings: Resilience settings
+
+    Yields:
+        str: Streamed response text chunks
+
+    Raises:
+        CircuitOpenError: When the breaker refuses the call
+        Exception: The provider error once the retries are exhausted, or any error after the first token
+    """
+    attempt = 0
+    while True:
+        breaker.before_call()
+        started = False
+        stream = None
+        try:
+            stream = start()
+            for chunk in stream:
+                started = True
+                yield chunk
+        except Exception as e:
+            # A stream closed by an abort failed on our side: no retry, and nothing to tell the breaker
+            if aborted() or not _failed(e, breaker) or started or attempt >= settings['retries']:
+                raise
+            delay = backoff_delay(attempt, settings)
+            logger.info(f"Nouvel essai {breaker.key} dans {delay:.2f} s après {type(e).__name__}: {e}")
+        else:
+            breaker.record_success()
+            return
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+        attempt += 1
+        time.sleep(delay)
+
+
+def call_with_retries(call: Callable[[], T], breaker: CircuitBreaker, settings: Mapping) -> T:
+    """
+    Calls a provider through its breaker, retrying transient errors.
+
+    Used for requests that are not streamed, such as Whisper transcriptions.
+
+    Args:
+        call: Callable sending the request; called again on every attempt
+        breaker: Circuit breaker of the provider
+        settings: Resilience settings
+
+    Returns:
+        T: Result of the call
+
+    Raises:
+        CircuitOpenError: When the breaker refuses the call
+        Exception: The provider error once the retries are exhausted
+    """
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = call()
+        except Exception as e:
+            if not _failed(e, breaker) or attempt >= settings['retries']:
+                raise
+            delay = backoff_delay(attempt, settings)
+            logger.info(f"Nouvel essai {breaker.key} dans {delay:.2f} s après {type(e).__name__}: {e}")
+        else:
+            breaker.record_success()
+            return result
+        attempt += 1
+        time.sleep(delay)
+
+
+async def astream_with_retries(start: Callable[[], AsyncIterator[str]], breaker: CircuitBreaker,
+                               settings: Mapping) -> AsyncGenerator[str, None]:
+    """
+    Asynchronous counterpart of stream_with_retries.
+
+    Args:
+        start: Callable starting the async provider stream
+        breaker: Circuit breaker of the provider
+        settings: Resilience settings
+
+    Yields:
+        str: Streamed response text chunks
+    """
+    attempt = 0
+    while True:
+        breaker.before_call()
+        started = False
+        stream = None
+        try:
+            stream = start()
+            async for chunk in stream:
+                started = True
+                yield chunk
+        except Exception as e:
+            if not _failed(e, breaker) or started or attempt >= settings['retries']:
+                raise
+            delay = backoff_delay(attempt, settings)
+            logger.info(f"Nouvel essai {breaker.key} dans {delay:.2f} s après {type(e).__name__}: {e}")
+        else:
+            breaker.record_success()
+            return
+        finally:
+            if hasattr(stream, 'aclose'):
+                await stream.aclose()
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def _fallback_error(candidate: Mapping, error: Exception, is_last: bool) -> bool:
+    """
+    Tells whether the next candidate should be tried after a failure, and logs it.
+    """
+    if is_last or not (is_transient(error) or isinstance(error, (CircuitOpenError, ThrottleTimeout))):
+        return False
+    logger.warning(f"{candidate['model']} indisponible ({type(error).__name__}: {error}), modèle suivant")
+    return True
+
+
+def _use_fallback(candidates: list, index: int, metadata: dict, errors: list) -> None:
+    if index:
+        metadata['fallback'] = {'model': candidates[index]['model'], 'requested': candidates[0]['model'],
+                                'errors': errors}
+        provider_health.record_fallback(candidates[0]['model'], candidates[index]['model'])
+
+
+def stream_with_fallback(candidates: list, settings: Mapping, metadata: dict) -> Generator[str, None, None]:
+    """
+    Streams from the first candidate model able to answer.
+
+    A candidate is skipped when its breaker is open, when its rate limit
+    leaves no slot in time, or when it still fails with a transient error
+    after its retries; other errors are raised at once.
+
+    Args:
+        candidates: Dicts with 'model', 'breaker' (endpoint key) and 'start'
+            (callable starting its stream), the requested model first
+        settings: Resilience settings
+        metadata: Dictionary receiving 'fallback' when another model answers
+
+    Yields:
+        str: Streamed response text chunks
+    """
+    errors = []
+    for index, candidate in enumerate(candidates):
+        breaker = provider_health.breaker(candidate['breaker'], settings)
+        stream = stream_with_retries(candidate['start'], breaker, settings)
+        started = False
+        try:
+            for chunk in stream:
+                if not started:
+                    started = True
+                    _use_fallback(candidates, index, metadata, errors)
+                yield chunk
+            return
+        except Exception as e:
+            if started or aborted() or not _fallback_error(candidate, e, index == len(candidates) - 1):
+                raise
+            errors.append(f"{candidate['model']}: {e}")
+        finally:
+            stream.close()
+
+
+async def astream_with_fallback(candidates: list, settings: Mapping, metadata: dict) -> AsyncGenerator[str, None]:
+    """
+    Asynchronous counterpart of stream_with_fallback.
+
+    Args:
+        candidates: Dicts with 'model', 'breaker' and 'start' (callable starting an async stream)
+        settings: Resilience settings
+        metadata: Dictionary receiving 'fallback' when another model answers
+
+    Yields:
+        str: Streamed response text chunks
+    """
+    errors = []
+    for index, candidate in enumerate(candidates):
+        breaker = provider_health.breaker(candidate['breaker'], settings)
+        stream = astream_with_retries(candidate['start'], breaker, settings)
+        started = False
+        try:
+            async for chunk in stream:
+                if not started:
+                    started = True
+                    _use_fallback(candidates, index, metadata, errors)
+                yield chunk
+            return
+        except Exception as e:
+            if started or not _fallback_error(candidate, e, index == len(candidates) - 1):
+                raise
+            errors.append(f"{candidate['model']}: {e}")
+        finally:
+            await stream.aclose()
@@ -1,18 +1,38 @@
+import functools
+import io
 import json
 import logging
-import os
 import tempfile
+import uuid
 import webbrowser
+from typing import BinaryIO, Optional
 
-from flask import Blueprint, render_template, request, jsonify, Response
+from flask import Blueprint, Request, g, render_template, request, jsonify, Response
+from werkzeug.datastructures import MultiDict
+from werkzeug.exceptions import RequestEntityTooLarge
 import pyperclip
-from openai import OpenAI
 
-from .config import MODES, AVAILABLE_MODELS, CURRENT_VERSION, DEFAULT_SHORTCUT, CONFIG_FILE, AVAILABLE_THEMES
-from .utils import load_config, save_config, restart_application, load_modes
-from .models import stream_response
-from .utils import validate_audio_file
-from bs4 import BeautifulSoup
+from .config import MODES, AVAILABLE_MODELS, CURRENT_VERSION, DEFAULT_SHORTCUT, AVAILABLE_THEMES, \
+    STREAM_PROTOCOL_VERSION, SUPPORTED_STREAM_PROTOCOLS, BATCH_MAX_ITEMS, SEGMENTABLE_MODES, \
+    EDIT_LIST_MODES, WHISPER_MAX_SIZE_MB, TRANSCRIPTION_MAX_UPLOAD_MB, UPLOAD_SPOOL_MAX_MB, \
+    TRANSCRIPTION_SEGMENT_SECONDS, TRANSCRIPTION_OVERLAP_SECONDS
+from .utils import load_config, save_config, restart_application, load_modes, config_snapshot, update_config, \
+    config_writer
+from .models import stream_response, estimate_request, client_pool
+from .pipeline import stream_segmented
+from .edits import stream_with_edits
+from .batch import run_batch
+from .live import live_sessions
+from .cache import response_cache, transcription_cache
+from .cancellation import StreamAbort, abortable, stream_registry
+from .metrics import metrics, StreamTimer
+from .ratelimit import rate_limiter
+from .prewarm import connection_warmer
+from .resilience import provider_health, resilience_settings, call_with_retries
+from .speculation import speculator, normalize_text
+from .streaming import create_stream_encoder, SSE_END
+from .transcription import split_recording, transcribe_segments, transcription_key, replay_transcription
+from .utils import validate_audio_stream
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -90,50 +110,413 @@ def restart_endpoint() -> None:
     """
     restart_application()
 
-@bp.route('/process', methods=['POST'])
-def process() -> Response:
+def parse_process_request(form) -> tuple[dict | None, str | None]:
     """
-    Processes text generation requests.
+    Validates the form of a text processing request.
 
-    Handles AI text processing requests by streaming responses from
-    configured AI models based on the selected processing mode.
+    Shared by the Flask /process route and the ASGI serving path.
+
+    Args:
+        form: Submitted form fields
+
+    Returns:
+        tuple[dict | None, str | None]: (stream arguments plus 'protocol', 'request_id', 'long_text'
+            and 'edit_list', error_message)
     """
-    mode = request.form.get('mode')
-    input_text = request.form.get('input_text')
+    mode = form.get('mode')
+    input_text = form.get('input_text')
+    protocol = form.get('protocol', STREAM_PROTOCOL_VERSION, type=int)
 
-    user_response = request.form.get('user_response') if mode == 'repondre' else None
-    config = load_config()
+    user_response = form.get('user_response') if mode == 'repondre' else None
+    config = config_snapshot()
 
     modes_config = load_modes()
     all_modes = {**modes_config['system'], **modes_config.get('custom', {})}
 
     if mode not in all_modes:
-        return jsonify({'error': f"Mode '{mode}' non reconnu."}), 400
+        return None, f"Mode '{mode}' non reconnu."
+
+    if protocol not in SUPPORTED_STREAM_PROTOCOLS:
+        return None, f"Protocole de streaming '{protocol}' non supporté."
+
+    long_text = config.get('long_text', {})
+    params = {
+        'mode_name': mode,
+        'input_text': input_text,
+        'user_response': user_response,
+        'model': config.get('model'),
+        'api_key': config.get('api_key'),
+        'all_modes': all_modes,
+        'protocol': protocol,
+        'request_id': form.get('request_id') or uuid.uuid4().hex,
+        'long_text': None,
+        'edit_list': False,
+    }
+    segmenting = {
+        'segment_tokens': long_text.get('segment_tokens', 800),
+        'max_workers': long_text.get('max_workers', 4),
+    }
+    if form.get('long_text', int(bool(long_text.get('enabled'))), type=int):
+        params['long_text'] = segmenting
+    elif mode in SEGMENTABLE_MODES:
+        # Texts too long for the model are split rather than rejected
+        plan, _ = estimate_request(mode, input_text, user_response, params['model'], all_modes)
+        if plan and not plan['fits']:
+            params['long_text'] = segmenting
+
+    edit_list = config.get('edit_list', {})
+    if mode in EDIT_LIST_MODES and not params['long_text']:
+        params['edit_list'] = bool(form.get('edit_list', int(bool(edit_list.get('enabled'))), type=int)) and \
+            len(input_text or '') >= edit_list.get('min_chars', 2000)
+    return params, None
+
+
+def stream_for_request(params: dict, metadata: dict | None = None):
+    """
+    Returns the response stream for validated /process arguments.
+
+    Args:
+        params: Arguments from parse_process_request, without 'protocol' and 'request_id'
+        metadata: Dictionary receiving the response metadata
+
+    Returns:
+        Generator[str, None, None]: Streamed response text
+    """
+    long_text = params.pop('long_text', None)
+    if long_text:
+        params.pop('edit_list', None)
+        return stream_segmented(**params, **long_text, metadata=metadata)
+    if params.pop('edit_list', False):
+        return stream_with_edits(**params, metadata=metadata)
+    return stream_response(**params, metadata=metadata)
+
+
+def speculate(text: str) -> bool:
+    """
+    Starts processing text placed in the input before a mode is picked.
+
+    The text is processed with the likely mode and buffered until the /process
+    request for it arrives; see speculation.py. The request is validated on
+    the speculation thread.
+
+    Args:
+        text: Text placed in the input field
+
+    Returns:
+        bool: True if a speculation was started, False if speculation is disabled
+    """
+    mode = speculator.likely_mode(config_snapshot())
+    if mode is None or not text.strip():
+        return False
+
+    def prepare() -> dict | None:
+        params, error = parse_process_request(MultiDict({'mode': mode, 'input_text': normalize_text(text)}))
+        if error:
+            return None
+        params.pop('protocol')
+        params.pop('request_id')
+        return params
+
+    speculator.start(prepare, lambda params, metadata: stream_for_request(dict(params), metadata))
+    return True
+
+
+def parse_live_request(data: dict) -> tuple[dict | None, str | None]:
+    """
+    Validates a live correction message.
+
+    Shared by the Flask /api/live route and the ASGI WebSocket. The message
+    is a JSON object {"session_id", "revision", "text", "mode"?}; the mode
+    defaults to 'corriger' and must allow paragraphs to be processed
+    independently.
+
+    Args:
+        data: Decoded message
+
+    Returns:
+        tuple[dict | None, str | None]: (LiveSession.check arguments plus 'session_id', error_message)
+    """
+    session_id, revision, text = data.get('session_id'), data.get('revision'), data.get('text')
+    mode = data.get('mode') or 'corriger'
+    if not isinstance(session_id, str) or not session_id:
+        return None, "Identifiant de session manquant."
+    if not isinstance(revision, int) or isinstance(revision, bool):
+        return None, "Numéro de révision manquant."
+    if not isinstance(text, str):
+        return None, "Texte manquant."
+    if mode not in SEGMENTABLE_MODES:
+        return None, f"Mode '{mode}' non disponible en correction en direct."
+
+    config = config_snapshot()
+    modes_config = load_modes()
+    return {
+        'session_id': session_id,
+        'text': text,
+        'revision': revision,
+        'mode_name': mode,
+        'model': config.get('model'),
+        'api_key': config.get('api_key'),
+        'all_modes': {**modes_config['system'], **modes_config.get('custom', {})},
+        'max_workers': config.get('live', {}).get('max_workers', 4),
+        'provider_concurrency': config.get('batch', {}).get('provider_concurrency'),
+    }, None
+
+
+def live_check(params: dict):
+    """
+    Checks a revision of a live session.
+
+    Args:
+        params: Arguments from parse_live_request
+
+    Returns:
+        Generator[dict, None, None]: Paragraph messages then a summary
+    """
+    params = dict(params)
+    return live_sessions.get(params.pop('session_id')).check(**params)
+
+
+@bp.route('/process', methods=['POST'])
+def process() -> Response:
+    """
+    Processes text generation requests.
+
+    Handles AI text processing requests by streaming responses from
+    configured AI models based on the selected processing mode.
+
+    The optional 'protocol' form field selects the streaming format:
+    2 (default) sends deltas, 1 re-sends the full buffer on every chunk.
+    The optional 'long_text' field (1/0) overrides the configured
+    long-text mode, which processes long inputs in parallel segments.
+    Texts too long for the model are always segmented when the mode allows it.
+    Likewise, the 'edit_list' field overrides the edit-list correction mode,
+    used for texts of at least the configured minimum length.
+    The optional 'request_id' field names the stream for /process/cancel.
+    A request answered by the speculation started for captured clipboard
+    text follows it instead of starting a new generation.
+    The Server-Timing header gives the time spent validating the request;
+    the final event reports the time to first token and total duration.
+    """
+    timer = StreamTimer()
+    params, error = parse_process_request(request.form)
+    if error:
+        return jsonify({'error': error}), 400
+    protocol = params.pop('protocol')
+    request_id = params.pop('request_id')
+    speculation = speculator.claim(params)
+    g.server_timing = {'setup': timer.elapsed_ms()}
+    client_disconnected = request.environ.get('waitress.client_disconnected', lambda: False)
 
     def generate():
         """
         Generate streaming response for the text processing request.
 
         This generator function streams AI model responses back to the client
-        in real-time using Server-Sent Events (SSE) format.
+        in real-time using Server-Sent Events (SSE) format. It stops pulling
+        from the provider as soon as the stream is cancelled or the client
+        goes away.
         """
-        buffer = ""
+        encoder = create_stream_encoder(protocol)
+        metadata = {}
+        # Cancelling closes the provider stream, even before its first token
+        abort = StreamAbort()
+        abortable(abort)
+        cancelled = stream_registry.register(request_id, abort)
+        output = []
+        outcome = 'disconnected'
+        stream = speculation.follow(metadata) if speculation else stream_for_request(params, metadata)
         try:
-            for chunk in stream_response(mode, input_text, user_response,
-                                         config.get('model'), config.get('api_key'), all_modes=all_modes):
+            for chunk in stream:
+                if cancelled.is_set() or client_disconnected():
+                    break
                 if chunk:
-                    clean_chunk = chunk.replace('\r', '')
-                    buffer += clean_chunk
-                    yield f"data: {json.dumps(buffer)}\n\n"
-
-            yield "data: [END]\n\n"
+                    output.append(chunk)
+                    timer.chunk(chunk)
+                    yield encoder.delta(chunk.replace('\r', ''))
+            else:
+                # An aborted stream ends early without an error
+                if not cancelled.is_set():
+                    outcome = 'completed'
+                    metadata['timing'] = timer.timing()
+                    yield encoder.done(metadata)
+                    yield SSE_END
+                    return
+
+            if cancelled.is_set():
+                outcome = 'cancelled'
+                yield encoder.error("Erreur: Génération interrompue")
+                yield SSE_END
 
         except Exception as e:
-            error_msg = json.dumps(f"Erreur: {str(e)}")
-            yield f"data: {error_msg}\n\n"
-            yield "data: [END]\n\n"
+            outcome = 'completed'
+            metadata.update({'error': f"Erreur: {str(e)}", 'error_class': type(e).__name__})
+            yield encoder.error(metadata['error'])
+            yield SSE_END
+        finally:
+            if hasattr(stream, 'close'):
+                stream.close()
+            abortable(None)
+            stream_registry.release(request_id, outcome, params['input_text'], ''.join(output))
+            timer.finish(outcome, params['mode_name'], metadata)
+
+    return Response(generate(), mimetype='text/event-stream', headers={'X-Request-Id': request_id})
+
+
+@bp.route('/api/batch', methods=['POST'])
+def batch() -> Response:
+    """
+    Processes many texts in one request.
+
+    Expects a JSON body {"items": [{"text", "mode", "user_response"?}, ...]}
+    and streams NDJSON lines: one result per item as soon as it completes,
+    tagged with the item index, then a summary line. An item that fails
+    gets an error line and does not stop the batch.
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': "Liste 'items' manquante ou vide."}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({'error': f"Trop d'éléments: {BATCH_MAX_ITEMS} maximum."}), 400
+
+    config = config_snapshot()
+    modes_config = load_modes()
+    batch_settings = config.get('batch', {})
+    results = run_batch(
+        items,
+        model=config.get('model'),
+        api_key=config.get('api_key'),
+        all_modes={**modes_config['system'], **modes_config.get('custom', {})},
+        max_workers=batch_settings.get('max_workers', 4),
+        provider_concurrency=batch_settings.get('provider_concurrency'),
+    )
+
+    def generate():
+        for result in results:
+            yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+@bp.route('/api/live', methods=['POST'])
+def live() -> Response:
+    """
+    Checks a revision of a text being typed.
+
+    HTTP counterpart of the /ws/live WebSocket served by the ASGI path.
+    Expects a JSON message {"session_id", "revision", "text", "mode"?} and
+    streams NDJSON lines: one suggestion per paragraph, then a summary.
+    Paragraphs unchanged since a previous message of the same session are
+    answered without calling the model.
+    """
+    params, error = parse_live_request(request.get_json(silent=True) or {})
+    if error:
+        return jsonify({'error': error}), 400
+    messages = live_check(params)
+
+    def generate():
+        for message in messages:
+            yield json.dumps(message, ensure_ascii=False) + "\n"
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+
+@bp.route('/process/cancel', methods=['POST'])
+def cancel_process() -> Response:
+    """
+    Stops a running text generation.
+
+    The stream named by the 'request_id' form field stops and its provider
+    connection is closed, even while it is still waiting for its first token.
+    """
+    request_id = request.form.get('request_id') or (request.get_json(silent=True) or {}).get('request_id')
+    if not request_id:
+        return jsonify({'success': False, 'error': 'Identifiant de requête manquant.'}), 400
+    return jsonify({'success': stream_registry.cancel(request_id)})
+
+
+@bp.route('/process/speculate', methods=['POST'])
+def speculate_process() -> Response:
+    """
+    Processes text placed in the input ahead of the choice of mode.
+
+    The page calls it once clipboard text captured by the shortcut is in
+    the input field. The answer for the likely mode is buffered for the
+    /process request that asks for it, when speculation is enabled.
+    """
+    text = request.form.get('input_text')
+    if not text:
+        return jsonify({'success': False, 'error': 'Texte manquant.'}), 400
+    return jsonify({'success': speculate(text)})
+
+
+@bp.route('/api/estimate', methods=['POST'])
+def estimate() -> Response:
+    """
+    Estimates a text processing request without sending it.
+
+    Takes the same form fields as /process and returns the estimated input
+    and output tokens, cost and duration, whether the text fits the model
+    and whether it will be processed in segments.
+    """
+    params, error = parse_process_request(request.form)
+    if error:
+        return jsonify({'error': error}), 400
+    plan, error = estimate_request(params['mode_name'], params['input_text'], params['user_response'],
+                                   params['model'], params['all_modes'])
+    if error:
+        return jsonify({'error': error}), 400
+    return jsonify({**plan, 'segmented': params['long_text'] is not None})
+
+
+@bp.after_request
+def add_server_timing(response: Response) -> Response:
+    """
+    Adds the Server-Timing header of the routes that measured their phases.
+    """
+    timings = g.get('server_timing')
+    if timings:
+        response.headers['Server-Timing'] = ', '.join(f"{name};dur={duration}" for name, duration in timings.items())
+    return response
+
+
+@bp.route('/api/metrics', methods=['GET'])
+def get_metrics() -> Response:
+    """
+    Request metrics.
+
+    Returns the counters and latency histograms of /process and
+    /transcribe in the Prometheus text format, or with ?format=json the
+    recent p50/p95 shown in the settings page.
+    """
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.summary())
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@bp.route('/api/providers', methods=['GET'])
+def provider_status() -> Response:
+    """
+    Provider health.
+
+    Returns the circuit breaker state of each provider endpoint called
+    since startup, how many requests were answered by a fallback model, the
+    rate limits and load of each provider key, and the connection warm-ups.
+    """
+    return jsonify({**provider_health.snapshot(), 'rate_limits': rate_limiter.snapshot(),
+                    'prewarm': connection_warmer.snapshot()})
 
-    return Response(generate(), mimetype='text/event-stream')
+
+@bp.route('/api/streams', methods=['GET'])
+def stream_stats() -> Response:
+    """
+    Stream cancellation statistics.
+
+    Returns the number of active streams, how finished streams ended, the
+    estimated tokens saved by stopping generations early, and how many
+    speculations on clipboard text were used or discarded.
+    """
+    return jsonify({**stream_registry.stats(), 'speculation': speculator.snapshot()})
 
 
 
@@ -146,6 +529,8 @@ def copy() -> Response:
     Extracts plain text from HTML content if provided and copies
     the cleaned text to the system clipboard.
     """
+    from bs4 import BeautifulSoup
+
     data = request.json
     html_or_plain_text = data.get('text', '')
 
@@ -160,65 +545,183 @@ def copy() -> Response:
         return jsonify({'success': False, 'error': str(e)})
 
 
+class UploadRequest(Request):
+    """
+    Request keeping uploaded files of up to UPLOAD_SPOOL_MAX_MB in memory.
+
+    Werkzeug writes any upload over 500 KB to a temporary file. Audio
+    uploads are only forwarded to Whisper, so those small enough for one
+    call stay in memory and larger ones go to an anonymous temporary file.
+    """
+
+    def _get_file_stream(self, total_content_length: Optional[int], content_type: Optional[str],
+                         filename: Optional[str] = None, content_length: Optional[int] = None) -> BinaryIO:
+        if total_content_length is not None and total_content_length <= UPLOAD_SPOOL_MAX_MB * 1024 * 1024:
+            return io.BytesIO()
+        return tempfile.TemporaryFile('rb+')
+
+
+def _whisper(client, settings: dict, upload: tuple[str, BinaryIO]) -> str:
+    """
+    Transcribes one audio file with Whisper.
+
+    The pooled client does not retry by itself: transient errors are
+    retried here, through the circuit breaker of the 'openai' endpoint.
+
+    Args:
+        client: Pooled OpenAI client
+        settings: Resilience settings
+        upload: (file name, file object) of at most 25 MB, streamed into the request body
+
+    Returns:
+        str: Transcribed text
+    """
+    def call() -> str:
+        upload[1].seek(0)
+        return client.audio.transcriptions.create(
+            model="whisper-1",
+            file=upload,
+            response_format="text"
+        )
+
+    return call_with_retries(call, provider_health.breaker('openai', settings), settings)
+
+
+def _upload_too_large() -> tuple[Response, int]:
+    return jsonify({
+        'success': False,
+        'error': f"Le fichier est trop volumineux. Taille maximale: {TRANSCRIPTION_MAX_UPLOAD_MB}MB"
+    }), 413
+
+
 @bp.route('/transcribe', methods=['POST'])
 def transcribe() -> Response:
     """
     Transcribes audio file to text using OpenAI Whisper.
 
     Processes uploaded audio files and returns transcribed text
-    using OpenAI's Whisper API for speech recognition.
+    using OpenAI's Whisper API for speech recognition. Requests over the
+    size limit are refused from their Content-Length before the body is
+    read, and the format is recognised from the first bytes of the file.
+    Uploads are kept in memory or spooled by UploadRequest and streamed to
+    Whisper from there. Recordings too long for a single call are split
+    into overlapping segments transcribed in parallel. With the 'stream'
+    form field set to 1, the text is streamed as NDJSON lines as the
+    segments complete, then a 'done' line with the full text. A recording
+    already transcribed with the same options is answered from the
+    transcription cache without calling Whisper. The Server-Timing header
+    splits the time between the upload, the cache lookup, the audio
+    splitting and the Whisper calls.
     """
-    temp_file = None
+    timer = StreamTimer('transcribe')
+    g.server_timing = {}
+    audio = uploads = None
     try:
-        if 'audio' not in request.files:
-            return jsonify({
-                'success': False,
-                'error': 'Aucun fichier audio fourni.'
-            }), 400
+        config = load_config()
 
-        audio_file = request.files['audio']
-        if audio_file.filename == '':
+        if not config.get('api_key') or AVAILABLE_MODELS.get(config.get('model', '')).get('provider') != 'openai':
             return jsonify({
                 'success': False,
-                'error': 'Aucun fichier sélectionné.'
+                'error': 'Une clé API OpenAI est requise pour la transcription audio.'
             }), 400
 
-        config = load_config()
+        max_length = request.max_content_length
+        if max_length is not None and (request.content_length or 0) > max_length:
+            return _upload_too_large()
 
-        if not config.get('api_key') or AVAILABLE_MODELS.get(config.get('model', '')).get('provider') != 'openai':
+        try:
+            files = request.files
+        except RequestEntityTooLarge:
+            # Bodies without a Content-Length are cut off by Werkzeug once over the limit
+            return _upload_too_large()
+
+        if 'audio' not in files:
             return jsonify({
                 'success': False,
-                'error': 'Une clé API OpenAI est requise pour la transcription audio.'
+                'error': 'Aucun fichier audio fourni.'
             }), 400
 
-        temp_file = tempfile.NamedTemporaryFile(suffix=os.path.splitext(audio_file.filename)[1], delete=False)
-        audio_file.save(temp_file.name)
-
-        is_valid, error_message = validate_audio_file(temp_file.name)
-        if not is_valid:
+        audio_file = files['audio']
+        if audio_file.filename == '':
             return jsonify({
                 'success': False,
-                'error': error_message
+                'error': 'Aucun fichier sélectionné.'
             }), 400
 
-        try:
-            client = OpenAI(api_key=config.get('api_key'))
-            with open(temp_file.name, "rb") as audio:
-                transcription = client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio,
-                    response_format="text"
-                )
-
-        except Exception:
+        audio_format, error_message = validate_audio_stream(audio_file.stream, TRANSCRIPTION_MAX_UPLOAD_MB)
+        if audio_format is None:
             return jsonify({
                 'success': False,
-                'error': "Erreur lors de la transcription, essayez un autre format."
-            }), 500
+                'error': error_message
+            }), 400
 
+        # The request closes its files when the view returns, before a streamed response is sent
+        audio, audio_file.stream = audio_file.stream, io.BytesIO()
+        g.server_timing['upload'] = timer.elapsed_ms()
+        metadata = {'model': 'whisper-1', 'provider': 'openai'}
+        settings = config.get('transcription', {})
+        cached = cache_key = None
+        if settings.get('cache', True):
+            cache_key = transcription_key(audio, metadata['model'], {
+                'response_format': 'text',
+                'segment_seconds': settings.get('segment_seconds', TRANSCRIPTION_SEGMENT_SECONDS),
+                'overlap_seconds': settings.get('overlap_seconds', TRANSCRIPTION_OVERLAP_SECONDS),
+            })
+            cached = transcription_cache.get(cache_key)
+            metadata['cache'] = 'miss' if cached is None else 'hit'
+            g.server_timing['cache'] = round(timer.elapsed_ms() - sum(g.server_timing.values()), 1)
+
+        if cached is not None:
+            messages = replay_transcription(cached)
+        else:
+            try:
+                uploads = split_recording(audio, f"audio.{audio_format}", settings)
+            except Exception as e:
+                logger.warning(f"Découpage audio impossible: {type(e).__name__}: {e}")
+                return jsonify({
+                    'success': False,
+                    'error': "Impossible de décoder le fichier audio, essayez un autre format."
+                }), 400
+            if uploads is None:
+                return jsonify({
+                    'success': False,
+                    'error': (f"Le fichier est trop volumineux. Taille maximale: {WHISPER_MAX_SIZE_MB}MB "
+                              "(installez ffmpeg pour transcrire les enregistrements plus longs)")
+                }), 400
+            g.server_timing['split'] = round(timer.elapsed_ms() - sum(g.server_timing.values()), 1)
+
+            client = client_pool.get('openai', config.get('api_key'))
+            whisper = functools.partial(_whisper, client, resilience_settings(config))
+            messages = transcribe_segments(uploads, whisper, settings.get('max_workers', 4), cache_key)
+        cleanup = (audio, uploads)
+        audio = uploads = None
+
+        def run():
+            try:
+                for message in messages:
+                    if message['type'] == 'segment':
+                        timer.chunk(message['text'])
+                    yield message
+            except Exception as e:
+                metadata.update({'error': str(e), 'error_class': type(e).__name__})
+                yield {'type': 'error', 'error': "Erreur lors de la transcription, essayez un autre format."}
+            finally:
+                messages.close()
+                timer.finish('completed', None, metadata)
+                _close_uploads(*cleanup)
+
+        if request.form.get('stream') == '1':
+            return Response((json.dumps(message, ensure_ascii=False) + "\n" for message in run()),
+                            mimetype='application/x-ndjson')
+
+        result = list(run())
+        if cached is None:
+            g.server_timing['whisper'] = round(timer.elapsed_ms() - sum(g.server_timing.values()), 1)
+        if result[-1]['type'] == 'error':
+            return jsonify({'success': False, 'error': result[-1]['error']}), 500
         return jsonify({
             'success': True,
-            'text': transcription
+            'text': result[-1]['text']
         })
 
     except Exception as e:
@@ -227,12 +730,21 @@ def transcribe() -> Response:
             'error': f"Erreur inattendue: {str(e)}"
         }), 500
     finally:
-        if temp_file:
-            temp_file.close()
-            try:
-                os.unlink(temp_file.name)
-            except OSError:
-                pass
+        _close_uploads(audio, uploads)
+
+
+def _close_uploads(audio: Optional[BinaryIO], uploads: Optional[list[tuple[str, BinaryIO]]]) -> None:
+    """
+    Closes the uploaded recording and its segments, deleting those spooled to disk.
+
+    Args:
+        audio: Uploaded recording, if any
+        uploads: (file name, file object) of the files sent to Whisper, if any
+    """
+    if audio:
+        audio.close()
+    for _, file in uploads or ():
+        file.close()
 
 
 @bp.route('/api/config', methods=['GET'])
@@ -257,6 +769,21 @@ def get_config() -> Response:
         'custom_endpoint': custom_endpoint
     })
 
+@bp.route('/api/cache', methods=['GET', 'DELETE'])
+def manage_cache() -> Response:
+    """
+    Cache statistics.
+
+    Returns hit/miss counters and storage usage of the response cache,
+    with those of the transcription cache under 'transcriptions', or
+    empties both on DELETE.
+    """
+    if request.method == 'DELETE':
+        response_cache.clear()
+        transcription_cache.clear()
+        return jsonify({'success': True})
+    return jsonify({**response_cache.stats(), 'transcriptions': transcription_cache.stats()})
+
 @bp.errorhandler(500)
 def internal_server_error(error: Exception) -> tuple[str, int]:
     """
@@ -290,10 +817,13 @@ def set_config() -> Response:
     current_config = load_config()
     current_shortcut = current_config.get('shortcut', DEFAULT_SHORTCUT)
 
+    if (api_key != current_config.get('api_key')
+            or custom_endpoint != current_config.get('custom_endpoint')):
+        client_pool.invalidate()
+
     if not api_key:
         try:
-            if CONFIG_FILE.exists():
-                CONFIG_FILE.unlink()
+            config_writer.delete()
             restart_application()
             return jsonify({'success': True})
         except Exception as e:
@@ -420,9 +950,7 @@ def create_custom_mode(data: dict) -> Response:
     Validates input data, generates a unique mode ID, and saves
     the new custom mode to the configuration.
     """
-    try:
-        config = load_config()
-
+    def add_mode(config: dict) -> str:
         if 'modes' not in config:
             config['modes'] = {'system': MODES, 'custom': {}, 'order': []}
 
@@ -440,11 +968,11 @@ def create_custom_mode(data: dict) -> Response:
 
         config['modes']['custom'][mode_id] = new_mode
         config['modes']['order'].append(mode_id)
+        return mode_id
 
-        if save_config(modes=config['modes']):
-            return jsonify({'success': True, 'mode_id': mode_id})
-        else:
-            raise Exception("Failed to save the configuration")
+    try:
+        mode_id = update_config(add_mode)
+        return jsonify({'success': True, 'mode_id': mode_id})
 
     except Exception as e:
         return jsonify({
@@ -465,20 +993,18 @@ def update_modes_order(data: dict) -> Response:
         if not new_order:
             raise ValueError("New order not specified")
 
-        config = load_config()
-        modes = config.get('modes', {})
+        def reorder(config: dict) -> None:
+            modes = config.setdefault('modes', {})
 
-        all_modes = {**MODES, **modes.get('custom', {})}
-        missing_modes = [mode_id for mode_id in new_order if mode_id not in all_modes]
-        if missing_modes:
-            raise ValueError(f"Unknown modes: {', '.join(missing_modes)}")
+            all_modes = {**MODES, **modes.get('custom', {})}
+            missing_modes = [mode_id for mode_id in new_order if mode_id not in all_modes]
+            if missing_modes:
+                raise ValueError(f"Unknown modes: {', '.join(missing_modes)}")
 
-        modes['order'] = new_order
+            modes['order'] = new_order
 
-        if save_config(modes=modes):
-            return jsonify({'success': True})
-        else:
-            raise Exception("Error during save")
+        update_config(reorder)
+        return jsonify({'success': True})
 
     except ValueError as ve:
         return jsonify({
@@ -501,8 +1027,7 @@ def delete_mode(mode_id: str) -> Response:
     Removes a custom mode from the configuration and updates
     the mode order accordingly.
     """
-    try:
-        config = load_config()
+    def remove_mode(config: dict) -> None:
         modes = config.get('modes', {})
 
         if mode_id not in modes.get('custom', {}):
@@ -513,10 +1038,9 @@ def delete_mode(mode_id: str) -> Response:
         if 'order' in modes:
             modes['order'] = [m for m in modes['order'] if m != mode_id]
 
-        if save_config(modes=modes):
-            return jsonify({'success': True})
-        else:
-            raise Exception("Error during save")
+    try:
+        update_config(remove_mode)
+        return jsonify({'success': True})
 
     except Exception as e:
         return jsonify({
@@ -533,9 +1057,7 @@ def update_mode(mode_id: str) -> Response:
     Modifies the prompt of an existing custom mode and saves
     the changes to the configuration.
     """
-    try:
-        data = request.json
-        config = load_config()
+    def edit_mode(config: dict) -> None:
         modes = config.get('modes', {})
 
         if mode_id not in modes.get('custom', {}):
@@ -544,10 +1066,10 @@ def update_mode(mode_id: str) -> Response:
         if 'prompt' in data:
             modes['custom'][mode_id]['prompt'] = data['prompt']
 
-        if save_config(modes=modes):
-            return jsonify({'success': True})
-        else:
-            raise Exception("Error during save")
+    try:
+        data = request.json
+        update_config(edit_mode)
+        return jsonify({'success': True})
 
     except Exception as e:
         return jsonify({
@@ -0,0 +1,327 @@
+"""
+Speculative processing of the text captured from the clipboard.
+
+When the page places clipboard text captured by the shortcut in the input
+field, the answer for the mode the user most likely wants (the pinned mode,
+or the last one used) is generated in the background and buffered. Text the
+user declines to paste is never sent. A /process request for
+the same text, mode and model then replays the buffer and follows the rest
+of the generation instead of starting a new one, so the usual copy,
+shortcut, "Corriger" sequence shows its answer at once. A request for
+anything else cancels the speculation, which closes the provider stream.
+
+Speculation is opt-in: a discarded speculation costs a full generation.
+"""
+import logging
+import threading
+from typing import Any, Callable, Iterator, Mapping, Optional
+
+from .config import SPECULATION_DEFAULT_MODE
+
+logger = logging.getLogger(__name__)
+
+# Modes that need more input than the captured text
+_UNSPECULATED_MODES = ('repondre',)
+
+
+def speculation_settings(config: Mapping) -> dict:
+    """
+    Reads the speculation settings, filling in the defaults.
+
+    Args:
+        config: Application configuration
+
+    Returns:
+        dict: enabled and mode (the pinned mode, '' to follow the last used one)
+    """
+    settings = config.get('speculation') or {}
+    return {
+        'enabled': bool(settings.get('enabled', False)),
+        'mode': settings.get('mode') or '',
+    }
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalizes line breaks the way the input field does.
+
+    The clipboard holds CRLF line breaks on Windows, while the text area
+    hands LF line breaks to the page and the form encoding may turn them
+    back into CRLF.
+
+    Args:
+        text: Captured or submitted text
+
+    Returns:
+        str: Text with LF line breaks
+    """
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def _signature(params: Mapping) -> tuple:
+    """
+    Identifies the answer a /process request asks for.
+
+    Args:
+        params: Arguments from routes.parse_process_request
+
+    Returns:
+        tuple: Mode with its prompt, normalized text and every other argument
+    """
+    mode = params['mode_name']
+    return (mode, repr(params['all_modes'].get(mode)), normalize_text(params.get('input_text') or ''),
+            params.get('user_response'), params.get('model'), params.get('api_key'),
+            repr(params.get('long_text')), bool(params.get('edit_list')))
+
+
+class Speculation:
+    """
+    A generation running ahead of its request, buffered for replay.
+    """
+
+    def __init__(self, prepare: Callable[[], Optional[dict]],
+                 stream: Callable[[dict, dict], Iterator[str]]) -> None:
+        """
+        Initialize a speculation, without starting it.
+
+        Args:
+            prepare: Returns the arguments of routes.parse_process_request, or
+                None when the request would be rejected; called on the
+                background thread, since validating may load a tokenizer
+            stream: Returns the response stream for the arguments, filling the metadata it is given
+        """
+        self.signature: Optional[tuple] = None
+        self.metadata: dict[str, Any] = {}
+        self._prepare = prepare
+        self._stream = stream
+        self._chunks: list[str] = []
+        self._done = False
+        self._error: Optional[Exception] = None
+        self._prepared = threading.Event()
+        self._cancelled = threading.Event()
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='speculation', daemon=True)
+
+    def start(self) -> None:
+        """
+        Starts the generation on a background thread.
+        """
+        self._thread.start()
+
+    def cancel(self) -> None:
+        """
+        Stops the generation at its next chunk, closing the provider stream.
+        """
+        self._cancelled.set()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        """
+        Waits for the generation to finish or stop.
+
+        Args:
+            timeout: Longest wait in seconds, unbounded if None
+        """
+        if self._thread.is_alive():
+            self._thread.join(timeout)
+
+    def answers(self, params: Mapping) -> bool:
+        """
+        Tells whether the speculation answers a request, once it is prepared.
+
+        Args:
+            params: Arguments from routes.parse_process_request
+
+        Returns:
+            bool: True if the speculation processes the same text with the same mode and model
+        """
+        self._prepared.wait()
+        return self.signature is not None and self.signature == _signature(params)
+
+    @property
+    def done(self) -> bool:
+        """
+        bool: True once the generation has finished or stopped.
+        """
+        with self._condition:
+            return self._done
+
+    def _run(self) -> None:
+        stream = None
+        try:
+            params = self._prepare()
+            if params is None or self._cancelled.is_set():
+                return
+            self.signature = _signature(params)
+            self._prepared.set()
+            stream = self._stream(params, self.metadata)
+            for chunk in stream:
+                if self._cancelled.is_set():
+                    break
+                if chunk:
+                    with self._condition:
+                        self._chunks.append(chunk)
+                        self._condition.notify_all()
+        except Exception as e:
+            # Raised again to the request that claims the speculation
+            logger.debug(f"Traitement anticipé interrompu: {type(e).__name__}: {e}")
+            self._error = e
+        finally:
+            self._prepared.set()
+            if hasattr(stream, 'close'):
+                stream.close()
+            with self._condition:
+                self._done = True
+                self._condition.notify_all()
+
+    def follow(self, metadata: dict) -> Iterator[str]:
+        """
+        Replays the buffered chunks, then the rest of the generation as it arrives.
+
+        Closing the generator before the end cancels the speculation.
+
+        Args:
+            metadata: Dictionary receiving the response metadata, flagged as speculative
+
+        Yields:
+            str: Response chunks
+        """
+        index = 0
+        try:
+            while True:
+                with self._condition:
+                    while index == len(self._chunks) and not self._done:
+                        self._condition.wait()
+                    chunks = self._chunks[index:]
+                    index += len(chunks)
+                    done = self._done
+                yield from chunks
+                if done:
+                    break
+            if self._error is not None:
+                raise self._error
+            metadata.update(self.metadata)
+            metadata['speculative'] = True
+        finally:
+            self.cancel()
+
+
+class Speculator:
+    """
+    Holds the pending speculation and remembers the last mode used.
+
+    At most one speculation runs at a time: starting a new one, or
+    processing a request it does not answer, cancels it.
+    """
+
+    def __init__(self) -> None:
+        """
+        Initialize without speculation or last mode.
+        """
+        self._lock = threading.Lock()
+        self._pending: Optional[Speculation] = None
+        self.last_mode: Optional[str] = None
+        self._counters = {'started': 0, 'hits': 0, 'discarded': 0}
+
+    def likely_mode(self, config: Mapping) -> Optional[str]:
+        """
+        Picks the mode to speculate with.
+
+        Args:
+            config: Application configuration
+
+        Returns:
+            str | None: Pinned mode, else the last mode used, else the default
+                mode, or None when speculation is disabled
+        """
+        settings = speculation_settings(config)
+        if not settings['enabled']:
+            return None
+        mode = settings['mode'] or self.last_mode or SPECULATION_DEFAULT_MODE
+        return None if mode in _UNSPECULATED_MODES else mode
+
+    def start(self, prepare: Callable[[], Optional[dict]],
+              stream: Callable[[dict, dict], Iterator[str]]) -> Speculation:
+        """
+        Starts a speculation, cancelling the pending one.
+
+        Args:
+            prepare: Returns the arguments of the request to speculate on, or None to give up
+            stream: Returns the response stream for the arguments, filling the metadata it is given
+
+        Returns:
+            Speculation: The started speculation
+        """
+        speculation = Speculation(prepare, stream)
+        with self._lock:
+            previous, self._pending = self._pending, speculation
+            self._counters['started'] += 1
+            if previous is not None:
+                self._counters['discarded'] += 1
+        if previous is not None:
+            previous.cancel()
+        speculation.start()
+        return speculation
+
+    def claim(self, params: Mapping) -> Optional[Speculation]:
+        """
+        Hands the pending speculation to the request it answers.
+
+        Called for every /process request: it records the mode used, and a
+        speculation answering something else is cancelled.
+
+        Args:
+            params: Arguments from routes.parse_process_request
+
+        Returns:
+            Speculation | None: The speculation to follow, or None to process the request normally
+        """
+        with self._lock:
+            if params['mode_name'] not in _UNSPECULATED_MODES:
+                self.last_mode = params['mode_name']
+            speculation, self._pending = self._pending, None
+        if speculation is None:
+            return None
+        answers = speculation.answers(params)
+        with self._lock:
+            self._counters['hits' if answers else 'discarded'] += 1
+        if answers:
+            return speculation
+        speculation.cancel()
+        return None
+
+    def discard(self) -> None:
+        """
+        Cancels the pending speculation, if any.
+        """
+        with self._lock:
+            speculation, self._pending = self._pending, None
+            if speculation is not None:
+                self._counters['discarded'] += 1
+        if speculation is not None:
+            speculation.cancel()
+
+    def snapshot(self) -> dict[str, Any]:
+        """
+        Returns the speculation counters.
+
+        Returns:
+            dict[str, Any]: Whether a speculation is pending, the last mode
+                used, and the speculations started, used and discarded
+        """
+        with self._lock:
+            return {'pending': self._pending is not None, 'last_mode': self.last_mode, **self._counters}
+
+    def reset(self) -> None:
+        """
+        Cancels the pending speculation and clears the last mode and counters.
+        """
+        with self._lock:
+            speculation, self._pending = self._pending, None
+            self.last_mode = None
+            self._counters = {key: 0 for key in self._counters}
+        if speculation is not None:
+            speculation.cancel()
+            speculation.wait()
+
+
+speculator = Speculator()
@@ -35,6 +35,7 @@ if (typeof QWebChannel !== 'undefined' && typeof qt !== 'undefined' && qt.webCha
             ).then((result) => {
                 if (result.isConfirmed) {
                     document.getElementById('input_text').value = clipboardText;
+                    speculateOnInput(document.getElementById('input_text').value);
                 }
             });
         });
@@ -129,6 +130,103 @@ if (modeButtons.length > 0 && selectedModeInput) {
     });
 }
 
+/**
+ * Append streamed text to an element
+ * @param {HTMLElement} element - Element receiving the text
+ * @param {string} text - New text, line breaks are rendered as <br>
+ * @description Appends text nodes instead of re-assigning innerHTML so each chunk costs O(chunk)
+ */
+function appendStreamText(element, text) {
+    const lines = text.split('\n');
+    lines.forEach((line, index) => {
+        if (index > 0) element.appendChild(document.createElement('br'));
+        if (line) element.appendChild(document.createTextNode(line));
+    });
+}
+
+/**
+ * Replace the content of an element with streamed text
+ * @param {HTMLElement} element - Element receiving the text
+ * @param {string} text - Full text, line breaks are rendered as <br>
+ */
+function setStreamText(element, text) {
+    element.textContent = '';
+    appendStreamText(element, text);
+}
+
+/**
+ * Create a consumer for the /process Server-Sent Events stream
+ * @param {HTMLElement} element - Element receiving the text
+ * @param {Function} onEnd - Called once the end marker is received
+ * @param {Function} [onDone] - Called with the response metadata of the protocol 2 done event
+ *     (model, provider, fallback, usage, timing...), or an empty object when there is none
+ * @returns {Function} Function to feed with decoded response text
+ * @description Handles protocol 2 delta events and legacy protocol 1 full-buffer events
+ */
+function createStreamConsumer(element, onEnd, onDone) {
+    let pending = '';
+    let received = '';
+    let lastSeq = 0;
+    let ended = false;
+
+    function handleData(rawData) {
+        if (rawData === '[END]') {
+            ended = true;
+            onEnd();
+            return;
+        }
+
+        let payload;
+        try {
+            payload = JSON.parse(rawData);
+        } catch (e) {
+            setStreamText(element, rawData);
+            return;
+        }
+
+        if (typeof payload === 'string') {
+            setStreamText(element, payload);
+            return;
+        }
+
+        if (payload.seq !== lastSeq + 1) {
+            console.warn(`Événement de flux inattendu: ${payload.seq} après ${lastSeq}`);
+        }
+        lastSeq = payload.seq;
+
+        if (payload.type === 'delta') {
+            received += payload.delta;
+            appendStreamText(element, payload.delta);
+        } else if (payload.type === 'error') {
+            received += payload.message;
+            appendStreamText(element, payload.message);
+        } else if (payload.type === 'done') {
+            if (payload.text !== received) {
+                received = payload.text;
+                setStreamText(element, payload.text);
+            }
+            element.normalize();
+            if (onDone) onDone(payload.meta || {});
+        }
+    }
+
+    return function feed(text) {
+        if (ended) return;
+        pending += text;
+        const events = pending.split('\n\n');
+        pending = events.pop();
+
+        for (const event of events) {
+            for (const line of event.split('\n')) {
+                if (line.startsWith('data: ')) {
+                    handleData(line.slice(6));
+                    if (ended) return;
+                }
+            }
+        }
+    };
+}
+
 /**
  * Text processing system
  * @description Handles form submission, streaming responses, and result display
@@ -140,6 +238,218 @@ const resultText = document.getElementById('result-text');
 const copyButton = document.getElementById('copy-button');
 const inputText = document.getElementById('input_text');
 
+/**
+ * Request estimate
+ * @description Shows the estimated tokens, duration and cost of the current text before it is sent
+ */
+const estimateLine = document.getElementById('estimate');
+let estimateTimer = null;
+
+function updateEstimate() {
+    if (!estimateLine || !inputText) return;
+    clearTimeout(estimateTimer);
+    if (!inputText.value.trim()) {
+        estimateLine.textContent = '';
+        return;
+    }
+    estimateTimer = setTimeout(async () => {
+        const formData = new FormData();
+        formData.append('mode', selectedModeInput.value);
+        formData.append('input_text', inputText.value);
+        const responseText = document.getElementById('response_text');
+        if (selectedModeInput.value === 'repondre' && responseText) {
+            formData.append('user_response', responseText.value);
+        }
+        try {
+            const response = await fetch('/api/estimate', { method: 'POST', body: formData });
+            const estimate = await response.json();
+            if (!response.ok) {
+                estimateLine.textContent = '';
+                return;
+            }
+            const parts = [`~${estimate.input_tokens} jetons en entrée, ~${estimate.output_tokens} en sortie`];
+            if (estimate.seconds !== null) parts.push(`~${estimate.seconds} s`);
+            if (estimate.cost_usd !== null) parts.push(`~${estimate.cost_usd.toFixed(4)} $`);
+            if (!estimate.fits) {
+                parts.push(estimate.segmented ? 'traité en plusieurs parties' : 'trop long pour ce modèle');
+            }
+            estimateLine.textContent = parts.join(' · ');
+            estimateLine.classList.toggle('text-red-500', !estimate.fits && !estimate.segmented);
+        } catch (error) {
+            estimateLine.textContent = '';
+        }
+    }, 400);
+}
+
+if (inputText) inputText.addEventListener('input', updateEstimate);
+modeButtons.forEach(button => button.addEventListener('click', updateEstimate));
+updateEstimate();
+
+/**
+ * Live correction
+ * @description Checks the text while it is typed. Each pause sends the whole text with a new
+ * revision number; the server only re-checks the paragraphs that changed and answers with one
+ * suggestion per paragraph. Uses the /ws/live WebSocket when the server offers it, /api/live otherwise.
+ */
+const liveToggle = document.getElementById('live-toggle');
+const liveSuggestions = document.getElementById('live-suggestions');
+const liveSessionId = Math.random().toString(36).slice(2) + Date.now().toString(36);
+let liveRevision = 0;
+let liveTimer = null;
+let liveSocket = null;
+let liveSocketFailed = false;
+
+function showLiveMessage(message) {
+    if (message.revision !== liveRevision) return;
+    if (message.type === 'error') {
+        liveSuggestions.replaceChildren();
+        const item = document.createElement('li');
+        item.className = 'text-red-500';
+        item.textContent = message.error;
+        liveSuggestions.appendChild(item);
+        return;
+    }
+    if (message.type !== 'paragraph' || !message.changed) return;
+
+    const item = document.createElement('li');
+    item.className = 'p-2 rounded-lg bg-indigo-50 flex items-start justify-between gap-2';
+    item.dataset.index = message.index;
+    const suggestion = document.createElement('span');
+    suggestion.textContent = message.suggestion;
+    const apply = document.createElement('button');
+    apply.className = 'text-indigo-600 hover:underline shrink-0';
+    apply.textContent = 'Appliquer';
+    apply.addEventListener('click', () => {
+        const start = inputText.value.indexOf(message.original.trim());
+        if (start >= 0) {
+            inputText.value = inputText.value.slice(0, start) + message.suggestion
+                + inputText.value.slice(start + message.original.trim().length);
+            inputText.dispatchEvent(new Event('input'));
+        }
+        item.remove();
+    });
+    item.append(suggestion, apply);
+
+    const next = [...liveSuggestions.children].find(child => Number(child.dataset.index) > message.index);
+    liveSuggestions.insertBefore(item, next || null);
+}
+
+function openLiveSocket() {
+    if (liveSocket || liveSocketFailed || !('WebSocket' in window)) return liveSocket;
+    const scheme = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    liveSocket = new WebSocket(`${scheme}://${window.location.host}/ws/live`);
+    let opened = false;
+    liveSocket.addEventListener('open', () => {
+        opened = true;
+        sendLiveText();
+    });
+    liveSocket.addEventListener('message', event => showLiveMessage(JSON.parse(event.data)));
+    liveSocket.addEventListener('close', () => {
+        // Servers without WebSocket support refuse the connection: fall back to HTTP
+        liveSocketFailed = liveSocketFailed || !opened;
+        liveSocket = null;
+        if (!opened && liveToggle.checked) sendLiveText();
+    });
+    return liveSocket;
+}
+
+async function sendLiveText() {
+    const message = {
+        session_id: liveSessionId,
+        revision: ++liveRevision,
+        text: inputText.value,
+        mode: 'corriger',
+    };
+    liveSuggestions.replaceChildren();
+    const socket = openLiveSocket();
+    if (socket) {
+        if (socket.readyState === WebSocket.OPEN) socket.send(JSON.stringify(message));
+        return;
+    }
+    try {
+        const response = await fetch('/api/live', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify(message),
+        });
+        if (!response.ok) {
+            showLiveMessage({ type: 'error', revision: message.revision, error: (await response.json()).error });
+            return;
+        }
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop();
+            lines.filter(line => line.trim()).forEach(line => showLiveMessage(JSON.parse(line)));
+            if (message.revision !== liveRevision) {
+                reader.cancel();
+                break;
+            }
+        }
+    } catch (error) {
+        console.error('Live correction error:', error);
+    }
+}
+
+function scheduleLiveCheck() {
+    clearTimeout(liveTimer);
+    if (!liveToggle || !liveToggle.checked || !inputText.value.trim()) return;
+    liveTimer = setTimeout(sendLiveText, 800);
+}
+
+if (liveToggle && liveSuggestions && inputText) {
+    liveToggle.addEventListener('change', () => {
+        liveSuggestions.classList.toggle('hidden', !liveToggle.checked);
+        if (liveToggle.checked) {
+            scheduleLiveCheck();
+        } else {
+            clearTimeout(liveTimer);
+            liveRevision++;
+            liveSuggestions.replaceChildren();
+            if (liveSocket) liveSocket.close();
+        }
+    });
+    inputText.addEventListener('input', scheduleLiveCheck);
+}
+
+/**
+ * Process pasted clipboard text ahead of the choice of mode
+ * @param {string} text - Text just placed in the input field
+ * @description Lets the server start the answer for the likely mode, used by /process if that mode is chosen
+ */
+function speculateOnInput(text) {
+    const formData = new FormData();
+    formData.append('input_text', text);
+    navigator.sendBeacon('/process/speculate', formData);
+}
+
+/**
+ * Stream currently being generated
+ * @description Request id and abort controller of the running /process call
+ */
+let currentRequest = null;
+
+/**
+ * Stop the running generation
+ * @description Aborts the /process fetch and asks the server to stop the upstream generation
+ */
+function cancelCurrentRequest() {
+    if (!currentRequest) return;
+    const formData = new FormData();
+    formData.append('request_id', currentRequest.id);
+    navigator.sendBeacon('/process/cancel', formData);
+    currentRequest.controller.abort();
+    currentRequest = null;
+    if (submitBtn) submitBtn.disabled = false;
+}
+
+window.addEventListener('pagehide', cancelCurrentRequest);
+
 if (submitBtn) {
     submitBtn.addEventListener('click', async function (e) {
     e.preventDefault();
@@ -151,6 +461,15 @@ if (submitBtn) {
     const formData = new FormData();
     formData.append('mode', selectedModeInput.value);
     formData.append('input_text', inputText.value);
+    formData.append('protocol', '2');
+
+    cancelCurrentRequest();
+    const request = {
+        id: window.crypto && crypto.randomUUID ? crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`,
+        controller: new AbortController()
+    };
+    currentRequest = request;
+    formData.append('request_id', request.id);
 
     if (selectedModeInput.value === 'repondre') {
         const userResponse = document.getElementById('response_text').value;
@@ -160,7 +479,8 @@ if (submitBtn) {
     try {
         const response = await fetch('/process', {
             method: 'POST',
-            body: formData
+            body: formData,
+            signal: request.controller.signal
         });
 
         loading.classList.add('hidden');
@@ -168,36 +488,24 @@ if (submitBtn) {
 
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
-
-        while (true) {
+        let finished = false;
+        showFallbackNotice({});
+        const feed = createStreamConsumer(resultText, () => {
+            finished = true;
+            if (currentRequest === request) currentRequest = null;
+            submitBtn.disabled = false;
+            AOS.refresh();
+            document.getElementById('result-buttons').classList.remove('hidden');
+        }, showFallbackNotice);
+
+        while (!finished) {
             const {value, done} = await reader.read();
             if (done) break;
-
-            const chunk = decoder.decode(value);
-            const lines = chunk.split('\n');
-
-            for (const line of lines) {
-                if (line.startsWith('data: ')) {
-                    const rawData = line.slice(6);
-                    if (rawData === '[END]') {
-                        submitBtn.disabled = false;
-                        AOS.refresh();
-                        document.getElementById('result-buttons').classList.remove('hidden');
-                        return;
-                    }
-                    try {
-                        const jsonData = JSON.parse(rawData);
-                        const htmlContent = jsonData.replace(/\n/g, '<br>');
-                        resultText.innerHTML = htmlContent;
-
-                    } catch (e) {
-                        const htmlContent = rawData.replace(/\n/g, '<br>');
-                        resultText.innerHTML = htmlContent;
-                    }
-                }
-            }
+            feed(decoder.decode(value, {stream: true}));
         }
     } catch (error) {
+        if (error.name === 'AbortError') return;
+        if (currentRequest === request) currentRequest = null;
         if (loading) loading.classList.add('hidden');
         if (submitBtn) submitBtn.disabled = false;
         alert('Une erreur est survenue lors du traitement.');
@@ -205,13 +513,29 @@ if (submitBtn) {
 });
 }
 
+/**
+ * Show which model answered when the selected one was unavailable
+ * @param {Object} meta - Metadata of the final stream event
+ */
+function showFallbackNotice(meta) {
+    const notice = document.getElementById('result-notice');
+    if (!notice) return;
+    if (meta.fallback) {
+        notice.textContent = `${meta.fallback.requested} indisponible, réponse de ${meta.fallback.model}`;
+        notice.classList.remove('hidden');
+    } else {
+        notice.classList.add('hidden');
+    }
+}
+
 /**
  * Handle back button functionality
- * @description Restores input text from results and shows input area
+ * @description Stops the running generation, restores input text from results and shows input area
  */
 const backButton = document.getElementById('back-button');
 if (backButton) {
     backButton.addEventListener('click', function () {
+        cancelCurrentRequest();
         if (result) result.classList.add('hidden');
         const resultButtons = document.getElementById('result-buttons');
         if (resultButtons) resultButtons.classList.add('hidden');
@@ -223,11 +547,12 @@ if (backButton) {
 
 /**
  * Handle close result button functionality
- * @description Closes result view and returns to input area
+ * @description Stops the running generation, closes result view and returns to input area
  */
 const closeResultBtn = document.getElementById('close-result');
 if (closeResultBtn) {
     closeResultBtn.addEventListener('click', function () {
+        cancelCurrentRequest();
         if (result) result.classList.add('hidden');
         const resultButtons = document.getElementById('result-buttons');
         if (resultButtons) resultButtons.classList.add('hidden');
@@ -398,6 +723,7 @@ function handleAudioFile(input) {
 
         const formData = new FormData();
         formData.append('audio', file);
+        formData.append('stream', '1');
 
         Swal.fire({
             title: 'Transcription en cours',
@@ -410,39 +736,74 @@ function handleAudioFile(input) {
             }
         });
 
-        fetch('/transcribe', {
-            method: 'POST',
-            body: formData
-        })
-            .then(response => response.json())
-            .then(data => {
+        transcribeStream(formData)
+            .then(() => {
                 Swal.close();
-                if (data.success) {
-                    document.getElementById('input_text').value = data.text;
-                    showAlert(
-                        'Succès',
-                        'Transcription terminée !',
-                        'success'
-                    );
-                } else {
-                    showAlert(
-                        'Erreur',
-                        data.error || 'Erreur lors de la transcription',
-                        'error'
-                    );
-                }
+                showAlert(
+                    'Succès',
+                    'Transcription terminée !',
+                    'success'
+                );
             })
             .catch(error => {
                 Swal.close();
                 showAlert(
                     'Erreur',
-                    'Erreur lors de la transcription: ' + error,
+                    error.message || 'Erreur lors de la transcription',
                     'error'
                 );
             });
     }
 }
 
+/**
+ * Stream a transcription into the input box
+ * @param {FormData} formData - Form holding the audio file
+ * @returns {Promise<void>} Resolves when the full text is received
+ * @description Long recordings are transcribed in segments; the text of each segment is appended as soon as it is ready
+ */
+async function transcribeStream(formData) {
+    const response = await fetch('/transcribe', {
+        method: 'POST',
+        body: formData
+    });
+    if (!response.ok) {
+        const data = await response.json().catch(() => ({}));
+        throw new Error(data.error || 'Erreur lors de la transcription');
+    }
+
+    const inputBox = document.getElementById('input_text');
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let pending = '';
+    inputBox.value = '';
+
+    while (true) {
+        const {value, done} = await reader.read();
+        if (done) break;
+        pending += decoder.decode(value, {stream: true});
+        const lines = pending.split('\n');
+        pending = lines.pop();
+        for (const line of lines) {
+            if (!line.trim()) continue;
+            const message = JSON.parse(line);
+            if (message.type === 'segment') {
+                inputBox.value += message.text;
+                if (message.total > 1) {
+                    Swal.update({text: `Segment ${message.index + 1} sur ${message.total} transcrit...`});
+                    Swal.showLoading();
+                }
+            } else if (message.type === 'done') {
+                inputBox.value = message.text;
+                return;
+            } else if (message.type === 'error') {
+                throw new Error(message.error);
+            }
+        }
+    }
+    throw new Error('Transcription interrompue');
+}
+
 /**
  * Configuration deletion system
  * @description Handles configuration reset with confirmation dialog
@@ -192,3 +192,73 @@ function deleteConfiguration() {
         }
     });
 }
+
+/**
+ * Performance panel
+ * @description Shows the recent p50/p95 latencies from /api/metrics and the provider breakers from
+ * /api/providers, refreshed while the section is open
+ */
+function formatLatency(p50, p95) {
+    if (p50 === null || p50 === undefined) return '–';
+    const format = ms => ms >= 1000 ? `${(ms / 1000).toFixed(1)} s` : `${Math.round(ms)} ms`;
+    return `${format(p50)} / ${format(p95)}`;
+}
+
+function refreshMetrics() {
+    const panel = document.getElementById('metricsPanel');
+    if (!panel) return;
+    fetch('/api/metrics?format=json')
+        .then(response => response.json())
+        .then(summary => {
+            panel.querySelectorAll('[data-kind]').forEach(card => {
+                const stats = summary[card.dataset.kind];
+                const requests = card.querySelector('[data-metric="requests"]');
+                const ttft = card.querySelector('[data-metric="ttft"]');
+                const duration = card.querySelector('[data-metric="duration"]');
+                if (!stats) return;
+                requests.textContent = `${stats.requests} requête(s), ${stats.errors} erreur(s)`;
+                if (ttft) ttft.textContent = formatLatency(stats.ttft_p50_ms, stats.ttft_p95_ms);
+                duration.textContent = formatLatency(stats.duration_p50_ms, stats.duration_p95_ms);
+            });
+        })
+        .catch(error => console.error('Erreur lors du chargement des métriques:', error));
+}
+
+const BREAKER_STATES = {closed: 'disponible', open: 'indisponible', half_open: 'en test'};
+
+function refreshProviders() {
+    const panel = document.getElementById('providersPanel');
+    if (!panel) return;
+    fetch('/api/providers')
+        .then(response => response.json())
+        .then(health => {
+            const breakers = Object.entries(health.breakers).map(([key, breaker]) => {
+                const retry = breaker.state === 'open' ? ` (nouvel essai dans ${Math.ceil(breaker.retry_in)} s)` : '';
+                return `${key} : ${BREAKER_STATES[breaker.state] || breaker.state}${retry}`;
+            });
+            const fallbacks = health.fallbacks.map(f => `${f.model} → ${f.fallback} : ${f.count}`);
+            const limits = health.rate_limits.map(limit => {
+                const rate = limit.requests_per_minute ? `, ${limit.requests_per_minute} req/min` : '';
+                const blocked = limit.blocked_for ? `, pause ${Math.ceil(limit.blocked_for)} s` : '';
+                return `${limit.endpoint} : ${limit.in_flight} en cours, ${limit.waiting} en attente${rate}${blocked}`;
+            });
+            panel.querySelector('[data-providers="breakers"]').textContent = breakers.join(', ') || 'Aucun appel';
+            panel.querySelector('[data-providers="fallbacks"]').textContent =
+                fallbacks.length ? `Modèles de secours utilisés : ${fallbacks.join(', ')}` : '';
+            panel.querySelector('[data-providers="rate_limits"]').textContent =
+                limits.length ? `Débit : ${limits.join(', ')}` : '';
+        })
+        .catch(error => console.error('Erreur lors du chargement de l\'état des fournisseurs:', error));
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const section = document.getElementById('section-performance');
+    if (!section) return;
+    refreshMetrics();
+    refreshProviders();
+    setInterval(() => {
+        if (!section.classList.contains('active')) return;
+        refreshMetrics();
+        refreshProviders();
+    }, 5000);
+});
@@ -0,0 +1,156 @@
+"""
+Server-Sent Events framing for streamed responses.
+
+Protocol 2 sends only the new text of each chunk with a sequence number,
+then a final event carrying the full text and its SHA-256 checksum so the
+client can verify what it assembled. Protocol 1 is the legacy format that
+re-sends the whole accumulated buffer on every chunk.
+"""
+import hashlib
+import json
+from typing import Optional
+
+SSE_END = "data: [END]\n\n"
+
+
+def sse_event(data) -> str:
+    """
+    Formats a JSON payload as a Server-Sent Event.
+
+    Args:
+        data: JSON-serializable payload
+
+    Returns:
+        str: SSE frame
+    """
+    return f"data: {json.dumps(data)}\n\n"
+
+
+class DeltaStreamEncoder:
+    """
+    Encodes a text stream as protocol 2 delta events.
+
+    Each chunk is encoded once, so the total work stays linear in the
+    length of the answer.
+    """
+    version = 2
+
+    def __init__(self) -> None:
+        self.seq = 0
+        self.length = 0
+        self._parts: list[str] = []
+        self._checksum = hashlib.sha256()
+
+    def delta(self, text: str) -> str:
+        """
+        Encodes a new chunk of text.
+
+        Args:
+            text: Text received since the previous chunk
+
+        Returns:
+            str: SSE frame for the chunk
+        """
+        self.seq += 1
+        self.length += len(text)
+        self._parts.append(text)
+        self._checksum.update(text.encode('utf-8'))
+        return sse_event({'v': self.version, 'type': 'delta', 'seq': self.seq, 'delta': text})
+
+    def error(self, message: str) -> str:
+        """
+        Encodes an error that interrupted the stream.
+
+        Args:
+            message: Error message shown to the user
+
+        Returns:
+            str: SSE frame for the error
+        """
+        self.seq += 1
+        return sse_event({'v': self.version, 'type': 'error', 'seq': self.seq, 'message': message})
+
+    def done(self, meta: Optional[dict] = None) -> str:
+        """
+        Encodes the final event with the full text and its checksum.
+
+        Args:
+            meta: Response metadata (model, provider, cache, hedging...)
+
+        Returns:
+            str: SSE frame closing the stream
+        """
+        self.seq += 1
+        return sse_event({
+            'v': self.version,
+            'type': 'done',
+            'seq': self.seq,
+            'length': self.length,
+            'sha256': self._checksum.hexdigest(),
+            'text': ''.join(self._parts),
+            'meta': meta or {},
+        })
+
+
+class BufferStreamEncoder:
+    """
+    Encodes a text stream in the legacy protocol 1 format.
+
+    Every event carries the whole text accumulated so far.
+    """
+    version = 1
+
+    def __init__(self) -> None:
+        self._buffer = ""
+
+    def delta(self, text: str) -> str:
+        """
+        Encodes a new chunk of text.
+
+        Args:
+            text: Text received since the previous chunk
+
+        Returns:
+            str: SSE frame with the accumulated buffer
+        """
+        self._buffer += text
+        return sse_event(self._buffer)
+
+    def error(self, message: str) -> str:
+        """
+        Encodes an error that interrupted the stream.
+
+        Args:
+            message: Error message shown to the user
+
+        Returns:
+            str: SSE frame with the error message
+        """
+        return sse_event(message)
+
+    def done(self, meta: Optional[dict] = None) -> str:
+        """
+        Legacy streams have no final event besides the end marker.
+
+        Args:
+            meta: Ignored, the legacy format carries no metadata
+
+        Returns:
+            str: Empty string
+        """
+        return ""
+
+
+def create_stream_encoder(version: int):
+    """
+    Returns the encoder for a streaming protocol version.
+
+    Args:
+        version: Protocol version requested by the client
+
+    Returns:
+        DeltaStreamEncoder | BufferStreamEncoder: Encoder instance
+    """
+    if version == 1:
+        return BufferStreamEncoder()
+    return DeltaStreamEncoder()
@@ -0,0 +1,147 @@
+"""
+Local token estimation and request sizing.
+
+Requests are measured before anything is sent to a provider: an input
+that does not fit the model context window is rejected, or split by the
+caller for segmentable modes, and the output budget is sized from the
+input length and the mode instead of a fixed max_tokens.
+
+OpenAI texts are counted exactly with tiktoken when it is installed.
+Other providers have no offline tokenizer, so a characters-per-token
+ratio calibrated on French prose is used for them.
+"""
+import functools
+import importlib.util
+import logging
+import math
+from typing import Any, Mapping, Optional
+
+from .config import (
+    CUSTOM_CONTEXT_WINDOW,
+    CUSTOM_MAX_OUTPUT_TOKENS,
+    DEFAULT_OUTPUT_RATIO,
+    MODE_OUTPUT_RATIOS,
+    OUTPUT_TOKENS_FLOOR,
+    OUTPUT_TOKENS_MARGIN,
+    TOKEN_CHARS_PER_TOKEN,
+)
+
+logger = logging.getLogger(__name__)
+
+
+@functools.lru_cache(maxsize=1)
+def _openai_encoding() -> Any:
+    """
+    Loads the tokenizer of current OpenAI models.
+
+    Returns:
+        Any: tiktoken encoding, None if tiktoken is not installed or its data cannot be loaded
+    """
+    if importlib.util.find_spec('tiktoken') is None:
+        return None
+    try:
+        import tiktoken
+        return tiktoken.get_encoding('o200k_base')
+    except Exception as e:
+        logger.warning(f"Tokeniseur OpenAI indisponible: {str(e)}")
+        return None
+
+
+def estimate_tokens(text: Optional[str], provider: Optional[str] = None) -> int:
+    """
+    Estimates the number of tokens of a text.
+
+    Args:
+        text: Text to measure
+        provider: Provider whose tokenizer is approximated; about four
+            characters per token when None
+
+    Returns:
+        int: Token count, exact for OpenAI when tiktoken is available
+    """
+    if not text:
+        return 0
+    if provider == 'openai':
+        encoding = _openai_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / TOKEN_CHARS_PER_TOKEN.get(provider, 4.0))
+
+
+def model_limits(model_config: Mapping, custom_endpoint: Optional[Mapping] = None) -> tuple[Optional[int], Optional[int]]:
+    """
+    Returns the token limits of a model.
+
+    Custom endpoints may declare 'context_window' and 'max_output_tokens' in
+    the custom_endpoint configuration; the limits they leave out are unknown.
+
+    Args:
+        model_config: Entry of AVAILABLE_MODELS
+        custom_endpoint: Custom endpoint configuration
+
+    Returns:
+        tuple[int | None, int | None]: (context window, maximum output tokens), None when unknown
+    """
+    if model_config['provider'] == 'custom':
+        endpoint = custom_endpoint or {}
+        return endpoint.get('context_window') or None, endpoint.get('max_output_tokens') or None
+    return model_config['context_window'], model_config['max_output_tokens']
+
+
+def plan_request(model_config: Mapping, mode_name: str, prompt: Optional[str], system: Optional[str] = None,
+                 custom_endpoint: Optional[Mapping] = None) -> dict:
+    """
+    Sizes a request before it is sent.
+
+    The expected output is the user text length times the ratio of the
+    mode; the output budget adds a safety margin to it. Reasoning models
+    get no output cap since their thinking tokens count against it.
+    A request is refused only by a known limit: going over the limits
+    assumed for a custom endpoint that declares none is logged instead.
+
+    Args:
+        model_config: Entry of AVAILABLE_MODELS
+        mode_name: Name of the processing mode
+        prompt: User message
+        system: Fixed mode instructions
+        custom_endpoint: Custom endpoint configuration
+
+    Returns:
+        dict: 'input_tokens', expected 'output_tokens', 'max_tokens' to send
+            (None for no cap), 'context_window' (None when unknown), whether the request 'fits',
+            and the approximate 'cost_usd' and 'seconds', None when unknown
+    """
+    provider = model_config['provider']
+    text_tokens = estimate_tokens(prompt, provider)
+    input_tokens = text_tokens + estimate_tokens(system, provider)
+    context_window, max_output_tokens = model_limits(model_config, custom_endpoint)
+
+    output_tokens = math.ceil(text_tokens * MODE_OUTPUT_RATIOS.get(mode_name, DEFAULT_OUTPUT_RATIO))
+    fits = (max_output_tokens is None or output_tokens <= max_output_tokens) and \
+        (context_window is None or input_tokens + output_tokens <= context_window)
+    if fits and (output_tokens > (max_output_tokens or CUSTOM_MAX_OUTPUT_TOKENS)
+                 or input_tokens + output_tokens > (context_window or CUSTOM_CONTEXT_WINDOW)):
+        logger.warning(f"Requête d'environ {input_tokens} + {output_tokens} jetons envoyée sans connaître les "
+                       f"limites du point de terminaison personnalisé: déclarez 'context_window' et "
+                       f"'max_output_tokens' dans 'custom_endpoint'")
+    max_tokens = None
+    if not model_config.get('reasoning'):
+        budget = max(OUTPUT_TOKENS_FLOOR, math.ceil(output_tokens * OUTPUT_TOKENS_MARGIN))
+        caps = [budget]
+        if max_output_tokens is not None:
+            caps.append(max_output_tokens)
+        if context_window is not None:
+            caps.append(context_window - input_tokens)
+        max_tokens = max(1, min(caps))
+
+    price = model_config.get('price_per_million')
+    speed = model_config.get('output_tokens_per_second')
+    return {
+        'input_tokens': input_tokens,
+        'output_tokens': output_tokens,
+        'max_tokens': max_tokens,
+        'context_window': context_window,
+        'fits': fits,
+        'cost_usd': round((input_tokens * price['input'] + output_tokens * price['output']) / 1e6, 6) if price else None,
+        'seconds': round(output_tokens / speed, 1) if speed else None,
+    }
@@ -0,0 +1,363 @@
+"""
+Segmented transcription of long recordings.
+
+Whisper accepts files of at most 25 MB and transcribes each one in a
+single blocking call. Longer recordings are decoded to PCM WAV and cut
+into segments of a few minutes, at the quietest moment near each planned
+cut. Each segment overlaps its neighbours by a couple of seconds so that
+no word is lost at a cut. Segments are transcribed concurrently on a
+bounded pool. Their texts are joined in order, and the words repeated in
+the overlaps are dropped.
+
+Recordings are handled as file objects: small ones never leave memory,
+and only audio larger than UPLOAD_SPOOL_MAX_MB is spooled to disk.
+Compressed formats are piped through ffmpeg when it is installed. 16-bit
+WAV files are cut directly. Finished transcriptions are cached under a
+hash of the audio content, the model and the options.
+"""
+import hashlib
+import io
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import wave
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Generator, Mapping, Optional, Union
+
+from .cache import transcription_cache
+from .config import WHISPER_MAX_SIZE_MB, TRANSCRIPTION_SEGMENT_SECONDS, TRANSCRIPTION_OVERLAP_SECONDS, \
+    TRANSCRIPTION_SILENCE_SEARCH_SECONDS, TRANSCRIPTION_SILENCE_FRAME_MS, UPLOAD_SPOOL_MAX_MB
+
+_WORD = re.compile(r'\w+')
+_MAX_OVERLAP_WORDS = 40
+_DECODE_TIMEOUT_SECONDS = 600
+_DECODE_RATE = 16000
+_PIPE_CHUNK_BYTES = 64 * 1024
+_SPOOL_MAX_BYTES = UPLOAD_SPOOL_MAX_MB * 1024 * 1024
+
+
+def _open_wav(audio: Union[str, BinaryIO]) -> wave.Wave_read:
+    if not isinstance(audio, str):
+        audio.seek(0)
+    return wave.open(audio, 'rb')
+
+
+def _is_pcm16_wav(audio: BinaryIO) -> bool:
+    try:
+        with _open_wav(audio) as wav:
+            return wav.getsampwidth() == 2
+    except (wave.Error, EOFError, OSError):
+        return False
+
+
+def _feed(audio: BinaryIO, pipe: BinaryIO) -> None:
+    try:
+        shutil.copyfileobj(audio, pipe, _PIPE_CHUNK_BYTES)
+    except OSError:
+        # ffmpeg stopped reading: it failed or was killed, and its exit code tells why
+        pass
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+def decode_to_wav(audio: BinaryIO) -> Optional[BinaryIO]:
+    """
+    Returns a 16-bit PCM WAV version of a recording.
+
+    The recording is piped through ffmpeg, so nothing is written to disk
+    unless the decoded audio outgrows the spool limit. MP4 files whose
+    index follows the audio cannot be read from a pipe and fail to decode.
+
+    Args:
+        audio: Recording in any format accepted by Whisper
+
+    Returns:
+        BinaryIO | None: The recording itself if it is already 16-bit WAV,
+            a mono 16 kHz copy decoded by ffmpeg, or None without ffmpeg
+
+    Raises:
+        subprocess.CalledProcessError: When ffmpeg cannot decode the recording
+    """
+    if _is_pcm16_wav(audio):
+        return audio
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        return None
+
+    command = [ffmpeg, '-loglevel', 'error', '-i', 'pipe:0',
+               '-ac', '1', '-ar', str(_DECODE_RATE), '-f', 's16le', 'pipe:1']
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    audio.seek(0)
+    feeder = threading.Thread(target=_feed, args=(audio, process.stdin), name='ffmpeg-feed', daemon=True)
+    feeder.start()
+    watchdog = threading.Timer(_DECODE_TIMEOUT_SECONDS, process.kill)
+    watchdog.start()
+
+    decoded = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MAX_BYTES)
+    try:
+        with wave.open(decoded, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(_DECODE_RATE)
+            for chunk in iter(lambda: process.stdout.read(_PIPE_CHUNK_BYTES), b''):
+                wav.writeframesraw(chunk)
+    except BaseException:
+        decoded.close()
+        process.kill()
+        raise
+    finally:
+        watchdog.cancel()
+        process.stdout.close()
+        returncode = process.wait()
+        feeder.join()
+
+    if returncode:
+        decoded.close()
+        raise subprocess.CalledProcessError(returncode, command)
+    return decoded
+
+
+def _quietest_point(wav: wave.Wave_read, center: float, search: float, frame_ms: int) -> float:
+    """
+    Finds the least energetic frame around a planned cut.
+
+    Args:
+        wav: Open 16-bit WAV file
+        center: Planned cut in seconds
+        search: Seconds searched on each side of the planned cut
+        frame_ms: Length of the compared frames
+
+    Returns:
+        float: Middle of the quietest frame, in seconds
+    """
+    rate, channels = wav.getframerate(), wav.getnchannels()
+    start = max(0, int((center - search) * rate))
+    end = min(wav.getnframes(), int((center + search) * rate))
+    wav.setpos(start)
+    samples = array('h', wav.readframes(end - start))
+    if sys.byteorder == 'big':
+        samples.byteswap()
+
+    frame = max(1, rate * frame_ms // 1000)
+    # Every fourth sample of the first channel is enough to compare frame energies
+    step = channels * 4
+    best, best_energy = center, None
+    for offset in range(0, end - start - frame + 1, frame):
+        energy = sum(sample * sample for sample in samples[offset * channels:(offset + frame) * channels:step])
+        if best_energy is None or energy < best_energy:
+            best, best_energy = (start + offset + frame / 2) / rate, energy
+    return best
+
+
+def plan_segments(wav_file: Union[str, BinaryIO], segment_seconds: float = TRANSCRIPTION_SEGMENT_SECONDS,
+                  overlap_seconds: float = TRANSCRIPTION_OVERLAP_SECONDS,
+                  search_seconds: float = TRANSCRIPTION_SILENCE_SEARCH_SECONDS,
+                  frame_ms: int = TRANSCRIPTION_SILENCE_FRAME_MS) -> list[tuple[float, float]]:
+    """
+    Plans the segments of a recording.
+
+    Cuts are placed at the quietest moment within search_seconds of their
+    planned position, so that no segment is longer than segment_seconds.
+    The segment length is reduced when needed so that every segment,
+    overlaps included, stays under the Whisper size limit.
+
+    Args:
+        wav_file: 16-bit WAV recording, as a path or a file object
+        segment_seconds: Longest segment, overlaps excluded
+        overlap_seconds: Seconds shared with each neighbouring segment
+        search_seconds: Seconds searched for a silence on each side of a planned cut
+        frame_ms: Length of the frames compared when looking for a silence
+
+    Returns:
+        list[tuple[float, float]]: (start, end) of each segment in seconds, overlaps included
+    """
+    with _open_wav(wav_file) as wav:
+        rate = wav.getframerate()
+        duration = wav.getnframes() / rate
+        byte_rate = rate * wav.getnchannels() * wav.getsampwidth()
+        size_limit = WHISPER_MAX_SIZE_MB * 1024 * 1024 * 0.95 / byte_rate
+        longest = max(1.0, min(segment_seconds, size_limit - 2 * overlap_seconds))
+        search_seconds = min(search_seconds, longest / 4)
+        segment_seconds = longest - search_seconds
+
+        cuts = [0.0]
+        while duration - cuts[-1] > segment_seconds + search_seconds:
+            cuts.append(_quietest_point(wav, cuts[-1] + segment_seconds, search_seconds, frame_ms))
+        cuts.append(duration)
+
+    return [(max(0.0, start - overlap_seconds), min(duration, end + overlap_seconds))
+            for start, end in zip(cuts, cuts[1:])]
+
+
+def write_segments(wav_file: Union[str, BinaryIO], segments: list[tuple[float, float]]) -> list[tuple[str, BinaryIO]]:
+    """
+    Writes each planned segment to its own WAV file object.
+
+    Segments are kept in memory when the whole recording fits the spool
+    limit, and written to anonymous temporary files otherwise.
+
+    Args:
+        wav_file: 16-bit WAV recording, as a path or a file object
+        segments: (start, end) of each segment in seconds
+
+    Returns:
+        list[tuple[str, BinaryIO]]: (file name, file object) of each segment, in order
+    """
+    files = []
+    with _open_wav(wav_file) as wav:
+        params, rate = wav.getparams(), wav.getframerate()
+        in_memory = wav.getnframes() * wav.getnchannels() * wav.getsampwidth() <= _SPOOL_MAX_BYTES
+        for index, (start, end) in enumerate(segments):
+            wav.setpos(int(start * rate))
+            file = io.BytesIO() if in_memory else tempfile.TemporaryFile()
+            with wave.open(file, 'wb') as segment:
+                segment.setparams(params)
+                segment.writeframes(wav.readframes(int((end - start) * rate)))
+            files.append((f"segment-{index:03d}.wav", file))
+    return files
+
+
+def split_recording(audio: BinaryIO, filename: str,
+                    settings: Optional[Mapping] = None) -> Optional[list[tuple[str, BinaryIO]]]:
+    """
+    Prepares the files to send to Whisper for a recording.
+
+    Args:
+        audio: Uploaded recording
+        filename: Name sent to Whisper with the recording, its extension naming the format
+        settings: transcription section of the configuration
+
+    Returns:
+        list[tuple[str, BinaryIO]] | None: (file name, file object) of the
+            recording itself when one call is enough, of each segment
+            otherwise, or None when the recording is too large for Whisper
+            and cannot be decoded
+
+    Raises:
+        subprocess.CalledProcessError: When ffmpeg cannot decode a recording too large for one call
+    """
+    settings = settings or {}
+    audio.seek(0, os.SEEK_END)
+    fits = audio.tell() <= WHISPER_MAX_SIZE_MB * 1024 * 1024
+    try:
+        wav_file = decode_to_wav(audio)
+    except subprocess.CalledProcessError:
+        if fits:
+            return [(filename, audio)]
+        raise
+    if wav_file is None:
+        return [(filename, audio)] if fits else None
+
+    try:
+        segments = plan_segments(wav_file, settings.get('segment_seconds', TRANSCRIPTION_SEGMENT_SECONDS),
+                                 settings.get('overlap_seconds', TRANSCRIPTION_OVERLAP_SECONDS))
+        if len(segments) == 1 and fits:
+            return [(filename, audio)]
+        return write_segments(wav_file, segments)
+    finally:
+        if wav_file is not audio:
+            wav_file.close()
+
+
+def merge_overlap(previous: str, text: str) -> str:
+    """
+    Drops the leading words of a segment already at the end of the previous one.
+
+    Words are compared case-insensitively without punctuation. The first
+    words of the segment may be skipped as well, since a segment may start
+    in the middle of a word.
+
+    Args:
+        previous: Text transcribed so far
+        text: Transcription of the next segment
+
+    Returns:
+        str: The segment text without the repeated words
+    """
+    previous_words = [word.lower() for word in _WORD.findall(previous[-2000:])]
+    spans = list(_WORD.finditer(text[:2000]))
+    words = [match.group().lower() for match in spans]
+    for size in range(min(_MAX_OVERLAP_WORDS, len(previous_words), len(words)), 0, -1):
+        for skipped in range(0, 3 if size >= 2 else 1):
+            if previous_words[-size:] == words[skipped:skipped + size]:
+                return text[spans[skipped + size - 1].end():].lstrip(' ,.;:!?…-')
+    return text
+
+
+def transcription_key(audio: BinaryIO, model: str, options: Mapping) -> str:
+    """
+    Builds the cache key of a recording from its content.
+
+    The audio is hashed in chunks, so an upload spooled to disk is never
+    read into memory at once.
+
+    Args:
+        audio: Uploaded recording
+        model: Transcription model
+        options: Every option that changes the transcribed text
+
+    Returns:
+        str: Key for transcription_cache
+    """
+    audio.seek(0)
+    digest = hashlib.file_digest(audio, 'sha256').hexdigest()
+    audio.seek(0)
+    return transcription_cache.make_key(model, digest, json.dumps(options, sort_keys=True))
+
+
+def replay_transcription(text: str) -> Generator[dict, None, None]:
+    """
+    Yields a cached transcription as the messages of transcribe_segments.
+
+    Args:
+        text: Cached text
+
+    Yields:
+        dict: One segment holding the whole text, then {'type': 'done', 'text', 'segments', 'cached': True}
+    """
+    yield {'type': 'segment', 'index': 0, 'total': 1, 'text': text}
+    yield {'type': 'done', 'text': text, 'segments': 1, 'cached': True}
+
+
+def transcribe_segments(files: list, transcribe: Callable[[object], str], max_workers: int = 4,
+                        cache_key: Optional[str] = None) -> Generator[dict, None, None]:
+    """
+    Transcribes segment files concurrently and yields the text in order.
+
+    Args:
+        files: Segment files, in order
+        transcribe: Callable returning the transcription of one file
+        max_workers: Maximum number of segments transcribed at the same time
+        cache_key: Key from transcription_key under which the full text is cached once every segment succeeded
+
+    Yields:
+        dict: {'type': 'segment', 'index', 'total', 'text'} with the text added by
+            each segment, as soon as it and the previous ones are done, then
+            {'type': 'done', 'text', 'segments'}
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix='whisper')
+    try:
+        futures = [executor.submit(transcribe, file) for file in files]
+        full_text = ''
+        for index, future in enumerate(futures):
+            text = future.result().strip()
+            if full_text and text:
+                text = merge_overlap(full_text, text)
+                if text:
+                    text = ' ' + text
+            full_text += text
+            yield {'type': 'segment', 'index': index, 'total': len(files), 'text': text}
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    if cache_key:
+        transcription_cache.set(cache_key, full_text)
+    yield {'type': 'done', 'text': full_text, 'segments': len(files)}
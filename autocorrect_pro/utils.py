@@ -1,277 +1,665 @@
-import json
-import logging
-import socket
-import sys
-import os
-from rich.console import Console
-from .config import CONFIG_FILE, CONFIG_DIR, DEFAULT_CONFIG, CUSTOM_MODES_SCHEMA, \
-    MODES
-
-console = Console()
-
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-logger = logging.getLogger(__name__)
-
-
-def validate_audio_file(file_path: str) -> tuple[bool, str]:
-    """
-    Validates an audio file.
-
-    Args:
-        file_path: Path to the audio file
-
-    Returns:
-        tuple[bool, str]: (is_valid, error_message)
-    """
-    ALLOWED_EXTENSIONS = {'flac', 'm4a', 'mp3', 'mp4', 'mpeg', 'mpga', 'oga', 'ogg', 'wav', 'webm'}
-    MAX_SIZE_MB = 25
-
-    if not os.path.exists(file_path):
-        return False, "Fichier audio non trouvé."
-
-    extension = os.path.basename(file_path).lower().split('.')[-1]
-    if extension not in ALLOWED_EXTENSIONS:
-        return False, f"Format de fichier non supporté. Formats acceptés: {', '.join(ALLOWED_EXTENSIONS)}"
-
-    file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
-    if file_size_mb > MAX_SIZE_MB:
-        return False, f"Le fichier est trop volumineux. Taille maximale: {MAX_SIZE_MB}MB"
-
-    return True, ""
-
-def find_free_port() -> int:
-    """
-    Finds a free port on the system.
-
-    Returns:
-        int: Available port number
-    """
-    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-        s.bind(('', 0))
-        s.listen(1)
-        port = s.getsockname()[1]
-        return port
-
-def restart_application():
-    """
-    Restarts the application.
-
-    This function restarts the current application by replacing the
-    current process with a new instance using the same arguments.
-    """
-    console.print("[bold blue]Redémarrage de l'application pour appliquer les changements de raccourci...[/bold blue]")
-    python = sys.executable
-    os.execl(python, python, *sys.argv)
-
-def ensure_config_dir() -> None:
-    """
-    Ensures that the configuration directory exists.
-
-    Creates the configuration directory if it doesn't exist.
-    """
-    CONFIG_DIR.mkdir(parents=True, exist_ok=True)
-
-def load_config() -> dict[str, any]:
-    """
-    Loads configuration from the JSON file.
-
-    Returns:
-        dict[str, any]: Configuration dictionary with defaults applied
-    """
-    try:
-        if CONFIG_FILE.exists():
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                for key, value in DEFAULT_CONFIG.items():
-                    if key not in config:
-                        config[key] = value
-
-                if 'custom_endpoint' in config:
-                    if 'style' not in config['custom_endpoint']:
-                        config['custom_endpoint']['style'] = 'openai'
-
-                return config
-    except Exception as e:
-        logger.error(f"Erreur lors de la lecture de la configuration: {e}")
-    return DEFAULT_CONFIG.copy()
-
-def save_config(api_key: str | None = None, model: str | None = None, theme: str | None = None, last_version: int | None = None,
-                shortcut: str | None = None, modes: dict | None = None, custom_endpoint: dict | None = None) -> bool:
-    """
-    Saves configuration to the JSON file.
-
-    Args:
-        api_key: API key for authentication
-        model: AI model name
-        theme: UI theme name
-        last_version: Last version used
-        shortcut: Global shortcut key
-        modes: Dictionary of processing modes
-        custom_endpoint: Custom API endpoint configuration
-
-    Returns:
-        bool: True if save was successful, False otherwise
-    """
-    try:
-        config = load_config()
-        if api_key is not None:
-            config['api_key'] = api_key
-        if model is not None:
-            config['model'] = model
-        if theme is not None:
-            config['theme'] = theme
-        if last_version is not None:
-            config['last_version'] = last_version
-        if shortcut is not None:
-            config['shortcut'] = shortcut
-        if modes is not None:
-            config['modes'] = modes
-        if custom_endpoint is not None:
-            config['custom_endpoint'] = custom_endpoint
-
-        if 'custom_endpoint' not in config:
-            config['custom_endpoint'] = {'url': '', 'model_name': ''}
-
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
-        return True
-    except Exception as e:
-        logger.error(f"Erreur lors de la sauvegarde de la configuration: {e}")
-        return False
-
-def load_api_key() -> str | None:
-    """
-    Loads the API key from the configuration file.
-
-    Returns:
-        str | None: API key if found, None otherwise
-    """
-    try:
-        if CONFIG_FILE.exists():
-            with open(CONFIG_FILE, 'r') as f:
-                config = json.load(f)
-                return config.get('api_key')
-    except Exception as e:
-        logger.error(f"Erreur lors de la lecture de la clé API: {e}")
-        console.print(f"[bold red]Erreur lors de la lecture de la clé API: {e}[/bold red]")
-    return None
-
-def save_api_key(api_key: str) -> bool:
-    """
-    Saves the API key to the configuration file.
-
-    Args:
-        api_key: API key to save
-
-    Returns:
-        bool: True if save was successful, False otherwise
-    """
-    try:
-        ensure_config_dir()
-        config = load_config()
-        config['api_key'] = api_key
-        with open(CONFIG_FILE, 'w') as f:
-            json.dump(config, f, indent=2)
-        return True
-    except Exception as e:
-        logger.error(f"Erreur lors de la sauvegarde de la clé API: {e}")
-        console.print(f"[bold red]Erreur lors de la sauvegarde de la clé API: {e}[/bold red]")
-        return False
-
-def load_modes() -> dict[str, any]:
-    """
-    Loads modes from the configuration.
-
-    Returns:
-        dict[str, any]: Dictionary containing system and custom modes
-    """
-    config = load_config()
-    if 'modes' not in config:
-        config['modes'] = {
-            'system': MODES,
-            'custom': {},
-            'order': list(MODES.keys())
-        }
-        save_config(modes=config['modes'])
-    else:
-        if 'system' not in config['modes']:
-            config['modes']['system'] = MODES
-        else:
-            for mode_id, mode_data in MODES.items():
-                if mode_id not in config['modes']['system']:
-                    config['modes']['system'][mode_id] = mode_data
-
-        if 'custom' not in config['modes']:
-            config['modes']['custom'] = {}
-
-        if 'order' not in config['modes']:
-            all_modes = {**config['modes']['system'], **config['modes']['custom']}
-            config['modes']['order'] = list(all_modes.keys())
-
-    return config['modes']
-
-def save_custom_mode(mode_data: dict) -> bool:
-    """
-    Saves a new custom mode.
-
-    Args:
-        mode_data: Dictionary containing mode information
-
-    Returns:
-        bool: True if save was successful, False otherwise
-    """
-    config = load_config()
-    if 'modes' not in config:
-        config['modes'] = CUSTOM_MODES_SCHEMA['modes']
-
-    mode_id = f"custom_{len(config['modes']['custom']) + 1}"
-    config['modes']['custom'][mode_id] = {
-        'title': mode_data['title'],
-        'icon': mode_data['icon'],
-        'prompt': mode_data['prompt'],
-        'order': len(config['modes']['order']) + 1,
-        'page': (len(config['modes']['order']) // 3) + 1,
-        'system': False
-    }
-
-    config['modes']['order'].append(mode_id)
-    return save_config(modes=config['modes'])
-
-def get_custom_endpoint() -> dict[str, str]:
-    """
-    Retrieves the custom endpoint configuration.
-
-    Returns:
-        dict[str, str]: Custom endpoint configuration with url, model_name, and style
-    """
-    config = load_config()
-    endpoint = config.get('custom_endpoint', {'url': '', 'model_name': ''})
-    if 'style' not in endpoint:
-        endpoint['style'] = 'openai'
-    return endpoint
-
-def save_custom_endpoint(url: str, model_name: str, style: str = 'openai') -> bool:
-    """
-    Saves the custom endpoint configuration.
-
-    Args:
-        url: Custom API endpoint URL
-        model_name: Model name for custom endpoint
-        style: Endpoint style ('openai' or 'anthropic')
-
-    Returns:
-        bool: True if save was successful, False otherwise
-    """
-    try:
-        config = load_config()
-        config['custom_endpoint'] = {
-            'url': url.strip(),
-            'model_name': model_name.strip(),
-            'style': style.strip()
-        }
-        return save_config(custom_endpoint=config['custom_endpoint'])
-    except Exception as e:
-        logger.error(f"Erreur lors de la sauvegarde de l'endpoint personnalisé: {e}")
-        console.print(f"[bold red]Erreur lors de la sauvegarde de l'endpoint personnalisé: {e}[/bold red]")
-        return False
+import atexit
+import copy
+import json
+import logging
+import socket
+import sys
+import os
+import tempfile
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, BinaryIO, Callable, Mapping, Optional, TypeVar
+from .config import CONFIG_FILE, CONFIG_DIR, DEFAULT_CONFIG, CUSTOM_MODES_SCHEMA, \
+    MODES, CONFIG_RELOAD_CHECK_SECONDS, CONFIG_WRITE_DELAY_SECONDS, WHISPER_MAX_SIZE_MB
+
+T = TypeVar('T')
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def get_console():
+    """
+    Returns the shared rich console, created on first use to keep rich out of startup.
+
+    Returns:
+        rich.console.Console: Console for colored terminal output
+    """
+    console = globals().get('console')
+    if console is None:
+        from rich.console import Console
+        console = globals()['console'] = Console()
+    return console
+
+def __getattr__(name: str) -> Any:
+    if name == 'console':
+        return get_console()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def validate_audio_file(file_path: str, max_size_mb: float = WHISPER_MAX_SIZE_MB) -> tuple[bool, str]:
+    """
+    Validates an audio file.
+
+    Args:
+        file_path: Path to the audio file
+        max_size_mb: Largest accepted size, the Whisper upload limit by default
+
+    Returns:
+        tuple[bool, str]: (is_valid, error_message)
+    """
+    ALLOWED_EXTENSIONS = {'flac', 'm4a', 'mp3', 'mp4', 'mpeg', 'mpga', 'oga', 'ogg', 'wav', 'webm'}
+    MAX_SIZE_MB = max_size_mb
+
+    if not os.path.exists(file_path):
+        return False, "Fichier audio non trouvé."
+
+    extension = os.path.basename(file_path).lower().split('.')[-1]
+    if extension not in ALLOWED_EXTENSIONS:
+        return False, f"Format de fichier non supporté. Formats acceptés: {', '.join(ALLOWED_EXTENSIONS)}"
+
+    file_size_mb = os.path.getsize(file_path) / (1024 * 1024)
+    if file_size_mb > MAX_SIZE_MB:
+        return False, f"Le fichier est trop volumineux. Taille maximale: {MAX_SIZE_MB}MB"
+
+    return True, ""
+
+def sniff_audio_format(header: bytes) -> Optional[str]:
+    """
+    Identifies an audio format from the first bytes of a file.
+
+    Args:
+        header: At least the first 12 bytes of the file
+
+    Returns:
+        str | None: Extension of the format as Whisper expects it, or None if unknown
+    """
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'wav'
+    if header[:4] == b'fLaC':
+        return 'flac'
+    if header[:4] == b'OggS':
+        return 'ogg'
+    if header[:4] == b'\x1aE\xdf\xa3':
+        return 'webm'
+    if header[4:8] == b'ftyp':
+        return 'm4a' if header[8:11] == b'M4A' else 'mp4'
+    if header[:4] == b'\x00\x00\x01\xba':
+        return 'mpeg'
+    # ID3 tag, or an MPEG audio frame sync with a layer set (ADTS AAC has none)
+    if header[:3] == b'ID3' or (len(header) > 1 and header[0] == 0xFF
+                                and header[1] & 0xE0 == 0xE0 and header[1] & 0x06):
+        return 'mp3'
+    return None
+
+def validate_audio_stream(stream: BinaryIO, max_size_mb: float = WHISPER_MAX_SIZE_MB) -> tuple[Optional[str], str]:
+    """
+    Validates an uploaded audio file without writing it to disk.
+
+    The format is read from the first bytes rather than the file name.
+
+    Args:
+        stream: Seekable upload stream
+        max_size_mb: Largest accepted size, the Whisper upload limit by default
+
+    Returns:
+        tuple[str | None, str]: (audio_format, error_message), the format being None when invalid
+    """
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    header = stream.read(12)
+    stream.seek(0)
+
+    if not header:
+        return None, "Le fichier audio est vide."
+
+    audio_format = sniff_audio_format(header)
+    if audio_format is None:
+        return None, ("Format de fichier non supporté. Formats acceptés: "
+                      "flac, m4a, mp3, mp4, mpeg, ogg, wav, webm")
+
+    if size > max_size_mb * 1024 * 1024:
+        return None, f"Le fichier est trop volumineux. Taille maximale: {max_size_mb}MB"
+
+    return audio_format, ""
+
+def find_free_port() -> int:
+    """
+    Finds a free port on the system.
+
+    Returns:
+        int: Available port number
+    """
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('', 0))
+        s.listen(1)
+        port = s.getsockname()[1]
+        return port
+
+def restart_application():
+    """
+    Restarts the application.
+
+    This function restarts the current application by replacing the
+    current process with a new instance using the same arguments.
+    """
+    get_console().print("[bold blue]Redémarrage de l'application pour appliquer les changements de raccourci...[/bold blue]")
+    config_writer.flush()
+    python = sys.executable
+    os.execl(python, python, *sys.argv)
+
+def ensure_config_dir() -> None:
+    """
+    Ensures that the configuration directory exists.
+
+    Creates the configuration directory if it doesn't exist.
+    """
+    CONFIG_DIR.mkdir(parents=True, exist_ok=True)
+
+def _read_config_file() -> dict[str, any]:
+    """
+    Reads and parses the JSON configuration file.
+
+    Returns:
+        dict[str, any]: Configuration dictionary with defaults applied
+    """
+    try:
+        if CONFIG_FILE.exists():
+            with open(CONFIG_FILE, 'r') as f:
+                config = json.load(f)
+                for key, value in DEFAULT_CONFIG.items():
+                    if key not in config:
+                        config[key] = value
+
+                if 'custom_endpoint' in config:
+                    if 'style' not in config['custom_endpoint']:
+                        config['custom_endpoint']['style'] = 'openai'
+
+                return config
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture de la configuration: {e}")
+    return DEFAULT_CONFIG.copy()
+
+def _config_file_signature() -> tuple | None:
+    """
+    Identifies the current version of the configuration file.
+
+    Returns:
+        tuple | None: Modification time and size, None if the file is missing
+    """
+    try:
+        stat = CONFIG_FILE.stat()
+        return stat.st_mtime_ns, stat.st_size
+    except OSError:
+        return None
+
+def _freeze(value: Any) -> Any:
+    """
+    Recursively converts dictionaries and lists to read-only equivalents.
+
+    Args:
+        value: Parsed JSON value
+
+    Returns:
+        Any: Read-only mappings and tuples in place of dictionaries and lists
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+def _thaw(value: Any) -> Any:
+    """
+    Recursively converts a frozen value back to plain dictionaries and lists.
+
+    Args:
+        value: Value returned by _freeze
+
+    Returns:
+        Any: Mutable copy of the value
+    """
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+class ConfigStore:
+    """
+    Process-wide cache of the parsed configuration file.
+
+    The file is parsed once and served as an immutable snapshot. It is
+    parsed again only when its modification time or size changes, which
+    is checked at most once per check_interval, or after our own writes.
+    """
+
+    def __init__(self, check_interval: float = CONFIG_RELOAD_CHECK_SECONDS) -> None:
+        """
+        Initialize the configuration store.
+
+        Args:
+            check_interval: Minimum number of seconds between two checks of the file
+        """
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot: Mapping | None = None
+        self._signature: tuple | None = None
+        self._checked_at = 0.0
+
+    def snapshot(self) -> Mapping[str, Any]:
+        """
+        Returns the current configuration.
+
+        Returns:
+            Mapping[str, Any]: Read-only configuration with defaults applied
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._snapshot is not None and now - self._checked_at < self.check_interval:
+                return self._snapshot
+            signature = _config_file_signature()
+            if self._snapshot is None or signature is None or signature != self._signature:
+                self._snapshot = _freeze(_read_config_file())
+                self._signature = signature
+            self._checked_at = now
+            return self._snapshot
+
+    def publish(self, config: dict[str, any]) -> None:
+        """
+        Replaces the snapshot with a configuration that is not written yet.
+
+        Args:
+            config: New configuration
+        """
+        snapshot = _freeze(config)
+        with self._lock:
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+
+    def record_write(self, config: dict[str, any]) -> None:
+        """
+        Records the file written by this process so it is not parsed again.
+
+        The signature and the snapshot are replaced together, so a read
+        cannot parse the written file over a newer change in between.
+
+        Args:
+            config: Latest configuration, possibly newer than the written one
+        """
+        snapshot = _freeze(config)
+        with self._lock:
+            self._signature = _config_file_signature()
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+
+    def invalidate(self) -> None:
+        """
+        Forces the next read to parse the configuration file again.
+        """
+        with self._lock:
+            self._snapshot = None
+
+
+config_store = ConfigStore()
+
+def config_snapshot() -> Mapping[str, Any]:
+    """
+    Returns the shared read-only configuration.
+
+    Meant for the request hot path: no disk access happens while the
+    configuration file is unchanged.
+
+    Returns:
+        Mapping[str, Any]: Read-only configuration with defaults applied
+    """
+    return config_store.snapshot()
+
+def load_config() -> dict[str, any]:
+    """
+    Loads the configuration.
+
+    Returns:
+        dict[str, any]: Mutable copy of the configuration, with defaults applied
+    """
+    return _thaw(config_store.snapshot())
+
+def _write_config_file(config: dict[str, any]) -> None:
+    """
+    Atomically replaces the configuration file.
+
+    The configuration is written to a temporary file in the same directory,
+    flushed to disk and renamed over the old file, so a crash never leaves
+    a truncated file behind.
+
+    Args:
+        config: Configuration to write
+    """
+    CONFIG_FILE.parent.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=CONFIG_FILE.parent, prefix=f".{CONFIG_FILE.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(config, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, CONFIG_FILE)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+    if os.name == 'posix':
+        dir_fd = os.open(CONFIG_FILE.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+class ConfigWriter:
+    """
+    Single writer of the configuration file.
+
+    Mutations are applied one at a time under a lock and published to the
+    configuration store at once. The file itself is written shortly after
+    by a background timer, so a burst of changes results in one write.
+    """
+
+    def __init__(self, delay: float = CONFIG_WRITE_DELAY_SECONDS) -> None:
+        """
+        Initialize the configuration writer.
+
+        Args:
+            delay: Seconds between the first pending change and the write
+        """
+        self.delay = delay
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._pending: dict[str, any] | None = None
+        self._version = 0
+        self._written_version = 0
+        self._timer: threading.Timer | None = None
+
+    def update(self, mutator: Callable[[dict[str, any]], T]) -> T:
+        """
+        Applies a change to the configuration.
+
+        Args:
+            mutator: Function modifying the configuration dictionary in place;
+                an exception leaves the configuration unchanged
+
+        Returns:
+            T: Value returned by the mutator
+        """
+        with self._lock:
+            config = load_config()
+            result = mutator(config)
+            self._pending = config
+            self._version += 1
+            config_store.publish(config)
+            self._schedule()
+        return result
+
+    def _schedule(self) -> None:
+        """
+        Starts the write timer unless one is already running; called with the lock held.
+        """
+        if self._timer is None:
+            self._timer = threading.Timer(self.delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self) -> bool:
+        """
+        Writes the pending changes to disk.
+
+        The changes stay pending until the file is replaced: a failed write
+        is logged and tried again after the delay.
+
+        Returns:
+            bool: True if there was nothing to write or the write succeeded
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            config, version = self._pending, self._version
+        if config is None:
+            return True
+
+        with self._write_lock:
+            if version <= self._written_version:
+                return True
+            try:
+                _write_config_file(config)
+            except Exception as e:
+                logger.error(f"Erreur lors de la sauvegarde de la configuration: {e}")
+                with self._lock:
+                    if self._pending is not None:
+                        self._schedule()
+                return False
+            self._written_version = version
+            with self._lock:
+                config_store.record_write(self._pending)
+                # A change made during the write stays pending
+                if self._version == version:
+                    self._pending = None
+        return True
+
+    def delete(self) -> None:
+        """
+        Drops pending changes and deletes the configuration file.
+        """
+        # Same lock order as flush: the write lock first
+        with self._write_lock, self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._pending = None
+            self._written_version = self._version
+            if CONFIG_FILE.exists():
+                CONFIG_FILE.unlink()
+            config_store.invalidate()
+
+
+config_writer = ConfigWriter()
+atexit.register(config_writer.flush)
+
+def update_config(mutator: Callable[[dict[str, any]], T]) -> T:
+    """
+    Applies a change to the configuration without waiting for the disk write.
+
+    Concurrent changes are serialized, so no update is lost.
+
+    Args:
+        mutator: Function modifying the configuration dictionary in place
+
+    Returns:
+        T: Value returned by the mutator
+    """
+    return config_writer.update(mutator)
+
+def save_config(api_key: str | None = None, model: str | None = None, theme: str | None = None, last_version: int | None = None,
+                shortcut: str | None = None, modes: dict | None = None, custom_endpoint: dict | None = None) -> bool:
+    """
+    Saves configuration to the JSON file.
+
+    The change is visible to readers immediately; the file is written in
+    the background by the configuration writer.
+
+    Args:
+        api_key: API key for authentication
+        model: AI model name
+        theme: UI theme name
+        last_version: Last version used
+        shortcut: Global shortcut key
+        modes: Dictionary of processing modes
+        custom_endpoint: Custom API endpoint configuration
+
+    Returns:
+        bool: True if save was successful, False otherwise
+    """
+    fields = {
+        'api_key': api_key,
+        'model': model,
+        'theme': theme,
+        'last_version': last_version,
+        'shortcut': shortcut,
+        'modes': modes,
+        'custom_endpoint': custom_endpoint,
+    }
+
+    def apply(config: dict[str, any]) -> None:
+        for key, value in fields.items():
+            if value is not None:
+                config[key] = value
+
+        if 'custom_endpoint' not in config:
+            config['custom_endpoint'] = {'url': '', 'model_name': ''}
+
+    try:
+        update_config(apply)
+        return True
+    except Exception as e:
+        logger.error(f"Erreur lors de la sauvegarde de la configuration: {e}")
+        return False
+
+def load_api_key() -> str | None:
+    """
+    Loads the API key from the configuration file.
+
+    Returns:
+        str | None: API key if found, None otherwise
+    """
+    try:
+        if CONFIG_FILE.exists():
+            with open(CONFIG_FILE, 'r') as f:
+                config = json.load(f)
+                return config.get('api_key')
+    except Exception as e:
+        logger.error(f"Erreur lors de la lecture de la clé API: {e}")
+        get_console().print(f"[bold red]Erreur lors de la lecture de la clé API: {e}[/bold red]")
+    return None
+
+def save_api_key(api_key: str) -> bool:
+    """
+    Saves the API key to the configuration file.
+
+    Args:
+        api_key: API key to save
+
+    Returns:
+        bool: True if save was successful, False otherwise
+    """
+    try:
+        update_config(lambda config: config.update(api_key=api_key))
+        return True
+    except Exception as e:
+        logger.error(f"Erreur lors de la sauvegarde de la clé API: {e}")
+        get_console().print(f"[bold red]Erreur lors de la sauvegarde de la clé API: {e}[/bold red]")
+        return False
+
+def load_modes() -> dict[str, any]:
+    """
+    Loads modes from the configuration.
+
+    Returns:
+        dict[str, any]: Dictionary containing system and custom modes
+    """
+    config = load_config()
+    if 'modes' not in config:
+        config['modes'] = {
+            'system': MODES,
+            'custom': {},
+            'order': list(MODES.keys())
+        }
+        save_config(modes=config['modes'])
+    else:
+        if 'system' not in config['modes']:
+            config['modes']['system'] = MODES
+        else:
+            for mode_id, mode_data in MODES.items():
+                if mode_id not in config['modes']['system']:
+                    config['modes']['system'][mode_id] = mode_data
+
+        if 'custom' not in config['modes']:
+            config['modes']['custom'] = {}
+
+        if 'order' not in config['modes']:
+            all_modes = {**config['modes']['system'], **config['modes']['custom']}
+            config['modes']['order'] = list(all_modes.keys())
+
+    return config['modes']
+
+def save_custom_mode(mode_data: dict) -> bool:
+    """
+    Saves a new custom mode.
+
+    Args:
+        mode_data: Dictionary containing mode information
+
+    Returns:
+        bool: True if save was successful, False otherwise
+    """
+    def add_mode(config: dict[str, any]) -> None:
+        if 'modes' not in config:
+            config['modes'] = copy.deepcopy(CUSTOM_MODES_SCHEMA['modes'])
+
+        mode_id = f"custom_{len(config['modes']['custom']) + 1}"
+        config['modes']['custom'][mode_id] = {
+            'title': mode_data['title'],
+            'icon': mode_data['icon'],
+            'prompt': mode_data['prompt'],
+            'order': len(config['modes']['order']) + 1,
+            'page': (len(config['modes']['order']) // 3) + 1,
+            'system': False
+        }
+        config['modes']['order'].append(mode_id)
+
+    try:
+        update_config(add_mode)
+        return True
+    except Exception as e:
+        logger.error(f"Erreur lors de la sauvegarde du mode personnalisé: {e}")
+        return False
+
+def get_custom_endpoint() -> dict[str, str]:
+    """
+    Retrieves the custom endpoint configuration.
+
+    Returns:
+        dict[str, str]: Custom endpoint configuration with url, model_name, and style
+    """
+    config = load_config()
+    endpoint = config.get('custom_endpoint', {'url': '', 'model_name': ''})
+    if 'style' not in endpoint:
+        endpoint['style'] = 'openai'
+    return endpoint
+
+def save_custom_endpoint(url: str, model_name: str, style: str = 'openai') -> bool:
+    """
+    Saves the custom endpoint configuration.
+
+    Args:
+        url: Custom API endpoint URL
+        model_name: Model name for custom endpoint
+        style: Endpoint style ('openai' or 'anthropic')
+
+    Returns:
+        bool: True if save was successful, False otherwise
+    """
+    try:
+        config = load_config()
+        config['custom_endpoint'] = {
+            'url': url.strip(),
+            'model_name': model_name.strip(),
+            'style': style.strip()
+        }
+        return save_config(custom_endpoint=config['custom_endpoint'])
+    except Exception as e:
+        logger.error(f"Erreur lors de la sauvegarde de l'endpoint personnalisé: {e}")
+        get_console().print(f"[bold red]Erreur lors de la sauvegarde de l'endpoint personnalisé: {e}[/bold red]")
+        return False
@@ -0,0 +1,6 @@
+"""
+Performance benchmarks for AI AutoCorrect.
+
+Run modules with `python -m benchmarks.<name>`; they are not part of the
+test suite.
+"""
@@ -0,0 +1,156 @@
+"""
+Concurrency benchmark: waitress (threads=6) versus the ASGI serving path.
+
+A fake provider streams a fixed number of chunks with a delay between
+them, standing in for network-bound generations. Both servers run in
+this process and receive the same burst of concurrent /process requests.
+
+Usage:
+    python -m benchmarks.concurrency --streams 50 --chunks 20 --delay 0.05
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+from autocorrect_pro import create_app
+from autocorrect_pro.config import MODES
+from autocorrect_pro.utils import find_free_port
+
+BENCH_CONFIG = {
+    'api_key': 'benchmark',
+    'model': 'gemini-1.5-flash',
+    'response_cache': {'enabled': False},
+}
+BENCH_MODES = {'system': MODES, 'custom': {}, 'order': list(MODES)}
+
+
+def _fake_provider(chunks: int, delay: float):
+    def stream(*args, **kwargs):
+        for i in range(chunks):
+            time.sleep(delay)
+            yield f"token{i} "
+
+    async def astream(*args, **kwargs):
+        for i in range(chunks):
+            await asyncio.sleep(delay)
+            yield f"token{i} "
+
+    return stream, astream
+
+
+def _wait_for_port(port: int, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/cache')
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def _one_stream(port: int, index: int) -> tuple[float, float]:
+    """Runs one /process request and returns (time to first event, total time)."""
+    body = urlencode({'mode': 'corriger', 'input_text': f'texte {index}'})
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    connection.request('POST', '/process', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    first = None
+    while True:
+        line = response.readline()
+        if not line:
+            break
+        if first is None and line.startswith(b'data: '):
+            first = time.perf_counter() - start
+        if line.startswith(b'data: [END]'):
+            break
+    connection.close()
+    return first or 0.0, time.perf_counter() - start
+
+
+def _run_burst(port: int, streams: int) -> dict:
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=streams) as executor:
+        results = list(executor.map(lambda i: _one_stream(port, i), range(streams)))
+    wall = time.perf_counter() - start
+    ttft = sorted(r[0] for r in results)
+    return {
+        'wall_seconds': round(wall, 3),
+        'ttft_p50': round(statistics.median(ttft), 3),
+        'ttft_p95': round(ttft[int(0.95 * (len(ttft) - 1))], 3),
+        'streams_per_second': round(streams / wall, 2),
+    }
+
+
+def run(streams: int, chunks: int, delay: float) -> dict:
+    """
+    Runs the benchmark against both serving paths.
+
+    Args:
+        streams: Number of concurrent /process requests
+        chunks: Chunks produced by the fake provider per stream
+        delay: Seconds between two chunks
+
+    Returns:
+        dict: Results by serving path
+    """
+    from waitress import serve
+    from autocorrect_pro.asgi import AsgiApp, asgi_available
+
+    stream, astream = _fake_provider(chunks, delay)
+    results = {}
+    with patch('autocorrect_pro.routes.config_snapshot', return_value=BENCH_CONFIG), \
+            patch('autocorrect_pro.routes.load_modes', return_value=BENCH_MODES), \
+            patch('autocorrect_pro.models.config_snapshot', return_value=BENCH_CONFIG), \
+            patch('autocorrect_pro.models._stream_provider', side_effect=stream), \
+            patch('autocorrect_pro.models._astream_provider', side_effect=astream):
+        app = create_app()
+
+        waitress_port = find_free_port()
+        threading.Thread(target=serve, args=(app,), daemon=True,
+                         kwargs={'host': '127.0.0.1', 'port': waitress_port, 'threads': 6}).start()
+        _wait_for_port(waitress_port)
+        results['waitress'] = _run_burst(waitress_port, streams)
+
+        if asgi_available():
+            import uvicorn
+            asgi_port = find_free_port()
+            threading.Thread(target=uvicorn.run, args=(AsgiApp(app),), daemon=True,
+                             kwargs={'host': '127.0.0.1', 'port': asgi_port, 'log_level': 'warning'}).start()
+            _wait_for_port(asgi_port)
+            results['asgi'] = _run_burst(asgi_port, streams)
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--streams', type=int, default=50, help="concurrent /process requests")
+    parser.add_argument('--chunks', type=int, default=20, help="chunks per stream")
+    parser.add_argument('--delay', type=float, default=0.05, help="seconds between chunks")
+    args = parser.parse_args()
+
+    results = run(args.streams, args.chunks, args.delay)
+    print(f"{args.streams} streams x {args.chunks} chunks, {args.delay}s between chunks "
+          f"(ideal stream duration {args.chunks * args.delay:.2f}s)")
+    print(f"{'server':<10}{'wall (s)':>10}{'TTFT p50':>10}{'TTFT p95':>10}{'streams/s':>11}")
+    for name, result in results.items():
+        print(f"{name:<10}{result['wall_seconds']:>10}{result['ttft_p50']:>10}"
+              f"{result['ttft_p95']:>10}{result['streams_per_second']:>11}")
+    if 'asgi' not in results:
+        print("uvicorn n'est pas installé : chemin ASGI ignoré (pip install .[asgi])")
+    print(json.dumps(results))
+
+
+if __name__ == '__main__':
+    main()
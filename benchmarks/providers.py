@@ -0,0 +1,385 @@
+"""
+End-to-end streaming benchmark against local provider stubs.
+
+The application runs in a child process with a throwaway configuration
+directory and is served as in the desktop app (waitress, or uvicorn with
+--server asgi), so the measure covers everything between the HTTP client
+and the provider SDK: load_config/load_modes, prompt building, the SDK
+client, SSE framing and the server. Providers are replaced by
+benchmarks.stub_provider, reached through the custom endpoint URL for the
+OpenAI and Anthropic styles and through the SDK api_endpoint for Gemini.
+
+For each provider the benchmark reports:
+    ttft               time to the first delta seen by the client
+    request_overhead   client request to stub request, i.e. work before the provider call
+    ttft_overhead      stub first chunk to client first delta
+    chunk_overhead_ms  time added by the application to every following chunk
+    streams_per_second and chunks_per_second under --streams concurrent requests
+    memory_per_stream_kib  growth of the server memory during that burst, per stream (Linux)
+
+Results are saved as JSON with the commit they were measured on:
+
+    python -m benchmarks.providers --streams 20 --output bench-before.json
+    python -m benchmarks.providers --streams 20 --output bench-after.json --compare bench-before.json
+"""
+import argparse
+import datetime
+import http.client
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from urllib.parse import urlencode
+
+from autocorrect_pro.config import CURRENT_VERSION
+from autocorrect_pro.utils import find_free_port
+
+from .stub_provider import DEFAULT_PROFILE, StubServer
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# Model and custom endpoint style used for each stubbed provider
+PROVIDERS = {
+    'openai': {'model': 'custom', 'style': 'openai', 'path': '/v1'},
+    'anthropic': {'model': 'custom', 'style': 'anthropic', 'path': ''},
+    'gemini': {'model': 'gemini-1.5-flash'},
+}
+
+# Child process serving the application; the Gemini SDK is pointed at the
+# stub since the app has no custom endpoint for it
+_SERVER_CODE = """
+import sys
+from autocorrect_pro import create_app, models
+
+port, server, gemini_endpoint = int(sys.argv[1]), sys.argv[2], sys.argv[3]
+if gemini_endpoint:
+    create_client = models._create_client
+
+    def _create_client(provider, api_key, base_url=None):
+        if provider == 'google':
+            genai = models._sdk('genai')
+            genai.configure(api_key=api_key, transport='rest', client_options={'api_endpoint': gemini_endpoint})
+            return genai.GenerativeModel('gemini-2.5-flash')
+        return create_client(provider, api_key, base_url)
+
+    models._create_client = _create_client
+
+app = create_app()
+if server == 'asgi':
+    from autocorrect_pro.asgi import run_asgi
+    run_asgi(app, port)
+else:
+    from waitress import serve
+    serve(app, host='127.0.0.1', port=port, threads=6, channel_request_lookahead=1)
+"""
+
+_markers = itertools.count()
+
+
+def _start_app(home: Path, stub_url: str, provider: str, server: str) -> tuple[subprocess.Popen, int]:
+    """
+    Starts the application in a child process configured for one stubbed provider.
+
+    Args:
+        home: Home directory of the child, holding its configuration
+        stub_url: Base URL of the stub server
+        provider: Key of PROVIDERS
+        server: 'waitress' or 'asgi'
+
+    Returns:
+        tuple[subprocess.Popen, int]: Child process and its port
+    """
+    settings = PROVIDERS[provider]
+    config = {
+        'api_key': 'benchmark',
+        'model': settings['model'],
+        'last_version': CURRENT_VERSION,
+        'response_cache': {'enabled': False},
+    }
+    if 'style' in settings:
+        config['custom_endpoint'] = {'url': stub_url + settings['path'], 'model_name': 'stub',
+                                     'style': settings['style']}
+    config_dir = home / '.config'
+    config_dir.mkdir(parents=True, exist_ok=True)
+    (config_dir / 'gemini.json').write_text(json.dumps(config))
+
+    port = find_free_port()
+    env = {**os.environ, 'HOME': str(home), 'PYTHONPATH': str(PROJECT_ROOT)}
+    process = subprocess.Popen(
+        [sys.executable, '-c', _SERVER_CODE, str(port), server, stub_url if provider == 'gemini' else ''],
+        cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/cache')
+            connection.getresponse().read()
+            return process, port
+        except OSError:
+            if process.poll() is not None:
+                break
+            time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f"L'application n'a pas démarré pour {provider}")
+
+
+def _rss_kib(pid: int) -> Optional[int]:
+    """
+    Reads the resident memory of a process.
+
+    Args:
+        pid: Process identifier
+
+    Returns:
+        Optional[int]: Resident set size in KiB, None where /proc is not available
+    """
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+def _one_stream(port: int) -> dict:
+    """
+    Runs one /process request and times its events.
+
+    Returns:
+        dict: Benchmark marker, start, first and last delta times, number of deltas and error
+    """
+    marker = f"bench-{next(_markers)}"
+    body = urlencode({'mode': 'corriger', 'input_text': f"Texte {marker} a corriger, sans faute ou presque."})
+    start = time.perf_counter()
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=600)
+    connection.request('POST', '/process', body, {'Content-Type': 'application/x-www-form-urlencoded'})
+    response = connection.getresponse()
+    first = last = None
+    deltas = 0
+    error = None if response.status == 200 else response.read().decode('utf-8', 'replace')
+    while error is None:
+        line = response.readline()
+        if not line or line.startswith(b'data: [END]'):
+            break
+        if not line.startswith(b'data: '):
+            continue
+        event = json.loads(line[6:])
+        if event['type'] == 'delta':
+            last = time.perf_counter()
+            first = first or last
+            deltas += 1
+        elif event['type'] == 'error':
+            error = event['message']
+        elif event['type'] == 'done':
+            error = event['meta'].get('error')
+    connection.close()
+    return {'marker': marker, 'start': start, 'first': first, 'last': last, 'deltas': deltas, 'error': error}
+
+
+def _percentile(values: list[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[int(fraction * (len(values) - 1))]
+
+
+def _latency(streams: list[dict], timings: dict) -> dict:
+    """
+    Splits the latency of streams between the application and the stub.
+
+    Args:
+        streams: Results of _one_stream
+        timings: Stub timings by marker
+
+    Returns:
+        dict: Percentiles in milliseconds
+    """
+    ttft, request_overhead, ttft_overhead, chunk_overhead = [], [], [], []
+    for stream in streams:
+        stub = timings.get(stream['marker'])
+        if stream['first'] is None or not stub or stub['first_chunk'] is None:
+            continue
+        ttft.append(stream['first'] - stream['start'])
+        request_overhead.append(stub['received'] - stream['start'])
+        ttft_overhead.append(stream['first'] - stub['first_chunk'])
+        if stub['chunks'] > 1:
+            app_span = stream['last'] - stream['first']
+            stub_span = stub['last_chunk'] - stub['first_chunk']
+            chunk_overhead.append((app_span - stub_span) / (stub['chunks'] - 1))
+
+    def ms(values: list[float], fraction: float) -> Optional[float]:
+        value = _percentile(values, fraction)
+        return None if value is None else round(value * 1000, 2)
+
+    return {
+        'ttft_p50_ms': ms(ttft, 0.5),
+        'ttft_p95_ms': ms(ttft, 0.95),
+        'request_overhead_p50_ms': ms(request_overhead, 0.5),
+        'ttft_overhead_p50_ms': ms(ttft_overhead, 0.5),
+        'chunk_overhead_ms': ms(chunk_overhead, 0.5),
+    }
+
+
+def _burst(port: int, pid: int, streams: int) -> tuple[list[dict], dict]:
+    """
+    Runs concurrent /process requests while sampling the server memory.
+
+    Returns:
+        tuple[list[dict], dict]: Stream results and throughput figures
+    """
+    baseline = _rss_kib(pid)
+    peak = baseline
+    sampling = threading.Event()
+
+    def sample() -> None:
+        nonlocal peak
+        while not sampling.wait(0.02):
+            rss = _rss_kib(pid)
+            if rss is not None:
+                peak = max(peak, rss)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=streams) as executor:
+        results = list(executor.map(lambda _: _one_stream(port), range(streams)))
+    wall = time.perf_counter() - start
+    sampling.set()
+    sampler.join()
+
+    return results, {
+        'streams': streams,
+        'wall_seconds': round(wall, 3),
+        'streams_per_second': round(streams / wall, 2),
+        'chunks_per_second': round(sum(r['deltas'] for r in results) / wall, 1),
+        'errors': sum(1 for r in results if r['error'] or r['first'] is None),
+        'memory_per_stream_kib': round((peak - baseline) / streams, 1) if baseline is not None else None,
+    }
+
+
+def run(providers: list[str], streams: int, samples: int, profile: dict, server: str = 'waitress') -> dict:
+    """
+    Benchmarks the application against the stub of each provider.
+
+    Args:
+        providers: Keys of PROVIDERS to benchmark
+        streams: Number of concurrent requests of the throughput burst
+        samples: Number of sequential requests measuring latency
+        profile: Pacing of the stub answers, see stub_provider.DEFAULT_PROFILE
+        server: 'waitress' or 'asgi'
+
+    Returns:
+        dict: Results by provider
+    """
+    stub = StubServer(profile=profile).start()
+    results = {}
+    try:
+        for provider in providers:
+            with tempfile.TemporaryDirectory() as home:
+                process, port = _start_app(Path(home), stub.url, provider, server)
+                try:
+                    _one_stream(port)  # warm up the SDK client and templates
+                    sequential = [_one_stream(port) for _ in range(samples)]
+                    errors = [r['error'] for r in sequential if r['error']]
+                    if errors:
+                        results[provider] = {'error': errors[0]}
+                        continue
+                    concurrent, throughput = _burst(port, process.pid, streams)
+                    results[provider] = {
+                        **_latency(sequential, stub.timings),
+                        'loaded': {key: value for key, value in _latency(concurrent, stub.timings).items()
+                                   if key.startswith('ttft')},
+                        **throughput,
+                    }
+                finally:
+                    process.terminate()
+                    process.wait(10)
+    finally:
+        stub.shutdown()
+        stub.server_close()
+    return results
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _print_comparison(report: dict, baseline: dict) -> None:
+    print(f"\nversus {baseline.get('commit')} ({baseline.get('date')})")
+    print(f"{'provider':<11}{'metric':<26}{'before':>10}{'after':>10}{'change':>9}")
+    for provider, result in report['results'].items():
+        before = baseline.get('results', {}).get(provider, {})
+        for metric, value in result.items():
+            old = before.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or metric == 'streams':
+                continue
+            change = f"{(value - old) / old * 100:+.0f}%" if old else ''
+            print(f"{provider:<11}{metric:<26}{old:>10}{value:>10}{change:>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--providers', nargs='+', choices=list(PROVIDERS), default=list(PROVIDERS),
+                        help="providers to stub")
+    parser.add_argument('--server', choices=('waitress', 'asgi'), default='waitress', help="serving path")
+    parser.add_argument('--streams', type=int, default=20, help="concurrent requests of the throughput burst")
+    parser.add_argument('--samples', type=int, default=10, help="sequential requests measuring latency")
+    parser.add_argument('--ttft', type=float, default=DEFAULT_PROFILE['ttft'], help="stub seconds to first chunk")
+    parser.add_argument('--rate', type=float, default=DEFAULT_PROFILE['tokens_per_second'],
+                        help="stub tokens per second")
+    parser.add_argument('--tokens', type=int, default=DEFAULT_PROFILE['tokens'], help="tokens per answer")
+    parser.add_argument('--chunk', type=int, default=DEFAULT_PROFILE['tokens_per_chunk'], help="tokens per chunk")
+    parser.add_argument('--jitter', type=float, default=DEFAULT_PROFILE['jitter'],
+                        help="relative random variation of every stub delay")
+    parser.add_argument('--output', type=Path, help="JSON file receiving the results")
+    parser.add_argument('--compare', type=Path, help="earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    profile = {'ttft': args.ttft, 'tokens_per_second': args.rate, 'tokens': args.tokens,
+               'tokens_per_chunk': args.chunk, 'jitter': args.jitter}
+    report = {
+        'commit': _commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'server': args.server,
+        'profile': profile,
+        'samples': args.samples,
+        'results': run(args.providers, args.streams, args.samples, profile, args.server),
+    }
+
+    print(f"{args.server}, stub: TTFT {args.ttft}s, {args.rate} tokens/s, {args.tokens} tokens "
+          f"by {args.chunk}, jitter ±{args.jitter:.0%}")
+    print(f"{'provider':<11}{'TTFT p50':>10}{'req ovh':>9}{'TTFT ovh':>10}{'chunk ovh':>11}"
+          f"{'streams/s':>11}{'chunks/s':>10}{'KiB/stream':>12}")
+    for provider, result in report['results'].items():
+        if 'error' in result:
+            print(f"{provider:<11}{result['error']}")
+            continue
+        print(f"{provider:<11}{result['ttft_p50_ms']:>10}{result['request_overhead_p50_ms']:>9}"
+              f"{result['ttft_overhead_p50_ms']:>10}{str(result['chunk_overhead_ms']):>11}"
+              f"{result['streams_per_second']:>11}{result['chunks_per_second']:>10}"
+              f"{str(result['memory_per_stream_kib']):>12}")
+    if args.compare:
+        _print_comparison(report, json.loads(args.compare.read_text()))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report))
+
+
+if __name__ == '__main__':
+    main()
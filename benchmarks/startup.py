@@ -0,0 +1,76 @@
+"""
+Cold start benchmark: time to import the package and build the Flask app.
+
+Each run starts a fresh interpreter with -X importtime, so nothing is
+cached in memory, and reports the wall time of the statement together
+with the packages that take longest to import.
+
+Usage:
+    python -m benchmarks.startup --runs 5 --top 15
+    python -m benchmarks.startup --statement "import autocorrect_pro.main"
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+DEFAULT_STATEMENT = "from autocorrect_pro import create_app; create_app()"
+
+
+def measure(statement: str = DEFAULT_STATEMENT) -> tuple[float, list[tuple[str, int, int]]]:
+    """
+    Runs a statement in a fresh interpreter.
+
+    Args:
+        statement: Python code to time
+
+    Returns:
+        tuple[float, list[tuple[str, int, int]]]: Wall time in seconds, and
+            (module, self µs, cumulative µs) of every import
+    """
+    code = (
+        "import time; _start = time.perf_counter()\n"
+        f"{statement}\n"
+        "print(time.perf_counter() - _start)"
+    )
+    completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', code],
+                               capture_output=True, text=True, check=True)
+    imports = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        imports.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return float(completed.stdout.strip().splitlines()[-1]), imports
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--statement', default=DEFAULT_STATEMENT, help="code to time")
+    parser.add_argument('--runs', type=int, default=5, help="fresh interpreters to start")
+    parser.add_argument('--top', type=int, default=15, help="slowest packages to list")
+    args = parser.parse_args()
+
+    timings = []
+    imports = []
+    for _ in range(args.runs):
+        wall, imports = measure(args.statement)
+        timings.append(wall)
+
+    print(f"{args.statement}")
+    print(f"cold start over {args.runs} runs: median {statistics.median(timings):.3f}s, "
+          f"min {min(timings):.3f}s, max {max(timings):.3f}s")
+    by_package = {}
+    for name, _, cumulative_us in imports:
+        package = name.strip().split('.')[0]
+        by_package[package] = max(by_package.get(package, 0), cumulative_us)
+    print(f"{'package':<40}{'cumulative (ms)':>16}")
+    for package, cumulative_us in sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]:
+        print(f"{package:<40}{cumulative_us / 1000:>16.1f}")
+    print(json.dumps({'median_seconds': round(statistics.median(timings), 3),
+                      'modules': len(imports)}))
+
+
+if __name__ == '__main__':
+    main()
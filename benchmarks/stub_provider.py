@@ -0,0 +1,264 @@
+"""
+Local stub of the OpenAI, Anthropic and Gemini streaming APIs.
+
+Every generation request is answered with a synthetic text streamed in
+the wire format of the provider, at a configurable pace: time to first
+token, token rate, tokens per chunk and random jitter on every delay.
+The application reaches it through the custom endpoint URL (OpenAI and
+Anthropic styles) or the Gemini SDK api_endpoint, so the provider SDKs
+parse real HTTP streams.
+
+    POST /v1/chat/completions                          OpenAI, SSE
+    POST /v1/messages                                  Anthropic, SSE
+    POST /v1beta/models/<model>:streamGenerateContent  Gemini, JSON array (SSE with alt=sse)
+
+The timing of every response is recorded, keyed by the first
+"bench-<id>" marker found in the request, so a benchmark can tell the
+time spent in the stub from the time spent in the application.
+
+Usage:
+    python -m benchmarks.stub_provider --port 8765 --ttft 0.3 --rate 80 --tokens 200 --jitter 0.2
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, Optional
+
+DEFAULT_PROFILE = {
+    'ttft': 0.2,
+    'tokens_per_second': 100.0,
+    'tokens': 100,
+    'tokens_per_chunk': 1,
+    'jitter': 0.0,
+}
+
+_WORDS = ("Le", "texte", "corrigé", "arrive", "ici", "mot", "après", "mot,", "sans", "faute.")
+_MARKER = re.compile(rb'bench-[\w-]+')
+
+
+def _chunks(profile: dict, rng: random.Random) -> Iterator[tuple[float, str]]:
+    """
+    Yields the delay before each chunk and its text.
+
+    Args:
+        profile: Pacing of the answer, see DEFAULT_PROFILE
+        rng: Random generator used for the jitter
+
+    Yields:
+        tuple[float, str]: (seconds to wait, chunk text)
+    """
+    def jittered(delay: float) -> float:
+        return max(0.0, delay * (1 + rng.uniform(-profile['jitter'], profile['jitter'])))
+
+    per_chunk = max(1, profile['tokens_per_chunk'])
+    delay = per_chunk / profile['tokens_per_second']
+    for start in range(0, profile['tokens'], per_chunk):
+        words = (_WORDS[i % len(_WORDS)] for i in range(start, min(start + per_chunk, profile['tokens'])))
+        yield jittered(profile['ttft'] if start == 0 else delay), ''.join(f"{word} " for word in words)
+
+
+def _sse(data: dict, event: Optional[str] = None) -> bytes:
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """
+    Request handler speaking the streaming APIs of the three providers.
+    """
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        received = time.perf_counter()
+        path, _, query = self.path.partition('?')
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            request = {}
+
+        if path.endswith('/chat/completions'):
+            frames = self._openai(request)
+        elif path.endswith('/messages'):
+            frames = self._anthropic(request)
+        elif path.endswith(':streamGenerateContent'):
+            frames = self._gemini(path, 'alt=sse' in query)
+        else:
+            self.send_error(404)
+            return
+
+        marker = _MARKER.search(body)
+        self.server.record(marker.group().decode() if marker else None, received, frames)
+
+    def _stream(self, content_type: str, frames: Iterator[tuple[float, bytes]]) -> Iterator[float]:
+        """
+        Sends a chunked response, waiting the given delay before each frame.
+
+        Yields:
+            float: Time each content frame was sent
+        """
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for delay, data in frames:
+            if delay:
+                time.sleep(delay)
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+            self.wfile.flush()
+            if delay is not None:
+                yield time.perf_counter()
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _openai(self, request: dict) -> Iterator[float]:
+        model = request.get('model', 'stub')
+        base = {'id': 'chatcmpl-stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model}
+
+        def frames():
+            yield None, _sse({**base, 'choices': [{'index': 0, 'delta': {'role': 'assistant', 'content': ''},
+                                                    'finish_reason': None}]})
+            count = 0
+            for delay, text in _chunks(self.server.profile, self.server.rng):
+                count += 1
+                yield delay, _sse({**base, 'choices': [{'index': 0, 'delta': {'content': text},
+                                                        'finish_reason': None}]})
+            yield None, _sse({**base, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]})
+            if (request.get('stream_options') or {}).get('include_usage'):
+                yield None, _sse({**base, 'choices': [], 'usage': {
+                    'prompt_tokens': 0, 'completion_tokens': count, 'total_tokens': count}})
+            yield None, b"data: [DONE]\n\n"
+
+        return self._stream('text/event-stream', frames())
+
+    def _anthropic(self, request: dict) -> Iterator[float]:
+        def frames():
+            yield None, _sse({'type': 'message_start', 'message': {
+                'id': 'msg_stub', 'type': 'message', 'role': 'assistant', 'model': request.get('model', 'stub'),
+                'content': [], 'stop_reason': None, 'stop_sequence': None,
+                'usage': {'input_tokens': 0, 'output_tokens': 1}}}, 'message_start')
+            yield None, _sse({'type': 'content_block_start', 'index': 0,
+                              'content_block': {'type': 'text', 'text': ''}}, 'content_block_start')
+            count = 0
+            for delay, text in _chunks(self.server.profile, self.server.rng):
+                count += 1
+                yield delay, _sse({'type': 'content_block_delta', 'index': 0,
+                                   'delta': {'type': 'text_delta', 'text': text}}, 'content_block_delta')
+            yield None, _sse({'type': 'content_block_stop', 'index': 0}, 'content_block_stop')
+            yield None, _sse({'type': 'message_delta', 'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                              'usage': {'output_tokens': count}}, 'message_delta')
+            yield None, _sse({'type': 'message_stop'}, 'message_stop')
+
+        return self._stream('text/event-stream', frames())
+
+    def _gemini(self, path: str, sse: bool) -> Iterator[float]:
+        model_version = path.rsplit('/', 1)[-1].split(':', 1)[0]
+
+        def response(text: str, count: int, last: bool) -> dict:
+            candidate = {'content': {'parts': [{'text': text}], 'role': 'model'}, 'index': 0}
+            if last:
+                candidate['finishReason'] = 'STOP'
+            return {'candidates': [candidate], 'modelVersion': model_version,
+                    'usageMetadata': {'promptTokenCount': 0, 'candidatesTokenCount': count, 'totalTokenCount': count}}
+
+        def frames():
+            chunks = list(_chunks(self.server.profile, self.server.rng))
+            for count, (delay, text) in enumerate(chunks, 1):
+                data = response(text, count, count == len(chunks))
+                if sse:
+                    yield delay, _sse(data)
+                else:
+                    yield delay, ('[' if count == 1 else ',\r\n').encode() + json.dumps(data).encode('utf-8')
+            if not sse:
+                yield None, b']'
+
+        return self._stream('text/event-stream' if sse else 'application/json', frames())
+
+
+class StubServer(ThreadingHTTPServer):
+    """
+    Threaded stub server recording the timing of every response.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, profile: Optional[dict] = None, seed: int = 0) -> None:
+        """
+        Initialize the server on localhost.
+
+        Args:
+            port: Port to listen on, any free port if 0
+            profile: Pacing of the answers, see DEFAULT_PROFILE
+            seed: Seed of the jitter
+        """
+        super().__init__(('127.0.0.1', port), StubHandler)
+        self.profile = {**DEFAULT_PROFILE, **(profile or {})}
+        self.rng = random.Random(seed)
+        self.timings: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def record(self, marker: Optional[str], received: float, sent_times: Iterator[float]) -> None:
+        """
+        Streams a response and records when its content chunks were sent.
+
+        Args:
+            marker: Benchmark marker of the request, None to skip recording
+            received: Time the request body was read
+            sent_times: Iterator sending the response and yielding each chunk time
+        """
+        times = list(sent_times)
+        if marker is None:
+            return
+        with self._lock:
+            self.timings[marker] = {
+                'received': received,
+                'first_chunk': times[0] if times else None,
+                'last_chunk': times[-1] if times else None,
+                'chunks': len(times),
+            }
+
+    def start(self) -> 'StubServer':
+        """
+        Serves requests from a daemon thread.
+
+        Returns:
+            StubServer: The server itself
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8765, help="port to listen on")
+    parser.add_argument('--ttft', type=float, default=DEFAULT_PROFILE['ttft'], help="seconds before the first chunk")
+    parser.add_argument('--rate', type=float, default=DEFAULT_PROFILE['tokens_per_second'], help="tokens per second")
+    parser.add_argument('--tokens', type=int, default=DEFAULT_PROFILE['tokens'], help="tokens per answer")
+    parser.add_argument('--chunk', type=int, default=DEFAULT_PROFILE['tokens_per_chunk'], help="tokens per chunk")
+    parser.add_argument('--jitter', type=float, default=DEFAULT_PROFILE['jitter'],
+                        help="relative random variation of every delay, e.g. 0.2 for ±20%%")
+    args = parser.parse_args()
+
+    server = StubServer(args.port, {'ttft': args.ttft, 'tokens_per_second': args.rate, 'tokens': args.tokens,
+                                    'tokens_per_chunk': args.chunk, 'jitter': args.jitter})
+    print(f"Stub provider on {server.url} (OpenAI: {server.url}/v1, Anthropic: {server.url})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
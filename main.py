@@ -6,7 +6,7 @@ from pathlib import Path
 
 from PyQt6.QtWidgets import QApplication
 from waitress import serve
-from autocorrect_pro.utils import find_free_port
+from autocorrect_pro.utils import find_free_port, load_config
 from autocorrect_pro.gui import MainWindow
 from autocorrect_pro import create_app
 
@@ -30,9 +30,19 @@ def main():
 
     def run_waitress():
         """Run Flask app with Waitress production server."""
-        serve(app, host='127.0.0.1', port=port, threads=6)
+        # The request lookahead lets /process notice when its client disconnects
+        serve(app, host='127.0.0.1', port=port, threads=6, channel_request_lookahead=1)
 
-    flask_thread = threading.Thread(target=run_waitress)
+    run_server = run_waitress
+    if load_config().get('server') == 'asgi':
+        # Only the ASGI server needs this module and its imports
+        from autocorrect_pro.asgi import asgi_available, run_asgi
+        if asgi_available():
+            run_server = lambda: run_asgi(app, port)
+        else:
+            logger.warning("uvicorn n'est pas installé, utilisation de Waitress")
+
+    flask_thread = threading.Thread(target=run_server)
     flask_thread.daemon = True
     flask_thread.start()
 
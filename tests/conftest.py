@@ -0,0 +1,99 @@
+import pytest
+
+from autocorrect_pro.cache import ResponseCache
+from autocorrect_pro.cancellation import StreamRegistry
+from autocorrect_pro.metrics import metrics
+from autocorrect_pro.models import client_pool
+from autocorrect_pro.prewarm import connection_warmer
+from autocorrect_pro.ratelimit import rate_limiter
+from autocorrect_pro.resilience import provider_health
+from autocorrect_pro.speculation import speculator
+from autocorrect_pro.utils import config_store, config_writer
+
+
+@pytest.fixture(autouse=True)
+def reset_client_pool():
+    """Ensure each test starts with an empty provider client pool."""
+    client_pool.invalidate()
+    yield
+    client_pool.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def reset_metrics():
+    """Ensure each test starts with empty request metrics."""
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_connection_warmer():
+    """Ensure each test starts without warm-up session, counters or attached event loop."""
+    connection_warmer.reset()
+    yield connection_warmer
+    connection_warmer.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_speculator():
+    """Ensure each test starts without pending speculation, last mode or counters."""
+    speculator.reset()
+    yield speculator
+    speculator.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_provider_health():
+    """Ensure each test starts with closed circuit breakers and no fallback counts."""
+    provider_health.reset()
+    yield provider_health
+    provider_health.reset()
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limiter():
+    """Ensure each test starts without rate limiter state."""
+    rate_limiter.reset()
+    yield rate_limiter
+    rate_limiter.reset()
+
+
+@pytest.fixture(autouse=True)
+def isolated_config_file(tmp_path, monkeypatch):
+    """Keep configuration reads and background writes away from the user's config file."""
+    config_file = tmp_path / "gemini.json"
+    monkeypatch.setattr('autocorrect_pro.utils.CONFIG_FILE', config_file)
+    config_store.invalidate()
+    yield config_file
+    config_writer.flush()
+    config_store.invalidate()
+
+
+@pytest.fixture(autouse=True)
+def isolated_response_cache(tmp_path, monkeypatch):
+    """Give each test its own empty response cache outside the user's config directory."""
+    cache = ResponseCache(tmp_path / "response_cache.sqlite3")
+    monkeypatch.setattr('autocorrect_pro.models.response_cache', cache)
+    monkeypatch.setattr('autocorrect_pro.routes.response_cache', cache)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_transcription_cache(tmp_path, monkeypatch):
+    """Give each test its own empty transcription cache outside the user's config directory."""
+    cache = ResponseCache(tmp_path / "transcription_cache.sqlite3")
+    monkeypatch.setattr('autocorrect_pro.transcription.transcription_cache', cache)
+    monkeypatch.setattr('autocorrect_pro.routes.transcription_cache', cache)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture(autouse=True)
+def isolated_stream_registry(monkeypatch):
+    """Give each test its own stream registry and cancellation counters."""
+    registry = StreamRegistry()
+    monkeypatch.setattr('autocorrect_pro.routes.stream_registry', registry)
+    monkeypatch.setattr('autocorrect_pro.asgi.stream_registry', registry)
+    return registry
@@ -0,0 +1,311 @@
+import asyncio
+import io
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from autocorrect_pro import create_app
+from autocorrect_pro.asgi import AsgiApp, _build_environ, _read_body
+from autocorrect_pro.config import MODES
+from autocorrect_pro.speculation import speculator
+
+
+def _call(app: AsgiApp, method: str, path: str, body: bytes = b'', content_type: str = '',
+          disconnect_after: float = 60, on_send=None) -> tuple[int, bytes]:
+    """Run one HTTP request through an ASGI application, the client leaving after disconnect_after seconds."""
+    scope = {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': b'',
+        'headers': [(b'content-type', content_type.encode())] if content_type else [],
+    }
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await asyncio.sleep(disconnect_after)
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+        if on_send:
+            on_send(message)
+
+    asyncio.run(app(scope, receive, send))
+    status = sent[0]['status']
+    return status, b''.join(m.get('body', b'') for m in sent[1:])
+
+
+def _websocket(app: AsgiApp, path: str, frames: list[str], replies: int) -> list[dict]:
+    """Send text frames over an ASGI WebSocket and close it once the expected number of replies arrived."""
+    messages = [{'type': 'websocket.connect'}] + [{'type': 'websocket.receive', 'text': f} for f in frames]
+    sent = []
+
+    async def run():
+        answered = asyncio.Event()
+
+        async def receive():
+            if messages:
+                return messages.pop(0)
+            await asyncio.wait_for(answered.wait(), 5)
+            return {'type': 'websocket.disconnect', 'code': 1000}
+
+        async def send(message):
+            sent.append(message)
+            if sum(m['type'] == 'websocket.send' for m in sent) >= replies:
+                answered.set()
+
+        await app({'type': 'websocket', 'path': path, 'query_string': b'', 'headers': []}, receive, send)
+
+    asyncio.run(run())
+    return sent
+
+
+@pytest.fixture
+def asgi_app():
+    """ASGI application with a configured API key."""
+    with patch('autocorrect_pro.routes.load_config') as mock_load_config, \
+            patch('autocorrect_pro.routes.config_snapshot') as mock_config_snapshot, \
+            patch('autocorrect_pro.routes.load_modes') as mock_load_modes:
+        mock_load_config.return_value = {'api_key': 'test_key', 'model': 'gemini-1.5-flash'}
+        mock_config_snapshot.return_value = mock_load_config.return_value
+        mock_load_modes.return_value = {'system': MODES, 'custom': {}, 'order': list(MODES)}
+        yield AsgiApp(create_app())
+
+
+class TestAsgiApp:
+    """Test cases for the ASGI serving path."""
+
+    @patch('autocorrect_pro.asgi.astream_response')
+    def test_process_streams_deltas(self, mock_astream_response, asgi_app):
+        """Test that /process is served by the async engine with protocol 2."""
+        async def stream(**kwargs):
+            for chunk in ["Bon", "jour"]:
+                yield chunk
+        mock_astream_response.side_effect = stream
+
+        status, body = _call(asgi_app, 'POST', '/process', b'mode=corriger&input_text=bonjour',
+                             'application/x-www-form-urlencoded')
+        frames = [f[6:] for f in body.decode().split('\n\n') if f.startswith('data: ')]
+
+        assert status == 200
+        assert [json.loads(f)['delta'] for f in frames[:2]] == ["Bon", "jour"]
+        assert json.loads(frames[2])['text'] == "Bonjour"
+        assert frames[-1] == "[END]"
+
+    @patch('autocorrect_pro.asgi.astream_response')
+    def test_client_disconnect_closes_stream(self, mock_astream_response, asgi_app, isolated_stream_registry):
+        """Test that a client disconnect stops the provider stream."""
+        closed = []
+
+        async def stream(**kwargs):
+            try:
+                yield "Bon"
+                await asyncio.Event().wait()
+            finally:
+                closed.append(True)
+        mock_astream_response.side_effect = stream
+
+        status, body = _call(asgi_app, 'POST', '/process', b'mode=corriger&input_text=bonjour',
+                             'application/x-www-form-urlencoded', disconnect_after=0.05)
+
+        assert status == 200
+        assert closed == [True]
+        assert b'[END]' not in body
+        assert isolated_stream_registry.stats()['disconnected'] == 1
+
+    @patch('autocorrect_pro.asgi.astream_response')
+    def test_cancel_before_first_token(self, mock_astream_response, asgi_app, isolated_stream_registry):
+        """Test that /process/cancel stops an async stream still waiting for its first token."""
+        closed = []
+
+        async def stream(**kwargs):
+            try:
+                threading.Timer(0.05, isolated_stream_registry.cancel, args=('req-1',)).start()
+                await asyncio.sleep(5)
+                yield "trop tard"
+            finally:
+                closed.append(True)
+        mock_astream_response.side_effect = stream
+
+        status, body = _call(asgi_app, 'POST', '/process', b'mode=corriger&input_text=bonjour&request_id=req-1',
+                             'application/x-www-form-urlencoded')
+        frames = [f[6:] for f in body.decode().split('\n\n') if f.startswith('data: ')]
+
+        assert status == 200
+        assert json.loads(frames[0])['type'] == "error"
+        assert frames[-1] == "[END]"
+        assert closed == [True]
+        assert isolated_stream_registry.stats()['cancelled'] == 1
+
+    @patch('autocorrect_pro.asgi.astream_response')
+    def test_process_follows_speculation(self, mock_astream_response, asgi_app):
+        """Test that a request answered by a speculation replays it instead of calling the async engine."""
+        params = {'mode_name': 'corriger', 'input_text': 'bonjour', 'user_response': None,
+                  'model': 'gemini-1.5-flash', 'api_key': 'test_key', 'all_modes': MODES,
+                  'long_text': None, 'edit_list': False}
+        speculator.start(lambda: params, lambda params, metadata: iter(["Bon", "jour"]))
+
+        status, body = _call(asgi_app, 'POST', '/process', b'mode=corriger&input_text=bonjour',
+                             'application/x-www-form-urlencoded')
+        frames = [f[6:] for f in body.decode().split('\n\n') if f.startswith('data: ')]
+
+        assert [json.loads(f)['delta'] for f in frames[:2]] == ["Bon", "jour"]
+        assert json.loads(frames[2])['meta']['speculative'] is True
+        mock_astream_response.assert_not_called()
+
+    @patch('autocorrect_pro.asgi.astream_response')
+    def test_speculation_claimed_off_the_event_loop(self, mock_astream_response, asgi_app):
+        """Test that the speculation is claimed on a worker thread, since it may wait for its preparation."""
+        async def stream(**kwargs):
+            yield "Bonjour"
+        mock_astream_response.side_effect = stream
+        claim_threads, loop_threads = [], []
+
+        def claim(params):
+            claim_threads.append(threading.get_ident())
+            return None
+
+        with patch.object(speculator, 'claim', side_effect=claim):
+            status, _ = _call(asgi_app, 'POST', '/process', b'mode=corriger&input_text=bonjour',
+                              'application/x-www-form-urlencoded',
+                              on_send=lambda message: loop_threads.append(threading.get_ident()))
+
+        assert status == 200
+        assert len(claim_threads) == 1
+        assert claim_threads[0] not in loop_threads
+
+    def test_process_unknown_mode(self, asgi_app):
+        """Test that validation errors are returned as JSON."""
+        status, body = _call(asgi_app, 'POST', '/process', b'mode=inconnu',
+                             'application/x-www-form-urlencoded')
+        assert status == 400
+        assert 'error' in json.loads(body)
+
+    def test_other_routes_delegated_to_flask(self, asgi_app):
+        """Test that non-streaming routes are served by the Flask blueprint."""
+        status, body = _call(asgi_app, 'GET', '/api/config')
+        assert status == 200
+        assert json.loads(body)['model'] == 'gemini-1.5-flash'
+
+
+    @patch('autocorrect_pro.batch.stream_response')
+    def test_live_websocket(self, mock_stream_response, asgi_app):
+        """Test that live messages are answered paragraph by paragraph over the WebSocket."""
+        mock_stream_response.side_effect = lambda mode, text, *args, **kwargs: iter([text.upper()])
+        frames = [json.dumps({'revision': 1, 'text': "un.\n\ndeux."}), 'pas du json']
+
+        sent = _websocket(asgi_app, '/ws/live', frames, replies=4)
+        replies = [json.loads(m['text']) for m in sent if m['type'] == 'websocket.send']
+
+        assert sent[0] == {'type': 'websocket.accept'}
+        paragraphs = sorted((r for r in replies if r['type'] == 'paragraph'), key=lambda r: r['index'])
+        assert [r['suggestion'] for r in paragraphs] == ['UN.', 'DEUX.']
+        assert {r['type'] for r in replies} == {'paragraph', 'done', 'error'}
+
+    def test_delegated_response_streamed(self):
+        """Test that each chunk of a Flask response is sent as soon as it is produced."""
+        first_sent = threading.Event()
+
+        def wsgi_app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'application/x-ndjson')])
+            yield b'{"index": 0}\n'
+            assert first_sent.wait(5), "le premier morceau n'a pas été envoyé"
+            yield b'{"index": 1}\n'
+
+        bodies = []
+
+        def on_send(message):
+            if message.get('body'):
+                bodies.append(message['body'])
+                first_sent.set()
+
+        status, body = _call(AsgiApp(wsgi_app), 'GET', '/api/batch', on_send=on_send)
+
+        assert status == 200
+        assert bodies == [b'{"index": 0}\n', b'{"index": 1}\n']
+
+    def test_oversize_upload_refused_before_reading(self, asgi_app):
+        """Test that a body announced over the upload limit is refused without being read."""
+        asgi_app.flask_app.config['MAX_CONTENT_LENGTH'] = 1024
+        scope = {'type': 'http', 'method': 'POST', 'path': '/transcribe', 'query_string': b'',
+                 'headers': [(b'content-length', b'4096')]}
+        received, sent = [], []
+
+        async def receive():
+            received.append(True)
+            return {'type': 'http.request', 'body': bytes(4096), 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(asgi_app(scope, receive, send))
+
+        assert sent[0]['status'] == 413
+        assert "trop volumineux" in json.loads(sent[1]['body'])['error']
+        assert received == []
+
+    def test_oversize_chunked_body_refused(self, asgi_app):
+        """Test that a body without Content-Length is refused once it grows past the limit."""
+        asgi_app.flask_app.config['MAX_CONTENT_LENGTH'] = 1024
+
+        status, body = _call(asgi_app, 'POST', '/transcribe', bytes(4096))
+
+        assert status == 413
+
+    def test_unknown_websocket_path_closed(self, asgi_app):
+        """Test that WebSockets other than /ws/live are refused."""
+        assert _websocket(asgi_app, '/ws/other', [], replies=0) == [{'type': 'websocket.close', 'code': 1008}]
+
+
+class TestBuildEnviron:
+    """Test cases for _build_environ function."""
+
+    def test_headers_and_body(self):
+        """Test that headers and body are mapped to WSGI keys."""
+        environ = _build_environ({
+            'method': 'POST',
+            'path': '/process',
+            'query_string': b'a=1',
+            'headers': [(b'content-type', b'text/plain'), (b'x-test', b'1'), (b'x-test', b'2')],
+        }, io.BytesIO(b'hello'))
+
+        assert environ['CONTENT_TYPE'] == 'text/plain'
+        assert environ['CONTENT_LENGTH'] == '5'
+        assert environ['HTTP_X_TEST'] == '1,2'
+        assert environ['QUERY_STRING'] == 'a=1'
+        assert environ['wsgi.input'].read() == b'hello'
+
+
+class TestReadBody:
+    """Test cases for _read_body."""
+
+    @staticmethod
+    def _read(chunks):
+        messages = [{'type': 'http.request', 'body': chunk, 'more_body': True} for chunk in chunks]
+        messages.append({'type': 'http.request', 'body': b'', 'more_body': False})
+
+        async def receive():
+            return messages.pop(0)
+
+        return asyncio.run(_read_body(receive))
+
+    def test_chunks_collected_in_memory(self):
+        """Test that a small body is kept in memory and rewound."""
+        with self._read([b'mode=', b'corriger']) as body:
+            assert not body._rolled
+            assert body.read() == b'mode=corriger'
+
+    def test_large_body_spooled_to_disk(self):
+        """Test that a body over the spool limit is written to a temporary file as it arrives."""
+        with patch('autocorrect_pro.asgi.UPLOAD_SPOOL_MAX_MB', 0.001):
+            body = self._read([bytes(1000), bytes(1000)])
+
+        with body:
+            assert body._rolled
+            assert len(body.read()) == 2000
@@ -0,0 +1,70 @@
+import threading
+import time
+from unittest.mock import patch
+
+from autocorrect_pro.batch import run_batch
+
+
+MODES = {"corriger": {"prompt": "Corrige :"}, "traduire": {"prompt": "Traduis :"}}
+
+
+def _fake_stream(mode_name, input_text, user_response, model, api_key, all_modes=None, metadata=None):
+    """Answer like stream_response: upper-cased text, errors for unknown modes."""
+    if mode_name not in all_modes:
+        metadata['error'] = f"Erreur: Mode '{mode_name}' non reconnu."
+        yield metadata['error']
+        return
+    metadata.update({'model': model, 'cache': 'miss'})
+    time.sleep(float(input_text.split(':')[0]) if ':' in input_text else 0)
+    yield input_text.upper()
+
+
+class TestRunBatch:
+    """Test cases for run_batch function."""
+
+    @patch('autocorrect_pro.batch.stream_response', side_effect=_fake_stream)
+    def test_results_in_completion_order(self, mock_stream_response):
+        """Test that fast items are returned first, tagged with their index."""
+        items = [{'text': '0.2:lent', 'mode': 'corriger'}, {'text': 'rapide', 'mode': 'corriger'}]
+
+        results = list(run_batch(items, 'gemini-1.5-flash', 'key', MODES, max_workers=2))
+
+        assert [r['index'] for r in results[:2]] == [1, 0]
+        assert results[0]['text'] == 'RAPIDE'
+        assert results[-1] == {'type': 'summary', 'total': 2, 'errors': 0}
+
+    @patch('autocorrect_pro.batch.stream_response', side_effect=_fake_stream)
+    def test_item_errors_do_not_abort_batch(self, mock_stream_response):
+        """Test that invalid items produce error lines next to successful ones."""
+        items = [{'text': 'a', 'mode': 'inconnu'}, 'pas un objet', {'text': 'b', 'mode': 'traduire'}]
+
+        results = {r['index']: r for r in run_batch(items, 'gemini-1.5-flash', 'key', MODES) if 'index' in r}
+
+        assert results[0]['status'] == 'error'
+        assert results[1]['status'] == 'error'
+        assert results[2] == {'type': 'result', 'index': 2, 'status': 'ok', 'text': 'B',
+                              'model': 'gemini-1.5-flash', 'cache': 'miss'}
+
+    @patch('autocorrect_pro.batch.stream_response')
+    def test_provider_concurrency_limit(self, mock_stream_response):
+        """Test that concurrent calls to a provider never exceed its limit."""
+        lock = threading.Lock()
+        running, peak = [0], [0]
+
+        def stream(*args, **kwargs):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            yield "ok"
+        mock_stream_response.side_effect = stream
+
+        items = [{'text': str(i), 'mode': 'corriger'} for i in range(12)]
+        list(run_batch(items, 'claude-3-5-haiku-latest', 'key', MODES, max_workers=8,
+                       provider_concurrency={'anthropic': 3}))
+
+        assert peak[0] <= 3
+        assert mock_stream_response.call_count == 12
+
@@ -0,0 +1,82 @@
+import time
+from unittest.mock import patch
+
+from autocorrect_pro.cache import ResponseCache
+
+
+class TestResponseCache:
+    """Test cases for the disk-backed response cache."""
+
+    def test_get_miss_then_hit(self, tmp_path):
+        """Test that stored values are returned and counted."""
+        cache = ResponseCache(tmp_path / "cache.sqlite3")
+        key = cache.make_key("model", "prompt", "text")
+
+        assert cache.get(key) is None
+        cache.set(key, "Texte corrigé")
+        assert cache.get(key) == "Texte corrigé"
+
+        stats = cache.stats()
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.5
+        assert stats['entries'] == 1
+
+    def test_persisted_across_instances(self, tmp_path):
+        """Test that entries survive a restart of the application."""
+        cache = ResponseCache(tmp_path / "cache.sqlite3")
+        key = cache.make_key("a")
+        cache.set(key, "value")
+        cache.close()
+
+        assert ResponseCache(tmp_path / "cache.sqlite3").get(key) == "value"
+
+    def test_key_depends_on_every_part(self):
+        """Test that changing any part of the request changes the key."""
+        base = ResponseCache.make_key("model", "prompt", "text", None)
+        assert ResponseCache.make_key("model", "prompt2", "text", None) != base
+        assert ResponseCache.make_key("model", "prompt", "text", "reply") != base
+        assert ResponseCache.make_key("model", "prompt", "text", None) == base
+
+    def test_ttl_expiry(self, tmp_path):
+        """Test that expired entries are not returned."""
+        cache = ResponseCache(tmp_path / "cache.sqlite3", ttl_seconds=60)
+        key = cache.make_key("a")
+        cache.set(key, "value")
+
+        with patch('autocorrect_pro.cache.time.time', return_value=time.time() + 120):
+            assert cache.get(key) is None
+        assert cache.stats()['entries'] == 0
+
+    def test_lru_eviction_by_entries(self, tmp_path):
+        """Test that the least recently used entry is evicted first."""
+        cache = ResponseCache(tmp_path / "cache.sqlite3", max_entries=2)
+        now = time.time()
+        with patch('autocorrect_pro.cache.time.time', side_effect=[now - 4, now - 3, now - 2, now - 1]):
+            cache.set("a", "1")
+            cache.set("b", "2")
+            cache.get("a")
+            cache.set("c", "3")
+
+        assert cache.get("a") == "1"
+        assert cache.get("b") is None
+        assert cache.get("c") == "3"
+
+    def test_eviction_by_size(self, tmp_path):
+        """Test that total stored size stays within bounds."""
+        cache = ResponseCache(tmp_path / "cache.sqlite3", max_bytes=10)
+        cache.set("a", "12345")
+        cache.set("b", "12345")
+        cache.set("c", "12345")
+
+        assert cache.stats()['size_bytes'] <= 10
+        assert cache.get("c") == "12345"
+
+    def test_clear(self, tmp_path):
+        """Test that clear removes entries and resets counters."""
+        cache = ResponseCache(tmp_path / "cache.sqlite3")
+        cache.set("a", "1")
+        cache.get("a")
+        cache.clear()
+
+        assert cache.stats() == {'hits': 0, 'misses': 0, 'hit_rate': 0.0, 'entries': 0, 'size_bytes': 0}
@@ -0,0 +1,58 @@
+from autocorrect_pro.cancellation import StreamAbort, StreamRegistry
+
+
+class TestStreamRegistry:
+    """Test cases for the stream cancellation registry."""
+
+    def test_cancel_sets_event(self):
+        """Test that cancelling a registered stream sets its event."""
+        registry = StreamRegistry()
+        event = registry.register("abc")
+
+        assert registry.cancel("abc") is True
+        assert event.is_set()
+
+    def test_cancel_aborts_registered_stream(self):
+        """Test that cancelling a stream calls the close hooks of its StreamAbort."""
+        registry = StreamRegistry()
+        abort = StreamAbort()
+        closed = []
+        abort.add(lambda: closed.append(True))
+        registry.register("abc", abort)
+
+        assert registry.cancel("abc") is True
+        assert closed == [True]
+        assert abort.aborted
+
+    def test_cancel_unknown_stream(self):
+        """Test that cancelling an unknown or finished stream is reported."""
+        registry = StreamRegistry()
+        registry.register("abc")
+        registry.release("abc", "completed", "texte", "texte")
+
+        assert registry.cancel("abc") is False
+        assert registry.cancel("inconnu") is False
+
+    def test_tokens_saved_on_cancel(self):
+        """Test that stopped streams count the tokens they did not generate."""
+        registry = StreamRegistry()
+        registry.register("abc")
+        assert registry.stats()['active'] == 1
+
+        registry.release("abc", "cancelled", "a" * 400, "b" * 40)
+
+        stats = registry.stats()
+        assert stats['active'] == 0
+        assert stats['cancelled'] == 1
+        assert stats['tokens_streamed'] == 10
+        assert stats['tokens_saved'] == 90
+
+    def test_completed_streams_save_nothing(self):
+        """Test that completed streams only increase their counter."""
+        registry = StreamRegistry()
+        registry.register("abc")
+        registry.release("abc", "completed", "a" * 400, "b" * 40)
+
+        stats = registry.stats()
+        assert stats['completed'] == 1
+        assert stats['tokens_saved'] == 0
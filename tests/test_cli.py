@@ -0,0 +1,116 @@
+import io
+import json
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from autocorrect_pro import cli
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+
+def _fake_stream(mode_name, input_text, user_response, model, api_key, all_modes=None, metadata=None):
+    """Answer like stream_response: upper-cased text in two chunks, errors on 'erreur'."""
+    if 'erreur' in input_text:
+        metadata['error'] = "Erreur: Clé API non configurée"
+        yield metadata['error']
+        return
+    metadata['model'] = model
+    time.sleep(0.1 if 'lent' in input_text else 0)
+    text = input_text.strip().upper()
+    yield text[:2]
+    yield text[2:]
+
+
+@pytest.fixture
+def stream_response():
+    with patch('autocorrect_pro.cli.stream_response', side_effect=_fake_stream) as mock_stream_response:
+        yield mock_stream_response
+
+
+class TestProcessCommand:
+    """Test cases for the process command."""
+
+    def test_stdin(self, stream_response, capsys, monkeypatch):
+        """Test that standard input is processed when no file is given."""
+        monkeypatch.setattr(sys, 'stdin', io.StringIO("bonjour\n"))
+
+        with pytest.raises(SystemExit) as exit_info:
+            cli.main(['process', '--mode', 'traduire', '--model', 'gpt-4o-mini'])
+
+        assert exit_info.value.code == 0
+        assert capsys.readouterr().out == "BONJOUR\n"
+        args = stream_response.call_args
+        assert args.args[0] == 'traduire'
+        assert args.args[3] == 'gpt-4o-mini'
+
+    def test_files_printed_in_order(self, stream_response, capsys, tmp_path):
+        """Test that several files are printed in command-line order under headers."""
+        slow = tmp_path / 'a.txt'
+        slow.write_text("lent", encoding='utf-8')
+        fast = tmp_path / 'b.txt'
+        fast.write_text("rapide", encoding='utf-8')
+
+        with pytest.raises(SystemExit) as exit_info:
+            cli.main(['process', str(slow), str(fast)])
+
+        assert exit_info.value.code == 0
+        assert capsys.readouterr().out == f"==> {slow} <==\nLENT\n==> {fast} <==\nRAPIDE\n"
+
+    def test_errors_reported_on_stderr(self, stream_response, capsys, tmp_path):
+        """Test that failures go to stderr with a non-zero status while other files succeed."""
+        good = tmp_path / 'ok.txt'
+        good.write_text("bien", encoding='utf-8')
+        bad = tmp_path / 'ko.txt'
+        bad.write_text("erreur", encoding='utf-8')
+        missing = tmp_path / 'absent.txt'
+
+        with pytest.raises(SystemExit) as exit_info:
+            cli.main(['process', str(good), str(bad), str(missing)])
+
+        captured = capsys.readouterr()
+        assert exit_info.value.code == 1
+        assert "BIEN" in captured.out
+        assert "Erreur" not in captured.out
+        assert f"{bad}: Erreur: Clé API non configurée" in captured.err
+        assert str(missing) in captured.err
+
+
+class TestModesCommand:
+    """Test cases for the modes command."""
+
+    def test_lists_modes(self, capsys):
+        """Test that the configured modes are listed with their titles."""
+        with pytest.raises(SystemExit):
+            cli.main(['modes'])
+
+        out = capsys.readouterr().out
+        assert "corriger" in out
+        assert "Corriger" in out
+
+
+class TestMain:
+    """Test cases for the CLI entry point."""
+
+    def test_no_command_starts_gui(self):
+        """Test that running without a command still opens the desktop application."""
+        gui_module = MagicMock()
+        with patch.dict(sys.modules, {'autocorrect_pro.main': gui_module}):
+            cli.main([])
+
+        gui_module.main.assert_called_once()
+
+    def test_gui_and_server_not_imported(self):
+        """Test that the CLI does not import Qt or Flask."""
+        completed = subprocess.run(
+            [sys.executable, '-c',
+             "import json, sys\n"
+             "import autocorrect_pro.cli\n"
+             "print(json.dumps([m for m in ('PyQt6', 'flask', 'waitress') if m in sys.modules]))"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True)
+
+        assert json.loads(completed.stdout.strip().splitlines()[-1]) == []
@@ -0,0 +1,113 @@
+from unittest.mock import patch
+
+import pytest
+
+from autocorrect_pro.config import EDIT_LIST_PROMPT
+from autocorrect_pro.edits import apply_edits, parse_edits, stream_with_edits
+
+TEXT = "Bonjour, sa va ? Je voulais te dire que sa marche. Merci pour tout se que tu fais."
+MODES = {"corriger": {"prompt": "Corrige :"}}
+
+
+class TestParseEdits:
+    """Test cases for parse_edits function."""
+
+    def test_json_array(self):
+        """Test that a plain JSON array is parsed."""
+        assert parse_edits('[{"contexte": "Bonjour, ", "original": "sa", "correction": "ça"}]') == \
+            [{"contexte": "Bonjour, ", "original": "sa", "correction": "ça"}]
+
+    def test_code_fence(self):
+        """Test that a fenced answer is accepted."""
+        assert parse_edits('```json\n[]\n```') == []
+
+    @pytest.mark.parametrize("reply", ["Voici le texte corrigé", '{"original": "sa"}', '[{"original": 1}]'])
+    def test_invalid_replies(self, reply):
+        """Test that anything but a list of string edits is rejected."""
+        with pytest.raises(ValueError):
+            parse_edits(reply)
+
+
+class TestApplyEdits:
+    """Test cases for apply_edits function."""
+
+    def test_edits_applied_in_order(self):
+        """Test that repeated passages are located by their context."""
+        edits = [
+            {"contexte": "Bonjour, ", "original": "sa", "correction": "ça"},
+            {"contexte": "dire que ", "original": "sa", "correction": "ça"},
+            {"contexte": "pour tout ", "original": "se", "correction": "ce"},
+        ]
+
+        assert apply_edits(TEXT, edits) == \
+            "Bonjour, ça va ? Je voulais te dire que ça marche. Merci pour tout ce que tu fais."
+
+    def test_no_edits(self):
+        """Test that an empty list leaves the text untouched."""
+        assert apply_edits(TEXT, []) == TEXT
+
+    def test_context_overlapping_previous_edit(self):
+        """Test that a context may include the passage corrected just before."""
+        edits = [
+            {"contexte": "", "original": "Bonjour,", "correction": "Salut,"},
+            {"contexte": "Bonjour, ", "original": "sa", "correction": "ça"},
+        ]
+
+        assert apply_edits(TEXT, edits).startswith("Salut, ça va ?")
+
+    def test_unknown_anchor(self):
+        """Test that an edit whose anchor is not in the text is rejected."""
+        with pytest.raises(ValueError):
+            apply_edits(TEXT, [{"contexte": "Au revoir ", "original": "sa", "correction": "ça"}])
+
+    def test_out_of_order_edit(self):
+        """Test that an edit located before the previous one is rejected."""
+        edits = [
+            {"contexte": "pour tout ", "original": "se", "correction": "ce"},
+            {"contexte": "Bonjour, ", "original": "sa", "correction": "ça"},
+        ]
+
+        with pytest.raises(ValueError):
+            apply_edits(TEXT, edits)
+
+
+class TestStreamWithEdits:
+    """Test cases for stream_with_edits function."""
+
+    @patch('autocorrect_pro.edits.stream_response')
+    def test_edits_applied_locally(self, mock_stream_response):
+        """Test that the model is asked for edits and the text is rebuilt locally."""
+        mock_stream_response.return_value = iter(['[{"contexte": "Bonjour, ", "original": "sa", "correction": "ça"}]'])
+
+        metadata = {}
+        result = list(stream_with_edits("corriger", TEXT, api_key="key", all_modes=MODES, metadata=metadata))
+
+        assert result == [TEXT.replace("Bonjour, sa", "Bonjour, ça")]
+        assert metadata['edits'] == 1
+        assert mock_stream_response.call_args.kwargs['all_modes'] == {"corriger": {"prompt": EDIT_LIST_PROMPT}}
+
+    @patch('autocorrect_pro.edits.stream_response')
+    def test_falls_back_to_full_text(self, mock_stream_response):
+        """Test that edits that do not apply trigger a regular request."""
+        mock_stream_response.side_effect = [
+            iter(['[{"contexte": "Au revoir ", "original": "sa", "correction": "ça"}]']),
+            iter(["Texte ", "corrigé"]),
+        ]
+
+        metadata = {}
+        result = list(stream_with_edits("corriger", TEXT, api_key="key", all_modes=MODES, metadata=metadata))
+
+        assert result == ["Texte ", "corrigé"]
+        assert metadata['edits'] is None
+        assert mock_stream_response.call_args.kwargs['all_modes'] == MODES
+
+    @patch('autocorrect_pro.edits.stream_response')
+    def test_provider_error_not_retried(self, mock_stream_response):
+        """Test that a failed edit request reports its error without a second call."""
+        def failing(*args, metadata=None, **kwargs):
+            metadata['error'] = "Erreur: Clé API non configurée"
+            yield metadata['error']
+        mock_stream_response.side_effect = failing
+
+        assert list(stream_with_edits("corriger", TEXT, all_modes=MODES)) == ["Erreur: Clé API non configurée"]
+        assert mock_stream_response.call_count == 1
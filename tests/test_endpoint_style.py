@@ -1,4 +1,5 @@
-from unittest.mock import patch
+import pytest
+from unittest.mock import ANY, patch, MagicMock
 from autocorrect_pro.config import DEFAULT_CONFIG, AVAILABLE_MODELS
 from autocorrect_pro.utils import load_config, get_custom_endpoint, save_custom_endpoint
 from autocorrect_pro.models import _stream_custom_anthropic, _stream_custom_openai
@@ -104,24 +105,24 @@ class TestEndpointStyle:
         assert result == ['Response chunk 1', 'Response chunk 2']
         mock_anthropic_class.assert_called_once_with(
             api_key='test_api_key',
-            base_url='https://custom-anthropic.com'
+            max_retries=0,
+            base_url='https://custom-anthropic.com',
+            http_client=ANY
         )
 
     @patch('autocorrect_pro.models.anthropic.Anthropic')
     def test_stream_custom_anthropic_error_handling(self, mock_anthropic_class):
-        """Test error handling in custom Anthropic streaming."""
+        """Test that custom Anthropic errors propagate like other providers."""
         mock_client = mock_anthropic_class.return_value
         mock_client.messages.stream.side_effect = Exception("Connection error")
 
-        result = list(_stream_custom_anthropic(
-            'Test prompt',
-            'test_api_key',
-            'test-model',
-            'https://custom-anthropic.com'
-        ))
-
-        assert len(result) == 1
-        assert 'Connection error' in result[0]
+        with pytest.raises(Exception, match="Connection error"):
+            list(_stream_custom_anthropic(
+                'Test prompt',
+                'test_api_key',
+                'test-model',
+                'https://custom-anthropic.com'
+            ))
 
     @patch('autocorrect_pro.models.OpenAI')
     def test_stream_custom_openai_success(self, mock_openai_class):
@@ -129,7 +130,8 @@ class TestEndpointStyle:
         mock_client = mock_openai_class.return_value
         mock_chunk = type('Chunk', (), {})()
         mock_chunk.choices = [type('Choice', (), {'delta': type('Delta', (), {'content': 'Test response'})()})()]
-        mock_response = iter([mock_chunk])
+        mock_response = MagicMock()
+        mock_response.__iter__.return_value = iter([mock_chunk])
 
         mock_client.chat.completions.create.return_value = mock_response
 
@@ -142,7 +144,9 @@ class TestEndpointStyle:
 
         mock_openai_class.assert_called_once_with(
             api_key='test_api_key',
-            base_url='https://custom-openai.com'
+            max_retries=0,
+            base_url='https://custom-openai.com',
+            http_client=ANY
         )
 
     def test_endpoint_style_validation(self):
@@ -0,0 +1,143 @@
+import threading
+from unittest.mock import patch
+
+from autocorrect_pro.live import LiveSession, LiveSessions, paragraph_hash
+
+
+MODES = {"corriger": {"prompt": "Corrige :"}}
+
+
+def _fake_stream(mode_name, input_text, user_response, model, api_key, all_modes=None, metadata=None):
+    """Answer like stream_response: the paragraph with its first letter upper-cased."""
+    if 'erreur' in input_text:
+        metadata['error'] = "Erreur: Quota dépassé"
+        yield metadata['error']
+        return
+    yield input_text[:1].upper() + input_text[1:] + "\n"
+
+
+def _check(session, text, revision=1):
+    return list(session.check(text, revision, 'corriger', 'gemini-1.5-flash', 'key', MODES))
+
+
+class TestLiveSession:
+    """Test cases for LiveSession."""
+
+    @patch('autocorrect_pro.batch.stream_response', side_effect=_fake_stream)
+    def test_first_check_sends_every_paragraph(self, mock_stream_response):
+        """Test that a new session checks every non-blank paragraph."""
+        messages = _check(LiveSession(), "premier.\n\nsecond.\n\n\n")
+
+        paragraphs = sorted((m for m in messages if m['type'] == 'paragraph'), key=lambda m: m['index'])
+        assert [(m['index'], m['suggestion'], m['changed'], m['reused']) for m in paragraphs] == [
+            (0, 'Premier.', True, False), (1, 'Second.', True, False)]
+        assert messages[-1] == {'type': 'done', 'revision': 1, 'paragraphs': 2, 'checked': 2, 'reused': 0,
+                                'errors': 0, 'superseded': False}
+        assert mock_stream_response.call_count == 2
+
+    @patch('autocorrect_pro.batch.stream_response', side_effect=_fake_stream)
+    def test_only_edited_paragraph_is_rechecked(self, mock_stream_response):
+        """Test that after a one-word edit only the edited paragraph reaches the model."""
+        session = LiveSession()
+        _check(session, "un.\n\ndeux.\n\ntrois.", revision=1)
+        mock_stream_response.reset_mock()
+
+        messages = _check(session, "un.\n\ndeux mots.\n\ntrois.", revision=2)
+
+        mock_stream_response.assert_called_once()
+        assert mock_stream_response.call_args.args[1] == "deux mots."
+        reused = [m['index'] for m in messages if m['type'] == 'paragraph' and m['reused']]
+        assert reused == [0, 2]
+        assert messages[-1]['checked'] == 1 and messages[-1]['reused'] == 2
+
+    @patch('autocorrect_pro.batch.stream_response', side_effect=_fake_stream)
+    def test_identical_paragraphs_sent_once(self, mock_stream_response):
+        """Test that repeated paragraphs are checked with a single call."""
+        messages = _check(LiveSession(), "bonjour.\n\nbonjour.")
+
+        mock_stream_response.assert_called_once()
+        assert sorted(m['index'] for m in messages if m['type'] == 'paragraph') == [0, 1]
+
+    @patch('autocorrect_pro.batch.stream_response', side_effect=_fake_stream)
+    def test_errors_are_not_remembered(self, mock_stream_response):
+        """Test that a failed paragraph is reported and retried on the next revision."""
+        session = LiveSession()
+        messages = _check(session, "erreur ici.", revision=1)
+        assert messages[0]['error'] == "Erreur: Quota dépassé"
+        assert messages[-1]['errors'] == 1
+
+        _check(session, "erreur ici.", revision=2)
+        assert mock_stream_response.call_count == 2
+
+    @patch('autocorrect_pro.batch.stream_response')
+    def test_newer_revision_supersedes_check(self, mock_stream_response):
+        """Test that a check stops once a newer revision has started, and old revisions are ignored."""
+        session = LiveSession()
+        started, release = threading.Event(), threading.Event()
+
+        def slow_stream(mode_name, input_text, *args, **kwargs):
+            started.set()
+            release.wait(5)
+            yield input_text
+
+        mock_stream_response.side_effect = slow_stream
+        check = session.check("lent.", 1, 'corriger', 'gemini-1.5-flash', 'key', MODES)
+        thread = threading.Thread(target=lambda: setattr(thread, 'messages', list(check)))
+        thread.start()
+        started.wait(5)
+
+        mock_stream_response.side_effect = _fake_stream
+        _check(session, "autre.", revision=2)
+        release.set()
+        thread.join(5)
+
+        assert thread.messages == [{'type': 'done', 'revision': 1, 'paragraphs': 1, 'checked': 0, 'reused': 0,
+                                    'errors': 0, 'superseded': True}]
+        assert _check(session, "autre.", revision=1)[-1]['superseded'] is True
+        # The superseded answer is still remembered for its paragraph
+        assert _check(session, "lent.", revision=3)[0]['reused'] is True
+
+    @patch('autocorrect_pro.batch.stream_response', side_effect=_fake_stream)
+    def test_results_are_bounded(self, mock_stream_response):
+        """Test that the least recently used paragraph results are evicted."""
+        session = LiveSession(max_paragraphs=2)
+        for revision, text in enumerate(["a.", "b.", "c."]):
+            _check(session, text, revision)
+        mock_stream_response.reset_mock()
+
+        _check(session, "a.", revision=3)
+
+        mock_stream_response.assert_called_once()
+
+    def test_hash_depends_on_mode_and_model(self):
+        """Test that results are not shared between modes or models."""
+        assert paragraph_hash('corriger', 'a', 'texte') != paragraph_hash('traduire', 'a', 'texte')
+        assert paragraph_hash('corriger', 'a', 'texte') != paragraph_hash('corriger', 'b', 'texte')
+
+
+class TestLiveSessions:
+    """Test cases for the live session registry."""
+
+    def test_same_identifier_same_session(self):
+        """Test that a session is found again by its identifier."""
+        sessions = LiveSessions()
+        assert sessions.get('a') is sessions.get('a')
+        assert sessions.get('a') is not sessions.get('b')
+
+    def test_least_recently_used_session_dropped(self):
+        """Test that the registry keeps at most max_sessions sessions."""
+        sessions = LiveSessions(max_sessions=2)
+        first = sessions.get('a')
+        sessions.get('b')
+        sessions.get('a')
+        sessions.get('c')
+
+        assert len(sessions) == 2
+        assert sessions.get('a') is first
+
+    def test_idle_sessions_expire(self):
+        """Test that sessions idle for too long are dropped."""
+        sessions = LiveSessions(idle_seconds=60)
+        first = sessions.get('a')
+        with patch('autocorrect_pro.live.time.monotonic', return_value=first.last_used + 61):
+            assert sessions.get('a') is not first
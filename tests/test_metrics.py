@@ -0,0 +1,99 @@
+from autocorrect_pro.metrics import Histogram, MetricsRegistry, StreamTimer
+
+
+class TestHistogram:
+    """Test cases for Histogram."""
+
+    def test_buckets_and_percentiles(self):
+        """Test that values land in their bucket and recent percentiles are exact."""
+        histogram = Histogram(buckets=(0.1, 1.0), window=10)
+        for value in (0.05, 0.5, 0.5, 2.0):
+            histogram.observe(value)
+
+        assert histogram.counts == [1, 2, 1]
+        assert histogram.count == 4 and histogram.sum == 3.05
+        assert histogram.percentile(0.5) == 0.5
+        assert histogram.percentile(0.95) == 2.0
+
+    def test_percentiles_use_recent_window(self):
+        """Test that only the most recent values count for percentiles."""
+        histogram = Histogram(window=2)
+        for value in (9.0, 1.0, 1.0):
+            histogram.observe(value)
+
+        assert histogram.percentile(0.95) == 1.0
+        assert Histogram().percentile(0.5) is None
+
+
+class TestMetricsRegistry:
+    """Test cases for MetricsRegistry."""
+
+    def test_render_prometheus(self):
+        """Test the counters and cumulative histogram buckets of the text format."""
+        registry = MetricsRegistry()
+        registry.observe('process', 'corriger', 'gpt-4o-mini', 'openai', 'completed', duration=0.3, ttft=0.2,
+                         chunks=3, output_bytes=12)
+        registry.observe('process', 'corriger', 'gpt-4o-mini', 'openai', 'error', duration=0.1,
+                         error_class='RateLimitError')
+
+        text = registry.render()
+
+        labels = 'kind="process",mode="corriger",model="gpt-4o-mini",provider="openai"'
+        assert f'autocorrect_requests_total{{{labels},outcome="completed",error_class=""}} 1' in text
+        assert f'autocorrect_requests_total{{{labels},outcome="error",error_class="RateLimitError"}} 1' in text
+        latency = 'kind="process",model="gpt-4o-mini",provider="openai"'
+        assert f'autocorrect_stream_chunks_total{{{latency}}} 3' in text
+        assert f'autocorrect_ttft_seconds_bucket{{{latency},le="0.25"}} 1' in text
+        assert f'autocorrect_request_duration_seconds_bucket{{{latency},le="0.1"}} 1' in text
+        assert f'autocorrect_request_duration_seconds_bucket{{{latency},le="+Inf"}} 2' in text
+        assert f'autocorrect_request_duration_seconds_count{{{latency}}} 2' in text
+        assert '# TYPE autocorrect_ttft_seconds histogram' in text
+
+    def test_label_values_escaped(self):
+        """Test that quotes in label values do not break the format."""
+        registry = MetricsRegistry()
+        registry.observe('process', 'mode "perso"', None, None, 'completed', duration=0.1)
+
+        assert 'mode="mode \\"perso\\""' in registry.render()
+
+    def test_summary(self):
+        """Test the recent percentiles per request kind."""
+        registry = MetricsRegistry()
+        for ttft in (0.1, 0.2, 0.3):
+            registry.observe('process', 'corriger', 'a', 'google', 'completed', duration=1.0, ttft=ttft)
+        registry.observe('transcribe', None, 'whisper-1', 'openai', 'error', duration=2.0, error_class='APIError')
+
+        summary = registry.summary()
+
+        assert summary['process'] == {'requests': 3, 'errors': 0, 'ttft_p50_ms': 200.0, 'ttft_p95_ms': 300.0,
+                                      'duration_p50_ms': 1000.0, 'duration_p95_ms': 1000.0}
+        assert summary['transcribe']['errors'] == 1
+        assert summary['transcribe']['ttft_p50_ms'] is None
+
+
+class TestStreamTimer:
+    """Test cases for StreamTimer."""
+
+    def test_finish_records_stream(self, reset_metrics):
+        """Test that a timed stream is counted with its chunks and bytes."""
+        timer = StreamTimer()
+        timer.chunk("Bonjour ")
+        timer.chunk("à tous")
+
+        timing = timer.timing()
+        timer.finish('completed', 'corriger', {'model': 'gemini-1.5-flash', 'provider': 'google'})
+
+        assert timing['ttft_ms'] <= timing['total_ms']
+        text = reset_metrics.render()
+        assert 'outcome="completed"' in text
+        assert 'autocorrect_output_bytes_total{kind="process",model="gemini-1.5-flash",provider="google"} 15' in text
+
+    def test_metadata_error_counts_as_error(self, reset_metrics):
+        """Test that an error answer is an error outcome and gives no TTFT."""
+        timer = StreamTimer()
+        timer.chunk("Erreur AI: quota")
+        timer.finish('completed', 'corriger', {'model': 'gpt-4o-mini', 'provider': 'openai',
+                                               'error': "Erreur AI: quota", 'error_class': 'RateLimitError'})
+
+        assert 'outcome="error",error_class="RateLimitError"' in reset_metrics.render()
+        assert reset_metrics.summary()['process']['ttft_p50_ms'] is None
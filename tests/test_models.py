@@ -1,13 +1,29 @@
+import asyncio
+import threading
+import time
+
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, AsyncMock, patch, MagicMock
 
 from autocorrect_pro.models import (
+    ClientPool,
+    _AbortableGeminiClient,
+    client_pool,
+    astream_response,
+    estimate_request,
     stream_response,
     _stream_gemini,
     _stream_openai,
     _stream_custom_openai,
-    _stream_anthropic
+    _stream_anthropic,
+    _stream_hedged,
+    _create_client,
+    _gemini_model,
+    _http_client,
+    _split_template
 )
+from autocorrect_pro.cancellation import StreamAbort, abortable, on_abort
+from autocorrect_pro.config import CLIENT_KEEPALIVE_SECONDS, MODES
 
 
 class TestStreamResponse:
@@ -85,8 +101,8 @@ class TestStreamResponse:
             "traduire": {"prompt": "Translate: {input}"}
         }
 
-        with patch('autocorrect_pro.models.load_config') as mock_load_config:
-            mock_load_config.return_value = {
+        with patch('autocorrect_pro.models.config_snapshot') as mock_config_snapshot:
+            mock_config_snapshot.return_value = {
                 'custom_endpoint': {
                     'url': 'http://localhost:8000',
                     'model_name': 'custom-model'
@@ -103,8 +119,8 @@ class TestStreamResponse:
             "traduire": {"prompt": "Translate: {input}"}
         }
 
-        with patch('autocorrect_pro.models.load_config') as mock_load_config:
-            mock_load_config.return_value = {
+        with patch('autocorrect_pro.models.config_snapshot') as mock_config_snapshot:
+            mock_config_snapshot.return_value = {
                 'custom_endpoint': {'url': '', 'model_name': ''}
             }
 
@@ -128,10 +144,12 @@ class TestStreamResponse:
             "traduire": {"prompt": "Translate: {input}"}
         }
 
-        with patch('autocorrect_pro.models._stream_gemini', side_effect=Exception("API Error")):
+        metadata = {}
+        with patch('autocorrect_pro.models._stream_gemini', side_effect=TimeoutError("API Error")):
             result = list(stream_response("traduire", "Hello world", api_key="test_key",
-                                       model="gemini-1.5-flash", all_modes=modes))
+                                       model="gemini-1.5-flash", all_modes=modes, metadata=metadata))
             assert result == ["Erreur AI: API Error"]
+            assert metadata['error_class'] == 'TimeoutError'
 
     def test_stream_response_repondre_mode_with_user_response(self):
         """Test stream_response with 'repondre' mode and user response."""
@@ -147,11 +165,345 @@ class TestStreamResponse:
             assert result == ["Generated response"]
 
 
+    @patch('autocorrect_pro.models._stream_gemini')
+    def test_aborted_request_not_reported(self, mock_stream_gemini):
+        """Test that a stream closed through cancellation is neither retried nor reported as an error."""
+        mock_stream_gemini.side_effect = ConnectionError("flux fermé")
+        abort = StreamAbort()
+        abort.abort()
+        metadata = {}
+
+        abortable(abort)
+        try:
+            result = list(stream_response("corriger", "texte", api_key="test_key", all_modes=MODES,
+                                          metadata=metadata))
+        finally:
+            abortable(None)
+
+        assert result == []
+        assert 'error' not in metadata
+        mock_stream_gemini.assert_called_once()
+
+
+class TestStreamResponseCache:
+    """Test cases for response caching in stream_response."""
+
+    modes = {"corriger": {"prompt": "Corrige :"}}
+
+    @patch('autocorrect_pro.models._stream_gemini')
+    def test_repeated_request_served_from_cache(self, mock_stream_gemini):
+        """Test that a repeated request replays the cached answer without a provider call."""
+        mock_stream_gemini.return_value = iter(["Bonjour ", "le monde"])
+
+        first = list(stream_response("corriger", "bonjour le monde", api_key="test_key", all_modes=self.modes))
+        second = list(stream_response("corriger", "bonjour le monde", api_key="test_key", all_modes=self.modes))
+
+        assert first == ["Bonjour ", "le monde"]
+        assert "".join(second) == "Bonjour le monde"
+        mock_stream_gemini.assert_called_once()
+
+    @patch('autocorrect_pro.models._stream_gemini')
+    def test_prompt_change_invalidates_cache(self, mock_stream_gemini):
+        """Test that editing the mode prompt produces a new provider call."""
+        mock_stream_gemini.side_effect = lambda *args: iter(["réponse"])
+
+        list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes))
+        list(stream_response("corriger", "texte", api_key="test_key",
+                             all_modes={"corriger": {"prompt": "Corrige vite :"}}))
+
+        assert mock_stream_gemini.call_count == 2
+
+    @patch('autocorrect_pro.models._stream_gemini')
+    def test_errors_are_not_cached(self, mock_stream_gemini):
+        """Test that a failed provider call is retried on the next request."""
+        mock_stream_gemini.side_effect = [Exception("API Error"), iter(["réponse"])]
+
+        first = list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes))
+        second = list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes))
+
+        assert first == ["Erreur AI: API Error"]
+        assert second == ["réponse"]
+
+    @patch('autocorrect_pro.models._stream_gemini')
+    def test_cache_write_deferred_to_caller(self, mock_stream_gemini):
+        """Test that the answer is handed to the caller instead of cached when cache_writes is given."""
+        mock_stream_gemini.side_effect = lambda *args: iter(["réponse"])
+        cache_writes = []
+
+        list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes,
+                             cache_writes=cache_writes))
+        list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes))
+
+        assert [answer for _, answer in cache_writes] == ["réponse"]
+        assert mock_stream_gemini.call_count == 2
+
+    @patch('autocorrect_pro.models.config_snapshot')
+    @patch('autocorrect_pro.models._stream_gemini')
+    def test_cache_disabled(self, mock_stream_gemini, mock_config_snapshot):
+        """Test that the cache can be disabled in the configuration."""
+        mock_config_snapshot.return_value = {'response_cache': {'enabled': False}}
+        mock_stream_gemini.side_effect = lambda *args: iter(["réponse"])
+
+        list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes))
+        list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes))
+
+        assert mock_stream_gemini.call_count == 2
+
+    @patch('autocorrect_pro.models.config_snapshot')
+    @patch('autocorrect_pro.models._stream_gemini')
+    def test_replay_as_single_chunk(self, mock_stream_gemini, mock_config_snapshot):
+        """Test that a hit can be replayed in one chunk."""
+        mock_config_snapshot.return_value = {'response_cache': {'enabled': True, 'replay_as_stream': False}}
+        mock_stream_gemini.return_value = iter(["a" * 100, "b" * 100])
+
+        list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes))
+        assert list(stream_response("corriger", "texte", api_key="test_key",
+                                    all_modes=self.modes)) == ["a" * 100 + "b" * 100]
+
+
+class TestStreamHedged:
+    """Test cases for hedged requests."""
+
+    modes = {"corriger": {"prompt": "Corrige :"}}
+
+    @staticmethod
+    def _slow(chunks, delay, closed=None):
+        def factory():
+            def generate():
+                try:
+                    time.sleep(delay)
+                    yield from chunks
+                finally:
+                    if closed is not None:
+                        closed.set()
+            return generate()
+        return factory
+
+    def test_primary_wins_when_fast(self):
+        """Test that the secondary model is not queried when the primary answers in time."""
+        secondary = MagicMock()
+        metadata = {}
+
+        result = list(_stream_hedged(lambda: iter(["a", "b"]), secondary, 1.0, metadata))
+
+        assert result == ["a", "b"]
+        secondary.assert_not_called()
+        assert metadata['hedge']['winner'] == 'primary'
+        assert metadata['hedge']['hedged'] is False
+
+    def test_secondary_wins_when_primary_is_slow(self):
+        """Test that a late primary is hedged and cancelled once the secondary answers."""
+        closed = threading.Event()
+        metadata = {}
+
+        result = list(_stream_hedged(self._slow(["lent"], 0.5, closed), lambda: iter(["rapide"]),
+                                     0.05, metadata))
+
+        assert result == ["rapide"]
+        assert metadata['hedge']['hedged'] is True
+        assert metadata['hedge']['winner'] == 'secondary'
+        assert closed.wait(2)
+
+    def test_stuck_primary_aborted_when_secondary_wins(self):
+        """Test that a primary still waiting for the provider is closed as soon as the secondary answers."""
+        response_closed = threading.Event()
+
+        def stuck():
+            def generate():
+                on_abort(response_closed.set)
+                # Stands for an SDK read that only fails once its response is closed
+                response_closed.wait(5)
+                raise ConnectionError("flux fermé")
+                yield
+            return generate()
+
+        started_at = time.monotonic()
+        result = list(_stream_hedged(stuck, lambda: iter(["rapide"]), 0.05, {}))
+
+        assert result == ["rapide"]
+        assert response_closed.wait(1)
+        assert time.monotonic() - started_at < 1
+
+    def test_request_abort_closes_hedged_streams(self):
+        """Test that aborting the request closes the primary and does not start the secondary."""
+        response_closed = threading.Event()
+        secondary_started = []
+
+        def stuck():
+            on_abort(response_closed.set)
+            response_closed.wait(5)
+            raise ConnectionError("flux fermé")
+
+        def secondary():
+            secondary_started.append(True)
+            return iter(["rapide"])
+
+        abort = StreamAbort()
+        threading.Timer(0.05, abort.abort).start()
+        started_at = time.monotonic()
+        abortable(abort)
+        try:
+            with pytest.raises(ConnectionError):
+                list(_stream_hedged(stuck, secondary, 5.0, {}))
+        finally:
+            abortable(None)
+
+        assert response_closed.is_set()
+        assert secondary_started == []
+        assert time.monotonic() - started_at < 1
+
+    def test_primary_error_starts_secondary(self):
+        """Test that a failing primary starts the secondary without waiting for the delay."""
+        def failing():
+            raise Exception("API Error")
+
+        metadata = {}
+        started_at = time.monotonic()
+        result = list(_stream_hedged(failing, lambda: iter(["ok"]), 5.0, metadata))
+
+        assert result == ["ok"]
+        assert time.monotonic() - started_at < 1
+        assert metadata['hedge']['winner'] == 'secondary'
+
+    def test_both_errors_raise(self):
+        """Test that the primary error is raised when both models fail."""
+        def failing(message):
+            def factory():
+                raise Exception(message)
+            return factory
+
+        with pytest.raises(Exception, match="primary"):
+            list(_stream_hedged(failing("primary"), failing("secondary"), 0.01, {}))
+
+    @patch('autocorrect_pro.models.config_snapshot')
+    @patch('autocorrect_pro.models._stream_provider')
+    def test_losing_fallback_not_reported(self, mock_stream_provider, mock_config_snapshot):
+        """Test that a fallback used by the losing stream does not reach the response metadata."""
+        mock_config_snapshot.return_value = {
+            'hedging': {'enabled': True, 'delay_ms': 10, 'model': 'claude-3-5-haiku-latest'},
+            'resilience': {'retries': 0, 'fallback_models': ['gpt-4o-mini']},
+        }
+
+        def provider(model_config, *args):
+            if model_config['provider'] == 'google':
+                raise TimeoutError()
+            if model_config['provider'] == 'openai':
+                return iter(["secours"])
+            return self._slow(["rapide"], 0.2)()
+        mock_stream_provider.side_effect = provider
+
+        metadata = {}
+        result = list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes,
+                                      metadata=metadata))
+
+        assert result == ["secours"]
+        assert metadata['fallback']['model'] == 'gpt-4o-mini'
+
+        fallback_streamed = threading.Event()
+
+        def provider_with_slow_fallback(model_config, *args):
+            if model_config['provider'] == 'google':
+                raise TimeoutError()
+            if model_config['provider'] == 'openai':
+                return self._slow(["secours"], 0.2, fallback_streamed)()
+            return iter(["rapide"])
+        mock_stream_provider.side_effect = provider_with_slow_fallback
+        metadata = {}
+        result = list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes,
+                                      metadata=metadata))
+        fallback_streamed.wait(2)
+
+        assert result == ["rapide"]
+        assert metadata['model'] == 'claude-3-5-haiku-latest'
+        assert 'fallback' not in metadata
+
+    @patch('autocorrect_pro.models.config_snapshot')
+    @patch('autocorrect_pro.models._stream_provider')
+    def test_stream_response_reports_hedge_winner(self, mock_stream_provider, mock_config_snapshot):
+        """Test that stream_response reports the answering model and skips caching secondary answers."""
+        mock_config_snapshot.return_value = {
+            'response_cache': {'enabled': True},
+            'hedging': {'enabled': True, 'delay_ms': 10, 'model': 'gpt-4o-mini'},
+        }
+
+        def provider(model_config, *args):
+            if model_config['provider'] == 'google':
+                return self._slow(["lent"], 0.5)()
+            return iter(["rapide"])
+        mock_stream_provider.side_effect = provider
+
+        metadata = {}
+        result = list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes,
+                                      metadata=metadata))
+
+        assert result == ["rapide"]
+        assert metadata['model'] == 'gpt-4o-mini'
+        assert metadata['provider'] == 'openai'
+        assert metadata['cache'] == 'miss'
+
+        mock_stream_provider.side_effect = lambda *args: iter(["réponse"])
+        list(stream_response("corriger", "texte", api_key="test_key", all_modes=self.modes))
+        assert mock_stream_provider.call_count == 3
+
+
+class TestAstreamResponse:
+    """Test cases for the asynchronous streaming engine."""
+
+    modes = {"corriger": {"prompt": "Corrige :"}}
+
+    @staticmethod
+    def _collect(agen) -> list[str]:
+        async def collect():
+            return [chunk async for chunk in agen]
+        return asyncio.run(collect())
+
+    def test_astream_response_no_api_key(self):
+        """Test that validation errors match the synchronous engine."""
+        assert self._collect(astream_response("corriger", "texte", api_key=None)) == \
+            ["Erreur: Clé API non configurée"]
+
+    @patch('autocorrect_pro.models._astream_provider')
+    def test_astream_response_success(self, mock_astream_provider):
+        """Test that provider chunks are streamed and then cached."""
+        async def provider(*args):
+            for chunk in ["Bonjour", " monde"]:
+                yield chunk
+        mock_astream_provider.side_effect = provider
+
+        first = self._collect(astream_response("corriger", "bonjour", api_key="test_key", all_modes=self.modes))
+        second = self._collect(astream_response("corriger", "bonjour", api_key="test_key", all_modes=self.modes))
+
+        assert first == ["Bonjour", " monde"]
+        assert "".join(second) == "Bonjour monde"
+        mock_astream_provider.assert_called_once()
+
+    @patch('autocorrect_pro.models._astream_provider')
+    def test_astream_response_exception(self, mock_astream_provider):
+        """Test that provider errors are reported like the synchronous engine."""
+        async def provider(*args):
+            raise Exception("API Error")
+            yield
+        mock_astream_provider.side_effect = provider
+
+        assert self._collect(astream_response("corriger", "texte", api_key="test_key",
+                                              all_modes=self.modes)) == ["Erreur AI: API Error"]
+
+    @patch('autocorrect_pro.models.AsyncOpenAI')
+    def test_async_clients_are_pooled(self, mock_async_openai_class):
+        """Test that async clients are pooled separately from blocking ones."""
+        mock_async_openai_class.side_effect = lambda **kwargs: MagicMock()
+
+        client = client_pool.get("openai_async", "key")
+        assert client_pool.get("openai_async", "key") is client
+        mock_async_openai_class.assert_called_once_with(api_key="key", max_retries=0, http_client=ANY)
+
+
 class TestStreamGemini:
     """Test cases for _stream_gemini function."""
 
+    @patch('autocorrect_pro.models.genai_client')
     @patch('autocorrect_pro.models.genai')
-    def test_stream_gemini_success(self, mock_genai):
+    def test_stream_gemini_success(self, mock_genai, mock_genai_client):
         """
         Test successful Gemini streaming response.
 
@@ -170,11 +522,15 @@ class TestStreamGemini:
         result = list(_stream_gemini("Test prompt", "test_api_key"))
         assert result == ["Gemini response"]
 
-        mock_genai.configure.assert_called_once_with(api_key="test_api_key")
+        manager = mock_genai_client._ClientManager.return_value
+        manager.configure.assert_called_once_with(api_key="test_api_key")
+        mock_genai.configure.assert_not_called()
         mock_genai.GenerativeModel.assert_called_once_with('gemini-2.5-flash')
+        assert mock_model._client._client is manager.make_client.return_value
 
+    @patch('autocorrect_pro.models.genai_client')
     @patch('autocorrect_pro.models.genai')
-    def test_stream_gemini_empty_chunk(self, mock_genai):
+    def test_stream_gemini_empty_chunk(self, mock_genai, mock_genai_client):
         """Test Gemini streaming with empty chunk."""
         mock_model = MagicMock()
         mock_response = MagicMock()
@@ -187,8 +543,9 @@ class TestStreamGemini:
         result = list(_stream_gemini("Test prompt", "test_api_key"))
         assert result == []
 
+    @patch('autocorrect_pro.models.genai_client')
     @patch('autocorrect_pro.models.genai')
-    def test_stream_gemini_exception(self, mock_genai):
+    def test_stream_gemini_exception(self, mock_genai, mock_genai_client):
         """Test Gemini streaming exception handling."""
         mock_genai.GenerativeModel.side_effect = Exception("Gemini Error")
 
@@ -196,6 +553,22 @@ class TestStreamGemini:
             list(_stream_gemini("Test prompt", "test_api_key"))
 
 
+    def test_stream_call_abortable(self):
+        """Test that a Gemini stream is cancelled by an abort, even before its first chunk is read."""
+        service = MagicMock()
+        abort = StreamAbort()
+
+        abortable(abort)
+        try:
+            call = _AbortableGeminiClient(service).stream_generate_content("requête")
+        finally:
+            abortable(None)
+        abort.abort()
+
+        assert call is service.stream_generate_content.return_value
+        call.cancel.assert_called_once()
+
+
 class TestStreamOpenAI:
     """Test cases for _stream_openai function."""
 
@@ -220,7 +593,7 @@ class TestStreamOpenAI:
         result = list(_stream_openai("Test prompt", "test_api_key", "gpt-4"))
         assert result == ["OpenAI response"]
 
-        mock_openai_class.assert_called_once_with(api_key="test_api_key")
+        mock_openai_class.assert_called_once_with(api_key="test_api_key", max_retries=0, http_client=ANY)
         mock_client.chat.completions.create.assert_called_once_with(
             model="gpt-4",
             temperature=0,
@@ -252,6 +625,22 @@ class TestStreamOpenAI:
             list(_stream_openai("Test prompt", "test_api_key", "gpt-4"))
 
 
+    @patch('autocorrect_pro.models.OpenAI')
+    def test_stream_openai_closed_early(self, mock_openai_class):
+        """Test that closing the generator closes the HTTP stream."""
+        mock_chunk = MagicMock()
+        mock_chunk.choices[0].delta.content = "Bonjour"
+        mock_response = MagicMock()
+        mock_response.__iter__ = MagicMock(return_value=iter([mock_chunk, mock_chunk]))
+        mock_openai_class.return_value.chat.completions.create.return_value = mock_response
+
+        stream = _stream_openai("Test prompt", "test_api_key", "gpt-4")
+        assert next(stream) == "Bonjour"
+        stream.close()
+
+        mock_response.close.assert_called_once()
+
+
 class TestStreamCustomOpenAI:
     """Test cases for _stream_custom_openai function."""
 
@@ -279,7 +668,9 @@ class TestStreamCustomOpenAI:
 
         mock_openai_class.assert_called_once_with(
             api_key="test_api_key",
-            base_url="http://localhost:8000"
+            max_retries=0,
+            base_url="http://localhost:8000",
+            http_client=ANY
         )
         mock_client.chat.completions.create.assert_called_once_with(
             model="custom-model",
@@ -312,7 +703,7 @@ class TestStreamAnthropic:
         result = list(_stream_anthropic("Test prompt", "test_api_key", "claude-3-5-sonnet"))
         assert result == ["Anthropic response"]
 
-        mock_anthropic.Anthropic.assert_called_once_with(api_key="test_api_key")
+        mock_anthropic.Anthropic.assert_called_once_with(api_key="test_api_key", max_retries=0, http_client=ANY)
         mock_client.messages.stream.assert_called_once_with(
             max_tokens=4096,
             temperature=0,
@@ -340,4 +731,271 @@ class TestStreamAnthropic:
         mock_anthropic.Anthropic.side_effect = Exception("Anthropic Error")
 
         with pytest.raises(Exception):
-            list(_stream_anthropic("Test prompt", "test_api_key", "claude-3-5-sonnet"))
\ No newline at end of file
+            list(_stream_anthropic("Test prompt", "test_api_key", "claude-3-5-sonnet"))
+
+
+class TestPromptCaching:
+    """Test cases for sending mode prompts as cacheable instructions."""
+
+    def test_split_template_keeps_instructions_fixed(self):
+        """Test that the reply template is split before the line holding the received message."""
+        prompt_text = MODES['repondre']['prompt']
+
+        first = _split_template(prompt_text, original_message="Salut", user_response="oui")
+        second = _split_template(prompt_text, original_message="Bonjour", user_response="non")
+
+        assert first[0] == second[0]
+        assert first[0].endswith("Entrées :")
+        assert first[1].startswith("Message reçu : Salut\nÉléments de réponse : oui")
+
+    def test_split_template_starting_with_placeholder(self):
+        """Test that a template without fixed lines is sent as a single message."""
+        assert _split_template("Répondre à: {original_message}", original_message="Salut") == \
+            (None, "Répondre à: Salut")
+
+    @patch('autocorrect_pro.models._stream_gemini')
+    def test_mode_prompt_sent_as_instructions(self, mock_stream_gemini):
+        """Test that the mode prompt and the text reach the provider separately."""
+        mock_stream_gemini.return_value = iter(["réponse"])
+
+        list(stream_response("corriger", "texte", api_key="test_key",
+                             all_modes={"corriger": {"prompt": "Corrige :"}}))
+
+        prompt, api_key, system, usage, max_tokens = mock_stream_gemini.call_args.args
+        assert (prompt, system) == ("texte", "Corrige :")
+
+    @patch('autocorrect_pro.models._stream_openai')
+    def test_usage_reported_in_metadata(self, mock_stream_openai):
+        """Test that the cached token counts of the provider reach the request metadata."""
+        def provider(prompt, api_key, model_name, system, usage, max_tokens):
+            usage.update({'input_tokens': 1200, 'cached_tokens': 1024})
+            yield "réponse"
+        mock_stream_openai.side_effect = provider
+
+        metadata = {}
+        list(stream_response("corriger", "texte", api_key="test_key", model="gpt-4o-mini",
+                             all_modes={"corriger": {"prompt": "Corrige :"}}, metadata=metadata))
+
+        assert metadata['usage'] == {'input_tokens': 1200, 'cached_tokens': 1024}
+
+    @patch('autocorrect_pro.models.OpenAI')
+    def test_openai_system_message_and_cached_tokens(self, mock_openai_class):
+        """Test that OpenAI gets a system message and reports the cached prefix."""
+        text_chunk = MagicMock(usage=None)
+        text_chunk.choices[0].delta.content = "Bonjour"
+        usage_chunk = MagicMock(choices=[])
+        usage_chunk.usage.prompt_tokens = 1500
+        usage_chunk.usage.prompt_tokens_details.cached_tokens = 1280
+        mock_response = MagicMock()
+        mock_response.__iter__ = MagicMock(return_value=iter([text_chunk, usage_chunk]))
+        mock_create = mock_openai_class.return_value.chat.completions.create
+        mock_create.return_value = mock_response
+
+        usage = {}
+        result = list(_stream_openai("texte", "test_api_key", "gpt-4o-mini", "Corrige :", usage))
+
+        assert result == ["Bonjour"]
+        assert mock_create.call_args.kwargs['messages'] == [
+            {"role": "system", "content": "Corrige :"},
+            {"role": "user", "content": "texte"},
+        ]
+        assert mock_create.call_args.kwargs['stream_options'] == {"include_usage": True}
+        assert usage == {'input_tokens': 1500, 'cached_tokens': 1280}
+
+    @patch('autocorrect_pro.models.anthropic')
+    def test_anthropic_cache_breakpoint_and_usage(self, mock_anthropic):
+        """Test that Anthropic gets a cache_control system block and reports cache reads."""
+        mock_stream = MagicMock()
+        mock_stream.__enter__ = MagicMock(return_value=mock_stream)
+        mock_stream.__exit__ = MagicMock(return_value=None)
+        mock_stream.text_stream = iter(["Bonjour"])
+        final_usage = mock_stream.get_final_message.return_value.usage
+        final_usage.input_tokens = 20
+        final_usage.cache_read_input_tokens = 2048
+        final_usage.cache_creation_input_tokens = 0
+        mock_client = mock_anthropic.Anthropic.return_value
+
+        usage = {}
+        mock_client.messages.stream.return_value = mock_stream
+        list(_stream_anthropic("texte", "test_api_key", "claude-3-5-haiku-latest", "Corrige :", usage))
+
+        assert mock_client.messages.stream.call_args.kwargs['system'] == [
+            {"type": "text", "text": "Corrige :", "cache_control": {"type": "ephemeral"}}
+        ]
+        assert usage == {'input_tokens': 2068, 'cached_tokens': 2048, 'cache_write_tokens': 0}
+
+
+class TestRequestSizing:
+    """Test cases for sizing requests before they are sent."""
+
+    modes = {"corriger": {"prompt": "Corrige :"}, "resumer": {"prompt": "Résume :"}}
+
+    @patch('autocorrect_pro.models.config_snapshot')
+    @patch('autocorrect_pro.models._stream_provider')
+    def test_oversized_input_rejected_without_call(self, mock_stream_provider, mock_config_snapshot):
+        """Test that a text larger than the model context is rejected locally."""
+        mock_config_snapshot.return_value = {'custom_endpoint': {'url': 'http://localhost', 'model_name': 'local',
+                                                                 'context_window': 32768}}
+
+        result = list(stream_response("corriger", "mot " * 100000, api_key="test_key", model="custom",
+                                      all_modes=self.modes))
+
+        assert result[0].startswith("Erreur: Texte trop long")
+        mock_stream_provider.assert_not_called()
+
+    @patch('autocorrect_pro.models._stream_anthropic')
+    def test_max_tokens_sized_per_mode(self, mock_stream_anthropic):
+        """Test that the output budget sent to the provider follows the mode."""
+        mock_stream_anthropic.side_effect = lambda *args: iter(["réponse"])
+        text = "Une phrase assez longue pour dépasser le budget minimal de sortie. " * 400
+
+        for mode in ("resumer", "corriger"):
+            list(stream_response(mode, text, api_key="test_key", model="claude-3-5-haiku-latest",
+                                 all_modes=self.modes))
+
+        summary_budget, correction_budget = [call.args[-1] for call in mock_stream_anthropic.call_args_list]
+        assert summary_budget < correction_budget
+
+    def test_estimate_request(self):
+        """Test that a request can be estimated without an API key."""
+        plan, error = estimate_request("corriger", "Bonjour", model="claude-3-5-haiku-latest", all_modes=self.modes)
+
+        assert error is None
+        assert plan['fits'] is True
+        assert estimate_request("inconnu", "Bonjour", all_modes=self.modes)[1] == "Erreur: Mode 'inconnu' non reconnu."
+
+
+class TestClientPool:
+    """Test cases for the provider client pool."""
+
+    def test_keepalive_expiry_extended(self):
+        """Test that pooled SDK clients keep idle connections open longer than the SDK default."""
+        sdk = MagicMock()
+        sdk.DEFAULT_CONNECTION_LIMITS = MagicMock(max_connections=1000, max_keepalive_connections=100)
+
+        _http_client(sdk, asynchronous=True)
+
+        limits = sdk.DefaultAsyncHttpxClient.call_args.kwargs['limits']
+        assert limits.keepalive_expiry == CLIENT_KEEPALIVE_SECONDS
+        assert limits.max_connections == 1000
+        sdk.DefaultHttpxClient.assert_not_called()
+
+    @patch('autocorrect_pro.models.OpenAI')
+    def test_client_reused_across_requests(self, mock_openai_class):
+        """Test that repeated streams with the same key share one client."""
+        mock_client = MagicMock()
+        mock_client.chat.completions.create.side_effect = lambda **kwargs: MagicMock()
+        mock_openai_class.return_value = mock_client
+
+        list(_stream_openai("First", "test_api_key", "gpt-4"))
+        list(_stream_openai("Second", "test_api_key", "gpt-4"))
+
+        mock_openai_class.assert_called_once_with(api_key="test_api_key", max_retries=0, http_client=ANY)
+        assert mock_client.chat.completions.create.call_count == 2
+
+    @patch('autocorrect_pro.models.OpenAI')
+    def test_client_keyed_by_api_key_and_base_url(self, mock_openai_class):
+        """Test that a different key or endpoint gets its own client."""
+        mock_openai_class.side_effect = lambda **kwargs: MagicMock()
+
+        first = client_pool.get("openai", "key_a")
+        assert client_pool.get("openai", "key_b") is not first
+        assert client_pool.get("openai", "key_a", "http://localhost:8000") is not first
+        assert client_pool.get("openai", "key_a") is first
+        assert mock_openai_class.call_count == 3
+
+    @patch('autocorrect_pro.models.OpenAI')
+    def test_lru_eviction(self, mock_openai_class):
+        """Test that the least recently used client is evicted when full."""
+        mock_openai_class.side_effect = lambda **kwargs: MagicMock()
+        pool = ClientPool(max_size=2)
+
+        first = pool.get("openai", "key_a")
+        pool.get("openai", "key_b")
+        pool.get("openai", "key_a")
+        pool.get("openai", "key_c")
+
+        assert len(pool) == 2
+        assert pool.get("openai", "key_a") is first
+        assert mock_openai_class.call_count == 3
+
+    @patch('autocorrect_pro.models.genai_client')
+    @patch('autocorrect_pro.models.genai')
+    def test_gemini_client_per_api_key(self, mock_genai, mock_genai_client):
+        """Test that each Gemini key gets its own service client instead of the process-wide one."""
+        mock_genai.GenerativeModel.side_effect = lambda *args, **kwargs: MagicMock()
+        mock_genai_client._ClientManager.side_effect = lambda: MagicMock()
+
+        first = _gemini_model("key_a", None)
+        second = _gemini_model("key_b", "Instructions")
+
+        assert second._client is not first._client
+        assert second._client is client_pool.get("google", "key_b")._client
+        mock_genai.configure.assert_not_called()
+
+    def test_gemini_sdk_internals_still_used(self):
+        """
+        Test that the installed Gemini SDK still sends its calls through the clients set on the model.
+
+        Pooling a client per key relies on private parts of google.generativeai:
+        _ClientManager, and the _client and _async_client attributes of
+        GenerativeModel. This test fails as soon as an SDK release changes them.
+        """
+        from google.generativeai import protos
+
+        answer = protos.GenerateContentResponse(candidates=[{'content': {'parts': [{'text': "Bonjour"}]}}])
+        model = _create_client("google", "test_key")
+        service = MagicMock()
+        service.stream_generate_content.return_value = MagicMock(**{'__iter__.return_value': iter([answer])})
+        model._client._client = service
+
+        model.count_tokens("ping")
+        chunks = [chunk.text for chunk in model.generate_content("ping", stream=True)]
+
+        service.count_tokens.assert_called_once()
+        assert chunks == ["Bonjour"]
+
+        async def count_async():
+            async_model = _create_client("google_async", "test_key")
+            async_service = AsyncMock()
+            async_model._async_client._client = async_service
+            await async_model.count_tokens_async("ping")
+            return async_service
+
+        asyncio.run(count_async()).count_tokens.assert_called_once()
+
+    @patch('autocorrect_pro.models.AsyncOpenAI')
+    def test_async_client_keyed_by_event_loop(self, mock_async_openai_class):
+        """Test that an async client is reused within a loop but not across loops."""
+        mock_async_openai_class.side_effect = lambda **kwargs: MagicMock()
+
+        async def get_twice():
+            client = client_pool.get("openai_async", "key")
+            assert client_pool.get("openai_async", "key") is client
+            return client
+
+        first = asyncio.run(get_twice())
+        assert asyncio.run(get_twice()) is not first
+        # The client of the closed first loop is dropped
+        assert len(client_pool) == 1
+
+    @patch('autocorrect_pro.models.anthropic')
+    @patch('autocorrect_pro.models.OpenAI')
+    def test_invalidate_by_provider(self, mock_openai_class, mock_anthropic):
+        """Test that invalidation only drops the targeted provider."""
+        mock_openai_class.side_effect = lambda **kwargs: MagicMock()
+        mock_anthropic.Anthropic.side_effect = lambda **kwargs: MagicMock()
+        pool = ClientPool()
+
+        openai_client = pool.get("openai", "key")
+        anthropic_client = pool.get("anthropic", "key")
+        pool.invalidate("openai")
+
+        assert len(pool) == 1
+        assert pool.get("anthropic", "key") is anthropic_client
+        assert pool.get("openai", "key") is not openai_client
+
+    def test_unknown_provider(self):
+        """Test that an unknown provider raises an error."""
+        with pytest.raises(ValueError):
+            client_pool.get("unknown", "key")
@@ -0,0 +1,191 @@
+import threading
+import time
+from unittest.mock import patch
+
+from autocorrect_pro.cancellation import StreamAbort, abortable, on_abort
+from autocorrect_pro.pipeline import (
+    estimate_tokens,
+    split_segments,
+    stream_in_order,
+    stream_segmented,
+)
+
+
+class TestSplitSegments:
+    """Test cases for split_segments function."""
+
+    def test_short_text_single_segment(self):
+        """Test that a text within budget is not split."""
+        assert split_segments("Bonjour le monde.", 100) == [("Bonjour le monde.", "")]
+
+    def test_paragraphs_grouped_within_budget(self):
+        """Test that paragraphs are grouped while they fit."""
+        paragraph = "a" * 40
+        text = f"{paragraph}\n\n{paragraph}\n\n{paragraph}"
+
+        segments = split_segments(text, 25)
+
+        assert segments == [(f"{paragraph}\n\n{paragraph}", "\n\n"), (paragraph, "")]
+
+    def test_layout_is_preserved(self):
+        """Test that segments and separators rebuild the original text."""
+        text = "Premier paragraphe.\n\n\nDeuxième. Avec deux phrases !\n  \nTroisième ?"
+        segments = split_segments(text, 4)
+
+        assert len(segments) > 1
+        assert "".join(segment + separator for segment, separator in segments) == text
+
+    def test_long_paragraph_split_between_sentences(self):
+        """Test that a paragraph over budget is split at sentence ends."""
+        text = "Une phrase assez longue. " * 10
+        segments = split_segments(text.strip(), 10)
+
+        assert len(segments) > 1
+        assert all(segment.endswith(".") for segment, _ in segments)
+        assert all(estimate_tokens(segment) <= 10 for segment, _ in segments)
+
+
+class TestStreamInOrder:
+    """Test cases for stream_in_order function."""
+
+    def test_output_in_task_order(self):
+        """Test that a slow first task still comes out first."""
+        def slow():
+            time.sleep(0.05)
+            yield "1"
+
+        def fast():
+            yield "2"
+
+        assert list(stream_in_order([slow, fast], max_workers=2)) == ["1", "2"]
+
+    def test_tasks_run_concurrently(self):
+        """Test that later tasks run while the first one is still streaming."""
+        started = threading.Event()
+
+        def first():
+            assert started.wait(1)
+            yield "a"
+
+        def second():
+            started.set()
+            yield "b"
+
+        assert list(stream_in_order([first, second], max_workers=2)) == ["a", "b"]
+
+    def test_task_error_reported_in_stream(self):
+        """Test that a failing task does not abort the others."""
+        def failing():
+            raise RuntimeError("boom")
+
+        def ok():
+            yield "ok"
+
+        assert list(stream_in_order([failing, ok], max_workers=2)) == ["Erreur: boom", "ok"]
+
+    def test_close_stops_tasks(self):
+        """Test that closing the stream stops running tasks."""
+        closed = threading.Event()
+
+        def endless():
+            try:
+                while True:
+                    time.sleep(0.01)
+                    yield "x"
+            finally:
+                closed.set()
+
+        stream = stream_in_order([endless], max_workers=1)
+        assert next(stream) == "x"
+        stream.close()
+        assert closed.wait(1)
+
+
+class TestStreamSegmented:
+    """Test cases for stream_segmented function."""
+
+    @patch('autocorrect_pro.pipeline.stream_response')
+    def test_segments_processed_and_reassembled(self, mock_stream_response):
+        """Test that each segment is processed and joined with its separator."""
+        mock_stream_response.side_effect = lambda mode, text, *args, **kwargs: iter([text.upper(), "\n"])
+        text = ("a" * 40) + "\n\n" + ("b" * 40)
+
+        result = "".join(stream_segmented("corriger", text, api_key="key", all_modes={}, segment_tokens=15))
+
+        assert result == ("A" * 40) + "\n\n" + ("B" * 40)
+        assert mock_stream_response.call_count == 2
+
+    @patch('autocorrect_pro.pipeline.stream_response')
+    def test_non_segmentable_mode_not_split(self, mock_stream_response):
+        """Test that modes needing the whole text are sent in one request."""
+        mock_stream_response.return_value = iter(["résumé"])
+        text = ("a" * 40) + "\n\n" + ("b" * 40)
+
+        assert list(stream_segmented("resumer", text, api_key="key", all_modes={}, segment_tokens=15)) == ["résumé"]
+        mock_stream_response.assert_called_once()
+
+    @patch('autocorrect_pro.pipeline.response_cache')
+    @patch('autocorrect_pro.pipeline.stream_response')
+    def test_segment_metadata_summarized(self, mock_stream_response, mock_response_cache):
+        """Test that segment usage is summed and the answers are cached once every segment succeeded."""
+        def answer(mode, text, *args, metadata, cache_writes, **kwargs):
+            metadata.update({'model': 'gpt-4', 'provider': 'openai', 'cache': 'miss',
+                             'usage': {'input_tokens': 10, 'cached_tokens': 4}})
+            cache_writes.append((text, text.upper()))
+            return iter([text.upper()])
+        mock_stream_response.side_effect = answer
+        text = ("a" * 40) + "\n\n" + ("b" * 40)
+        metadata = {}
+
+        list(stream_segmented("corriger", text, api_key="key", all_modes={}, segment_tokens=15, metadata=metadata))
+
+        assert metadata['segments'] == 2
+        assert metadata['model'] == 'gpt-4'
+        assert metadata['cache'] == 'miss'
+        assert metadata['usage'] == {'input_tokens': 20, 'cached_tokens': 8}
+        assert 'error' not in metadata
+        assert mock_response_cache.set.call_count == 2
+
+    @patch('autocorrect_pro.pipeline.response_cache')
+    @patch('autocorrect_pro.pipeline.stream_response')
+    def test_failed_segment_reported_and_not_cached(self, mock_stream_response, mock_response_cache):
+        """Test that a failed segment sets the response error and keeps every segment out of the cache."""
+        def answer(mode, text, *args, metadata, cache_writes, **kwargs):
+            if text.startswith("b"):
+                metadata.update({'error': "Erreur AI: boom", 'error_class': 'TimeoutError'})
+                return iter(["Erreur AI: boom"])
+            cache_writes.append((text, text.upper()))
+            return iter([text.upper()])
+        mock_stream_response.side_effect = answer
+        text = ("a" * 40) + "\n\n" + ("b" * 40)
+        metadata = {}
+
+        list(stream_segmented("corriger", text, api_key="key", all_modes={}, segment_tokens=15, metadata=metadata))
+
+        assert metadata['error'] == "Erreur AI: boom"
+        assert metadata['error_class'] == 'TimeoutError'
+        mock_response_cache.set.assert_not_called()
+
+    @patch('autocorrect_pro.pipeline.stream_response')
+    def test_abort_reaches_segment_streams(self, mock_stream_response):
+        """Test that aborting the request closes the provider stream of every running segment."""
+        closed = []
+
+        def answer(*args, **kwargs):
+            response_closed = threading.Event()
+            on_abort(response_closed.set)
+            if response_closed.wait(2):
+                closed.append(True)
+            return iter([])
+        mock_stream_response.side_effect = answer
+        text = ("a" * 40) + "\n\n" + ("b" * 40)
+        abort = StreamAbort()
+        threading.Timer(0.05, abort.abort).start()
+
+        abortable(abort)
+        try:
+            list(stream_segmented("corriger", text, api_key="key", all_modes={}, segment_tokens=15))
+        finally:
+            abortable(None)
+
+        assert closed == [True, True]
@@ -0,0 +1,159 @@
+import asyncio
+import threading
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from autocorrect_pro.asgi import AsgiApp
+from autocorrect_pro.prewarm import connection_warmer, prewarm_settings, warm_target
+
+
+OPENAI_CONFIG = {'api_key': 'test_key', 'model': 'gpt-4o-mini'}
+CUSTOM_CONFIG = {'api_key': 'test_key', 'model': 'custom',
+                 'custom_endpoint': {'url': 'http://localhost:11434/v1', 'model_name': 'llama3', 'style': 'openai'}}
+
+
+@pytest.fixture
+def mock_pool():
+    """Pooled clients replaced by mocks, with the configuration read by the warmer."""
+    with patch('autocorrect_pro.prewarm.client_pool') as pool:
+        pool.get.return_value = MagicMock()
+        yield pool
+
+
+def _warm(config):
+    with patch('autocorrect_pro.prewarm.config_snapshot', return_value=config):
+        started = connection_warmer.warm()
+        connection_warmer.wait()
+    return started
+
+
+class TestWarmTarget:
+    """Test cases for warm_target and prewarm_settings."""
+
+    def test_provider_model(self):
+        """Test that a hosted model is warmed through its provider SDK."""
+        target = warm_target(OPENAI_CONFIG)
+        assert (target['provider'], target['base_url'], target['custom']) == ('openai', None, False)
+
+    def test_custom_endpoint(self):
+        """Test that a custom endpoint is warmed through the SDK of its style."""
+        target = warm_target({**CUSTOM_CONFIG, 'custom_endpoint': {**CUSTOM_CONFIG['custom_endpoint'],
+                                                                   'style': 'anthropic'}})
+        assert (target['provider'], target['base_url'], target['custom']) == \
+            ('anthropic', 'http://localhost:11434/v1', True)
+
+    def test_nothing_to_warm(self):
+        """Test that no request is planned without a key or an endpoint URL."""
+        assert warm_target({'model': 'gpt-4o-mini'}) is None
+        assert warm_target({**CUSTOM_CONFIG, 'custom_endpoint': {}}) is None
+
+    def test_defaults(self):
+        """Test that pre-warming is on by default and never loads a model unless asked."""
+        settings = prewarm_settings({})
+        assert settings['enabled'] is True
+        assert settings['load_custom_model'] is False
+
+
+class TestConnectionWarmer:
+    """Test cases for ConnectionWarmer."""
+
+    def test_free_request_on_pooled_client(self, mock_pool):
+        """Test that warming lists the models with the pooled client and sends no prompt."""
+        assert _warm(OPENAI_CONFIG)
+
+        mock_pool.get.assert_called_once_with('openai', 'test_key', None)
+        client = mock_pool.get.return_value
+        client.models.list.assert_called_once()
+        client.chat.completions.create.assert_not_called()
+        assert connection_warmer.snapshot()['warms'] == 1
+
+    def test_gemini_token_count(self, mock_pool):
+        """Test that Gemini is warmed with a free token count on the pooled model."""
+        _warm({'api_key': 'test_key', 'model': 'gemini-1.5-flash'})
+
+        mock_pool.get.assert_called_once_with('google', 'test_key')
+        mock_pool.get.return_value.count_tokens.assert_called_once()
+        mock_pool.get.return_value.generate_content.assert_not_called()
+
+    def test_custom_model_load_is_opt_in(self, mock_pool):
+        """Test that a one-token completion is sent only to a custom endpoint that asked for it."""
+        _warm({**OPENAI_CONFIG, 'prewarm': {'load_custom_model': True}})
+        mock_pool.get.return_value.chat.completions.create.assert_not_called()
+
+        connection_warmer.reset()
+        _warm({**CUSTOM_CONFIG, 'prewarm': {'load_custom_model': True}})
+        mock_pool.get.return_value.chat.completions.create.assert_called_once_with(
+            model='llama3', max_tokens=1, messages=[{'role': 'user', 'content': "ping"}])
+
+    def test_repeated_shows_warm_once(self, mock_pool):
+        """Test that showing the window again shortly after does not send another request."""
+        assert _warm(OPENAI_CONFIG)
+        assert not _warm(OPENAI_CONFIG)
+
+        assert mock_pool.get.return_value.models.list.call_count == 1
+
+    def test_disabled(self, mock_pool):
+        """Test that nothing is sent when pre-warming is turned off."""
+        assert not _warm({**OPENAI_CONFIG, 'prewarm': {'enabled': False}})
+        mock_pool.get.assert_not_called()
+
+    def test_failure_is_counted_not_raised(self, mock_pool):
+        """Test that an unreachable provider only shows in the counters."""
+        mock_pool.get.return_value.models.list.side_effect = ConnectionError("hors ligne")
+
+        _warm(OPENAI_CONFIG)
+
+        assert connection_warmer.snapshot()['failures'] == 1
+
+    def test_keep_alive_during_session(self, mock_pool):
+        """Test that the connection is refreshed while the window is open, and no longer once hidden."""
+        _warm(OPENAI_CONFIG)
+        assert connection_warmer.snapshot()['session_active']
+        assert connection_warmer._timer is not None
+
+        with patch('autocorrect_pro.prewarm.config_snapshot', return_value=OPENAI_CONFIG):
+            connection_warmer._keep_alive()
+            connection_warmer.wait()
+            assert mock_pool.get.return_value.models.list.call_count == 2
+
+            connection_warmer.stop()
+            assert connection_warmer._timer is None
+            connection_warmer._keep_alive()
+            connection_warmer.wait()
+        assert mock_pool.get.return_value.models.list.call_count == 2
+
+    def test_async_clients_warmed_on_attached_loop(self, mock_pool):
+        """Test that under the ASGI server the async client is warmed on the server's event loop."""
+        client = MagicMock()
+        client.models.list = AsyncMock()
+        mock_pool.get.return_value = client
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        try:
+            connection_warmer.attach_loop(loop)
+            _warm(OPENAI_CONFIG)
+        finally:
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+
+        mock_pool.get.assert_called_once_with('openai_async', 'test_key', None)
+        client.models.list.assert_awaited_once()
+
+    def test_asgi_lifespan_attaches_loop(self):
+        """Test that the ASGI server attaches its event loop at startup and detaches it at shutdown."""
+        messages = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+        attached = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            attached.append(connection_warmer._loop)
+
+        asyncio.run(AsgiApp(None)({'type': 'lifespan'}, receive, send))
+
+        assert attached[0] is not None
+        assert attached[1] is None
@@ -0,0 +1,217 @@
+import asyncio
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from autocorrect_pro.cancellation import StreamAbort, abortable
+from autocorrect_pro.models import stream_response
+from autocorrect_pro.ratelimit import (
+    KeyLimiter,
+    ThrottleTimeout,
+    TokenBucket,
+    acquire,
+    athrottled_stream,
+    rate_limit_settings,
+    rate_limiter,
+    throttled_stream,
+)
+
+
+MODES = {"corriger": {"prompt": "Corrige :"}}
+
+
+def _settings(**limits):
+    return rate_limit_settings({'max_wait_seconds': 1, 'providers': {'openai': limits}}, 'openai')
+
+
+class TestTokenBucket:
+    """Test cases for TokenBucket."""
+
+    def test_wait_until_refilled(self):
+        """Test that an empty bucket waits for the missing allowance at its rate."""
+        bucket = TokenBucket(60)
+        bucket.take(60)
+
+        assert bucket.wait_time(1, bucket.updated) == pytest.approx(1.0)
+        assert bucket.wait_time(1, bucket.updated + 1) == 0
+
+    def test_large_request_waits_for_full_bucket(self):
+        """Test that a request larger than the bucket is not blocked forever."""
+        bucket = TokenBucket(100)
+        assert bucket.wait_time(500, bucket.updated) == 0
+
+
+class TestKeyLimiter:
+    """Test cases for KeyLimiter."""
+
+    def test_configured_limits(self):
+        """Test that requests and tokens per minute are enforced."""
+        limiter = KeyLimiter('openai')
+        limiter.configure(_settings(requests_per_minute=2, tokens_per_minute=1000))
+
+        assert limiter.try_acquire(400) == 0
+        assert limiter.try_acquire(400) == 0
+        assert limiter.try_acquire(10) > 0
+
+    def test_max_in_flight(self):
+        """Test that a key accepts a bounded number of concurrent calls."""
+        limiter = KeyLimiter('openai')
+        limiter.configure(_settings(max_in_flight=1))
+
+        assert limiter.try_acquire(10) == 0
+        assert limiter.try_acquire(10) > 0
+        limiter.release()
+        assert limiter.try_acquire(10) == 0
+
+    def test_openai_headers(self):
+        """Test that limits and remaining allowance are learned from OpenAI headers."""
+        limiter = KeyLimiter('openai')
+        limiter.observe({
+            'x-ratelimit-limit-requests': '500',
+            'x-ratelimit-remaining-requests': '499',
+            'x-ratelimit-limit-tokens': '30000',
+            'x-ratelimit-remaining-tokens': '0',
+            'x-ratelimit-reset-tokens': '1m30s',
+        })
+
+        snapshot = limiter.snapshot()
+        assert snapshot['requests_per_minute'] == 500
+        assert snapshot['tokens_per_minute'] == 30000
+        assert 89 < snapshot['blocked_for'] <= 90
+        assert limiter.try_acquire(10) > 89
+
+    def test_learned_limit_never_raises_configured_one(self):
+        """Test that the stricter of the configured and learned limits applies."""
+        limiter = KeyLimiter('anthropic')
+        limiter.configure(_settings(requests_per_minute=50))
+        limiter.observe({'anthropic-ratelimit-requests-limit': '1000',
+                         'anthropic-ratelimit-requests-reset': '2026-01-01T00:00:00Z'})
+
+        assert limiter.snapshot()['requests_per_minute'] == 50
+
+    def test_retry_after_blocks_key(self):
+        """Test that retry-after pauses every call with the key."""
+        limiter = KeyLimiter('openai')
+        limiter.observe({'retry-after': '20'})
+
+        assert limiter.try_acquire(1) > 19
+
+    def test_ignores_missing_headers(self):
+        """Test that responses without rate-limit headers change nothing."""
+        limiter = KeyLimiter('custom:http://localhost')
+        limiter.observe({'content-type': 'text/event-stream'})
+        limiter.observe(None)
+
+        assert limiter.snapshot()['requests_per_minute'] is None
+        assert limiter.try_acquire(10) == 0
+
+
+class TestThrottledStream:
+    """Test cases for throttled_stream."""
+
+    def test_wait_is_bounded(self):
+        """Test that a call gives up when no slot frees up within the maximum wait."""
+        limiter = rate_limiter.limiter('openai', 'key', _settings())
+        limiter.observe({'retry-after': '60'})
+
+        with pytest.raises(ThrottleTimeout):
+            acquire(limiter, 10, max_wait=1)
+        assert limiter.snapshot()['waiting'] == 0
+
+    def test_queued_call_waits_for_slot(self):
+        """Test that a call over the limit waits instead of failing."""
+        limiter = rate_limiter.limiter('openai', 'key', _settings(max_in_flight=1))
+        limiter.try_acquire(10)
+
+        with patch('autocorrect_pro.ratelimit.time.sleep', side_effect=lambda _: limiter.release()) as sleep:
+            acquire(limiter, 10, max_wait=1)
+
+        sleep.assert_called_once()
+        assert limiter.in_flight == 1
+
+    def test_slot_released_and_error_headers_observed(self):
+        """Test that the in-flight slot is freed and a 429 retry-after is applied."""
+        class RateLimitError(Exception):
+            class response:
+                headers = {'retry-after': '5'}
+
+        def start():
+            raise RateLimitError()
+            yield
+
+        rate_limits = {'providers': {'openai': {'max_in_flight': 1}}}
+        with pytest.raises(RateLimitError):
+            list(throttled_stream('openai', 'key', 10, rate_limits, start))
+
+        snapshot = rate_limiter.limiter('openai', 'key').snapshot()
+        assert snapshot['in_flight'] == 0
+        assert snapshot['blocked_for'] > 4
+
+    def test_keys_are_separate(self):
+        """Test that each API key has its own limits."""
+        rate_limits = {'providers': {'openai': {'max_in_flight': 1}}}
+        first = throttled_stream('openai', 'key-a', 10, rate_limits, lambda: iter(["a"]))
+        assert next(first) == "a"
+
+        assert list(throttled_stream('openai', 'key-b', 10, rate_limits, lambda: iter(["b"]))) == ["b"]
+        first.close()
+        assert all(limiter['in_flight'] == 0 for limiter in rate_limiter.snapshot())
+
+    def test_slot_released_on_abort(self):
+        """Test that aborting a stream still waiting for the provider frees its in-flight slot at once."""
+        abort, waiting, closed = StreamAbort(), threading.Event(), threading.Event()
+
+        def start():
+            waiting.set()
+            closed.wait(5)
+            return iter([])
+
+        def run():
+            abortable(abort)
+            list(throttled_stream('openai', 'key', 10, {'providers': {'openai': {'max_in_flight': 1}}}, start))
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        waiting.wait(5)
+        assert rate_limiter.limiter('openai', 'key').in_flight == 1
+
+        abort.abort()
+        assert rate_limiter.limiter('openai', 'key').in_flight == 0
+        closed.set()
+        thread.join(5)
+        assert rate_limiter.limiter('openai', 'key').in_flight == 0
+
+    def test_disabled(self):
+        """Test that no limiter is used when rate limiting is disabled."""
+        assert list(throttled_stream('openai', 'key', 10, {'enabled': False}, lambda: iter(["a"]))) == ["a"]
+        assert rate_limiter.snapshot() == []
+
+    def test_async(self):
+        """Test the asynchronous wrapper."""
+        async def start():
+            yield "a"
+
+        async def collect():
+            return [chunk async for chunk in athrottled_stream('openai', 'key', 10, {}, start)]
+
+        assert asyncio.run(collect()) == ["a"]
+        assert rate_limiter.snapshot()[0]['in_flight'] == 0
+
+
+class TestStreamResponseRateLimit:
+    """Test cases for rate limiting in stream_response."""
+
+    @patch('autocorrect_pro.models.config_snapshot')
+    @patch('autocorrect_pro.models._stream_provider')
+    def test_throttled_request_reports_error(self, mock_stream_provider, mock_config_snapshot):
+        """Test that a key paused beyond the maximum wait fails without calling the provider."""
+        mock_config_snapshot.return_value = {'rate_limits': {'max_wait_seconds': 1}}
+        rate_limiter.limiter('google', 'test_key').observe({'retry-after': '60'})
+
+        metadata = {}
+        result = list(stream_response("corriger", "texte", api_key="test_key", all_modes=MODES, metadata=metadata))
+
+        assert result[0].startswith("Erreur AI: Limite de débit atteinte pour google")
+        assert metadata['error_class'] == 'ThrottleTimeout'
+        mock_stream_provider.assert_not_called()
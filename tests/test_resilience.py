@@ -0,0 +1,318 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+
+from autocorrect_pro.models import astream_response, stream_response
+from autocorrect_pro.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    astream_with_fallback,
+    backoff_delay,
+    call_with_retries,
+    is_transient,
+    provider_health,
+    stream_with_fallback,
+    stream_with_retries,
+)
+
+
+SETTINGS = {'retries': 2, 'backoff_ms': 0, 'max_backoff_ms': 0, 'breaker_threshold': 3,
+            'breaker_cooldown_seconds': 30}
+MODES = {"corriger": {"prompt": "Corrige :"}}
+
+
+class RateLimitError(Exception):
+    """Stand-in for the rate limit errors of the provider SDKs."""
+
+    status_code = 429
+
+
+def _attempts(*outcomes):
+    """Return a stream factory whose successive calls fail or stream as listed."""
+    outcomes = list(outcomes)
+
+    def start():
+        outcome = outcomes.pop(0)
+
+        def generate():
+            if isinstance(outcome, Exception):
+                raise outcome
+            yield from outcome
+        return generate()
+    start.remaining = outcomes
+    return start
+
+
+class TestTransientErrors:
+    """Test cases for is_transient."""
+
+    def test_status_codes(self):
+        """Test that rate limits and server errors are transient, client errors are not."""
+        error = Exception("erreur")
+        for status, expected in ((429, True), (503, True), (529, True), (400, False), (401, False)):
+            error.status_code = status
+            assert is_transient(error) is expected
+
+    def test_google_code_and_class_names(self):
+        """Test the Google error code attribute and the timeout and connection classes."""
+        error = Exception("quota")
+        error.code = 429
+        assert is_transient(error)
+
+        class APIConnectionError(Exception):
+            pass
+        assert is_transient(APIConnectionError())
+        assert is_transient(TimeoutError())
+        assert not is_transient(ValueError("invalide"))
+        assert not is_transient(CircuitOpenError('openai', 10))
+
+    def test_backoff_is_bounded(self):
+        """Test that the jittered backoff never exceeds its exponential ceiling."""
+        settings = {'backoff_ms': 100, 'max_backoff_ms': 300}
+        assert all(0 <= backoff_delay(0, settings) <= 0.1 for _ in range(50))
+        assert all(0 <= backoff_delay(5, settings) <= 0.3 for _ in range(50))
+
+
+class TestCircuitBreaker:
+    """Test cases for CircuitBreaker."""
+
+    def test_opens_after_threshold(self):
+        """Test that consecutive failures open the breaker and calls fail fast."""
+        breaker = CircuitBreaker('openai', threshold=2, cooldown=30)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        assert breaker.snapshot()['state'] == 'open'
+
+    def test_success_resets_failures(self):
+        """Test that only consecutive failures count."""
+        breaker = CircuitBreaker('openai', threshold=2, cooldown=30)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+
+        breaker.before_call()
+        assert breaker.snapshot() == {'state': 'closed', 'failures': 1, 'retry_in': None}
+
+    def test_half_open_allows_one_trial(self):
+        """Test that a single trial goes through after the cooldown and closes the breaker."""
+        breaker = CircuitBreaker('openai', threshold=1, cooldown=30)
+        breaker.record_failure()
+        opened_at = breaker.opened_at
+
+        with patch('autocorrect_pro.resilience.time.monotonic', return_value=opened_at + 31):
+            breaker.before_call()
+            assert breaker.state == 'half_open'
+            with pytest.raises(CircuitOpenError):
+                breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == 'closed'
+
+    def test_failed_trial_reopens(self):
+        """Test that a failing trial opens the breaker for another cooldown."""
+        breaker = CircuitBreaker('openai', threshold=1, cooldown=30)
+        breaker.record_failure()
+        with patch('autocorrect_pro.resilience.time.monotonic', return_value=breaker.opened_at + 31):
+            breaker.before_call()
+        breaker.record_failure()
+
+        assert breaker.state == 'open'
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+
+class TestStreamWithRetries:
+    """Test cases for stream_with_retries."""
+
+    def test_transient_error_is_retried(self):
+        """Test that a rate limit before the first token is retried."""
+        start = _attempts(RateLimitError("quota"), RateLimitError("quota"), ["ok"])
+        breaker = CircuitBreaker('openai')
+
+        assert list(stream_with_retries(start, breaker, SETTINGS)) == ["ok"]
+        assert breaker.snapshot()['failures'] == 0
+
+    def test_retries_are_limited(self):
+        """Test that the last error is raised once the retries are exhausted."""
+        start = _attempts(*[RateLimitError("quota")] * 4)
+
+        with pytest.raises(RateLimitError):
+            list(stream_with_retries(start, CircuitBreaker('openai', threshold=10), SETTINGS))
+        assert len(start.remaining) == 1
+
+    def test_other_errors_are_not_retried(self):
+        """Test that a refused request fails at once without counting as a provider failure."""
+        start = _attempts(ValueError("invalide"), ["ok"])
+        breaker = CircuitBreaker('openai')
+
+        with pytest.raises(ValueError):
+            list(stream_with_retries(start, breaker, SETTINGS))
+        assert breaker.snapshot()['failures'] == 0
+
+    def test_error_after_first_token_is_not_retried(self):
+        """Test that a stream failing midway is not restarted."""
+        def start():
+            yield "début"
+            raise RateLimitError("quota")
+
+        stream = stream_with_retries(start, CircuitBreaker('openai'), SETTINGS)
+        assert next(stream) == "début"
+        with pytest.raises(RateLimitError):
+            next(stream)
+
+    def test_open_breaker_fails_fast(self):
+        """Test that the provider is not called while its breaker is open."""
+        start = _attempts(*[RateLimitError("quota")] * 3, ["ok"])
+        breaker = CircuitBreaker('openai', threshold=3)
+
+        with pytest.raises(CircuitOpenError):
+            list(stream_with_retries(start, breaker, {**SETTINGS, 'retries': 5}))
+        assert start.remaining == [["ok"]]
+
+
+class TestCallWithRetries:
+    """Test cases for call_with_retries."""
+
+    def test_transient_error_is_retried(self):
+        """Test that a request that is not streamed is sent again after a rate limit."""
+        outcomes = [RateLimitError("quota"), "Bonjour."]
+
+        def call():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        assert call_with_retries(call, CircuitBreaker('openai'), SETTINGS) == "Bonjour."
+
+    def test_open_breaker_fails_fast(self):
+        """Test that the provider is not called while its breaker is open."""
+        breaker = CircuitBreaker('openai', threshold=1)
+        breaker.record_failure()
+
+        with pytest.raises(CircuitOpenError):
+            call_with_retries(lambda: "Bonjour.", breaker, SETTINGS)
+
+
+class TestFallback:
+    """Test cases for the fallback chain."""
+
+    def test_next_model_answers(self):
+        """Test that the next model is used when the first one stays unavailable."""
+        candidates = [
+            {'model': 'gpt-4o', 'breaker': 'openai', 'start': _attempts(*[RateLimitError("quota")] * 3)},
+            {'model': 'claude-3-5-haiku', 'breaker': 'anthropic', 'start': _attempts(["secours"])},
+        ]
+        metadata = {}
+
+        assert list(stream_with_fallback(candidates, SETTINGS, metadata)) == ["secours"]
+        assert metadata['fallback']['model'] == 'claude-3-5-haiku'
+        assert metadata['fallback']['requested'] == 'gpt-4o'
+        assert provider_health.snapshot()['fallbacks'] == [
+            {'model': 'gpt-4o', 'fallback': 'claude-3-5-haiku', 'count': 1}]
+
+    def test_invalid_request_does_not_fall_back(self):
+        """Test that errors unrelated to availability are raised."""
+        candidates = [
+            {'model': 'gpt-4o', 'breaker': 'openai', 'start': _attempts(ValueError("invalide"))},
+            {'model': 'claude-3-5-haiku', 'breaker': 'anthropic', 'start': _attempts(["secours"])},
+        ]
+
+        with pytest.raises(ValueError):
+            list(stream_with_fallback(candidates, SETTINGS, {}))
+
+    def test_async_next_model_answers(self):
+        """Test the asynchronous fallback chain."""
+        def start(outcome):
+            async def generate():
+                if isinstance(outcome, Exception):
+                    raise outcome
+                yield outcome
+            return generate
+
+        candidates = [
+            {'model': 'gpt-4o', 'breaker': 'openai', 'start': start(TimeoutError())},
+            {'model': 'claude-3-5-haiku', 'breaker': 'anthropic', 'start': start("secours")},
+        ]
+        metadata = {}
+
+        async def collect():
+            return [chunk async for chunk in astream_with_fallback(candidates, SETTINGS, metadata)]
+
+        assert asyncio.run(collect()) == ["secours"]
+        assert metadata['fallback']['model'] == 'claude-3-5-haiku'
+
+
+class TestStreamResponseResilience:
+    """Test cases for retries and fallback in the streaming engines."""
+
+    config = {
+        'response_cache': {'enabled': True},
+        'resilience': {**SETTINGS, 'fallback_models': ['unknown-model', {'model': 'gpt-4o-mini', 'api_key': 'cle'}]},
+    }
+
+    @patch('autocorrect_pro.models.config_snapshot')
+    @patch('autocorrect_pro.models._stream_provider')
+    def test_fallback_model_reported_and_not_cached(self, mock_stream_provider, mock_config_snapshot):
+        """Test that a fallback answer names its model and is not cached for the requested one."""
+        mock_config_snapshot.return_value = self.config
+
+        def provider(model_config, prompt, api_key, *args):
+            if model_config['provider'] == 'google':
+                raise RateLimitError("quota")
+            assert api_key == 'cle'
+            yield "secours"
+        mock_stream_provider.side_effect = provider
+
+        metadata = {}
+        result = list(stream_response("corriger", "texte", api_key="test_key", all_modes=MODES, metadata=metadata))
+
+        assert result == ["secours"]
+        assert (metadata['model'], metadata['provider']) == ('gpt-4o-mini', 'openai')
+        assert metadata['fallback']['requested'] == 'gemini-1.5-flash'
+        assert mock_stream_provider.call_count == 4
+
+        mock_stream_provider.side_effect = lambda *args: iter(["réponse"])
+        assert list(stream_response("corriger", "texte", api_key="test_key", all_modes=MODES)) == ["réponse"]
+
+    @patch('autocorrect_pro.models.config_snapshot')
+    @patch('autocorrect_pro.models._stream_provider')
+    def test_open_breaker_reported_as_error(self, mock_stream_provider, mock_config_snapshot):
+        """Test that an unavailable provider without fallback fails fast with a readable error."""
+        mock_config_snapshot.return_value = {'resilience': {**SETTINGS, 'retries': 0, 'breaker_threshold': 1}}
+        mock_stream_provider.side_effect = RateLimitError("quota")
+
+        list(stream_response("corriger", "texte", api_key="test_key", all_modes=MODES))
+        metadata = {}
+        result = list(stream_response("corriger", "texte", api_key="test_key", all_modes=MODES, metadata=metadata))
+
+        assert result[0].startswith("Erreur AI: Fournisseur indisponible (google)")
+        assert metadata['error_class'] == 'CircuitOpenError'
+        assert mock_stream_provider.call_count == 1
+        assert provider_health.snapshot()['breakers']['google']['state'] == 'open'
+
+    @patch('autocorrect_pro.models.config_snapshot')
+    @patch('autocorrect_pro.models._astream_provider')
+    def test_async_fallback(self, mock_astream_provider, mock_config_snapshot):
+        """Test that the asynchronous engine falls back like the synchronous one."""
+        mock_config_snapshot.return_value = self.config
+
+        async def provider(model_config, *args):
+            if model_config['provider'] == 'google':
+                raise RateLimitError("quota")
+            yield "secours"
+        mock_astream_provider.side_effect = provider
+
+        metadata = {}
+
+        async def collect():
+            return [chunk async for chunk in astream_response("corriger", "texte", api_key="test_key",
+                                                              all_modes=MODES, metadata=metadata)]
+
+        assert asyncio.run(collect()) == ["secours"]
+        assert metadata['model'] == 'gpt-4o-mini'
@@ -0,0 +1,423 @@
+import io
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from autocorrect_pro import create_app
+from autocorrect_pro.cancellation import on_abort
+from autocorrect_pro.config import MODES
+from autocorrect_pro.resilience import provider_health, resilience_settings
+
+
+@pytest.fixture
+def client():
+    """Flask test client with a configured API key."""
+    app = create_app()
+    app.testing = True
+    with patch('autocorrect_pro.routes.load_config') as mock_load_config, \
+            patch('autocorrect_pro.routes.config_snapshot') as mock_config_snapshot, \
+            patch('autocorrect_pro.routes.load_modes') as mock_load_modes:
+        mock_load_config.return_value = {'api_key': 'test_key', 'model': 'gemini-1.5-flash'}
+        mock_config_snapshot.return_value = mock_load_config.return_value
+        mock_load_modes.return_value = {'system': MODES, 'custom': {}, 'order': list(MODES)}
+        yield app.test_client()
+
+
+def _events(response) -> list[str]:
+    """Split an SSE response body into raw data payloads."""
+    body = response.get_data(as_text=True)
+    return [frame[6:] for frame in body.split("\n\n") if frame.startswith("data: ")]
+
+
+class TestProcess:
+    """Test cases for the /process endpoint."""
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_process_delta_protocol(self, mock_stream_response, client):
+        """Test that protocol 2 streams deltas then the full text."""
+        mock_stream_response.return_value = iter(["Bon", "jour\r\n"])
+
+        response = client.post('/process', data={'mode': 'corriger', 'input_text': 'bonjour'})
+        events = _events(response)
+
+        assert [json.loads(e)['delta'] for e in events[:2]] == ["Bon", "jour\n"]
+        assert json.loads(events[2])['text'] == "Bonjour\n"
+        assert events[-1] == "[END]"
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_process_done_event_carries_metadata(self, mock_stream_response, client):
+        """Test that the metadata filled by the engine reaches the final event."""
+        def stream(*args, metadata=None, **kwargs):
+            metadata.update({'model': 'gpt-4o-mini', 'provider': 'openai'})
+            yield "Bonjour"
+        mock_stream_response.side_effect = stream
+
+        response = client.post('/process', data={'mode': 'corriger', 'input_text': 'bonjour'})
+
+        meta = json.loads(_events(response)[-2])['meta']
+        assert set(meta.pop('timing')) == {'ttft_ms', 'total_ms'}
+        assert meta == {'model': 'gpt-4o-mini', 'provider': 'openai'}
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_cancel_stops_stream(self, mock_stream_response, client, isolated_stream_registry):
+        """Test that /process/cancel stops the stream and closes the provider generator."""
+        closed = []
+
+        def stream(*args, **kwargs):
+            try:
+                yield "Bon"
+                client.post('/process/cancel', data={'request_id': 'req-1'})
+                yield "jour"
+                yield "!"
+            finally:
+                closed.append(True)
+        mock_stream_response.side_effect = stream
+
+        response = client.post('/process', data={'mode': 'corriger', 'input_text': 'bonjour', 'request_id': 'req-1'})
+        events = _events(response)
+
+        assert response.headers['X-Request-Id'] == 'req-1'
+        assert json.loads(events[0])['delta'] == "Bon"
+        assert json.loads(events[1])['type'] == "error"
+        assert closed == [True]
+        assert isolated_stream_registry.stats()['cancelled'] == 1
+        assert client.get('/api/streams').get_json()['active'] == 0
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_cancel_before_first_token(self, mock_stream_response, client, isolated_stream_registry):
+        """Test that /process/cancel closes a provider stream still waiting for its first token."""
+        closed = threading.Event()
+
+        def stream(*args, **kwargs):
+            on_abort(closed.set)
+            threading.Timer(0.05, isolated_stream_registry.cancel, args=('req-1',)).start()
+            # Waiting for the provider; the close hook interrupts the read
+            if closed.wait(2):
+                return
+            yield "trop tard"
+        mock_stream_response.side_effect = stream
+
+        response = client.post('/process', data={'mode': 'corriger', 'input_text': 'bonjour', 'request_id': 'req-1'})
+        events = _events(response)
+
+        assert closed.is_set()
+        assert json.loads(events[0])['type'] == "error"
+        assert isolated_stream_registry.stats()['cancelled'] == 1
+
+    def test_cancel_unknown_request(self, client):
+        """Test that cancelling a finished or unknown stream is reported."""
+        assert client.post('/process/cancel', data={'request_id': 'inconnu'}).get_json() == {'success': False}
+        assert client.post('/process/cancel').status_code == 400
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_process_legacy_protocol(self, mock_stream_response, client):
+        """Test that protocol 1 re-sends the accumulated buffer."""
+        mock_stream_response.return_value = iter(["Bon", "jour"])
+
+        response = client.post('/process', data={'mode': 'corriger', 'input_text': 'bonjour', 'protocol': '1'})
+
+        assert _events(response) == ['"Bon"', '"Bonjour"', "[END]"]
+
+    def test_process_unknown_protocol(self, client):
+        """Test that unsupported protocol versions are rejected."""
+        response = client.post('/process', data={'mode': 'corriger', 'input_text': 'x', 'protocol': '9'})
+        assert response.status_code == 400
+
+    def test_process_unknown_mode(self, client):
+        """Test that unknown modes are rejected."""
+        response = client.post('/process', data={'mode': 'inconnu', 'input_text': 'x'})
+        assert response.status_code == 400
+
+    @patch('autocorrect_pro.routes.stream_segmented')
+    def test_process_long_text_mode(self, mock_stream_segmented, client):
+        """Test that long_text=1 routes the request through the segment pipeline."""
+        mock_stream_segmented.return_value = iter(["Texte"])
+
+        response = client.post('/process', data={'mode': 'corriger', 'input_text': 'texte', 'long_text': '1'})
+
+        assert json.loads(_events(response)[-2])['text'] == "Texte"
+        assert mock_stream_segmented.call_args.kwargs['segment_tokens'] == 800
+
+
+    @patch('autocorrect_pro.routes.stream_response')
+    @patch('autocorrect_pro.routes.stream_with_edits')
+    def test_process_edit_list_mode(self, mock_stream_with_edits, mock_stream_response, client):
+        """Test that edit_list=1 routes long corrections through the edit-list protocol."""
+        mock_stream_with_edits.return_value = iter(["Corrections"])
+        mock_stream_response.return_value = iter(["Texte"])
+
+        short = client.post('/process', data={'mode': 'corriger', 'input_text': 'texte', 'edit_list': '1'})
+        long = client.post('/process', data={'mode': 'corriger', 'input_text': 'texte ' * 500, 'edit_list': '1'})
+
+        assert json.loads(_events(short)[-2])['text'] == "Texte"
+        assert json.loads(_events(long)[-2])['text'] == "Corrections"
+        mock_stream_with_edits.assert_called_once()
+
+
+class TestMetrics:
+    """Test cases for request metrics and Server-Timing headers."""
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_process_is_measured(self, mock_stream_response, client):
+        """Test that a /process stream is timed and exposed at /api/metrics."""
+        def stream(*args, metadata=None, **kwargs):
+            metadata.update({'model': 'gemini-1.5-flash', 'provider': 'google'})
+            yield "Bonjour"
+        mock_stream_response.side_effect = stream
+
+        response = client.post('/process', data={'mode': 'corriger', 'input_text': 'bonjour'})
+        response.get_data()
+        metrics_text = client.get('/api/metrics').get_data(as_text=True)
+
+        assert response.headers['Server-Timing'].startswith('setup;dur=')
+        assert ('autocorrect_requests_total{kind="process",mode="corriger",model="gemini-1.5-flash",'
+                'provider="google",outcome="completed",error_class=""} 1') in metrics_text
+        summary = client.get('/api/metrics?format=json').get_json()
+        assert summary['process']['requests'] == 1
+        assert summary['process']['ttft_p50_ms'] is not None
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_provider_error_is_classified(self, mock_stream_response, client):
+        """Test that a failed stream is counted with its error class."""
+        def stream(*args, metadata=None, **kwargs):
+            metadata.update({'model': 'gemini-1.5-flash', 'provider': 'google',
+                             'error': "Erreur AI: délai dépassé", 'error_class': 'TimeoutError'})
+            yield metadata['error']
+        mock_stream_response.side_effect = stream
+
+        client.post('/process', data={'mode': 'corriger', 'input_text': 'bonjour'}).get_data()
+
+        assert 'outcome="error",error_class="TimeoutError"} 1' in client.get('/api/metrics').get_data(as_text=True)
+
+    def test_provider_health(self, client):
+        """Test that breaker states and fallback counts are exposed."""
+        provider_health.breaker('openai', resilience_settings({})).record_failure()
+        provider_health.record_fallback('gpt-4o', 'gemini-1.5-flash')
+
+        health = client.get('/api/providers').get_json()
+
+        assert health['breakers'] == {'openai': {'state': 'closed', 'failures': 1, 'retry_in': None}}
+        assert health['fallbacks'] == [{'model': 'gpt-4o', 'fallback': 'gemini-1.5-flash', 'count': 1}]
+        assert health['rate_limits'] == []
+        assert health['prewarm']['warms'] == 0
+
+
+class TestEstimate:
+    """Test cases for the /api/estimate endpoint."""
+
+    def test_estimate(self, client):
+        """Test that the endpoint returns the size, cost and duration of a request."""
+        response = client.post('/api/estimate', data={'mode': 'corriger', 'input_text': 'Bonjour, sa va ?'})
+        estimate = response.get_json()
+
+        assert response.status_code == 200
+        assert estimate['input_tokens'] > 0
+        assert estimate['fits'] is True
+        assert estimate['segmented'] is False
+        assert estimate['cost_usd'] is not None
+
+    def test_estimate_unknown_mode(self, client):
+        """Test that invalid requests are rejected."""
+        assert client.post('/api/estimate', data={'mode': 'inconnu', 'input_text': 'x'}).status_code == 400
+
+    @patch('autocorrect_pro.routes.stream_segmented')
+    @patch('autocorrect_pro.routes.estimate_request')
+    def test_oversized_text_is_segmented(self, mock_estimate_request, mock_stream_segmented, client):
+        """Test that a text too long for the model is split instead of rejected."""
+        mock_estimate_request.return_value = ({'fits': False}, None)
+        mock_stream_segmented.return_value = iter(["Texte"])
+
+        response = client.post('/process', data={'mode': 'corriger', 'input_text': 'texte'})
+
+        assert json.loads(_events(response)[-2])['text'] == "Texte"
+        mock_stream_segmented.assert_called_once()
+
+
+WAV_HEADER = b"RIFF\x24\x00\x00\x00WAVEfmt "
+
+
+class TestTranscribe:
+    """Test cases for the /transcribe endpoint."""
+
+    @pytest.fixture(autouse=True)
+    def openai_config(self, client):
+        with patch('autocorrect_pro.routes.load_config',
+                   return_value={'api_key': 'test_key', 'model': 'gpt-4o-mini'}):
+            yield
+
+    @staticmethod
+    def _upload(client, audio=WAV_HEADER, **fields):
+        return client.post('/transcribe', data={'audio': (io.BytesIO(audio), 'reunion.mp3'), **fields},
+                           content_type='multipart/form-data')
+
+    @patch('autocorrect_pro.routes._whisper')
+    @patch('autocorrect_pro.routes.split_recording')
+    def test_segments_are_streamed(self, mock_split_recording, mock_whisper, client):
+        """Test that segment texts stream in order, overlaps removed, then the full text."""
+        mock_split_recording.return_value = [('segment-000.wav', io.BytesIO()), ('segment-001.wav', io.BytesIO())]
+        mock_whisper.side_effect = lambda client, settings, upload: {
+            'segment-000.wav': "Bonjour à tous.", 'segment-001.wav': "à tous. Commençons."}[upload[0]]
+
+        response = self._upload(client, stream='1')
+        messages = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        assert response.mimetype == 'application/x-ndjson'
+        assert [m['text'] for m in messages if m['type'] == 'segment'] == ["Bonjour à tous.", " Commençons."]
+        assert messages[-1] == {'type': 'done', 'text': "Bonjour à tous. Commençons.", 'segments': 2}
+
+    @patch('autocorrect_pro.routes._whisper')
+    def test_upload_streamed_from_memory(self, mock_whisper, client):
+        """Test that a small upload reaches Whisper from memory, named after its sniffed format."""
+        def whisper(client, settings, upload):
+            name, audio = upload
+            assert isinstance(audio, io.BytesIO) and not audio.closed
+            audio.seek(0)
+            assert audio.read() == WAV_HEADER
+            return f"{name} transcrit."
+        mock_whisper.side_effect = whisper
+
+        response = self._upload(client, stream='1')
+        messages = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        assert messages[-1]['text'] == "audio.wav transcrit."
+
+    @patch('autocorrect_pro.routes._whisper', return_value="Bonjour.")
+    @patch('autocorrect_pro.routes.split_recording')
+    def test_json_response(self, mock_split_recording, mock_whisper, client):
+        """Test that clients not asking for a stream get the whole text."""
+        mock_split_recording.side_effect = lambda audio, filename, settings: [(filename, audio)]
+
+        response = self._upload(client)
+
+        assert response.get_json() == {'success': True, 'text': "Bonjour."}
+        assert 'split;dur=' in response.headers['Server-Timing']
+
+    @patch('autocorrect_pro.routes._whisper', return_value="Bonjour.")
+    def test_repeat_upload_answered_from_cache(self, mock_whisper, client):
+        """Test that the same recording uploaded again is not sent to Whisper."""
+        first = self._upload(client)
+        second = self._upload(client, stream='1')
+        messages = [json.loads(line) for line in second.get_data(as_text=True).splitlines()]
+
+        assert first.get_json()['text'] == "Bonjour."
+        assert messages[-1] == {'type': 'done', 'text': "Bonjour.", 'segments': 1, 'cached': True}
+        assert mock_whisper.call_count == 1
+        assert client.get('/api/cache').get_json()['transcriptions']['hit_rate'] == 0.5
+
+    @patch('autocorrect_pro.routes._whisper', return_value="Bonjour.")
+    def test_cache_disabled(self, mock_whisper, client):
+        """Test that the cache can be turned off in the transcription settings."""
+        with patch('autocorrect_pro.routes.load_config', return_value={
+                'api_key': 'test_key', 'model': 'gpt-4o-mini', 'transcription': {'cache': False}}):
+            self._upload(client)
+            self._upload(client)
+
+        assert mock_whisper.call_count == 2
+
+    @patch('autocorrect_pro.routes.split_recording')
+    def test_oversize_refused_before_reading(self, mock_split_recording, client):
+        """Test that a request announcing a body over the limit is refused from its Content-Length."""
+        with patch('autocorrect_pro.routes.Request.max_content_length', 1024):
+            response = self._upload(client, audio=WAV_HEADER + bytes(2048))
+
+        assert response.status_code == 413
+        assert "trop volumineux" in response.get_json()['error']
+        mock_split_recording.assert_not_called()
+
+    @patch('autocorrect_pro.routes.split_recording')
+    def test_format_sniffed_from_content(self, mock_split_recording, client):
+        """Test that the file name does not make an unknown file acceptable."""
+        response = self._upload(client, audio=b"%PDF-1.7 pas un fichier audio")
+
+        assert response.status_code == 400
+        assert "Format de fichier non supporté" in response.get_json()['error']
+        mock_split_recording.assert_not_called()
+
+    @patch('autocorrect_pro.resilience.time.sleep')
+    @patch('autocorrect_pro.routes.client_pool')
+    def test_transient_whisper_error_retried(self, mock_client_pool, mock_sleep, client):
+        """Test that a Whisper call failing with a lost connection is sent again, the upload rewound."""
+        sent = []
+
+        def create(file, **kwargs):
+            sent.append(file[1].read())
+            if len(sent) == 1:
+                raise ConnectionError("connexion perdue")
+            return "Bonjour."
+        mock_client_pool.get.return_value.audio.transcriptions.create.side_effect = create
+
+        response = self._upload(client)
+
+        assert response.get_json()['text'] == "Bonjour."
+        assert sent == [WAV_HEADER, WAV_HEADER]
+        assert provider_health.snapshot()['breakers']['openai']['failures'] == 0
+
+    @patch('autocorrect_pro.routes._whisper', side_effect=Exception("API Error"))
+    @patch('autocorrect_pro.routes.split_recording', return_value=[('audio.wav', io.BytesIO())])
+    def test_whisper_error(self, mock_split_recording, mock_whisper, client):
+        """Test that a failing segment ends the transcription with an error."""
+        response = self._upload(client)
+
+        assert response.status_code == 500
+        assert response.get_json()['success'] is False
+        assert 'outcome="error",error_class="Exception"} 1' in client.get('/api/metrics').get_data(as_text=True)
+
+    @patch('autocorrect_pro.routes.split_recording', return_value=None)
+    def test_too_large_without_ffmpeg(self, mock_split_recording, client):
+        """Test that a recording that can be neither sent nor split is refused."""
+        response = self._upload(client)
+
+        assert response.status_code == 400
+        assert "ffmpeg" in response.get_json()['error']
+
+
+class TestLive:
+    """Test cases for the /api/live endpoint."""
+
+    @patch('autocorrect_pro.batch.stream_response')
+    def test_live_reuses_unchanged_paragraphs(self, mock_stream_response, client):
+        """Test that a second revision only sends the edited paragraph to the model."""
+        mock_stream_response.side_effect = lambda mode, text, *args, **kwargs: iter([text.upper()])
+        message = {'session_id': 'test-live', 'revision': 1, 'text': "un.\n\ndeux."}
+
+        first = client.post('/api/live', json=message)
+        second = client.post('/api/live', json={**message, 'revision': 2, 'text': "un.\n\ntrois."})
+        lines = [json.loads(line) for line in second.get_data(as_text=True).splitlines()]
+
+        assert first.mimetype == 'application/x-ndjson'
+        assert mock_stream_response.call_count == 3
+        assert [(line['index'], line['suggestion'], line['reused']) for line in lines[:2]] == [
+            (0, 'UN.', True), (1, 'TROIS.', False)]
+        assert lines[-1]['type'] == 'done' and lines[-1]['checked'] == 1
+
+    def test_live_rejects_invalid_message(self, client):
+        """Test that incomplete messages and unsupported modes are rejected."""
+        assert client.post('/api/live', json={'revision': 1, 'text': 'a'}).status_code == 400
+        assert client.post('/api/live', json={'session_id': 's', 'text': 'a'}).status_code == 400
+        response = client.post('/api/live', json={'session_id': 's', 'revision': 1, 'text': 'a', 'mode': 'resumer'})
+        assert response.status_code == 400
+
+
+class TestBatch:
+    """Test cases for the /api/batch endpoint."""
+
+    @patch('autocorrect_pro.batch.stream_response')
+    def test_batch_streams_ndjson(self, mock_stream_response, client):
+        """Test that the endpoint streams one JSON line per item and a summary."""
+        mock_stream_response.side_effect = lambda mode, text, *args, **kwargs: iter([text.upper()])
+
+        response = client.post('/api/batch', json={'items': [
+            {'text': 'un', 'mode': 'corriger'}, {'text': 'deux', 'mode': 'traduire'},
+        ]})
+        lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+        assert response.mimetype == 'application/x-ndjson'
+        assert sorted((line['index'], line['text']) for line in lines[:2]) == [(0, 'UN'), (1, 'DEUX')]
+        assert lines[-1] == {'type': 'summary', 'total': 2, 'errors': 0}
+
+    def test_batch_rejects_missing_items(self, client):
+        """Test that a request without items is rejected."""
+        assert client.post('/api/batch', json={'items': []}).status_code == 400
+        assert client.post('/api/batch', json={}).status_code == 400
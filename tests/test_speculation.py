@@ -0,0 +1,248 @@
+import json
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from autocorrect_pro import create_app
+from autocorrect_pro.config import MODES
+from autocorrect_pro.routes import speculate
+from autocorrect_pro.speculation import Speculation, speculation_settings, speculator
+
+
+CONFIG = {'api_key': 'test_key', 'model': 'gemini-1.5-flash', 'speculation': {'enabled': True}}
+
+
+def _params(text="bonjour", mode='corriger', model='gemini-1.5-flash'):
+    return {'mode_name': mode, 'input_text': text, 'user_response': None, 'model': model,
+            'api_key': 'test_key', 'all_modes': MODES, 'long_text': None, 'edit_list': False}
+
+
+def _events(response) -> list[str]:
+    """Split an SSE response body into raw data payloads."""
+    body = response.get_data(as_text=True)
+    return [frame[6:] for frame in body.split("\n\n") if frame.startswith("data: ")]
+
+
+@pytest.fixture
+def config():
+    """Configuration read by the routes, with speculation enabled."""
+    with patch('autocorrect_pro.routes.config_snapshot') as mock_config_snapshot, \
+            patch('autocorrect_pro.routes.load_modes') as mock_load_modes:
+        mock_config_snapshot.return_value = dict(CONFIG)
+        mock_load_modes.return_value = {'system': MODES, 'custom': {}, 'order': list(MODES)}
+        yield mock_config_snapshot.return_value
+
+
+@pytest.fixture
+def client(config):
+    """Flask test client with speculation enabled."""
+    app = create_app()
+    app.testing = True
+    return app.test_client()
+
+
+class TestSpeculation:
+    """Test cases for Speculation."""
+
+    def test_follow_replays_buffer_then_live_chunks(self):
+        """Test that a follower gets the buffered chunks, then those generated after it joined."""
+        release = threading.Event()
+
+        def stream(params, metadata):
+            yield "Bon"
+            release.wait(5)
+            metadata['model'] = 'gemini-1.5-flash'
+            yield "jour"
+
+        speculation = Speculation(_params, stream)
+        speculation.start()
+        metadata = {}
+        follower = speculation.follow(metadata)
+
+        assert next(follower) == "Bon"
+        release.set()
+        assert list(follower) == ["jour"]
+        assert metadata == {'model': 'gemini-1.5-flash', 'speculative': True}
+
+    def test_closed_follower_cancels_generation(self):
+        """Test that a request stopping early also stops the provider stream."""
+        closed, release = [], threading.Event()
+
+        def stream(params, metadata):
+            try:
+                yield "Bon"
+                release.wait(5)
+                yield "jour"
+                yield "!"
+            finally:
+                closed.append(True)
+
+        speculation = Speculation(_params, stream)
+        speculation.start()
+        follower = speculation.follow({})
+        next(follower)
+        follower.close()
+        release.set()
+        speculation.wait(5)
+
+        assert closed == [True]
+
+    def test_error_raised_to_follower(self):
+        """Test that a failed generation fails the request that follows it."""
+        def stream(params, metadata):
+            yield "Bon"
+            raise RuntimeError("quota")
+
+        speculation = Speculation(_params, stream)
+        speculation.start()
+        speculation.wait(5)
+
+        with pytest.raises(RuntimeError):
+            list(speculation.follow({}))
+
+
+class TestSpeculator:
+    """Test cases for Speculator."""
+
+    def test_disabled_by_default(self):
+        """Test that nothing is processed ahead of time unless enabled."""
+        assert speculation_settings({})['enabled'] is False
+        assert speculator.likely_mode({}) is None
+
+    def test_likely_mode(self):
+        """Test that the pinned mode wins over the last mode used, which wins over the default."""
+        assert speculator.likely_mode(CONFIG) == 'corriger'
+        speculator.claim(_params(mode='traduire'))
+        assert speculator.likely_mode(CONFIG) == 'traduire'
+        assert speculator.likely_mode({'speculation': {'enabled': True, 'mode': 'resumer'}}) == 'resumer'
+
+    def test_reply_mode_not_speculated(self):
+        """Test that the reply mode, which needs the user's answer, is never picked."""
+        speculator.claim(_params(mode='traduire'))
+        speculator.claim(_params(mode='repondre'))
+        assert speculator.likely_mode(CONFIG) == 'traduire'
+        assert speculator.likely_mode({'speculation': {'enabled': True, 'mode': 'repondre'}}) is None
+
+    def test_claim_matches_line_breaks_of_the_form(self):
+        """Test that clipboard CRLF line breaks match the text submitted by the page."""
+        speculation = speculator.start(lambda: _params("un\r\ndeux"), lambda params, metadata: iter(["Un"]))
+
+        assert speculator.claim(_params("un\ndeux")) is speculation
+        assert speculator.snapshot()['hits'] == 1
+
+    def test_other_request_cancels_speculation(self):
+        """Test that a request for another mode, text or model discards the speculation."""
+        for params in (_params(mode='traduire'), _params("autre"), _params(model='gpt-4o-mini')):
+            speculation = speculator.start(_params, lambda params, metadata: iter(["Bonjour"]))
+            assert speculator.claim(params) is None
+            speculation.wait(5)
+            assert speculation._cancelled.is_set()
+
+        assert speculator.snapshot() == {'pending': False, 'last_mode': 'corriger',
+                                         'started': 3, 'hits': 0, 'discarded': 3}
+
+    def test_new_speculation_replaces_pending_one(self):
+        """Test that capturing new clipboard text cancels the previous speculation."""
+        first = speculator.start(lambda: _params("un"), lambda params, metadata: iter(["Un"]))
+        speculator.start(lambda: _params("deux"), lambda params, metadata: iter(["Deux"]))
+
+        assert first._cancelled.is_set()
+        assert speculator.claim(_params("un")) is None
+
+
+class TestSpeculativeProcess:
+    """Test cases for /process answered by a speculation."""
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_confirmed_mode_replays_speculation(self, mock_stream_response, client):
+        """Test that confirming the likely mode streams the buffered answer without a second generation."""
+        def stream(*args, metadata=None, **kwargs):
+            metadata.update({'model': 'gemini-1.5-flash', 'provider': 'google'})
+            yield "Bon"
+            yield "jour"
+        mock_stream_response.side_effect = stream
+
+        assert speculate("bonjour\r\n")
+        response = client.post('/process', data={'mode': 'corriger', 'input_text': 'bonjour\n'})
+        events = _events(response)
+
+        assert [json.loads(e)['delta'] for e in events[:2]] == ["Bon", "jour"]
+        meta = json.loads(events[-2])['meta']
+        assert (meta['provider'], meta['speculative']) == ('google', True)
+        mock_stream_response.assert_called_once()
+        assert client.get('/api/streams').get_json()['speculation']['hits'] == 1
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_other_mode_processed_normally(self, mock_stream_response, client):
+        """Test that picking another mode cancels the speculation and starts its own generation."""
+        release, closed = threading.Event(), []
+
+        def stream(mode_name, *args, metadata=None, **kwargs):
+            if mode_name == 'corriger':
+                try:
+                    yield "Bonjour"
+                    release.wait(5)
+                    yield "!"
+                finally:
+                    closed.append(True)
+            else:
+                yield "Hello"
+        mock_stream_response.side_effect = stream
+
+        speculate("bonjour")
+        speculation = speculator._pending
+        response = client.post('/process', data={'mode': 'traduire', 'input_text': 'bonjour'})
+        release.set()
+        speculation.wait(5)
+
+        assert closed == [True]
+        assert json.loads(_events(response)[0])['delta'] == "Hello"
+        assert 'speculative' not in json.loads(_events(response)[-2])['meta']
+        assert client.get('/api/streams').get_json()['speculation']['discarded'] == 1
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_disabled(self, mock_stream_response, config):
+        """Test that captured text is not processed when speculation is off."""
+        config['speculation'] = {'enabled': False}
+
+        assert not speculate("bonjour")
+        mock_stream_response.assert_not_called()
+
+    def test_rejected_text_not_speculated(self, config):
+        """Test that a pinned mode that does not exist starts nothing."""
+        config['speculation'] = {'enabled': True, 'mode': 'inconnu'}
+
+        assert speculate("bonjour")
+        assert speculator.claim(_params()) is None
+        assert speculator.snapshot()['discarded'] == 1
+
+    def test_validated_on_speculation_thread(self, config):
+        """Test that the request is not validated in the caller, which may be the window's event loop."""
+        release = threading.Event()
+        callers = []
+
+        def parse(form):
+            callers.append(threading.current_thread().name)
+            release.wait(5)
+            return None, "Mode non reconnu."
+
+        with patch('autocorrect_pro.routes.parse_process_request', side_effect=parse):
+            assert speculate("bonjour")
+            release.set()
+            speculator.claim(_params())
+
+        assert callers == ['speculation']
+
+    @patch('autocorrect_pro.routes.stream_response')
+    def test_started_by_the_page(self, mock_stream_response, client):
+        """Test that the page starts the speculation once it has placed the text in the input."""
+        mock_stream_response.side_effect = lambda *args, metadata=None, **kwargs: iter(["Bonjour"])
+
+        response = client.post('/process/speculate', data={'input_text': 'bonjour'})
+        client.post('/process', data={'mode': 'corriger', 'input_text': 'bonjour'})
+
+        assert response.get_json() == {'success': True}
+        assert client.post('/process/speculate').status_code == 400
+        mock_stream_response.assert_called_once()
+        assert client.get('/api/streams').get_json()['speculation']['hits'] == 1
@@ -0,0 +1,53 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+from autocorrect_pro import models
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# Cold start used to take about 3s, mostly importing every provider SDK.
+STARTUP_BUDGET_SECONDS = 1.5
+
+PROVIDER_MODULES = ('google.generativeai', 'anthropic', 'openai', 'bs4', 'rich')
+
+
+def _run_fresh(code: str) -> str:
+    """Run code in a fresh interpreter from the project root and return its output."""
+    completed = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_ROOT,
+                               capture_output=True, text=True, check=True)
+    return completed.stdout.strip().splitlines()[-1]
+
+
+class TestStartup:
+    """Test cases for the application cold start."""
+
+    def test_heavy_modules_not_imported(self):
+        """Test that building the app does not import provider SDKs or other heavy modules."""
+        output = _run_fresh(
+            "import json, sys\n"
+            "from autocorrect_pro import create_app\n"
+            "create_app()\n"
+            f"print(json.dumps([m for m in {PROVIDER_MODULES!r} if m in sys.modules]))"
+        )
+        assert json.loads(output) == []
+
+    def test_cold_start_within_budget(self):
+        """Test that importing the package and creating the app stays within the startup budget."""
+        code = (
+            "import time\n"
+            "start = time.perf_counter()\n"
+            "from autocorrect_pro import create_app\n"
+            "create_app()\n"
+            "print(time.perf_counter() - start)"
+        )
+        elapsed = min(float(_run_fresh(code)) for _ in range(2))
+        assert elapsed < STARTUP_BUDGET_SECONDS, f"cold start took {elapsed:.2f}s"
+
+    def test_sdk_imported_on_first_use(self):
+        """Test that provider SDKs are still reachable as module attributes."""
+        import openai
+
+        assert models.OpenAI is openai.OpenAI
+        assert models._sdk('AsyncOpenAI') is openai.AsyncOpenAI
@@ -0,0 +1,75 @@
+import hashlib
+import json
+
+from autocorrect_pro.streaming import (
+    BufferStreamEncoder,
+    DeltaStreamEncoder,
+    create_stream_encoder,
+    sse_event,
+)
+
+
+def _payload(frame: str):
+    """Decode the JSON payload of an SSE frame."""
+    assert frame.startswith("data: ") and frame.endswith("\n\n")
+    return json.loads(frame[6:-2])
+
+
+class TestSseEvent:
+    """Test cases for sse_event function."""
+
+    def test_sse_event_format(self):
+        """Test that payloads are JSON encoded in a data frame."""
+        assert sse_event({"a": 1}) == 'data: {"a": 1}\n\n'
+
+
+class TestDeltaStreamEncoder:
+    """Test cases for the protocol 2 encoder."""
+
+    def test_delta_sends_only_new_text(self):
+        """Test that each event carries only its own chunk with a sequence number."""
+        encoder = DeltaStreamEncoder()
+        first = _payload(encoder.delta("Hello"))
+        second = _payload(encoder.delta(" world"))
+
+        assert first == {"v": 2, "type": "delta", "seq": 1, "delta": "Hello"}
+        assert second == {"v": 2, "type": "delta", "seq": 2, "delta": " world"}
+
+    def test_done_carries_full_text_and_checksum(self):
+        """Test that the final event allows the client to verify the text."""
+        encoder = DeltaStreamEncoder()
+        encoder.delta("Héllo")
+        encoder.delta("\nworld")
+        done = _payload(encoder.done())
+
+        assert done["type"] == "done"
+        assert done["seq"] == 3
+        assert done["text"] == "Héllo\nworld"
+        assert done["length"] == len("Héllo\nworld")
+        assert done["sha256"] == hashlib.sha256("Héllo\nworld".encode("utf-8")).hexdigest()
+
+    def test_error_event(self):
+        """Test error encoding."""
+        encoder = DeltaStreamEncoder()
+        error = _payload(encoder.error("Erreur: boom"))
+        assert error == {"v": 2, "type": "error", "seq": 1, "message": "Erreur: boom"}
+
+
+class TestBufferStreamEncoder:
+    """Test cases for the legacy protocol 1 encoder."""
+
+    def test_delta_resends_buffer(self):
+        """Test that every event carries the accumulated text."""
+        encoder = BufferStreamEncoder()
+        encoder.delta("Hello")
+        assert _payload(encoder.delta(" world")) == "Hello world"
+        assert encoder.done() == ""
+
+
+class TestCreateStreamEncoder:
+    """Test cases for create_stream_encoder function."""
+
+    def test_versions(self):
+        """Test encoder selection by protocol version."""
+        assert isinstance(create_stream_encoder(1), BufferStreamEncoder)
+        assert isinstance(create_stream_encoder(2), DeltaStreamEncoder)
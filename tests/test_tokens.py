@@ -0,0 +1,96 @@
+from unittest.mock import patch
+
+from autocorrect_pro.config import AVAILABLE_MODELS, CUSTOM_CONTEXT_WINDOW, CUSTOM_MAX_OUTPUT_TOKENS, OUTPUT_TOKENS_FLOOR
+from autocorrect_pro.tokens import estimate_tokens, model_limits, plan_request
+
+HAIKU = AVAILABLE_MODELS["claude-3-5-haiku-latest"]
+GEMINI = AVAILABLE_MODELS["gemini-1.5-flash"]
+CUSTOM = AVAILABLE_MODELS["custom"]
+
+
+class TestEstimateTokens:
+    """Test cases for estimate_tokens function."""
+
+    def test_empty_text(self):
+        """Test that empty and missing texts count zero tokens."""
+        assert estimate_tokens("") == 0
+        assert estimate_tokens(None, "anthropic") == 0
+
+    def test_provider_ratios(self):
+        """Test that providers with denser tokenizers count more tokens for the same text."""
+        text = "Bonjour, je voudrais corriger ce texte avant de l'envoyer. " * 20
+
+        assert estimate_tokens(text, "anthropic") > estimate_tokens(text, "google")
+        assert estimate_tokens(text) == (len(text) + 3) // 4
+
+    @patch('autocorrect_pro.tokens._openai_encoding')
+    def test_openai_uses_tokenizer(self, mock_encoding):
+        """Test that OpenAI texts are counted with the tokenizer when it is available."""
+        mock_encoding.return_value.encode.return_value = [1, 2, 3]
+
+        assert estimate_tokens("Bonjour le monde", "openai") == 3
+
+
+class TestPlanRequest:
+    """Test cases for plan_request function."""
+
+    text = "Une phrase de longueur moyenne pour mesurer la taille des requêtes. " * 200
+
+    def test_output_budget_depends_on_mode(self):
+        """Test that a summary gets a smaller output budget than an expansion."""
+        summary = plan_request(HAIKU, "resumer", self.text)
+        expansion = plan_request(HAIKU, "etendre", self.text)
+
+        assert summary['max_tokens'] < expansion['max_tokens']
+        assert summary['output_tokens'] < summary['input_tokens'] < expansion['output_tokens']
+
+    def test_output_budget_floor(self):
+        """Test that short texts still get the minimum output budget."""
+        assert plan_request(HAIKU, "corriger", "Bonjour")['max_tokens'] == OUTPUT_TOKENS_FLOOR
+
+    def test_reasoning_models_not_capped(self):
+        """Test that reasoning models get no output cap."""
+        plan = plan_request(GEMINI, "corriger", self.text)
+
+        assert plan['max_tokens'] is None
+        assert plan['fits'] is True
+
+    def test_instructions_counted_in_input(self):
+        """Test that the mode instructions add to the input but not to the expected output."""
+        bare = plan_request(HAIKU, "corriger", self.text)
+        with_system = plan_request(HAIKU, "corriger", self.text, system="Corrige le texte suivant :")
+
+        assert with_system['input_tokens'] > bare['input_tokens']
+        assert with_system['output_tokens'] == bare['output_tokens']
+
+    def test_too_long_for_context_window(self):
+        """Test that a text larger than the context window does not fit."""
+        plan = plan_request(CUSTOM, "corriger", "x" * (CUSTOM_CONTEXT_WINDOW * 4),
+                            custom_endpoint={'url': 'http://localhost', 'model_name': 'local',
+                                             'context_window': CUSTOM_CONTEXT_WINDOW})
+
+        assert plan['fits'] is False
+
+    def test_unknown_custom_limits_warn_instead_of_refusing(self, caplog):
+        """Test that a custom endpoint without declared limits gets the request and a logged warning."""
+        plan = plan_request(CUSTOM, "etendre", "x" * (CUSTOM_MAX_OUTPUT_TOKENS * 4),
+                            custom_endpoint={'url': 'http://localhost', 'model_name': 'local'})
+
+        assert plan['fits'] is True
+        assert plan['max_tokens'] > CUSTOM_MAX_OUTPUT_TOKENS
+        assert "custom_endpoint" in caplog.text
+
+    def test_custom_endpoint_limits(self):
+        """Test that a custom endpoint can declare its own limits."""
+        endpoint = {'context_window': 128000, 'max_output_tokens': 8192}
+
+        assert model_limits(CUSTOM, endpoint) == (128000, 8192)
+        assert model_limits(CUSTOM, {}) == (None, None)
+
+    def test_cost_and_duration(self):
+        """Test that known models get a cost and duration estimate."""
+        plan = plan_request(HAIKU, "corriger", self.text)
+
+        assert plan['cost_usd'] > 0
+        assert plan['seconds'] > 0
+        assert plan_request(CUSTOM, "corriger", self.text)['cost_usd'] is None
@@ -0,0 +1,259 @@
+import io
+import math
+import subprocess
+import sys
+import threading
+import time
+import wave
+from array import array
+from unittest.mock import patch
+
+import pytest
+
+from autocorrect_pro.transcription import (
+    decode_to_wav,
+    merge_overlap,
+    plan_segments,
+    replay_transcription,
+    split_recording,
+    transcribe_segments,
+    transcription_key,
+    write_segments,
+)
+
+
+RATE = 8000
+
+
+def _write_wav(path, pattern):
+    """Write a mono 16-bit WAV made of (seconds, loud) parts: a tone when loud, silence otherwise."""
+    samples = array('h')
+    for seconds, loud in pattern:
+        for i in range(int(seconds * RATE)):
+            samples.append(int(8000 * math.sin(2 * math.pi * 440 * i / RATE)) if loud else 0)
+    with wave.open(str(path), 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(RATE)
+        wav.writeframes(samples.tobytes())
+    return str(path)
+
+
+class TestPlanSegments:
+    """Test cases for segment planning."""
+
+    def test_short_recording_is_one_segment(self, tmp_path):
+        """Test that a recording shorter than a segment is not split."""
+        path = _write_wav(tmp_path / "court.wav", [(3, True)])
+        assert plan_segments(path, segment_seconds=10, overlap_seconds=1, search_seconds=2) == [(0.0, 3.0)]
+
+    def test_segments_overlap_and_cut_in_silences(self, tmp_path):
+        """Test that cuts fall in the silences near each planned cut, with overlaps on both sides."""
+        path = _write_wav(tmp_path / "long.wav", [(8.5, True), (1, False), (8, True), (1, False), (8, True)])
+
+        segments = plan_segments(path, segment_seconds=10, overlap_seconds=1, search_seconds=2, frame_ms=50)
+
+        assert len(segments) == 3
+        assert segments[0][0] == 0.0 and segments[-1][1] == 26.5
+        first_cut, second_cut = segments[0][1] - 1, segments[1][1] - 1
+        assert 8.5 <= first_cut <= 9.5
+        assert 17.5 <= second_cut <= 18.5
+        assert segments[1][0] == first_cut - 1
+
+    def test_write_segments(self, tmp_path):
+        """Test that each segment file holds its slice of the recording."""
+        path = _write_wav(tmp_path / "audio.wav", [(4, True)])
+
+        files = write_segments(path, [(0.0, 2.5), (1.5, 4.0)])
+
+        assert [name for name, _ in files] == ["segment-000.wav", "segment-001.wav"]
+        assert isinstance(files[1][1], io.BytesIO)
+        files[1][1].seek(0)
+        with wave.open(files[1][1], 'rb') as segment:
+            assert segment.getnframes() == int(2.5 * RATE)
+            assert segment.getframerate() == RATE
+
+    def test_large_segments_spooled_to_disk(self, tmp_path):
+        """Test that segments of a recording over the spool limit are not kept in memory."""
+        path = _write_wav(tmp_path / "audio.wav", [(2, True)])
+
+        with patch('autocorrect_pro.transcription._SPOOL_MAX_BYTES', 1024):
+            files = write_segments(path, [(0.0, 1.0), (1.0, 2.0)])
+
+        assert not any(isinstance(file, io.BytesIO) for _, file in files)
+        for _, file in files:
+            file.close()
+
+
+def _fake_ffmpeg(tmp_path, exit_code=0):
+    """Write an executable standing in for ffmpeg: it drains stdin and outputs one second of silence."""
+    script = tmp_path / "ffmpeg"
+    script.write_text(f"#!{sys.executable}\n"
+                      "import sys\n"
+                      "sys.stdin.buffer.read()\n"
+                      "sys.stdout.buffer.write(bytes(32000))\n"
+                      f"sys.exit({exit_code})\n")
+    script.chmod(0o755)
+    return str(script)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="the fake ffmpeg is a script")
+class TestDecodeToWav:
+    """Test cases for decode_to_wav."""
+
+    def test_decoded_through_pipes(self, tmp_path):
+        """Test that a compressed recording is decoded in memory through ffmpeg's stdin and stdout."""
+        audio = io.BytesIO(b"ID3" + bytes(200000))
+
+        with patch('autocorrect_pro.transcription.shutil.which', return_value=_fake_ffmpeg(tmp_path)):
+            decoded = decode_to_wav(audio)
+
+        decoded.seek(0)
+        with wave.open(decoded, 'rb') as wav:
+            assert (wav.getnchannels(), wav.getsampwidth(), wav.getframerate()) == (1, 2, 16000)
+            assert wav.getnframes() == 16000
+        assert list(tmp_path.iterdir()) == [tmp_path / "ffmpeg"]
+
+    def test_pcm_wav_used_as_is(self, tmp_path):
+        """Test that a 16-bit WAV recording is not decoded."""
+        with open(_write_wav(tmp_path / "audio.wav", [(1, True)]), 'rb') as audio:
+            assert decode_to_wav(audio) is audio
+
+    def test_ffmpeg_failure(self, tmp_path):
+        """Test that an ffmpeg error is raised."""
+        with patch('autocorrect_pro.transcription.shutil.which', return_value=_fake_ffmpeg(tmp_path, 1)):
+            with pytest.raises(subprocess.CalledProcessError):
+                decode_to_wav(io.BytesIO(b"OggS" + bytes(100)))
+
+
+class TestSplitRecording:
+    """Test cases for split_recording."""
+
+    @staticmethod
+    def _upload(path):
+        with open(path, 'rb') as audio:
+            return io.BytesIO(audio.read())
+
+    def test_small_recording_sent_as_is(self, tmp_path):
+        """Test that a recording fitting one call is not re-encoded."""
+        audio = self._upload(_write_wav(tmp_path / "audio.wav", [(3, True)]))
+        assert split_recording(audio, "audio.wav") == [("audio.wav", audio)]
+
+    def test_long_recording_split(self, tmp_path):
+        """Test that a long recording is cut into in-memory segment files."""
+        audio = self._upload(_write_wav(tmp_path / "audio.wav", [(25, True)]))
+
+        files = split_recording(audio, "audio.wav", {'segment_seconds': 10, 'overlap_seconds': 1})
+
+        assert len(files) >= 2
+        assert all(isinstance(file, io.BytesIO) for _, file in files)
+        assert list(tmp_path.iterdir()) == [tmp_path / "audio.wav"]
+
+    @patch('autocorrect_pro.transcription.shutil.which', return_value=None)
+    def test_large_compressed_file_without_ffmpeg(self, mock_which):
+        """Test that a compressed file over the Whisper limit is refused without ffmpeg."""
+        audio = io.BytesIO(b"ID3" + b"\0" * 100)
+
+        assert split_recording(audio, "audio.mp3") == [("audio.mp3", audio)]
+        with patch('autocorrect_pro.transcription.WHISPER_MAX_SIZE_MB', 0.00001):
+            assert split_recording(audio, "audio.mp3") is None
+
+    @patch('autocorrect_pro.transcription.decode_to_wav',
+           side_effect=subprocess.CalledProcessError(1, ['ffmpeg']))
+    def test_undecodable_small_file_sent_as_is(self, mock_decode_to_wav):
+        """Test that a file ffmpeg cannot read from a pipe is still sent when small enough."""
+        audio = io.BytesIO(b"\0\0\0\x20ftypM4A " + b"\0" * 100)
+
+        assert split_recording(audio, "audio.m4a") == [("audio.m4a", audio)]
+        with patch('autocorrect_pro.transcription.WHISPER_MAX_SIZE_MB', 0.00001):
+            with pytest.raises(subprocess.CalledProcessError):
+                split_recording(audio, "audio.m4a")
+
+
+class TestMergeOverlap:
+    """Test cases for overlap de-duplication."""
+
+    def test_repeated_words_dropped(self):
+        """Test that the words heard in both segments are kept once."""
+        assert merge_overlap("Nous avons parlé du budget.", "du budget. Ensuite, le planning.") == \
+            "Ensuite, le planning."
+
+    def test_comparison_ignores_case_and_punctuation(self):
+        """Test that punctuation differences between segments do not prevent the match."""
+        assert merge_overlap("la réunion est terminée", "Terminée. Merci à tous") == "Merci à tous"
+
+    def test_cut_word_at_segment_start(self):
+        """Test that a word truncated at the start of a segment is skipped with the overlap."""
+        assert merge_overlap("on commence la réunion", "ence la réunion maintenant") == "maintenant"
+
+    def test_no_overlap(self):
+        """Test that unrelated texts are kept whole."""
+        assert merge_overlap("Premier segment.", "Second segment.") == "Second segment."
+
+
+class TestTranscribeSegments:
+    """Test cases for transcribe_segments."""
+
+    def test_ordered_merged_output(self):
+        """Test that segments are transcribed concurrently and yielded in order."""
+        texts = {'a': "Bonjour à tous.", 'b': "à tous. Commençons.", 'c': "Commençons. Premier point."}
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def transcribe(path):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05 if path == 'a' else 0.01)
+            with lock:
+                running[0] -= 1
+            return texts[path] + "\n"
+
+        messages = list(transcribe_segments(['a', 'b', 'c'], transcribe, max_workers=3))
+
+        assert [m['index'] for m in messages[:-1]] == [0, 1, 2]
+        assert messages[-1] == {'type': 'done', 'text': "Bonjour à tous. Commençons. Premier point.", 'segments': 3}
+        assert ''.join(m['text'] for m in messages[:-1]) == messages[-1]['text']
+        assert peak[0] > 1
+
+    def test_full_text_cached_on_success(self, isolated_transcription_cache):
+        """Test that the joined text is cached once every segment is transcribed, and only then."""
+        list(transcribe_segments(['a'], lambda path: "Bonjour.", cache_key='ok'))
+        with pytest.raises(RuntimeError):
+            list(transcribe_segments(['a', 'b'], self._failing_second, cache_key='erreur'))
+
+        assert isolated_transcription_cache.get('ok') == "Bonjour."
+        assert isolated_transcription_cache.get('erreur') is None
+
+    @staticmethod
+    def _failing_second(path):
+        if path == 'b':
+            raise RuntimeError("quota")
+        return "Bonjour."
+
+
+class TestTranscriptionCache:
+    """Test cases for the transcription cache key and replay."""
+
+    def test_key_depends_on_content_model_and_options(self):
+        """Test that the key follows the audio bytes, not the file object, and every option."""
+        options = {'segment_seconds': 300}
+        key = transcription_key(io.BytesIO(b"ID3" + bytes(1000)), 'whisper-1', options)
+
+        assert transcription_key(io.BytesIO(b"ID3" + bytes(1000)), 'whisper-1', options) == key
+        assert transcription_key(io.BytesIO(b"ID3" + bytes(1001)), 'whisper-1', options) != key
+        assert transcription_key(io.BytesIO(b"ID3" + bytes(1000)), 'whisper-2', options) != key
+        assert transcription_key(io.BytesIO(b"ID3" + bytes(1000)), 'whisper-1', {'segment_seconds': 60}) != key
+
+    def test_key_leaves_stream_at_start(self, tmp_path):
+        """Test that hashing a spooled upload rewinds it for Whisper."""
+        with open(_write_wav(tmp_path / "audio.wav", [(1, True)]), 'rb') as audio:
+            transcription_key(audio, 'whisper-1', {})
+            assert audio.tell() == 0
+
+    def test_replay(self):
+        """Test that a cached text is replayed as one segment flagged as cached."""
+        assert list(replay_transcription("Bonjour.")) == [
+            {'type': 'segment', 'index': 0, 'total': 1, 'text': "Bonjour."},
+            {'type': 'done', 'text': "Bonjour.", 'segments': 1, 'cached': True},
+        ]
@@ -1,8 +1,20 @@
+import io
+import json
+import threading
+import time
+
 import pytest
 from unittest.mock import patch, mock_open
 
 from autocorrect_pro.utils import (
+    ConfigStore,
+    ConfigWriter,
+    config_snapshot,
+    config_writer,
+    update_config,
     validate_audio_file,
+    validate_audio_stream,
+    sniff_audio_format,
     find_free_port,
     ensure_config_dir,
     load_config,
@@ -13,7 +25,8 @@ from autocorrect_pro.utils import (
     save_custom_mode,
     get_custom_endpoint,
     save_custom_endpoint,
-    restart_application
+    restart_application,
+    _write_config_file
 )
 
 
@@ -137,6 +150,47 @@ class TestValidateAudioFile:
         assert error == ""
 
 
+class TestValidateAudioStream:
+    """Test cases for sniff_audio_format and validate_audio_stream."""
+
+    def test_sniff_audio_format(self):
+        """Test that common audio containers are recognised from their first bytes."""
+        headers = {
+            b"RIFF\x24\x00\x00\x00WAVEfmt ": 'wav',
+            b"ID3\x04\x00\x00\x00\x00\x00\x00\x00\x00": 'mp3',
+            b"\xff\xfb\x90\x00" + bytes(8): 'mp3',
+            b"fLaC\x00\x00\x00\x22" + bytes(4): 'flac',
+            b"OggS\x00\x02" + bytes(6): 'ogg',
+            b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81" + bytes(4): 'webm',
+            b"\x00\x00\x00\x20ftypM4A ": 'm4a',
+            b"\x00\x00\x00\x18ftypisom": 'mp4',
+        }
+        for header, expected in headers.items():
+            assert sniff_audio_format(header) == expected
+        assert sniff_audio_format(b"\xff\xf1\x50\x80" + bytes(8)) is None
+        assert sniff_audio_format(b"%PDF-1.7") is None
+
+    def test_valid_stream_left_at_start(self):
+        """Test that a valid upload is accepted and rewound for the next reader."""
+        stream = io.BytesIO(b"OggS" + bytes(100))
+
+        assert validate_audio_stream(stream) == ('ogg', "")
+        assert stream.tell() == 0
+
+    def test_extension_is_ignored(self):
+        """Test that unknown content is refused whatever its name."""
+        audio_format, error = validate_audio_stream(io.BytesIO(b"<html></html>"))
+        assert audio_format is None
+        assert "Format de fichier non supporté" in error
+
+    def test_empty_and_too_large(self):
+        """Test that empty uploads and uploads over the limit are refused."""
+        assert validate_audio_stream(io.BytesIO())[0] is None
+        audio_format, error = validate_audio_stream(io.BytesIO(b"ID3" + bytes(2 * 1024 * 1024)), max_size_mb=1)
+        assert audio_format is None
+        assert "trop volumineux" in error
+
+
 class TestFindFreePort:
     """Test cases for find_free_port function."""
 
@@ -170,28 +224,29 @@ class TestConfigFunctions:
         config = load_config()
         assert config == DEFAULT_CONFIG.copy()
 
-    @patch('autocorrect_pro.utils.CONFIG_FILE')
-    @patch('builtins.open', new_callable=mock_open)
-    @patch('autocorrect_pro.utils.load_config')
-    def test_save_config_success(self, mock_load_config, mock_file, mock_config_file):
+    def test_save_config_success(self, isolated_config_file):
         """Test successful configuration saving."""
-        mock_load_config.return_value = {"api_key": "old_key"}
+        isolated_config_file.write_text(json.dumps({"api_key": "old_key", "theme": "dark"}))
 
         result = save_config(api_key="new_key")
         assert result is True
+        assert config_writer.flush() is True
 
-        mock_file.assert_called_once()
+        saved = json.loads(isolated_config_file.read_text())
+        assert saved["api_key"] == "new_key"
+        assert saved["theme"] == "dark"
 
-    @patch('autocorrect_pro.utils.CONFIG_FILE')
-    @patch('builtins.open', new_callable=mock_open)
-    @patch('autocorrect_pro.utils.load_config')
-    def test_save_config_failure(self, mock_load_config, mock_file, mock_config_file):
-        """Test configuration saving failure."""
-        mock_load_config.return_value = {"api_key": "old_key"}
-        mock_file.side_effect = Exception("Permission denied")
+    @patch('autocorrect_pro.utils.os.replace')
+    def test_save_config_failure(self, mock_replace, isolated_config_file):
+        """Test that a failed write leaves the previous file intact."""
+        isolated_config_file.write_text(json.dumps({"api_key": "old_key"}))
+        mock_replace.side_effect = OSError("Permission denied")
 
-        result = save_config(api_key="new_key")
-        assert result is False
+        save_config(api_key="new_key")
+        assert config_writer.flush() is False
+
+        assert json.loads(isolated_config_file.read_text()) == {"api_key": "old_key"}
+        assert list(isolated_config_file.parent.iterdir()) == [isolated_config_file]
 
     @patch('autocorrect_pro.utils.CONFIG_FILE')
     @patch('builtins.open', new_callable=mock_open)
@@ -222,18 +277,208 @@ class TestConfigFunctions:
         result = save_api_key("new_key")
         assert result is True
 
-    @patch('autocorrect_pro.utils.CONFIG_FILE')
-    @patch('builtins.open', new_callable=mock_open)
     @patch('autocorrect_pro.utils.load_config')
-    def test_save_api_key_failure(self, mock_load_config, mock_file, mock_config_file):
+    def test_save_api_key_failure(self, mock_load_config):
         """Test API key saving failure."""
-        mock_load_config.return_value = {"api_key": "old_key"}
-        mock_file.side_effect = Exception("Permission denied")
+        mock_load_config.side_effect = Exception("Permission denied")
 
         result = save_api_key("new_key")
         assert result is False
 
 
+class TestConfigStore:
+    """Test cases for the in-memory configuration store."""
+
+    def test_file_parsed_once(self, tmp_path):
+        """Test that repeated reads of an unchanged file do not parse it again."""
+        config_file = tmp_path / "gemini.json"
+        config_file.write_text(json.dumps({"api_key": "test_key"}))
+        store = ConfigStore(check_interval=0)
+
+        with patch('autocorrect_pro.utils.CONFIG_FILE', config_file), \
+                patch('autocorrect_pro.utils.json.load', wraps=json.load) as mock_json_load:
+            assert store.snapshot()["api_key"] == "test_key"
+            assert store.snapshot()["api_key"] == "test_key"
+
+        mock_json_load.assert_called_once()
+
+    def test_reload_on_file_change(self, tmp_path):
+        """Test that an external edit of the file is picked up."""
+        config_file = tmp_path / "gemini.json"
+        config_file.write_text(json.dumps({"api_key": "old"}))
+        store = ConfigStore(check_interval=0)
+
+        with patch('autocorrect_pro.utils.CONFIG_FILE', config_file):
+            assert store.snapshot()["api_key"] == "old"
+            config_file.write_text(json.dumps({"api_key": "new_key"}))
+            assert store.snapshot()["api_key"] == "new_key"
+
+    def test_file_not_checked_within_interval(self, tmp_path):
+        """Test that the file is not even checked between two intervals."""
+        config_file = tmp_path / "gemini.json"
+        config_file.write_text(json.dumps({"api_key": "old"}))
+        store = ConfigStore(check_interval=60)
+
+        with patch('autocorrect_pro.utils.CONFIG_FILE', config_file):
+            store.snapshot()
+            with patch('autocorrect_pro.utils._config_file_signature') as mock_signature:
+                store.snapshot()
+            mock_signature.assert_not_called()
+
+    def test_snapshot_is_read_only(self, tmp_path):
+        """Test that readers cannot modify the shared snapshot."""
+        config_file = tmp_path / "gemini.json"
+        config_file.write_text(json.dumps({"modes": {"order": ["corriger"]}}))
+        store = ConfigStore()
+
+        with patch('autocorrect_pro.utils.CONFIG_FILE', config_file):
+            snapshot = store.snapshot()
+
+        with pytest.raises(TypeError):
+            snapshot["api_key"] = "x"
+        assert snapshot["modes"]["order"] == ("corriger",)
+
+    def test_own_writes_are_visible(self, tmp_path):
+        """Test that load_config returns a mutable copy reflecting save_config."""
+        config_file = tmp_path / "gemini.json"
+        config_file.write_text(json.dumps({"api_key": "old"}))
+
+        with patch('autocorrect_pro.utils.CONFIG_FILE', config_file):
+            config = load_config()
+            config["api_key"] = "modified in place"
+            assert load_config()["api_key"] == "old"
+
+            save_config(api_key="new_key")
+            assert load_config()["api_key"] == "new_key"
+
+
+class TestConfigWriter:
+    """Test cases for the background configuration writer."""
+
+    def test_burst_of_writes_coalesced(self, isolated_config_file):
+        """Test that successive changes are visible at once and written in one go."""
+        writer = ConfigWriter(delay=60)
+
+        with patch('autocorrect_pro.utils._write_config_file') as mock_write:
+            for index in range(5):
+                writer.update(lambda config, index=index: config.update(last_version=index))
+            assert load_config()['last_version'] == 4
+            mock_write.assert_not_called()
+
+            writer.flush()
+
+        mock_write.assert_called_once()
+        assert mock_write.call_args.args[0]['last_version'] == 4
+
+    def test_write_happens_in_background(self, isolated_config_file):
+        """Test that pending changes are written after the delay without a flush."""
+        writer = ConfigWriter(delay=0.01)
+        writer.update(lambda config: config.update(theme="dark"))
+
+        deadline = time.monotonic() + 2
+        while not isolated_config_file.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert json.loads(isolated_config_file.read_text())['theme'] == "dark"
+
+    def test_concurrent_updates_not_lost(self, isolated_config_file):
+        """Test that concurrent read-modify-write changes are serialized."""
+        def append(config):
+            config.setdefault('items', []).append(len(config.get('items', [])))
+
+        threads = [threading.Thread(target=update_config, args=(append,)) for _ in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        config_writer.flush()
+
+        assert json.loads(isolated_config_file.read_text())['items'] == list(range(20))
+
+    def test_failed_mutation_discarded(self, isolated_config_file):
+        """Test that an exception in a mutator leaves the configuration unchanged."""
+        def invalid(config):
+            config['theme'] = "dark"
+            raise ValueError("invalid")
+
+        with pytest.raises(ValueError):
+            update_config(invalid)
+
+        assert load_config()['theme'] == "light"
+
+    def test_delete_drops_pending_changes(self, isolated_config_file):
+        """Test that deleting the configuration cancels pending writes."""
+        isolated_config_file.write_text(json.dumps({"api_key": "old_key"}))
+        update_config(lambda config: config.update(api_key="new_key"))
+
+        config_writer.delete()
+        config_writer.flush()
+
+        assert not isolated_config_file.exists()
+        assert load_config()['api_key'] is None
+
+    def test_failed_write_kept_pending(self, isolated_config_file):
+        """Test that a change whose write failed is written again after the delay."""
+        writer = ConfigWriter(delay=0.01)
+
+        with patch('autocorrect_pro.utils._write_config_file', side_effect=OSError("disque plein")):
+            writer.update(lambda config: config.update(theme="dark"))
+            assert not writer.flush()
+
+        deadline = time.monotonic() + 2
+        while not isolated_config_file.exists() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        assert json.loads(isolated_config_file.read_text())['theme'] == "dark"
+        assert writer.flush()
+
+    def _blocking_write(self, started, release):
+        """Returns a file write that waits for release once it has started."""
+        def blocking_write(config):
+            started.set()
+            release.wait(2)
+            _write_config_file(config)
+        return blocking_write
+
+    def test_delete_during_flush(self, isolated_config_file):
+        """Test that deleting the configuration while a flush is writing does not deadlock."""
+        writer = ConfigWriter(delay=60)
+        started, release = threading.Event(), threading.Event()
+        writer.update(lambda config: config.update(theme="dark"))
+
+        with patch('autocorrect_pro.utils._write_config_file', side_effect=self._blocking_write(started, release)):
+            flush = threading.Thread(target=writer.flush, daemon=True)
+            flush.start()
+            assert started.wait(2)
+            delete = threading.Thread(target=writer.delete, daemon=True)
+            delete.start()
+            time.sleep(0.05)
+            release.set()
+            flush.join(2)
+            delete.join(2)
+
+        assert not flush.is_alive() and not delete.is_alive()
+        assert not isolated_config_file.exists()
+
+    def test_change_during_flush_kept(self, isolated_config_file):
+        """Test that a change made while the file is written stays visible and pending."""
+        writer = ConfigWriter(delay=60)
+        started, release = threading.Event(), threading.Event()
+        writer.update(lambda config: config.update(theme="dark"))
+
+        with patch('autocorrect_pro.utils._write_config_file', side_effect=self._blocking_write(started, release)):
+            flush = threading.Thread(target=writer.flush, daemon=True)
+            flush.start()
+            assert started.wait(2)
+            writer.update(lambda config: config.update(last_version=7))
+            release.set()
+            flush.join(2)
+
+        assert load_config()['last_version'] == 7
+        writer.flush()
+        assert json.loads(isolated_config_file.read_text())['last_version'] == 7
+
+
 class TestModesFunctions:
     """Test cases for modes functions."""
 
@@ -270,13 +515,11 @@ class TestModesFunctions:
         assert modes['order'] == ['traduire', 'custom_1']
 
     @patch('autocorrect_pro.utils.load_config')
-    @patch('autocorrect_pro.utils.save_config')
-    def test_save_custom_mode_success(self, mock_save_config, mock_load_config):
+    def test_save_custom_mode_success(self, mock_load_config):
         """Test successful custom mode saving."""
         mock_load_config.return_value = {
             'modes': {'system': {}, 'custom': {}, 'order': []}
         }
-        mock_save_config.return_value = True
 
         mode_data = {
             'title': 'Test Mode',
@@ -287,24 +530,16 @@ class TestModesFunctions:
         result = save_custom_mode(mode_data)
         assert result is True
 
-        mock_save_config.assert_called_once()
+        assert config_snapshot()['modes']['order'] == ('custom_1',)
 
     @patch('autocorrect_pro.utils.load_config')
-    @patch('autocorrect_pro.utils.save_config')
-    def test_save_custom_mode_failure(self, mock_save_config, mock_load_config):
+    def test_save_custom_mode_failure(self, mock_load_config):
         """Test custom mode saving failure."""
         mock_load_config.return_value = {
             'modes': {'system': {}, 'custom': {}, 'order': []}
         }
-        mock_save_config.return_value = False
 
-        mode_data = {
-            'title': 'Test Mode',
-            'icon': 'fas fa-test',
-            'prompt': 'Test prompt'
-        }
-
-        result = save_custom_mode(mode_data)
+        result = save_custom_mode({'title': 'Test Mode'})
         assert result is False
 
 